@@ -0,0 +1,45 @@
+"""
+BITFIELD benchmark on a key packing 4096 u4 counters: 100-operation batches sent as
+100 single-operation BITFIELD commands (the previous handler) vs. one batched command.
+-n is the number of batches.
+"""
+import random
+
+from common import fresh_store, parse_args, timed
+from commands.bitfield_handler import BitFieldCommandHandler
+
+BATCH = 100
+COUNTERS = 4096
+
+
+def main():
+    args = parse_args(__doc__, 10_000)
+    n = args.n
+    rng = random.Random(42)
+    db = fresh_store()
+    handler = BitFieldCommandHandler(db)
+    batches = []
+    for _ in range(n):
+        batch = []
+        for _ in range(BATCH):
+            counter = f"#{rng.randrange(COUNTERS)}"
+            batch.append(rng.choice([["INCRBY", "u4", counter, "1"], ["GET", "u4", counter],
+                                     ["SET", "u4", counter, "3"]]))
+        batches.append(batch)
+
+    def single_ops():
+        for batch in batches:
+            for op in batch:
+                handler.bitfield_command(None, "single", *op)
+
+    def batched():
+        for batch in batches:
+            handler.bitfield_command(None, "batched", "OVERFLOW", "SAT", *(arg for op in batch for arg in op))
+
+    print(f"{n:,} batches of {BATCH} operations on {COUNTERS} u4 counters")
+    timed("one BITFIELD per operation", n * BATCH, single_ops)
+    timed("one BITFIELD per batch", n * BATCH, batched)
+
+
+if __name__ == '__main__':
+    main()
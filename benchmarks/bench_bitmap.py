@@ -0,0 +1,60 @@
+"""
+SETBIT / GETBIT benchmark on a 100 MB bitmap: the previous latin-1 str round trip
+(O(size) per SETBIT) vs. the in-place bytearray (O(1) per SETBIT).
+"""
+import random
+
+from common import fresh_store, parse_args, timed
+
+BITMAP_BYTES = 100 * 1024 * 1024
+
+
+def old_setbit(db, key, offset, value):
+    """The previous SETBIT: pad, encode, flip one bit, decode and store a new str."""
+    current = db.store.get(key) or ""
+    byte_index = offset >> 3
+    if byte_index >= len(current):
+        current = current.ljust(byte_index + 1, '\x00')
+    byte_array = bytearray(current.encode('latin1'))
+    if value:
+        byte_array[byte_index] |= 1 << (7 - (offset & 7))
+    else:
+        byte_array[byte_index] &= ~(1 << (7 - (offset & 7)))
+    db.store[key] = byte_array.decode('latin1')
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    old_ops = 3
+    bits = BITMAP_BYTES * 8
+    rng = random.Random(42)
+    offsets = [rng.randrange(bits) for _ in range(n)]
+    db = fresh_store()
+
+    db.store["old"] = '\x00' * BITMAP_BYTES
+
+    def old_setbits():
+        for offset in offsets[:old_ops]:
+            old_setbit(db, "old", offset, 1)
+
+    db.bitmap.setbit("bitmap", bits - 1, 1)
+
+    def setbits():
+        setbit = db.bitmap.setbit
+        for offset in offsets:
+            setbit("bitmap", offset, 1)
+
+    def getbits():
+        getbit = db.bitmap.getbit
+        for offset in offsets:
+            getbit("bitmap", offset)
+
+    print(f"bitmap of {BITMAP_BYTES // (1024 * 1024)} MB, {n:,} random offsets")
+    timed("str round trip: SETBIT", old_ops, old_setbits)
+    timed("bytearray: SETBIT", n, setbits)
+    timed("bytearray: GETBIT", n, getbits)
+
+
+if __name__ == '__main__':
+    main()
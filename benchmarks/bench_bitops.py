@@ -0,0 +1,56 @@
+"""
+BITCOUNT / BITOP / BITPOS benchmark across bitmap sizes: the previous byte-by-byte loops
+vs. word-at-a-time big-integer chunks, and NumPy when it is installed.
+-n is the largest bitmap size in MB (1, 10 and 100 MB are measured up to it).
+"""
+import os
+
+from common import fresh_store, parse_args, timed
+import datatypes.advanced.bitmap as bitmap_module
+
+MB = 1024 * 1024
+
+
+def old_bitcount(data):
+    return sum(bin(byte).count('1') for byte in data)
+
+
+def old_bitop_and(first, second):
+    result = bytearray(first)
+    for i in range(len(result)):
+        result[i] &= second[i]
+    return result
+
+
+def main():
+    args = parse_args(__doc__, 100)
+    sizes = [size for size in (1, 10, 100) if size <= args.n] or [args.n]
+    numpy_module = bitmap_module.np
+    db = fresh_store()
+
+    for size in sizes:
+        length = size * MB
+        db.store["a"] = bytearray(os.urandom(length))
+        db.store["b"] = bytearray(os.urandom(length))
+        # BITPOS worst case: the only set bit is the last one
+        db.store["sparse"] = bytearray(length - 1) + bytearray(b"\x01")
+        print(f"bitmaps of {size} MB")
+
+        if size <= 10:
+            timed("  byte loop: BITCOUNT", 1, old_bitcount, db.store["a"])
+            timed("  byte loop: BITOP AND", 1, old_bitop_and, db.store["a"], db.store["b"])
+
+        paths = [("int chunks", None)]
+        if numpy_module is not None:
+            paths.append(("numpy", numpy_module))
+        for label, module in paths:
+            bitmap_module.np = module
+            timed(f"  {label}: BITCOUNT", 1, db.bitmap.bitcount, "a")
+            timed(f"  {label}: BITOP AND", 1, db.bitmap.bitop, "AND", "dest", "a", "b")
+            timed(f"  {label}: BITOP NOT", 1, db.bitmap.bitop, "NOT", "dest", "a")
+        bitmap_module.np = numpy_module
+        timed("  BITPOS 1 (scan to the last byte)", 1, db.bitmap.bitpos, "sparse", 1)
+
+
+if __name__ == '__main__':
+    main()
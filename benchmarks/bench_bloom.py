@@ -0,0 +1,79 @@
+"""
+Bloom filter benchmark at a 1% error rate: the previous filter (one byte per bit, one
+mmh3.hash call per hash function) vs. the bit-packed blocked filter (one mmh3.hash128 call
+per item). -n is the filter capacity; n items are added and 2n are checked.
+"""
+import math
+
+import mmh3
+
+from common import fresh_store, parse_args, timed
+
+ERROR_RATE = 0.01
+
+
+class OldBloomFilter:
+    """The previous BloomFilter, sized with the classic formulas."""
+    def __init__(self, size, num_hashes):
+        self.size = size
+        self.num_hashes = num_hashes
+        self.bits = bytearray(size)
+
+    def _get_hash_values(self, item):
+        return [mmh3.hash(item, seed) % self.size for seed in range(self.num_hashes)]
+
+    def add(self, item):
+        changed = False
+        for pos in self._get_hash_values(item):
+            if not self.bits[pos]:
+                self.bits[pos] = 1
+                changed = True
+        return changed
+
+    def contains(self, item):
+        return all(self.bits[pos] for pos in self._get_hash_values(item))
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    members = [f"user:{i}" for i in range(n)]
+    others = [f"visitor:{i}" for i in range(n)]
+    db = fresh_store()
+
+    size = math.ceil(-n * math.log(ERROR_RATE) / math.log(2) ** 2)
+    old = OldBloomFilter(size, math.ceil(math.log(2) * size / n))
+
+    def old_add():
+        for item in members:
+            old.add(item)
+
+    def old_check():
+        return sum(old.contains(item) for item in members + others)
+
+    db.probabilistic.bf_reserve("bf", ERROR_RATE, n)
+
+    def madd():
+        for start in range(0, n, 1000):
+            db.probabilistic.bf_madd("bf", members[start:start + 1000])
+
+    def mexists():
+        found = 0
+        for items in (members, others):
+            for start in range(0, n, 1000):
+                found += sum(db.probabilistic.bf_mexists("bf", items[start:start + 1000]))
+        return found
+
+    print(f"capacity {n:,}, error rate {ERROR_RATE}")
+    timed("byte per bit: ADD", n, old_add)
+    found = timed("byte per bit: EXISTS", 2 * n, old_check)
+    print(f"byte per bit: {len(old.bits):,} bytes, {old.num_hashes} hash calls per item, "
+          f"false positives {(found - n) / n:.4f}")
+    timed("blocked: BF.MADD x1000", n, madd)
+    found = timed("blocked: BF.MEXISTS x1000", 2 * n, mexists)
+    bf = db.store["bf"]
+    print(f"blocked: {bf.size:,} bytes, 1 hash call per item, false positives {(found - n) / n:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Cuckoo filter and Count-Min Sketch benchmark: CF.ADD/CF.MEXISTS/CF.DEL and CMS.INCRBY/CMS.QUERY
+throughput, and the memory of their array-backed storage. -n is the number of items.
+"""
+from common import fresh_store, parse_args, timed
+
+CMS_ERROR = 0.001
+CMS_PROBABILITY = 0.01
+
+
+def main():
+    args = parse_args(__doc__, 200_000)
+    n = args.n
+    members = [f"user:{i}" for i in range(n)]
+    others = [f"visitor:{i}" for i in range(n)]
+    db = fresh_store()
+    probabilistic = db.probabilistic
+
+    probabilistic.cf_reserve("cf", n)
+
+    def cf_add():
+        for item in members:
+            probabilistic.cf_add("cf", item)
+
+    def cf_exists():
+        return sum(probabilistic.cf_mexists("cf", others))
+
+    def cf_del():
+        for item in members[::2]:
+            probabilistic.cf_del("cf", item)
+
+    print(f"{n:,} items")
+    timed("CF.ADD", n, cf_add)
+    found = timed("CF.MEXISTS (absent items)", n, cf_exists)
+    cf = db.store["cf"]
+    print(f"cuckoo: {cf.size:,} bytes in {len(cf.filters)} sub-filter(s), "
+          f"{cf.size / n:.2f} bytes per item, false positives {found / n:.4f}")
+    timed("CF.DEL", n // 2, cf_del)
+
+    probabilistic.cms_initbyprob("cms", CMS_ERROR, CMS_PROBABILITY)
+
+    def cms_incrby():
+        for start in range(0, n, 1000):
+            probabilistic.cms_incrby("cms", [(item, 1) for item in members[start:start + 1000]])
+
+    def cms_query():
+        for start in range(0, n, 1000):
+            probabilistic.cms_query("cms", members[start:start + 1000])
+
+    timed("CMS.INCRBY x1000", n, cms_incrby)
+    timed("CMS.QUERY x1000", n, cms_query)
+    cms = db.store["cms"]
+    print(f"count-min {cms.width}x{cms.depth}: {cms.counters.itemsize * len(cms.counters):,} bytes of counters")
+
+
+if __name__ == '__main__':
+    main()
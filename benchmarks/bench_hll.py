@@ -0,0 +1,107 @@
+"""
+HyperLogLog benchmark: the previous HLL (always 16 KB of registers, PFCOUNT walking every
+register, PFMERGE as a per-register loop) vs. the sparse/dense HLL with a cached estimate.
+-n is the number of items added; PFCOUNT and PFMERGE are repeated 100 times.
+"""
+import math
+import sys
+
+import mmh3
+
+from common import fresh_store, parse_args, timed
+from datatypes.advanced.probabilistic import HyperLogLog
+
+SMALL_HLLS = 1000
+SMALL_ITEMS = 50
+REPEAT = 100
+
+
+class OldHyperLogLog:
+    """The previous HyperLogLog."""
+    def __init__(self, precision=14):
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, item):
+        x = mmh3.hash(item, 42)
+        j = x & (self.m - 1)
+        w = x >> self.p
+        rho = min(self.p, (w | 1).bit_length())
+        if self.registers[j] < rho:
+            self.registers[j] = rho
+            return True
+        return False
+
+    def count(self):
+        sum_inv = 0
+        zeros = 0
+        for val in self.registers:
+            sum_inv += 2.0 ** -val
+            if val == 0:
+                zeros += 1
+        estimate = (self.alpha * self.m ** 2) / sum_inv
+        if estimate <= 2.5 * self.m and zeros > 0:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(estimate)
+
+    def merge(self, other):
+        for i in range(self.m):
+            self.registers[i] = max(self.registers[i], other.registers[i])
+        return True
+
+
+def hll_bytes(hll):
+    registers = hll.registers if hll.registers is not None else hll.sparse
+    return sys.getsizeof(registers)
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    items = [f"user:{i}" for i in range(n)]
+    others = [f"visitor:{i}" for i in range(n)]
+    db = fresh_store()
+
+    old, old_other = OldHyperLogLog(), OldHyperLogLog()
+
+    def old_add():
+        for item in items:
+            old.add(item)
+        for item in others:
+            old_other.add(item)
+
+    def pfadd():
+        for start in range(0, n, 1000):
+            db.probabilistic.pfadd("hll", *items[start:start + 1000])
+            db.probabilistic.pfadd("other", *others[start:start + 1000])
+
+    def repeat(func, *args):
+        for _ in range(REPEAT):
+            result = func(*args)
+        return result
+
+    print(f"{n:,} items per HLL")
+    timed("previous: PFADD", 2 * n, old_add)
+    timed("sparse/dense: PFADD x1000", 2 * n, pfadd)
+    estimate = timed("previous: PFCOUNT", REPEAT, repeat, old.count)
+    print(f"previous estimate {estimate:,} (error {abs(estimate - n) / n:.2%})")
+    estimate = timed("sparse/dense: PFCOUNT", REPEAT, repeat, db.probabilistic.pfcount, "hll")
+    print(f"sparse/dense estimate {estimate:,} (error {abs(estimate - n) / n:.2%})")
+    timed("previous: PFMERGE", REPEAT, repeat, old.merge, old_other)
+    timed("sparse/dense: PFMERGE", REPEAT, repeat, db.probabilistic.pfmerge, "dest", "hll", "other")
+
+    small_old = [OldHyperLogLog() for _ in range(SMALL_HLLS)]
+    small_new = [HyperLogLog() for _ in range(SMALL_HLLS)]
+    for number, (before, after) in enumerate(zip(small_old, small_new)):
+        for i in range(SMALL_ITEMS):
+            before.add(f"{number}:{i}")
+            after.add(f"{number}:{i}")
+    print(f"{SMALL_HLLS:,} HLLs of {SMALL_ITEMS} items: previous "
+          f"{sum(sys.getsizeof(hll.registers) for hll in small_old):,} bytes, sparse "
+          f"{sum(hll_bytes(hll) for hll in small_new):,} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""LPUSH / RPOP queue benchmark at a deep queue: Python list (previous encoding) vs deque."""
+from common import fresh_store, parse_args, timed
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    ops = min(n, 10_000)
+    values = [f"job:{i}" for i in range(n)]
+
+    # Previous encoding: head operations shift the whole Python list
+    old = list(values)
+
+    def old_queue():
+        for i in range(ops):
+            old.insert(0, values[i])
+            old.pop()
+
+    def old_lpop():
+        for _ in range(ops):
+            old.pop(0)
+
+    db = fresh_store()
+    db.list.rpush("queue", *values)
+
+    def new_queue():
+        for i in range(ops):
+            db.list.lpush("queue", values[i])
+            db.list.rpop("queue")
+
+    def new_lpop():
+        for _ in range(ops):
+            db.list.lpop("queue")
+
+    def new_lindex_middle():
+        for _ in range(ops):
+            db.list.lindex("queue", n // 2)
+
+    print(f"queue depth {n:,}, {ops:,} operations each")
+    timed("list: LPUSH + RPOP", ops, old_queue)
+    timed("list: LPOP", ops, old_lpop)
+    timed("deque: LPUSH + RPOP", ops, new_queue)
+    timed("deque: LPOP", ops, new_lpop)
+    timed("deque: LINDEX middle", ops, new_lindex_middle)
+
+
+if __name__ == '__main__':
+    main()
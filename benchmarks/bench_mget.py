@@ -0,0 +1,54 @@
+"""
+Cache warm-up benchmark: 500 keys read with one GET dispatch per key (as a pipeline
+costs the server) vs. a single MGET dispatch, and N SET dispatches vs. one MSET.
+Every reply is encoded with format_resp as the server would send it.
+"""
+from common import fresh_store, parse_args, timed
+from commands.core_handler import CoreCommandHandler
+from commands.string_handler import StringCommandHandler
+from protocol import format_resp
+
+
+def main():
+    args = parse_args(__doc__, 500)
+    n = args.n
+    rounds = 200
+    db = fresh_store()
+    commands = {}
+    commands.update(CoreCommandHandler(db).get_commands())
+    commands.update(StringCommandHandler(db).get_commands())
+    keys = [f"page:{i}" for i in range(n)]
+    mset_args = []
+    for key in keys:
+        mset_args.extend([key, f"value of {key}"])
+
+    def dispatch(command, *command_args):
+        return format_resp(commands[command](1, *command_args))
+
+    def pipelined_set():
+        for _ in range(rounds):
+            for key in keys:
+                dispatch("SET", key, "value")
+
+    def mset():
+        for _ in range(rounds):
+            dispatch("MSET", *mset_args)
+
+    def pipelined_get():
+        for _ in range(rounds):
+            for key in keys:
+                dispatch("GET", key)
+
+    def mget():
+        for _ in range(rounds):
+            dispatch("MGET", *keys)
+
+    print(f"{n:,} keys, {rounds:,} rounds")
+    timed(f"{n} x SET", rounds * n, pipelined_set)
+    timed(f"MSET with {n} keys", rounds * n, mset)
+    timed(f"{n} x GET", rounds * n, pipelined_get)
+    timed(f"MGET with {n} keys", rounds * n, mget)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Sparse bitmap benchmark: n random user ids below 2^28 (a 32 MB string) stored dense vs. as a
+RoaringBitmap. Reports memory (tracemalloc) and SETBIT / GETBIT / BITCOUNT / BITPOS / BITOP
+times, then the SETBIT 4000000000 case that would otherwise allocate 500 MB.
+"""
+import random
+import tracemalloc
+
+from common import fresh_store, parse_args, timed
+import datatypes.advanced.bitmap as bitmap_module
+
+ID_BITS = 1 << 28
+
+
+def main():
+    args = parse_args(__doc__, 100_000)
+    n = args.n
+    rng = random.Random(42)
+    first = [rng.randrange(ID_BITS) for _ in range(n)]
+    second = [rng.randrange(ID_BITS) for _ in range(n)]
+    sparse_min_bytes = bitmap_module.SPARSE_MIN_BYTES
+    db = fresh_store()
+
+    def setbits(key, offsets):
+        setbit = db.bitmap.setbit
+        for offset in offsets:
+            setbit(key, offset, 1)
+
+    def getbits(key):
+        getbit = db.bitmap.getbit
+        for offset in first:
+            getbit(key, offset)
+
+    print(f"{n:,} random bits below 2^28")
+    for label, min_bytes in (("dense", float('inf')), ("roaring", sparse_min_bytes)):
+        # An infinite threshold keeps every bitmap dense
+        bitmap_module.SPARSE_MIN_BYTES = min_bytes
+        timed(f"{label}: SETBIT", n, setbits, f"{label}:a", first)
+        # Memory is measured on the second bitmap, so the SETBIT timing above is not traced
+        tracemalloc.start()
+        setbits(f"{label}:b", second)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label}: memory {memory / (1024 * 1024):,.2f} MB "
+              f"({type(db.store[f'{label}:b']).__name__})")
+        timed(f"{label}: GETBIT", n, getbits, f"{label}:a")
+        timed(f"{label}: BITCOUNT", 1, db.bitmap.bitcount, f"{label}:a")
+        timed(f"{label}: BITCOUNT 1 MB range", 1, db.bitmap.bitcount, f"{label}:a", 1 << 20, 2 << 20)
+        timed(f"{label}: BITPOS 1 from bit 2^27", 1, db.bitmap.bitpos, f"{label}:a", 1, 1 << 24)
+        timed(f"{label}: BITOP AND", 1, db.bitmap.bitop, "AND", f"{label}:and", f"{label}:a", f"{label}:b")
+        timed(f"{label}: BITOP OR", 1, db.bitmap.bitop, "OR", f"{label}:or", f"{label}:a", f"{label}:b")
+    bitmap_module.SPARSE_MIN_BYTES = sparse_min_bytes
+
+    tracemalloc.start()
+    timed("roaring: SETBIT 4000000000", 1, db.bitmap.setbit, "huge", 4_000_000_000, 1)
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"roaring: SETBIT 4000000000 peak memory {memory:,} bytes (dense: 500,000,001)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+SINTER / SINTERCARD / SINTERSTORE benchmark (a 10-element set against two large sets)
+and SRANDMEMBER / SPOP random sampling on a large set.
+"""
+import random
+
+from common import fresh_store, parse_args, timed
+from datatypes.set import IndexedSet
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    rounds = 1000
+    db = fresh_store()
+
+    # Plain Python sets for the previous implementations
+    big1 = {f"m:{i}" for i in range(n)}
+    big2 = {f"m:{i}" for i in range(0, n, 2)}
+    small = {f"m:{i}" for i in range(0, 20, 2)}
+    db.store["big1"] = IndexedSet(big1)
+    db.store["big2"] = IndexedSet(big2)
+    db.store["small"] = IndexedSet(small)
+
+    def old_sinter():
+        # Previous implementation: intersect in argument order
+        for _ in range(10):
+            big1.intersection(big2, small)
+
+    def sinter():
+        for _ in range(rounds):
+            db.sets.sinter("big1", "big2", "small")
+
+    def sintercard_limit():
+        for _ in range(rounds):
+            db.sets.sintercard(["big1", "big2"], limit=10)
+
+    def sinterstore():
+        for _ in range(rounds):
+            db.sets.sinterstore("dest", "big1", "big2", "small")
+
+    def old_random_choice():
+        # Without indexed access a random pick has to materialize the set
+        for _ in range(10):
+            random.choice(list(big1))
+
+    def srandmember():
+        for _ in range(rounds * 100):
+            db.sets.srandmember("big1")
+
+    def srandmember_negative():
+        for _ in range(rounds):
+            db.sets.srandmember("big1", -100)
+
+    def spop():
+        for _ in range(rounds * 100):
+            db.sets.spop("big1")
+
+    print(f"10-element set against sets of {n:,} and {n // 2:,} members")
+    timed("argument order: big1 & big2 & small", 10, old_sinter)
+    timed("SINTER big1 big2 small", rounds, sinter)
+    timed("SINTERCARD 2 big1 big2 LIMIT 10", rounds, sintercard_limit)
+    timed("SINTERSTORE dest big1 big2 small", rounds, sinterstore)
+    timed("random.choice(list(set))", 10, old_random_choice)
+    timed("SRANDMEMBER", rounds * 100, srandmember)
+    timed("SRANDMEMBER -100 (100 members per call)", rounds * 100, srandmember_negative)
+    timed("SPOP", rounds * 100, spop)
+
+
+if __name__ == '__main__':
+    main()
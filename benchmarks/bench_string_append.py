@@ -0,0 +1,57 @@
+"""
+APPEND / SETRANGE / GETRANGE benchmark on a growing log key: immutable str (previous
+encoding, every change copies the whole value) vs. the in-place bytearray buffer.
+"""
+from common import fresh_store, parse_args, timed
+
+
+def main():
+    args = parse_args(__doc__, 100_000)
+    n = args.n
+    old_ops = min(n, 20_000)
+    line = "GET /index.html 200\n"
+    db = fresh_store()
+
+    def old_append():
+        # Previous implementation: build a new str and store it on every APPEND
+        value = ""
+        for _ in range(old_ops):
+            value = value + line
+            db.set("old", value)
+
+    def append():
+        for _ in range(n):
+            db.string.append("log", line)
+
+    def old_setrange():
+        value = db.get("log")
+        for i in range(old_ops // 10):
+            offset = (i * 7919) % (len(value) - 3)
+            value = value[:offset] + "XYZ" + value[offset + 3:]
+
+    def setrange():
+        length = db.string.strlen("log")
+        for i in range(n):
+            db.string.setrange("log", (i * 7919) % (length - 3), "XYZ")
+
+    def old_getrange():
+        value = db.get("log")
+        for _ in range(n):
+            value[1000:1000 + 4096]
+
+    def getrange():
+        for _ in range(n):
+            with db.string.getrange_view("log", 1000, 1000 + 4095):
+                pass
+
+    timed(f"str: {old_ops:,} x APPEND", old_ops, old_append)
+    timed(f"bytearray: {n:,} x APPEND", n, append)
+    print(f"log size {db.string.strlen('log'):,} bytes")
+    timed("str: SETRANGE (copy)", old_ops // 10, old_setrange)
+    timed("bytearray: SETRANGE in place", n, setrange)
+    timed("str: GETRANGE 4 KiB slice", n, old_getrange)
+    timed("bytearray: GETRANGE 4 KiB view", n, getrange)
+
+
+if __name__ == '__main__':
+    main()
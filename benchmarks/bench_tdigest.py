@@ -0,0 +1,56 @@
+"""
+Streaming latency percentiles: exporting every sample and sorting it for each p50/p99/p99.9
+query vs. a t-digest fed with TDIGEST.ADD batches. Reports the time per query, the rank error of
+the estimates and the memory kept. -n is the number of samples.
+"""
+import bisect
+import random
+import sys
+
+from common import fresh_store, parse_args, timed
+
+QUANTILES = [0.5, 0.99, 0.999]
+QUERIES = 20
+BATCH = 1000
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    rng = random.Random(42)
+    samples = [rng.lognormvariate(3, 0.8) for _ in range(n)]
+    db = fresh_store()
+
+    def exact_quantiles():
+        for _ in range(QUERIES):
+            ordered = sorted(samples)
+            result = [ordered[min(n - 1, int(q * n))] for q in QUANTILES]
+        return result
+
+    def tdigest_add():
+        for start in range(0, n, BATCH):
+            db.probabilistic.tdigest_add("latency", samples[start:start + BATCH])
+
+    def tdigest_quantiles():
+        for _ in range(QUERIES):
+            result = db.probabilistic.tdigest_quantile("latency", QUANTILES)
+        return result
+
+    print(f"{n:,} samples, quantiles {QUANTILES}")
+    exact = timed("sort all samples per query", QUERIES, exact_quantiles)
+    print(f"samples: {sys.getsizeof(samples) + n * sys.getsizeof(1.0):,} bytes")
+
+    db.probabilistic.tdigest_create("latency")
+    timed(f"TDIGEST.ADD x{BATCH}", n, tdigest_add)
+    estimates = timed("TDIGEST.QUANTILE", QUERIES, tdigest_quantiles)
+    ordered = sorted(samples)
+    errors = [abs(bisect.bisect_left(ordered, estimate) / n - q) for estimate, q in zip(estimates, QUANTILES)]
+    digest = db.store["latency"]
+    print("exact " + ", ".join(f"{value:.2f}" for value in exact) +
+          " / t-digest " + ", ".join(f"{value:.2f}" for value in estimates) +
+          f" (max rank error {max(errors):.5f})")
+    print(f"t-digest: {len(digest.means)} centroids, {16 * len(digest.means):,} bytes")
+
+
+if __name__ == '__main__':
+    main()
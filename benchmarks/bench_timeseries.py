@@ -0,0 +1,96 @@
+"""
+TS.ADD / TS.RANGE benchmark. The previous list-of-tuples TimeSeries (duplicate scan, sort and
+retention rebuild on every add) runs on the first OLD_SAMPLES samples only; the columnar
+TimeSeries ingests all n samples (in order, plus 1% late arrivals) and answers range and
+aggregation queries. -n is the number of samples.
+"""
+import random
+import statistics
+import sys
+import tracemalloc
+
+from common import fresh_store, parse_args, timed
+
+OLD_SAMPLES = 10_000
+QUERIES = 1000
+STEP_MS = 1000
+
+
+class OldTimeSeries:
+    """The previous TimeSeries storage."""
+    def __init__(self, retention_ms=0):
+        self.samples = []
+        self.retention_ms = retention_ms
+
+    def add_sample(self, timestamp_ms, value):
+        for i, (ts, _) in enumerate(self.samples):
+            if ts == timestamp_ms:
+                self.samples[i] = (timestamp_ms, value)
+                return True
+        self.samples.append((timestamp_ms, value))
+        self.samples.sort()
+        if self.retention_ms > 0:
+            min_timestamp = timestamp_ms - self.retention_ms
+            self.samples = [(ts, val) for ts, val in self.samples if ts >= min_timestamp]
+        return True
+
+    def range(self, from_ts, to_ts, bucket_size_ms):
+        filtered = [(ts, val) for ts, val in self.samples if from_ts <= ts <= to_ts]
+        buckets = {}
+        for ts, val in filtered:
+            buckets.setdefault((ts // bucket_size_ms) * bucket_size_ms, []).append(val)
+        return [(ts, statistics.mean(values)) for ts, values in sorted(buckets.items())]
+
+
+def main():
+    args = parse_args(__doc__, 10_000_000)
+    n = args.n
+    rng = random.Random(42)
+    timestamps = list(range(0, n * STEP_MS, STEP_MS))
+    # 1% of the samples arrive late, within the last minute
+    for i in rng.sample(range(100, n), n // 100):
+        timestamps[i - 1], timestamps[i] = timestamps[i], timestamps[i - 1]
+    values = [rng.random() * 100 for _ in range(n)]
+    old_count = min(n, OLD_SAMPLES)
+    windows, old_windows = ([(start, start + 3600 * STEP_MS)
+                             for start in (rng.randrange(0, max(1, (count - 3600) * STEP_MS)) for _ in range(QUERIES))]
+                            for count in (n, old_count))
+    db = fresh_store()
+
+    old = OldTimeSeries()
+
+    def old_add():
+        for ts, value in zip(timestamps[:old_count], values):
+            old.add_sample(ts, value)
+
+    def old_range():
+        for start, end in old_windows[:100]:
+            old.range(start, end, 60 * STEP_MS)
+
+    def ts_add():
+        for ts, value in zip(timestamps, values):
+            db.timeseries.add("metric", ts, value)
+
+    def ts_range():
+        for start, end in windows:
+            db.timeseries.range("metric", start, end)
+
+    def ts_range_avg():
+        for start, end in windows:
+            db.timeseries.range("metric", start, end, "avg", 60 * STEP_MS)
+
+    print(f"{n:,} samples ({n // 100:,} out of order)")
+    timed(f"previous: TS.ADD ({old_count:,} samples)", old_count, old_add)
+    timed("previous: TS.RANGE 1h AVG 1m", 100, old_range)
+    tracemalloc.start()
+    timed("columns: TS.ADD", n, ts_add)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    timed("columns: TS.RANGE 1h raw", QUERIES, ts_range)
+    timed("columns: TS.RANGE 1h AVG 1m", QUERIES, ts_range_avg)
+    tuple_size = sys.getsizeof((0, 0.0)) + sys.getsizeof(10 ** 12) + sys.getsizeof(0.0) + 8
+    print(f"columns: {size / n:.1f} bytes per sample (list of tuples: about {tuple_size})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Top-100 heavy hitters over a skewed stream of URL events: one sorted set update per event
+(ZINCRBY, done as a score lookup plus ZADD) vs. TOPK.ADD batches of 1000 events on a HeavyKeeper
+sketch. Reports throughput, memory and how many of the true top 100 each one finds.
+-n is the number of events.
+"""
+import random
+import tracemalloc
+from collections import Counter
+
+from common import fresh_store, parse_args, timed
+
+K = 100
+BATCH = 1000
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    rng = random.Random(42)
+    events = [f"/page/{int(rng.paretovariate(0.4))}" for _ in range(n)]
+    truth = {url for url, _ in Counter(events).most_common(K)}
+    db = fresh_store()
+
+    def zincrby(key):
+        for url in events:
+            zset = db.zset._get_zset(key)
+            score = zset['dict'].get(url, 0) if zset else 0
+            db.zset.zadd(key, score + 1, url)
+
+    def topk_add(key):
+        if not db.exists(key):
+            db.probabilistic.topk_reserve(key, K)
+        for start in range(0, n, BATCH):
+            db.probabilistic.topk_add(key, events[start:start + BATCH])
+
+    def measure(func, key):
+        tracemalloc.start()
+        func(key)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size
+
+    print(f"{n:,} events, {len(set(events)):,} distinct URLs, top {K}")
+    timed("sorted set: ZINCRBY per event", n, zincrby, "zset")
+    found = set(db.zset.zrevrange("zset", 0, K - 1))
+    print(f"sorted set: {len(found & truth)}/{K} of the top {K}, "
+          f"{measure(zincrby, 'zset_memory'):,} bytes")
+
+    timed(f"HeavyKeeper: TOPK.ADD x{BATCH}", n, topk_add, "topk")
+    found = {url for url, _ in db.probabilistic.topk_list("topk")}
+    topk = db.store["topk"]
+    print(f"HeavyKeeper {topk.width}x{topk.depth}: {len(found & truth)}/{K} of the top {K}, "
+          f"{measure(topk_add, 'topk_memory'):,} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+TS.CREATERULE benchmark: per-second samples are ingested into a series without rules and into
+one compacted to 1-minute avg, max and p99 series. A dashboard then reads 1-minute averages
+over a day, either aggregating the raw samples in TS.RANGE or reading the compacted series.
+-n is the number of samples.
+"""
+import random
+
+from common import fresh_store, parse_args, timed
+
+QUERIES = 100
+STEP_MS = 1000
+MINUTE_MS = 60 * STEP_MS
+DAY_MS = 86400 * STEP_MS
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    rng = random.Random(42)
+    timestamps = range(0, n * STEP_MS, STEP_MS)
+    values = [rng.random() * 100 for _ in range(n)]
+    windows = [(start, start + DAY_MS)
+               for start in (rng.randrange(0, max(1, n * STEP_MS - DAY_MS)) for _ in range(QUERIES))]
+    db = fresh_store()
+    for key in ("plain", "raw", "raw:avg", "raw:max", "raw:p99"):
+        db.timeseries.create(key)
+    for aggregation in ("avg", "max", "p99"):
+        db.timeseries.create_rule("raw", f"raw:{aggregation}", aggregation, MINUTE_MS)
+
+    def ts_add(key):
+        for ts, value in zip(timestamps, values):
+            db.timeseries.add(key, ts, value)
+
+    def raw_range_avg():
+        for start, end in windows:
+            db.timeseries.range("raw", start, end, "avg", MINUTE_MS)
+
+    def compacted_range():
+        for start, end in windows:
+            db.timeseries.range("raw:avg", start, end)
+
+    print(f"{n:,} samples")
+    timed("TS.ADD, no rules", n, ts_add, "plain")
+    timed("TS.ADD, avg/max/p99 rules", n, ts_add, "raw")
+    timed("TS.RANGE 1d AVG 1m on raw samples", QUERIES, raw_range_avg)
+    timed("TS.RANGE 1d on the avg 1m series", QUERIES, compacted_range)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+TimeSeries ENCODING benchmark: per-second samples with a little timestamp jitter, for a gauge
+(integer percentage in a random walk), a counter and uniformly random floats (the worst case
+for XOR compression), stored UNCOMPRESSED (flat columns) and COMPRESSED (Gorilla chunks).
+Reports bytes per sample, TS.ADD throughput and 1h TS.RANGE latency. -n is the number of
+samples per series.
+"""
+import random
+import tracemalloc
+
+from common import fresh_store, parse_args, timed
+
+QUERIES = 200
+STEP_MS = 1000
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    rng = random.Random(42)
+    timestamps = [i * STEP_MS + rng.randint(-5, 5) for i in range(n)]
+    gauge, level = [], 50
+    for _ in range(n):
+        level = min(100, max(0, level + rng.choice((-1, 0, 0, 0, 1))))
+        gauge.append(float(level))
+    counter, total = [], 0
+    for _ in range(n):
+        total += rng.randint(0, 20)
+        counter.append(float(total))
+    series = {'gauge': gauge, 'counter': counter, 'random': [rng.random() for _ in range(n)]}
+    windows = [(start, start + 3600 * STEP_MS)
+               for start in (rng.randrange(0, max(1, (n - 3600) * STEP_MS)) for _ in range(QUERIES))]
+    db = fresh_store()
+
+    print(f"{n:,} samples per series")
+    for name, values in series.items():
+        for encoding in ('UNCOMPRESSED', 'COMPRESSED'):
+            key = f"{name}:{encoding}"
+
+            def ts_add(key):
+                db.timeseries.create(key, encoding=encoding)
+                for ts, value in zip(timestamps, values):
+                    db.timeseries.add(key, ts, value)
+
+            def ts_range():
+                for start, end in windows:
+                    db.timeseries.range(key, start, end)
+
+            def ts_range_avg():
+                for start, end in windows:
+                    db.timeseries.range(key, start, end, "avg", 60 * STEP_MS)
+
+            timed(f"{key}: TS.ADD", n, ts_add, key)
+            timed(f"{key}: TS.RANGE 1h raw", QUERIES, ts_range)
+            timed(f"{key}: TS.RANGE 1h AVG 1m", QUERIES, ts_range_avg)
+            db.delete(key)
+            # Memory is measured on a separate load: tracing every allocation skews the timings
+            tracemalloc.start()
+            ts_add(key)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f"{key}: {size / n:.2f} bytes per sample")
+            db.delete(key)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""ZADD / ZRANK / ZRANGE / ZRANGEBYSCORE / ZCOUNT benchmark on a large sorted set."""
+import random
+
+from common import fresh_store, parse_args, timed
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    db = fresh_store()
+    members = [f"member:{i}" for i in range(n)]
+    scores = [random.random() * n for _ in range(n)]
+    probes = random.sample(members, min(n, 100_000))
+
+    def zadd_all():
+        for score, member in zip(scores, members):
+            db.zset.zadd("bench", score, member)
+
+    def zadd_update():
+        for member in probes:
+            db.zset.zadd("bench", random.random() * n, member)
+
+    def zrank_all():
+        for member in probes:
+            db.zset.zrank("bench", member)
+
+    def zrange_pages():
+        for start in range(0, n, max(1, n // 1000)):
+            db.zset.zrange("bench", start, start + 9)
+
+    def zrangebyscore_top():
+        for _ in range(1000):
+            db.zset.zrevrangebyscore("bench", "+inf", "-inf", offset=0, count=10)
+            db.zset.zrangebyscore("bench", n * 0.99, "+inf", offset=0, count=10)
+
+    def zcount_ranges():
+        for i in range(1000):
+            db.zset.zcount("bench", n * i / 1000, f"({n * (i + 500) / 1000}")
+
+    print(f"sorted set with {n:,} members")
+    timed("ZADD (new members)", n, zadd_all)
+    timed("ZADD (score updates)", len(probes), zadd_update)
+    timed("ZRANK", len(probes), zrank_all)
+    timed("ZRANGE (10-element pages)", 1000, zrange_pages)
+    timed("ZRANGEBYSCORE near the top (LIMIT 10)", 2000, zrangebyscore_top)
+    timed("ZCOUNT (half-set ranges)", 1000, zcount_ranges)
+
+
+if __name__ == '__main__':
+    main()
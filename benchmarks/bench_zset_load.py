@@ -0,0 +1,42 @@
+"""Sorted-set load benchmark: single inserts vs. bulk load, ZADD and snapshot round trip."""
+import pickle
+import random
+
+from common import fresh_store, parse_args, timed
+from datatypes.zset import SkipList, paused_gc
+
+
+def main():
+    args = parse_args(__doc__, 1_000_000)
+    n = args.n
+    pairs = sorted((random.random() * n, f"member:{i}") for i in range(n))
+    shuffled = pairs[:]
+    random.shuffle(shuffled)
+
+    def insert_one_by_one():
+        skiplist = SkipList()
+        for score, member in shuffled:
+            skiplist.insert(score, member)
+        return skiplist
+
+    print(f"loading {n:,} members")
+    timed("SkipList.insert x n", n, insert_one_by_one)
+    skiplist = timed("SkipList.from_sorted", n, SkipList.from_sorted, pairs)
+
+    db = fresh_store()
+    flat = []
+    for score, member in shuffled:
+        flat.extend((score, member))
+    timed("ZADD with n pairs (bulk path)", n, db.zset.zadd, "bench", *flat)
+
+    def snapshot_load(data):
+        # SnapshotManager.restore_snapshot also pauses the GC while unpickling
+        with paused_gc():
+            return pickle.loads(data)
+
+    data = timed("snapshot dump (pickle)", n, pickle.dumps, skiplist, 4)
+    timed("snapshot load (pickle)", n, snapshot_load, data)
+
+
+if __name__ == '__main__':
+    main()
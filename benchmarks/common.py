@@ -0,0 +1,40 @@
+"""Shared helpers for the benchmark scripts."""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the src directory to the module search path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+def parse_args(description, default_size):
+    """Parse the common ``-n`` size argument."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-n', type=int, default=default_size, help='Number of elements')
+    return parser.parse_args()
+
+
+def fresh_store():
+    """
+    Create a KeyValueStore inside a temporary working directory so the snapshot and
+    AOF files do not touch the repository. AOF logging is disabled (as during replay)
+    so the numbers reflect the in-memory data structures only.
+    """
+    from core.database import KeyValueStore
+
+    os.chdir(tempfile.mkdtemp(prefix='bench-'))
+    db = KeyValueStore()
+    db.replaying = True
+    return db
+
+
+def timed(label, ops, func, *args):
+    """Run func once and report the elapsed time and throughput."""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    rate = ops / elapsed if elapsed > 0 else float('inf')
+    print(f"{label:<40} {elapsed:>9.3f}s {rate:>14,.0f} ops/s")
+    return result
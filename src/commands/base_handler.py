@@ -1,3 +1,5 @@
+from core.blocking import BlockedCommand
+
 class BaseCommandHandler:
     def __init__(self, database):
         self.db = database
@@ -5,3 +7,17 @@ class BaseCommandHandler:
     def get_commands(self):
         """Return a dictionary of command names mapped to their handler methods."""
         return {}
+
+    def _block_on(self, client_id, keys, timeout, retry):
+        """
+        Try retry(key) on each key in order and return the first reply. If none of the
+        keys can serve the client, return a BlockedCommand so the server parks it.
+        Inside MULTI/EXEC blocking commands behave as if they timed out.
+        """
+        for key in keys:
+            reply = retry(key)
+            if reply is not None:
+                return reply
+        if self.db.transaction_manager.is_in_transaction(client_id):
+            return None
+        return BlockedCommand(keys, timeout, retry)
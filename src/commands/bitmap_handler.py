@@ -7,8 +7,14 @@ class BitMapCommandHandler(BaseCommandHandler):
             "GETBIT": self.getbit_command,
             "BITCOUNT": self.bitcount_command,
             "BITOP": self.bitop_command,
+            "BITPOS": self.bitpos_command,
         }
 
+    def _error(self, error):
+        """Format a ValueError from the bitmap type; type errors keep their WRONGTYPE prefix."""
+        message = str(error)
+        return message if message.startswith("WRONGTYPE") else f"ERROR: {message}"
+
     def setbit_command(self, client_id, key, offset, value):
         """Set or clear a bit in string. Format: SETBIT key offset value"""
         try:
@@ -20,7 +26,7 @@ class BitMapCommandHandler(BaseCommandHandler):
                 return "ERROR: bit value must be 0 or 1"
             return str(self.db.bitmap.setbit(key, offset, value))
         except ValueError as e:
-            return f"ERROR: {str(e)}"
+            return self._error(e)
 
     def getbit_command(self, client_id, key, offset):
         """Get bit value from string. Format: GETBIT key offset"""
@@ -30,7 +36,7 @@ class BitMapCommandHandler(BaseCommandHandler):
                 return "ERROR: bit offset is not an integer or out of range"
             return str(self.db.bitmap.getbit(key, offset))
         except ValueError as e:
-            return f"ERROR: {str(e)}"
+            return self._error(e)
 
     def bitcount_command(self, client_id, key, *args):
         """Count set bits in string. Format: BITCOUNT key [start end [BYTE | BIT]]"""
@@ -48,7 +54,7 @@ class BitMapCommandHandler(BaseCommandHandler):
                 return str(self.db.bitmap.bitcount(key, int(start), int(end), unit))
             return "ERROR: Wrong number of arguments for BITCOUNT"
         except ValueError as e:
-            return f"ERROR: {str(e)}"
+            return self._error(e)
 
     def bitop_command(self, client_id, operation, destkey, *sourcekeys):
         """Perform bitwise operation. Format: BITOP operation destkey sourcekey [sourcekey ...]"""
@@ -57,4 +63,19 @@ class BitMapCommandHandler(BaseCommandHandler):
         try:
             return str(self.db.bitmap.bitop(operation, destkey, *sourcekeys))
         except ValueError as e:
-            return f"ERROR: {str(e)}"
+            return self._error(e)
+
+    def bitpos_command(self, client_id, key, bit, *args):
+        """Find first bit set to 0 or 1. Format: BITPOS key bit [start [end [BYTE | BIT]]]"""
+        if len(args) > 3:
+            return "ERROR: Wrong number of arguments for BITPOS"
+        try:
+            bit = int(bit)
+            start = int(args[0]) if len(args) > 0 else None
+            end = int(args[1]) if len(args) > 1 else None
+            unit = args[2].upper() if len(args) > 2 else 'BYTE'
+            if unit not in ['BYTE', 'BIT']:
+                return "ERROR: Unit must be either BYTE or BIT"
+            return str(self.db.bitmap.bitpos(key, bit, start, end, unit))
+        except ValueError as e:
+            return self._error(e)
@@ -9,6 +9,18 @@ class HashCommandHandler(BaseCommandHandler):
             "HGETALL": self.hgetall_command,
             "HDEL": self.hdel_command,
             "HEXISTS": self.hexists_command,
+            "HSETNX": self.hsetnx_command,
+            "HMGET": self.hmget_command,
+            "HINCRBY": self.hincrby_command,
+            "HINCRBYFLOAT": self.hincrbyfloat_command,
+            "HLEN": self.hlen_command,
+            "HKEYS": self.hkeys_command,
+            "HVALS": self.hvals_command,
+            "HSTRLEN": self.hstrlen_command,
+            "HRANDFIELD": self.hrandfield_command,
+            "HEXPIRE": self.hexpire_command,
+            "HTTL": self.httl_command,
+            "HPERSIST": self.hpersist_command,
         }
 
     def hset_command(self, client_id, *args):
@@ -63,3 +75,138 @@ class HashCommandHandler(BaseCommandHandler):
             return "ERR wrong number of arguments for 'hexists' command"
         key, field = args
         return "1" if self.db.hash.hexists(key, field) else "0"
+
+    def hsetnx_command(self, client_id, *args):
+        if len(args) != 3:
+            return "ERR wrong number of arguments for 'hsetnx' command"
+        key, field, value = args
+        return str(self.db.hash.hsetnx(key, field, value))
+
+    def hmget_command(self, client_id, *args):
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'hmget' command"
+        key, *fields = args
+        # Missing fields stay None and are sent as nil bulk strings
+        return self.db.hash.hmget(key, *fields)
+
+    def hincrby_command(self, client_id, *args):
+        if len(args) != 3:
+            return "ERR wrong number of arguments for 'hincrby' command"
+        key, field, increment = args
+        try:
+            increment = int(increment)
+        except ValueError:
+            return "ERR value is not an integer or out of range"
+        return str(self.db.hash.hincrby(key, field, increment))
+
+    def hincrbyfloat_command(self, client_id, *args):
+        if len(args) != 3:
+            return "ERR wrong number of arguments for 'hincrbyfloat' command"
+        key, field, increment = args
+        try:
+            increment = float(increment)
+        except ValueError:
+            return "ERR value is not a valid float"
+        if increment != increment or increment in (float('inf'), float('-inf')):
+            return "ERR value is not a valid float"
+        return self.db.hash.hincrbyfloat(key, field, increment)
+
+    def hlen_command(self, client_id, *args):
+        if len(args) != 1:
+            return "ERR wrong number of arguments for 'hlen' command"
+        return str(self.db.hash.hlen(args[0]))
+
+    def hkeys_command(self, client_id, *args):
+        if len(args) != 1:
+            return "ERR wrong number of arguments for 'hkeys' command"
+        result = self.db.hash.hkeys(args[0])
+        if isinstance(result, str):
+            return result
+        return result if result else "(empty list)"
+
+    def hvals_command(self, client_id, *args):
+        if len(args) != 1:
+            return "ERR wrong number of arguments for 'hvals' command"
+        result = self.db.hash.hvals(args[0])
+        if isinstance(result, str):
+            return result
+        return result if result else "(empty list)"
+
+    def hstrlen_command(self, client_id, *args):
+        if len(args) != 2:
+            return "ERR wrong number of arguments for 'hstrlen' command"
+        key, field = args
+        return str(self.db.hash.hstrlen(key, field))
+
+    def hrandfield_command(self, client_id, *args):
+        if not 1 <= len(args) <= 3:
+            return "ERR wrong number of arguments for 'hrandfield' command"
+        key = args[0]
+        if len(args) == 1:
+            result = self.db.hash.hrandfield(key)
+            return result if result is not None else "(nil)"
+        try:
+            count = int(args[1])
+        except ValueError:
+            return "ERR value is not an integer or out of range"
+        withvalues = False
+        if len(args) == 3:
+            if args[2].upper() != "WITHVALUES":
+                return "ERR syntax error"
+            withvalues = True
+        result = self.db.hash.hrandfield(key, count, withvalues)
+        if isinstance(result, str):
+            return result
+        return result if result else "(empty list)"
+
+    def _parse_fields(self, args):
+        """Parse the trailing FIELDS numfields field [field ...] block of the field-TTL commands."""
+        if len(args) < 2 or args[0].upper() != "FIELDS":
+            raise ValueError("ERR Mandatory argument FIELDS is missing or not at the right position")
+        try:
+            numfields = int(args[1])
+        except ValueError:
+            raise ValueError("ERR value is not an integer or out of range")
+        if numfields <= 0:
+            raise ValueError("ERR Parameter `numFields` should be greater than 0")
+        fields = list(args[2:])
+        if len(fields) != numfields:
+            raise ValueError("ERR The `numfields` parameter must match the number of arguments")
+        return fields
+
+    def hexpire_command(self, client_id, *args):
+        if len(args) < 5:
+            return "ERR wrong number of arguments for 'hexpire' command"
+        key, seconds, *rest = args
+        try:
+            seconds = int(seconds)
+        except ValueError:
+            return "ERR value is not an integer or out of range"
+        if seconds < 0:
+            return "ERR invalid expire time in 'hexpire' command"
+        condition = None
+        if rest[0].upper() in ("NX", "XX", "GT", "LT"):
+            condition = rest.pop(0).upper()
+        try:
+            fields = self._parse_fields(rest)
+        except ValueError as e:
+            return str(e)
+        return self.db.hash.hexpire(key, seconds, fields, condition)
+
+    def httl_command(self, client_id, *args):
+        if len(args) < 4:
+            return "ERR wrong number of arguments for 'httl' command"
+        try:
+            fields = self._parse_fields(args[1:])
+        except ValueError as e:
+            return str(e)
+        return self.db.hash.httl(args[0], fields)
+
+    def hpersist_command(self, client_id, *args):
+        if len(args) < 4:
+            return "ERR wrong number of arguments for 'hpersist' command"
+        try:
+            fields = self._parse_fields(args[1:])
+        except ValueError as e:
+            return str(e)
+        return self.db.hash.hpersist(args[0], fields)
@@ -1,4 +1,5 @@
 from .base_handler import BaseCommandHandler
+from core.blocking import parse_timeout
 
 class ListCommandHandler(BaseCommandHandler):
     def get_commands(self):
@@ -10,6 +11,16 @@ class ListCommandHandler(BaseCommandHandler):
             "LRANGE": self.lrange_command,
             "LINDEX": self.lindex_command,
             "LSET": self.lset_command,
+            "LLEN": self.llen_command,
+            "LTRIM": self.ltrim_command,
+            "LREM": self.lrem_command,
+            "LINSERT": self.linsert_command,
+            "LPOS": self.lpos_command,
+            "LMOVE": self.lmove_command,
+            "LMPOP": self.lmpop_command,
+            "BLPOP": self.blpop_command,
+            "BRPOP": self.brpop_command,
+            "BLMOVE": self.blmove_command,
         }
 
     def lpush_command(self, client_id, key, *values):
@@ -24,15 +35,35 @@ class ListCommandHandler(BaseCommandHandler):
         result = self.db.list.rpush(key, *values)
         return result
 
+    def _parse_count(self, args):
+        """Parse the optional COUNT argument of LPOP/RPOP."""
+        if not args:
+            return None
+        try:
+            count = int(args[0])
+        except ValueError:
+            raise ValueError("ERR value is out of range, must be positive")
+        if count < 0:
+            raise ValueError("ERR value is out of range, must be positive")
+        return count
+
     def lpop_command(self, client_id, key, *args):
-        if args:
+        if len(args) > 1:
             return "ERR wrong number of arguments for 'lpop' command"
-        return self.db.list.lpop(key)
+        try:
+            count = self._parse_count(args)
+        except ValueError as e:
+            return str(e)
+        return self.db.list.lpop(key, count)
 
     def rpop_command(self, client_id, key, *args):
-        if args:
+        if len(args) > 1:
             return "ERR wrong number of arguments for 'rpop' command"
-        return self.db.list.rpop(key)
+        try:
+            count = self._parse_count(args)
+        except ValueError as e:
+            return str(e)
+        return self.db.list.rpop(key, count)
 
     def lrange_command(self, client_id, key, start, stop):
         try:
@@ -48,3 +79,148 @@ class ListCommandHandler(BaseCommandHandler):
 
     def lset_command(self, client_id, key, index, value):
         return self.db.list.lset(key, index, value)
+
+    def llen_command(self, client_id, *args):
+        """Get the length of a list. Format: LLEN key"""
+        if len(args) != 1:
+            return "ERR wrong number of arguments for 'llen' command"
+        return self.db.list.llen(args[0])
+
+    def ltrim_command(self, client_id, *args):
+        """Trim a list to the given range. Format: LTRIM key start stop"""
+        if len(args) != 3:
+            return "ERR wrong number of arguments for 'ltrim' command"
+        try:
+            int(args[1]), int(args[2])
+        except ValueError:
+            return "ERR value is not an integer or out of range"
+        return self.db.list.ltrim(*args)
+
+    def lrem_command(self, client_id, *args):
+        """Remove occurrences of an element. Format: LREM key count element"""
+        if len(args) != 3:
+            return "ERR wrong number of arguments for 'lrem' command"
+        key, count, element = args
+        try:
+            count = int(count)
+        except ValueError:
+            return "ERR value is not an integer or out of range"
+        return self.db.list.lrem(key, count, element)
+
+    def linsert_command(self, client_id, *args):
+        """Insert an element next to a pivot. Format: LINSERT key BEFORE|AFTER pivot element"""
+        if len(args) != 4:
+            return "ERR wrong number of arguments for 'linsert' command"
+        key, where, pivot, element = args
+        if where.upper() not in ("BEFORE", "AFTER"):
+            return "ERR syntax error"
+        return self.db.list.linsert(key, where, pivot, element)
+
+    def lpos_command(self, client_id, *args):
+        """Find the position of an element. Format: LPOS key element [RANK rank] [COUNT num] [MAXLEN len]"""
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'lpos' command"
+        key, element = args[:2]
+        options = {"RANK": 1, "COUNT": None, "MAXLEN": 0}
+        i = 2
+        while i < len(args):
+            option = args[i].upper()
+            if option not in options or i + 1 >= len(args):
+                return "ERR syntax error"
+            try:
+                options[option] = int(args[i + 1])
+            except ValueError:
+                return "ERR value is not an integer or out of range"
+            i += 2
+
+        if options["RANK"] == 0:
+            return ("ERR RANK can't be zero: use 1 to start from the first match, "
+                    "2 from the second ... or use negative to start from the end of the list")
+        if options["COUNT"] is not None and options["COUNT"] < 0:
+            return "ERR COUNT can't be negative"
+        if options["MAXLEN"] < 0:
+            return "ERR MAXLEN can't be negative"
+        return self.db.list.lpos(key, element, options["RANK"], options["COUNT"], options["MAXLEN"])
+
+    def lmove_command(self, client_id, *args):
+        """Move an element between lists. Format: LMOVE source destination LEFT|RIGHT LEFT|RIGHT"""
+        if len(args) != 4:
+            return "ERR wrong number of arguments for 'lmove' command"
+        source, destination, wherefrom, whereto = args
+        if wherefrom.upper() not in ("LEFT", "RIGHT") or whereto.upper() not in ("LEFT", "RIGHT"):
+            return "ERR syntax error"
+        return self.db.list.lmove(source, destination, wherefrom, whereto)
+
+    def lmpop_command(self, client_id, *args):
+        """Pop elements from the first non-empty list. Format: LMPOP numkeys key [key ...] LEFT|RIGHT [COUNT count]"""
+        if len(args) < 3:
+            return "ERR wrong number of arguments for 'lmpop' command"
+        try:
+            numkeys = int(args[0])
+        except ValueError:
+            return "ERR numkeys should be greater than 0"
+        if numkeys <= 0:
+            return "ERR numkeys should be greater than 0"
+        if len(args) < numkeys + 2:
+            return "ERR syntax error"
+        keys = args[1:numkeys + 1]
+        where = args[numkeys + 1].upper()
+        if where not in ("LEFT", "RIGHT"):
+            return "ERR syntax error"
+        options = args[numkeys + 2:]
+        count = 1
+        if options:
+            if len(options) != 2 or options[0].upper() != "COUNT":
+                return "ERR syntax error"
+            try:
+                count = int(options[1])
+            except ValueError:
+                count = 0
+            if count <= 0:
+                return "ERR count should be greater than 0"
+        return self.db.list.lmpop(keys, where, count)
+
+    def _blocking_pop_command(self, client_id, name, pop, args):
+        """Shared implementation of BLPOP and BRPOP. Format: key [key ...] timeout"""
+        if len(args) < 2:
+            return f"ERR wrong number of arguments for '{name}' command"
+        keys = args[:-1]
+        try:
+            timeout = parse_timeout(args[-1])
+        except ValueError as e:
+            return str(e)
+
+        def retry(key):
+            value = pop(key)
+            if value is None:
+                return None
+            if isinstance(value, str) and value.startswith("WRONGTYPE"):
+                return value
+            return [key, value]
+
+        return self._block_on(client_id, keys, timeout, retry)
+
+    def blpop_command(self, client_id, *args):
+        """Blocking LPOP over several keys. Format: BLPOP key [key ...] timeout"""
+        return self._blocking_pop_command(client_id, 'blpop', self.db.list.lpop, args)
+
+    def brpop_command(self, client_id, *args):
+        """Blocking RPOP over several keys. Format: BRPOP key [key ...] timeout"""
+        return self._blocking_pop_command(client_id, 'brpop', self.db.list.rpop, args)
+
+    def blmove_command(self, client_id, *args):
+        """Blocking LMOVE. Format: BLMOVE source destination LEFT|RIGHT LEFT|RIGHT timeout"""
+        if len(args) != 5:
+            return "ERR wrong number of arguments for 'blmove' command"
+        source, destination, wherefrom, whereto = args[:4]
+        if wherefrom.upper() not in ("LEFT", "RIGHT") or whereto.upper() not in ("LEFT", "RIGHT"):
+            return "ERR syntax error"
+        try:
+            timeout = parse_timeout(args[4])
+        except ValueError as e:
+            return str(e)
+
+        def retry(key):
+            return self.db.list.lmove(key, destination, wherefrom, whereto)
+
+        return self._block_on(client_id, [source], timeout, retry)
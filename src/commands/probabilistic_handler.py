@@ -1,4 +1,8 @@
 from .base_handler import BaseCommandHandler
+from datatypes.advanced.probabilistic import (
+    BLOOM_DEFAULT_EXPANSION, CUCKOO_DEFAULT_BUCKET_SIZE, CUCKOO_DEFAULT_EXPANSION, CUCKOO_DEFAULT_MAX_ITERATIONS,
+    TDIGEST_DEFAULT_COMPRESSION, TOPK_DEFAULT_DECAY, TOPK_DEFAULT_DEPTH,
+)
 
 class ProbabilisticCommandHandler(BaseCommandHandler):
     def get_commands(self):
@@ -6,7 +10,41 @@ class ProbabilisticCommandHandler(BaseCommandHandler):
             "BF.RESERVE": self.bf_reserve_command,
             "BF.ADD": self.bf_add_command,
             "BF.EXISTS": self.bf_exists_command,
+            "BF.MADD": self.bf_madd_command,
+            "BF.MEXISTS": self.bf_mexists_command,
         }
+        commands.update({
+            "CF.RESERVE": self.cf_reserve_command,
+            "CF.ADD": self.cf_add_command,
+            "CF.ADDNX": self.cf_addnx_command,
+            "CF.EXISTS": self.cf_exists_command,
+            "CF.MEXISTS": self.cf_mexists_command,
+            "CF.DEL": self.cf_del_command,
+            "CF.COUNT": self.cf_count_command,
+        })
+        commands.update({
+            "CMS.INITBYDIM": self.cms_initbydim_command,
+            "CMS.INITBYPROB": self.cms_initbyprob_command,
+            "CMS.INCRBY": self.cms_incrby_command,
+            "CMS.QUERY": self.cms_query_command,
+            "CMS.MERGE": self.cms_merge_command,
+        })
+        commands.update({
+            "TOPK.RESERVE": self.topk_reserve_command,
+            "TOPK.ADD": self.topk_add_command,
+            "TOPK.INCRBY": self.topk_incrby_command,
+            "TOPK.QUERY": self.topk_query_command,
+            "TOPK.COUNT": self.topk_count_command,
+            "TOPK.LIST": self.topk_list_command,
+        })
+        commands.update({
+            "TDIGEST.CREATE": self.tdigest_create_command,
+            "TDIGEST.ADD": self.tdigest_add_command,
+            "TDIGEST.MERGE": self.tdigest_merge_command,
+            "TDIGEST.QUANTILE": self.tdigest_quantile_command,
+            "TDIGEST.CDF": self.tdigest_cdf_command,
+            "TDIGEST.TRIMMED_MEAN": self.tdigest_trimmed_mean_command,
+        })
         commands.update({
             "PFADD": self.pfadd_command,
             "PFCOUNT": self.pfcount_command,
@@ -14,16 +52,40 @@ class ProbabilisticCommandHandler(BaseCommandHandler):
         })
         return commands
 
-    def bf_reserve_command(self, client_id, key, size, num_hashes):
-        """Create a new Bloom filter. Format: BF.RESERVE key size num_hashes"""
+    def bf_reserve_command(self, client_id, key, error_rate, capacity, *options):
+        """Create a new Bloom filter. Format: BF.RESERVE key error_rate capacity [EXPANSION expansion] [NONSCALING]"""
         try:
-            size = int(size)
-            num_hashes = int(num_hashes)
-            if size <= 0 or num_hashes <= 0:
-                return "ERROR: Size and num_hashes must be positive"
-            return "OK" if self.db.probabilistic.bf_reserve(key, size, num_hashes) else "ERROR: Key exists"
+            error_rate = float(error_rate)
+            capacity = int(capacity)
         except ValueError:
             return "ERROR: Invalid arguments"
+        if not 0 < error_rate < 1:
+            return "ERROR: error rate must be between 0 and 1"
+        if capacity <= 0:
+            return "ERROR: capacity must be positive"
+
+        expansion = BLOOM_DEFAULT_EXPANSION
+        scaling = True
+        pos = 0
+        while pos < len(options):
+            option = options[pos].upper()
+            if option == "NONSCALING":
+                scaling = False
+                pos += 1
+            elif option == "EXPANSION" and pos + 1 < len(options):
+                try:
+                    expansion = int(options[pos + 1])
+                except ValueError:
+                    return "ERROR: Invalid expansion"
+                if expansion < 1:
+                    return "ERROR: expansion must be positive"
+                pos += 2
+            else:
+                return f"ERROR: Unknown option {options[pos]}"
+
+        if not self.db.probabilistic.bf_reserve(key, error_rate, capacity, expansion, scaling):
+            return "ERROR: Key exists"
+        return "OK"
 
     def bf_add_command(self, client_id, key, item):
         """Add item to Bloom filter. Format: BF.ADD key item"""
@@ -37,6 +99,357 @@ class ProbabilisticCommandHandler(BaseCommandHandler):
             return "ERROR: Wrong number of arguments for BF.EXISTS"
         return "1" if self.db.probabilistic.bf_exists(key, item) else "0"
 
+    def bf_madd_command(self, client_id, key, *items):
+        """Add several items to a Bloom filter. Format: BF.MADD key item [item ...]"""
+        if not items:
+            return "ERROR: Wrong number of arguments for BF.MADD"
+        try:
+            return self.db.probabilistic.bf_madd(key, list(items))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def bf_mexists_command(self, client_id, key, *items):
+        """Check if several items might exist. Format: BF.MEXISTS key item [item ...]"""
+        if not items:
+            return "ERROR: Wrong number of arguments for BF.MEXISTS"
+        try:
+            return self.db.probabilistic.bf_mexists(key, list(items))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cf_reserve_command(self, client_id, key, capacity, *options):
+        """
+        Create a new Cuckoo filter. Format: CF.RESERVE key capacity [BUCKETSIZE bucketsize]
+        [MAXITERATIONS maxiterations] [EXPANSION expansion]
+        """
+        try:
+            capacity = int(capacity)
+        except ValueError:
+            return "ERROR: Invalid arguments"
+        if capacity <= 0:
+            return "ERROR: capacity must be positive"
+
+        settings = {
+            "BUCKETSIZE": CUCKOO_DEFAULT_BUCKET_SIZE,
+            "MAXITERATIONS": CUCKOO_DEFAULT_MAX_ITERATIONS,
+            "EXPANSION": CUCKOO_DEFAULT_EXPANSION,
+        }
+        for pos in range(0, len(options), 2):
+            option = options[pos].upper()
+            if option not in settings or pos + 1 >= len(options):
+                return f"ERROR: Unknown option {options[pos]}"
+            try:
+                settings[option] = int(options[pos + 1])
+            except ValueError:
+                return f"ERROR: Invalid {option.lower()}"
+            if settings[option] < 1:
+                return f"ERROR: {option.lower()} must be positive"
+        if settings["BUCKETSIZE"] > 255:
+            return "ERROR: bucketsize must be at most 255"
+
+        if not self.db.probabilistic.cf_reserve(key, capacity, settings["BUCKETSIZE"],
+                                                settings["MAXITERATIONS"], settings["EXPANSION"]):
+            return "ERROR: Key exists"
+        return "OK"
+
+    def cf_add_command(self, client_id, key, item):
+        """Add item to Cuckoo filter. Format: CF.ADD key item"""
+        try:
+            return str(self.db.probabilistic.cf_add(key, item))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cf_addnx_command(self, client_id, key, item):
+        """Add item to Cuckoo filter if it does not exist yet. Format: CF.ADDNX key item"""
+        try:
+            return str(self.db.probabilistic.cf_addnx(key, item))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cf_exists_command(self, client_id, key, item):
+        """Check if item might exist. Format: CF.EXISTS key item"""
+        try:
+            return "1" if self.db.probabilistic.cf_exists(key, item) else "0"
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cf_mexists_command(self, client_id, key, *items):
+        """Check if several items might exist. Format: CF.MEXISTS key item [item ...]"""
+        if not items:
+            return "ERROR: Wrong number of arguments for CF.MEXISTS"
+        try:
+            return self.db.probabilistic.cf_mexists(key, list(items))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cf_del_command(self, client_id, key, item):
+        """Delete one copy of item from Cuckoo filter. Format: CF.DEL key item"""
+        try:
+            return str(self.db.probabilistic.cf_del(key, item))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cf_count_command(self, client_id, key, item):
+        """Get the approximate number of copies of item. Format: CF.COUNT key item"""
+        try:
+            return str(self.db.probabilistic.cf_count(key, item))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cms_initbydim_command(self, client_id, key, width, depth):
+        """Create a Count-Min Sketch. Format: CMS.INITBYDIM key width depth"""
+        try:
+            width, depth = int(width), int(depth)
+        except ValueError:
+            return "ERROR: Invalid arguments"
+        if width < 1 or depth < 1:
+            return "ERROR: width and depth must be positive"
+        if not self.db.probabilistic.cms_initbydim(key, width, depth):
+            return "ERROR: Key exists"
+        return "OK"
+
+    def cms_initbyprob_command(self, client_id, key, error, probability):
+        """Create a Count-Min Sketch for an error rate and probability. Format: CMS.INITBYPROB key error probability"""
+        try:
+            error, probability = float(error), float(probability)
+        except ValueError:
+            return "ERROR: Invalid arguments"
+        if not (0 < error < 1 and 0 < probability < 1):
+            return "ERROR: error and probability must be between 0 and 1"
+        if not self.db.probabilistic.cms_initbyprob(key, error, probability):
+            return "ERROR: Key exists"
+        return "OK"
+
+    def cms_incrby_command(self, client_id, key, *args):
+        """Increase item counts. Format: CMS.INCRBY key item increment [item increment ...]"""
+        if not args or len(args) % 2:
+            return "ERROR: Wrong number of arguments for CMS.INCRBY"
+        try:
+            increments = [(item, int(increment)) for item, increment in zip(args[::2], args[1::2])]
+        except ValueError:
+            return "ERROR: Cannot parse number"
+        if any(increment < 0 for _, increment in increments):
+            return "ERROR: increment must be non-negative"
+        try:
+            return self.db.probabilistic.cms_incrby(key, increments)
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cms_query_command(self, client_id, key, *items):
+        """Get estimated item counts. Format: CMS.QUERY key item [item ...]"""
+        if not items:
+            return "ERROR: Wrong number of arguments for CMS.QUERY"
+        try:
+            return self.db.probabilistic.cms_query(key, list(items))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def cms_merge_command(self, client_id, destkey, numkeys, *args):
+        """Merge Count-Min Sketches. Format: CMS.MERGE destkey numkeys source [source ...] [WEIGHTS weight [weight ...]]"""
+        try:
+            numkeys = int(numkeys)
+        except ValueError:
+            return "ERROR: Invalid numkeys"
+        if numkeys < 1 or len(args) < numkeys:
+            return "ERROR: Wrong number of arguments for CMS.MERGE"
+        sourcekeys, rest = list(args[:numkeys]), args[numkeys:]
+        weights = None
+        if rest:
+            if rest[0].upper() != "WEIGHTS" or len(rest) != numkeys + 1:
+                return "ERROR: Wrong number of arguments for CMS.MERGE"
+            try:
+                weights = [int(weight) for weight in rest[1:]]
+            except ValueError:
+                return "ERROR: Cannot parse number"
+        try:
+            self.db.probabilistic.cms_merge(destkey, sourcekeys, weights)
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+        return "OK"
+
+    def topk_reserve_command(self, client_id, key, topk, *args):
+        """Create a Top-K sketch. Format: TOPK.RESERVE key topk [width depth decay]"""
+        if len(args) not in (0, 3):
+            return "ERROR: Wrong number of arguments for TOPK.RESERVE"
+        try:
+            topk = int(topk)
+            width, depth, decay = (int(args[0]), int(args[1]), float(args[2])) if args else \
+                (None, TOPK_DEFAULT_DEPTH, TOPK_DEFAULT_DECAY)
+        except ValueError:
+            return "ERROR: Invalid arguments"
+        if topk < 1 or depth < 1 or (width is not None and width < 1):
+            return "ERROR: topk, width and depth must be positive"
+        if not 0 < decay < 1:
+            return "ERROR: decay must be between 0 and 1"
+        if not self.db.probabilistic.topk_reserve(key, topk, width, depth, decay):
+            return "ERROR: Key exists"
+        return "OK"
+
+    def topk_add_command(self, client_id, key, *items):
+        """Add items to a Top-K sketch. Format: TOPK.ADD key item [item ...]"""
+        if not items:
+            return "ERROR: Wrong number of arguments for TOPK.ADD"
+        try:
+            expelled = self.db.probabilistic.topk_add(key, list(items))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+        return [item if item is not None else "(nil)" for item in expelled]
+
+    def topk_incrby_command(self, client_id, key, *args):
+        """Increase item counts in a Top-K sketch. Format: TOPK.INCRBY key item increment [item increment ...]"""
+        if not args or len(args) % 2:
+            return "ERROR: Wrong number of arguments for TOPK.INCRBY"
+        try:
+            increments = [(item, int(increment)) for item, increment in zip(args[::2], args[1::2])]
+        except ValueError:
+            return "ERROR: Cannot parse number"
+        if any(increment < 1 for _, increment in increments):
+            return "ERROR: increment must be positive"
+        try:
+            expelled = self.db.probabilistic.topk_incrby(key, increments)
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+        return [item if item is not None else "(nil)" for item in expelled]
+
+    def topk_query_command(self, client_id, key, *items):
+        """Check if items are in the top-k. Format: TOPK.QUERY key item [item ...]"""
+        if not items:
+            return "ERROR: Wrong number of arguments for TOPK.QUERY"
+        try:
+            return self.db.probabilistic.topk_query(key, list(items))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def topk_count_command(self, client_id, key, *items):
+        """Get estimated item counts. Format: TOPK.COUNT key item [item ...]"""
+        if not items:
+            return "ERROR: Wrong number of arguments for TOPK.COUNT"
+        try:
+            return self.db.probabilistic.topk_count(key, list(items))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def topk_list_command(self, client_id, key, *options):
+        """List the top-k items, largest first. Format: TOPK.LIST key [WITHCOUNT]"""
+        withcount = False
+        if options:
+            if len(options) > 1 or options[0].upper() != "WITHCOUNT":
+                return "ERROR: Syntax error"
+            withcount = True
+        try:
+            items = self.db.probabilistic.topk_list(key)
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+        if withcount:
+            return [value for item, count in items for value in (item, count)]
+        return [item for item, _ in items]
+
+    def tdigest_create_command(self, client_id, key, *options):
+        """Create a t-digest. Format: TDIGEST.CREATE key [COMPRESSION compression]"""
+        compression = TDIGEST_DEFAULT_COMPRESSION
+        if options:
+            if len(options) != 2 or options[0].upper() != "COMPRESSION":
+                return "ERROR: Syntax error"
+            try:
+                compression = int(options[1])
+            except ValueError:
+                return "ERROR: Invalid compression"
+            if compression < 1:
+                return "ERROR: compression must be positive"
+        if not self.db.probabilistic.tdigest_create(key, compression):
+            return "ERROR: Key exists"
+        return "OK"
+
+    def tdigest_add_command(self, client_id, key, *values):
+        """Add values to a t-digest. Format: TDIGEST.ADD key value [value ...]"""
+        if not values:
+            return "ERROR: Wrong number of arguments for TDIGEST.ADD"
+        try:
+            values = [float(value) for value in values]
+        except ValueError:
+            return "ERROR: Cannot parse number"
+        if any(value != value or value in (float("inf"), float("-inf")) for value in values):
+            return "ERROR: value must be a finite number"
+        try:
+            self.db.probabilistic.tdigest_add(key, values)
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+        return "OK"
+
+    def tdigest_merge_command(self, client_id, destkey, numkeys, *args):
+        """Merge t-digests. Format: TDIGEST.MERGE destkey numkeys source [source ...] [COMPRESSION compression] [OVERRIDE]"""
+        try:
+            numkeys = int(numkeys)
+        except ValueError:
+            return "ERROR: Invalid numkeys"
+        if numkeys < 1 or len(args) < numkeys:
+            return "ERROR: Wrong number of arguments for TDIGEST.MERGE"
+        sourcekeys, options = list(args[:numkeys]), args[numkeys:]
+        compression = None
+        override = False
+        pos = 0
+        while pos < len(options):
+            option = options[pos].upper()
+            if option == "OVERRIDE":
+                override = True
+                pos += 1
+            elif option == "COMPRESSION" and pos + 1 < len(options):
+                try:
+                    compression = int(options[pos + 1])
+                except ValueError:
+                    return "ERROR: Invalid compression"
+                if compression < 1:
+                    return "ERROR: compression must be positive"
+                pos += 2
+            else:
+                return f"ERROR: Unknown option {options[pos]}"
+        try:
+            self.db.probabilistic.tdigest_merge(destkey, sourcekeys, compression, override)
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+        return "OK"
+
+    def tdigest_quantile_command(self, client_id, key, *quantiles):
+        """Get estimated values at quantiles. Format: TDIGEST.QUANTILE key quantile [quantile ...]"""
+        if not quantiles:
+            return "ERROR: Wrong number of arguments for TDIGEST.QUANTILE"
+        try:
+            quantiles = [float(q) for q in quantiles]
+        except ValueError:
+            return "ERROR: Cannot parse number"
+        if any(not 0 <= q <= 1 for q in quantiles):
+            return "ERROR: quantile must be between 0 and 1"
+        try:
+            return [str(value) for value in self.db.probabilistic.tdigest_quantile(key, quantiles)]
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def tdigest_cdf_command(self, client_id, key, *values):
+        """Get the estimated fraction of values at or below each value. Format: TDIGEST.CDF key value [value ...]"""
+        if not values:
+            return "ERROR: Wrong number of arguments for TDIGEST.CDF"
+        try:
+            values = [float(value) for value in values]
+        except ValueError:
+            return "ERROR: Cannot parse number"
+        try:
+            return [str(fraction) for fraction in self.db.probabilistic.tdigest_cdf(key, values)]
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def tdigest_trimmed_mean_command(self, client_id, key, low, high):
+        """Get the mean of the values between two quantiles. Format: TDIGEST.TRIMMED_MEAN key low_quantile high_quantile"""
+        try:
+            low, high = float(low), float(high)
+        except ValueError:
+            return "ERROR: Cannot parse number"
+        if not 0 <= low < high <= 1:
+            return "ERROR: quantiles must satisfy 0 <= low < high <= 1"
+        try:
+            return str(self.db.probabilistic.tdigest_trimmed_mean(key, low, high))
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
     def pfadd_command(self, client_id, key, *elements):
         """Add elements to HLL. Format: PFADD key element [element ...]"""
         if not elements:
@@ -10,6 +10,12 @@ class SetCommandHandler(BaseCommandHandler):
             "SINTER": self.sinter_command,
             "SUNION": self.sunion_command,
             "SDIFF": self.sdiff_command,
+            "SINTERSTORE": self.sinterstore_command,
+            "SUNIONSTORE": self.sunionstore_command,
+            "SDIFFSTORE": self.sdiffstore_command,
+            "SINTERCARD": self.sintercard_command,
+            "SRANDMEMBER": self.srandmember_command,
+            "SPOP": self.spop_command,
         }
 
     def sadd_command(self, client_id, *args):
@@ -67,3 +73,70 @@ class SetCommandHandler(BaseCommandHandler):
         if isinstance(result, str):
             return result
         return list(result) if result else []
+
+    def sinterstore_command(self, client_id, *args):
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'sinterstore' command"
+        return self.db.sets.sinterstore(*args)
+
+    def sunionstore_command(self, client_id, *args):
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'sunionstore' command"
+        return self.db.sets.sunionstore(*args)
+
+    def sdiffstore_command(self, client_id, *args):
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'sdiffstore' command"
+        return self.db.sets.sdiffstore(*args)
+
+    def sintercard_command(self, client_id, *args):
+        """SINTERCARD numkeys key [key ...] [LIMIT limit]"""
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'sintercard' command"
+        try:
+            numkeys = int(args[0])
+        except ValueError:
+            return "ERR numkeys should be greater than 0"
+        if numkeys <= 0:
+            return "ERR numkeys should be greater than 0"
+        if len(args) < numkeys + 1:
+            return "ERR Number of keys can't be greater than number of args"
+        keys = args[1:numkeys + 1]
+        options = args[numkeys + 1:]
+        limit = 0
+        if options:
+            if len(options) != 2 or options[0].upper() != "LIMIT":
+                return "ERR syntax error"
+            try:
+                limit = int(options[1])
+            except ValueError:
+                limit = -1
+            if limit < 0:
+                return "ERR LIMIT can't be negative"
+        return self.db.sets.sintercard(keys, limit)
+
+    def srandmember_command(self, client_id, *args):
+        """SRANDMEMBER key [count]; a negative count may return the same member several times"""
+        if len(args) not in (1, 2):
+            return "ERR wrong number of arguments for 'srandmember' command"
+        count = None
+        if len(args) == 2:
+            try:
+                count = int(args[1])
+            except ValueError:
+                return "ERR value is not an integer or out of range"
+        return self.db.sets.srandmember(args[0], count)
+
+    def spop_command(self, client_id, *args):
+        """SPOP key [count]"""
+        if len(args) not in (1, 2):
+            return "ERR wrong number of arguments for 'spop' command"
+        count = None
+        if len(args) == 2:
+            try:
+                count = int(args[1])
+            except ValueError:
+                count = -1
+            if count < 0:
+                return "ERR value is out of range, must be positive"
+        return self.db.sets.spop(args[0], count)
@@ -1,3 +1,5 @@
+import time
+
 from .base_handler import BaseCommandHandler
 
 class StringCommandHandler(BaseCommandHandler):
@@ -11,6 +13,14 @@ class StringCommandHandler(BaseCommandHandler):
             "DECRBY": self.decrby_command,
             "GETRANGE": self.getrange_command,
             "SETRANGE": self.setrange_command,
+            "MGET": self.mget_command,
+            "MSET": self.mset_command,
+            "MSETNX": self.msetnx_command,
+            "SETNX": self.setnx_command,
+            "GETSET": self.getset_command,
+            "GETDEL": self.getdel_command,
+            "GETEX": self.getex_command,
+            "INCRBYFLOAT": self.incrbyfloat_command,
         }
 
     def append_command(self, client_id, key, value):
@@ -32,7 +42,81 @@ class StringCommandHandler(BaseCommandHandler):
         return str(self.db.string.decrby(key, int(decrement)))
 
     def getrange_command(self, client_id, key, start, end):
-        return self.db.string.getrange(key, int(start), int(end))
+        # A memoryview of the stored bytes; the server writes it to the socket without copying
+        return self.db.string.getrange_view(key, int(start), int(end))
 
     def setrange_command(self, client_id, key, offset, value):
         return str(self.db.string.setrange(key, int(offset), value))
+
+    def _parse_mapping(self, name, args):
+        """Turn key value [key value ...] arguments into a dict."""
+        if not args or len(args) % 2:
+            raise ValueError(f"ERR wrong number of arguments for '{name}' command")
+        return dict(zip(args[::2], args[1::2]))
+
+    def mget_command(self, client_id, *keys):
+        if not keys:
+            return "ERR wrong number of arguments for 'mget' command"
+        # Missing keys stay None and are sent as nil bulk strings
+        return self.db.string.mget(*keys)
+
+    def mset_command(self, client_id, *args):
+        try:
+            mapping = self._parse_mapping('mset', args)
+        except ValueError as e:
+            return str(e)
+        self.db.string.mset(mapping)
+        return "OK"
+
+    def msetnx_command(self, client_id, *args):
+        try:
+            mapping = self._parse_mapping('msetnx', args)
+        except ValueError as e:
+            return str(e)
+        return str(self.db.string.msetnx(mapping))
+
+    def setnx_command(self, client_id, key, value):
+        return str(self.db.string.setnx(key, value))
+
+    def getset_command(self, client_id, key, value):
+        result = self.db.string.getset(key, value)
+        return result if result is not None else "(nil)"
+
+    def getdel_command(self, client_id, key):
+        result = self.db.string.getdel(key)
+        return result if result is not None else "(nil)"
+
+    def getex_command(self, client_id, key, *args):
+        deadline = None
+        persist = False
+        if len(args) == 1 and args[0].upper() == "PERSIST":
+            persist = True
+        elif len(args) == 2 and args[0].upper() in ("EX", "PX", "EXAT", "PXAT"):
+            option = args[0].upper()
+            try:
+                amount = int(args[1])
+            except ValueError:
+                return "ERR value is not an integer or out of range"
+            if amount <= 0:
+                return "ERR invalid expire time in 'getex' command"
+            if option == "EX":
+                deadline = time.time() + amount
+            elif option == "PX":
+                deadline = time.time() + amount / 1000
+            elif option == "EXAT":
+                deadline = amount
+            else:
+                deadline = amount / 1000
+        elif args:
+            return "ERR syntax error"
+        result = self.db.string.getex(key, deadline, persist)
+        return result if result is not None else "(nil)"
+
+    def incrbyfloat_command(self, client_id, key, increment):
+        try:
+            increment = float(increment)
+        except ValueError:
+            return "ERR value is not a valid float"
+        if increment != increment or increment in (float('inf'), float('-inf')):
+            return "ERR value is not a valid float"
+        return self.db.string.incrbyfloat(key, increment)
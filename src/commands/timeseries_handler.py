@@ -1,4 +1,5 @@
 from .base_handler import BaseCommandHandler
+from datatypes.advanced.timeseries import TS_DEFAULT_CHUNK_SIZE, TS_ENCODINGS
 import time
 
 class TimeSeriesCommandHandler(BaseCommandHandler):
@@ -8,12 +9,18 @@ class TimeSeriesCommandHandler(BaseCommandHandler):
             "TS.ADD": self.ts_add_command,
             "TS.GET": self.ts_get_command,
             "TS.RANGE": self.ts_range_command,
+            "TS.CREATERULE": self.ts_createrule_command,
+            "TS.DELETERULE": self.ts_deleterule_command,
         }
 
     def ts_create_command(self, client_id, key, *args):
-        """Create a new time series. Format: TS.CREATE key [RETENTION retentionms] [DUPLICATE_POLICY policy] [LABELS label value..]"""
+        """Create a new time series. Format: TS.CREATE key [RETENTION retentionms] [ENCODING COMPRESSED|UNCOMPRESSED]
+           [CHUNK_SIZE size] [DUPLICATE_POLICY policy] [LABELS label value..]
+           COMPRESSED series store Gorilla-compressed chunks of CHUNK_SIZE bytes (a multiple of 8 from 48 to 1048576)"""
         retention_ms = 0
         duplicate_policy = 'LAST'
+        encoding = 'UNCOMPRESSED'
+        chunk_size = TS_DEFAULT_CHUNK_SIZE
         labels = {}
         
         i = 0
@@ -33,6 +40,23 @@ class TimeSeriesCommandHandler(BaseCommandHandler):
                 if duplicate_policy not in ['BLOCK', 'FIRST', 'LAST']:
                     return "ERROR: Invalid duplicate policy"
                 i += 2
+            elif args[i].upper() == 'ENCODING':
+                if i + 1 >= len(args):
+                    return "ERROR: ENCODING requires COMPRESSED or UNCOMPRESSED"
+                encoding = args[i + 1].upper()
+                if encoding not in TS_ENCODINGS:
+                    return "ERROR: Invalid encoding"
+                i += 2
+            elif args[i].upper() == 'CHUNK_SIZE':
+                if i + 1 >= len(args):
+                    return "ERROR: CHUNK_SIZE requires size in bytes"
+                try:
+                    chunk_size = int(args[i + 1])
+                except ValueError:
+                    return "ERROR: Invalid chunk size"
+                if chunk_size % 8 or not 48 <= chunk_size <= 1048576:
+                    return "ERROR: Invalid chunk size"
+                i += 2
             elif args[i].upper() == 'LABELS':
                 i += 1
                 while i < len(args) - 1:
@@ -43,7 +67,7 @@ class TimeSeriesCommandHandler(BaseCommandHandler):
         
         try:
             success = self.db.timeseries.create(
-                key, retention_ms, duplicate_policy, labels)
+                key, retention_ms, duplicate_policy, labels, encoding, chunk_size)
             return "OK" if success else "ERROR: Key exists"
         except ValueError as e:
             return f"ERROR: {str(e)}"
@@ -81,7 +105,8 @@ class TimeSeriesCommandHandler(BaseCommandHandler):
 
     def ts_range_command(self, client_id, key, *args):
         """Get range of samples. Format: TS.RANGE key fromTimestamp toTimestamp 
-           [AGGREGATION aggregationType bucketSizeMs]"""
+           [AGGREGATION aggregationType bucketSizeMs]
+           aggregationType is avg, sum, min, max, count, first, last or a percentile such as p99"""
         if len(args) < 2:
             return "ERROR: Wrong number of arguments for TS.RANGE"
             
@@ -112,3 +137,26 @@ class TimeSeriesCommandHandler(BaseCommandHandler):
             
         except ValueError as e:
             return f"ERROR: {str(e)}"
+
+    def ts_createrule_command(self, client_id, source_key, dest_key, *args):
+        """Compact a series into another. Format: TS.CREATERULE sourceKey destKey AGGREGATION aggregationType
+           bucketDuration [alignTimestamp]
+           Every TS.ADD to sourceKey updates the open bucket; destKey gets a sample when the bucket closes"""
+        if len(args) not in (3, 4) or args[0].upper() != "AGGREGATION":
+            return "ERROR: Wrong number of arguments for TS.CREATERULE"
+        try:
+            bucket_size = int(args[2])
+            align = int(args[3]) if len(args) > 3 else 0
+        except ValueError:
+            return "ERROR: Invalid bucket duration or align timestamp"
+        try:
+            self.db.timeseries.create_rule(source_key, dest_key, args[1], bucket_size, align)
+            return "OK"
+        except ValueError as e:
+            return f"ERROR: {str(e)}"
+
+    def ts_deleterule_command(self, client_id, source_key, dest_key):
+        """Delete a compaction rule. Format: TS.DELETERULE sourceKey destKey"""
+        if self.db.timeseries.delete_rule(source_key, dest_key):
+            return "OK"
+        return "ERROR: Rule does not exist"
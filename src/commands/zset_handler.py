@@ -1,4 +1,5 @@
 from .base_handler import BaseCommandHandler
+from core.blocking import parse_timeout
 
 class ZSetCommandHandler(BaseCommandHandler):
     def get_commands(self):
@@ -8,8 +9,62 @@ class ZSetCommandHandler(BaseCommandHandler):
             "ZRANK": self.zrank_command,
             "ZREM": self.zrem_command,
             "ZRANGEBYSCORE": self.zrangebyscore_command,
+            "ZREVRANGEBYSCORE": self.zrevrangebyscore_command,
+            "ZREVRANGE": self.zrevrange_command,
+            "ZREVRANK": self.zrevrank_command,
+            "ZCOUNT": self.zcount_command,
+            "ZRANGEBYLEX": self.zrangebylex_command,
+            "ZREVRANGEBYLEX": self.zrevrangebylex_command,
+            "ZLEXCOUNT": self.zlexcount_command,
+            "ZUNIONSTORE": self.zunionstore_command,
+            "ZINTERSTORE": self.zinterstore_command,
+            "ZDIFFSTORE": self.zdiffstore_command,
+            "ZUNION": self.zunion_command,
+            "ZINTER": self.zinter_command,
+            "ZDIFF": self.zdiff_command,
+            "ZPOPMIN": self.zpopmin_command,
+            "ZPOPMAX": self.zpopmax_command,
+            "BZPOPMIN": self.bzpopmin_command,
+            "BZPOPMAX": self.bzpopmax_command,
         }
 
+    def _parse_range_options(self, options, allow_withscores=True):
+        """Parse the trailing [WITHSCORES] [LIMIT offset count] options of range commands."""
+        withscores = False
+        offset, count = 0, None
+        i = 0
+        while i < len(options):
+            option = options[i].upper()
+            if option == "WITHSCORES" and allow_withscores:
+                withscores = True
+                i += 1
+            elif option == "LIMIT" and i + 2 < len(options):
+                try:
+                    offset = int(options[i + 1])
+                    count = int(options[i + 2])
+                except ValueError:
+                    raise ValueError("ERR value is not an integer or out of range")
+                i += 3
+            else:
+                raise ValueError("ERR syntax error")
+        return withscores, offset, count
+
+    def _validate_score_bounds(self, *bounds):
+        """Raise ValueError with the Redis error message if a score bound is invalid."""
+        try:
+            for bound in bounds:
+                self.db.zset.parse_score_bound(bound)
+        except ValueError:
+            raise ValueError("ERR min or max is not a float")
+
+    def _validate_lex_bounds(self, *bounds):
+        """Raise ValueError with the Redis error message if a lex bound is invalid."""
+        try:
+            for bound in bounds:
+                self.db.zset.parse_lex_bound(bound)
+        except ValueError:
+            raise ValueError("ERR min or max not valid string range item")
+
     def zadd_command(self, client_id, *args):
         """Add one or more members to a sorted set."""
         if len(args) < 3:
@@ -51,6 +106,22 @@ class ZSetCommandHandler(BaseCommandHandler):
         result = self.db.zset.zrange(key, start, stop, withscores)
         return result if result else []
 
+    def zrevrange_command(self, client_id, *args):
+        """Return a range of members from sorted set, ordered from high to low scores."""
+        if len(args) not in (3, 4):
+            return "ERR wrong number of arguments for 'zrevrange' command"
+
+        key = args[0]
+        try:
+            start = int(args[1])
+            stop = int(args[2])
+        except ValueError:
+            return "ERR value is not an integer or out of range"
+        if len(args) == 4 and args[3].upper() != "WITHSCORES":
+            return "ERR syntax error"
+
+        return self.db.zset.zrevrange(key, start, stop, len(args) == 4)
+
     def zrank_command(self, client_id, *args):
         """Get the rank of a member in the sorted set."""
         if len(args) != 2:
@@ -60,6 +131,15 @@ class ZSetCommandHandler(BaseCommandHandler):
         result = self.db.zset.zrank(key, member)
         return result if result is not None else "(nil)"
 
+    def zrevrank_command(self, client_id, *args):
+        """Get the rank of a member with the scores ordered from high to low."""
+        if len(args) != 2:
+            return "ERR wrong number of arguments for 'zrevrank' command"
+
+        key, member = args
+        result = self.db.zset.zrevrank(key, member)
+        return result if result is not None else "(nil)"
+
     def zrem_command(self, client_id, *args):
         """Remove one or more members from the sorted set."""
         if len(args) < 2:
@@ -70,14 +150,235 @@ class ZSetCommandHandler(BaseCommandHandler):
         return self.db.zset.zrem(key, *members)
 
     def zrangebyscore_command(self, client_id, *args):
-        """Return members with scores within the specified range."""
+        """Return members with scores within the specified range.
+        Format: ZRANGEBYSCORE key min max [WITHSCORES] [LIMIT offset count]"""
         if len(args) < 3:
             return "ERR wrong number of arguments for 'zrangebyscore' command"
             
-        key = args[0]
-        min_score = args[1]
-        max_score = args[2]
-        withscores = len(args) > 3 and args[3].upper() == "WITHSCORES"
+        key, min_score, max_score = args[:3]
+        try:
+            self._validate_score_bounds(min_score, max_score)
+            withscores, offset, count = self._parse_range_options(args[3:])
+        except ValueError as e:
+            return str(e)
         
-        result = self.db.zset.zrangebyscore(key, min_score, max_score, withscores)
+        result = self.db.zset.zrangebyscore(key, min_score, max_score, withscores, offset, count)
         return result if result else []
+
+    def zrevrangebyscore_command(self, client_id, *args):
+        """Return members with scores within the range, from high to low.
+        Format: ZREVRANGEBYSCORE key max min [WITHSCORES] [LIMIT offset count]"""
+        if len(args) < 3:
+            return "ERR wrong number of arguments for 'zrevrangebyscore' command"
+
+        key, max_score, min_score = args[:3]
+        try:
+            self._validate_score_bounds(max_score, min_score)
+            withscores, offset, count = self._parse_range_options(args[3:])
+        except ValueError as e:
+            return str(e)
+
+        return self.db.zset.zrevrangebyscore(key, max_score, min_score, withscores, offset, count)
+
+    def zcount_command(self, client_id, *args):
+        """Count members with scores within the range. Format: ZCOUNT key min max"""
+        if len(args) != 3:
+            return "ERR wrong number of arguments for 'zcount' command"
+
+        key, min_score, max_score = args
+        try:
+            self._validate_score_bounds(min_score, max_score)
+        except ValueError as e:
+            return str(e)
+        return self.db.zset.zcount(key, min_score, max_score)
+
+    def zrangebylex_command(self, client_id, *args):
+        """Return members in a lexicographical range. Format: ZRANGEBYLEX key min max [LIMIT offset count]"""
+        if len(args) < 3:
+            return "ERR wrong number of arguments for 'zrangebylex' command"
+
+        key, min_member, max_member = args[:3]
+        try:
+            self._validate_lex_bounds(min_member, max_member)
+            _, offset, count = self._parse_range_options(args[3:], allow_withscores=False)
+        except ValueError as e:
+            return str(e)
+        return self.db.zset.zrangebylex(key, min_member, max_member, offset, count)
+
+    def zrevrangebylex_command(self, client_id, *args):
+        """Return members in a reverse lexicographical range. Format: ZREVRANGEBYLEX key max min [LIMIT offset count]"""
+        if len(args) < 3:
+            return "ERR wrong number of arguments for 'zrevrangebylex' command"
+
+        key, max_member, min_member = args[:3]
+        try:
+            self._validate_lex_bounds(max_member, min_member)
+            _, offset, count = self._parse_range_options(args[3:], allow_withscores=False)
+        except ValueError as e:
+            return str(e)
+        return self.db.zset.zrevrangebylex(key, max_member, min_member, offset, count)
+
+    def zlexcount_command(self, client_id, *args):
+        """Count members in a lexicographical range. Format: ZLEXCOUNT key min max"""
+        if len(args) != 3:
+            return "ERR wrong number of arguments for 'zlexcount' command"
+
+        key, min_member, max_member = args
+        try:
+            self._validate_lex_bounds(min_member, max_member)
+        except ValueError as e:
+            return str(e)
+        return self.db.zset.zlexcount(key, min_member, max_member)
+
+    def _parse_aggregate_args(self, args, allow_weights=True, allow_withscores=False):
+        """Parse numkeys key [key ...] [WEIGHTS weight ...] [AGGREGATE SUM|MIN|MAX] [WITHSCORES]."""
+        try:
+            numkeys = int(args[0])
+        except (IndexError, ValueError):
+            raise ValueError("ERR value is not an integer or out of range")
+        if numkeys <= 0:
+            raise ValueError("ERR at least 1 input key is needed")
+        if len(args) < numkeys + 1:
+            raise ValueError("ERR syntax error")
+
+        keys = list(args[1:numkeys + 1])
+        weights, aggregate, withscores = None, 'SUM', False
+        i = numkeys + 1
+        while i < len(args):
+            option = args[i].upper()
+            if option == "WEIGHTS" and allow_weights and i + numkeys < len(args):
+                try:
+                    weights = [float(weight) for weight in args[i + 1:i + 1 + numkeys]]
+                except ValueError:
+                    raise ValueError("ERR weight value is not a float")
+                i += numkeys + 1
+            elif option == "AGGREGATE" and allow_weights and i + 1 < len(args):
+                aggregate = args[i + 1].upper()
+                if aggregate not in ("SUM", "MIN", "MAX"):
+                    raise ValueError("ERR syntax error")
+                i += 2
+            elif option == "WITHSCORES" and allow_withscores:
+                withscores = True
+                i += 1
+            else:
+                raise ValueError("ERR syntax error")
+        return keys, weights, aggregate, withscores
+
+    def zunionstore_command(self, client_id, *args):
+        """Store the union of sorted sets.
+        Format: ZUNIONSTORE destination numkeys key [key ...] [WEIGHTS weight ...] [AGGREGATE SUM|MIN|MAX]"""
+        if len(args) < 3:
+            return "ERR wrong number of arguments for 'zunionstore' command"
+        try:
+            keys, weights, aggregate, _ = self._parse_aggregate_args(args[1:])
+            return self.db.zset.zunionstore(args[0], keys, weights, aggregate)
+        except ValueError as e:
+            return str(e)
+
+    def zinterstore_command(self, client_id, *args):
+        """Store the intersection of sorted sets.
+        Format: ZINTERSTORE destination numkeys key [key ...] [WEIGHTS weight ...] [AGGREGATE SUM|MIN|MAX]"""
+        if len(args) < 3:
+            return "ERR wrong number of arguments for 'zinterstore' command"
+        try:
+            keys, weights, aggregate, _ = self._parse_aggregate_args(args[1:])
+            return self.db.zset.zinterstore(args[0], keys, weights, aggregate)
+        except ValueError as e:
+            return str(e)
+
+    def zdiffstore_command(self, client_id, *args):
+        """Store the difference of sorted sets. Format: ZDIFFSTORE destination numkeys key [key ...]"""
+        if len(args) < 3:
+            return "ERR wrong number of arguments for 'zdiffstore' command"
+        try:
+            keys, _, _, _ = self._parse_aggregate_args(args[1:], allow_weights=False)
+            return self.db.zset.zdiffstore(args[0], keys)
+        except ValueError as e:
+            return str(e)
+
+    def zunion_command(self, client_id, *args):
+        """Return the union of sorted sets.
+        Format: ZUNION numkeys key [key ...] [WEIGHTS weight ...] [AGGREGATE SUM|MIN|MAX] [WITHSCORES]"""
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'zunion' command"
+        try:
+            keys, weights, aggregate, withscores = self._parse_aggregate_args(args, allow_withscores=True)
+            return self.db.zset.zunion(keys, weights, aggregate, withscores)
+        except ValueError as e:
+            return str(e)
+
+    def zinter_command(self, client_id, *args):
+        """Return the intersection of sorted sets.
+        Format: ZINTER numkeys key [key ...] [WEIGHTS weight ...] [AGGREGATE SUM|MIN|MAX] [WITHSCORES]"""
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'zinter' command"
+        try:
+            keys, weights, aggregate, withscores = self._parse_aggregate_args(args, allow_withscores=True)
+            return self.db.zset.zinter(keys, weights, aggregate, withscores)
+        except ValueError as e:
+            return str(e)
+
+    def zdiff_command(self, client_id, *args):
+        """Return the difference of sorted sets. Format: ZDIFF numkeys key [key ...] [WITHSCORES]"""
+        if len(args) < 2:
+            return "ERR wrong number of arguments for 'zdiff' command"
+        try:
+            keys, _, _, withscores = self._parse_aggregate_args(args, allow_weights=False, allow_withscores=True)
+            return self.db.zset.zdiff(keys, withscores)
+        except ValueError as e:
+            return str(e)
+
+    def _pop_command(self, name, pop, args):
+        """Shared implementation of ZPOPMIN and ZPOPMAX. Format: key [count]"""
+        if len(args) not in (1, 2):
+            return f"ERR wrong number of arguments for '{name}' command"
+        count = 1
+        if len(args) == 2:
+            try:
+                count = int(args[1])
+            except ValueError:
+                return "ERR value is not an integer or out of range"
+            if count < 0:
+                return "ERR value is out of range, must be positive"
+        try:
+            return pop(args[0], count)
+        except ValueError as e:
+            return str(e)
+
+    def _blocking_pop_command(self, client_id, name, pop, args):
+        """Shared implementation of BZPOPMIN and BZPOPMAX. Format: key [key ...] timeout"""
+        if len(args) < 2:
+            return f"ERR wrong number of arguments for '{name}' command"
+        keys = args[:-1]
+        try:
+            timeout = parse_timeout(args[-1])
+        except ValueError as e:
+            return str(e)
+
+        def retry(key):
+            try:
+                popped = pop(key, 1)
+            except ValueError as e:
+                return str(e)
+            if not popped:
+                return None
+            member, score = popped[0]
+            return [key, member, score]
+
+        return self._block_on(client_id, keys, timeout, retry)
+
+    def zpopmin_command(self, client_id, *args):
+        """Remove and return members with the lowest scores. Format: ZPOPMIN key [count]"""
+        return self._pop_command('zpopmin', self.db.zset.zpopmin, args)
+
+    def zpopmax_command(self, client_id, *args):
+        """Remove and return members with the highest scores. Format: ZPOPMAX key [count]"""
+        return self._pop_command('zpopmax', self.db.zset.zpopmax, args)
+
+    def bzpopmin_command(self, client_id, *args):
+        """Blocking ZPOPMIN over several keys. Format: BZPOPMIN key [key ...] timeout"""
+        return self._blocking_pop_command(client_id, 'bzpopmin', self.db.zset.zpopmin, args)
+
+    def bzpopmax_command(self, client_id, *args):
+        """Blocking ZPOPMAX over several keys. Format: BZPOPMAX key [key ...] timeout"""
+        return self._blocking_pop_command(client_id, 'bzpopmax', self.db.zset.zpopmax, args)
@@ -0,0 +1,157 @@
+# core/blocking.py
+
+import heapq
+import itertools
+import time
+from collections import deque
+
+class BlockedCommand:
+    """
+    BlockedCommand is returned by a command handler when the client has to wait for
+    one of its keys instead of getting a reply right away.
+
+    Attributes:
+        keys (list): The keys the client waits on, in the order they were given.
+        timeout (float): Seconds to wait; 0 waits forever.
+        retry (callable): Called with a key that was signalled ready. Returns the reply,
+            or None if the key cannot serve the client (yet).
+        timeout_reply: The reply sent when the timeout expires.
+    """
+    __slots__ = ('keys', 'timeout', 'retry', 'timeout_reply')
+
+    def __init__(self, keys, timeout, retry, timeout_reply=None):
+        self.keys = list(keys)
+        self.timeout = timeout
+        self.retry = retry
+        self.timeout_reply = timeout_reply
+
+def parse_timeout(value):
+    """Parse the timeout argument of a blocking command into seconds (0 blocks forever)."""
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("ERR timeout is not a float or out of range")
+    if timeout != timeout or timeout == float('inf'):
+        raise ValueError("ERR timeout is not a float or out of range")
+    if timeout < 0:
+        raise ValueError("ERR timeout is negative")
+    return timeout
+
+class _Waiter:
+    __slots__ = ('client_id', 'command', 'deadline', 'active')
+
+    def __init__(self, client_id, command, deadline):
+        self.client_id = client_id
+        self.command = command
+        self.deadline = deadline
+        self.active = True
+
+class BlockingManager:
+    """
+    BlockingManager parks clients running blocking commands (BZPOPMIN, BLPOP, ...) without
+    a thread per waiter. Waiters are queued per key in FIFO order. Write commands signal
+    keys as ready, and the server loop calls serve_ready_keys() after every command to hand
+    replies to the waiters. Timeouts are kept in a deadline heap so expiring them only
+    touches the waiters that are actually due.
+
+    Attributes:
+        database (KeyValueStore): The database instance.
+        waiters (dict): Maps a key to the deque of waiters blocked on it.
+        blocked (dict): Maps a client ID to its waiter.
+        ready_keys (deque): Keys signalled since the last serve, in signal order.
+        deadlines (list): Heap of (deadline, sequence, waiter) tuples.
+    """
+    def __init__(self, database):
+        self.database = database
+        self.waiters = {}
+        self.blocked = {}
+        self.ready_keys = deque()
+        self._ready_set = set()
+        self.deadlines = []
+        self._sequence = itertools.count()
+
+    def block(self, client_id, command):
+        """Park a client until one of the command's keys is ready or it times out."""
+        deadline = time.monotonic() + command.timeout if command.timeout > 0 else None
+        waiter = _Waiter(client_id, command, deadline)
+        self.blocked[client_id] = waiter
+        for key in command.keys:
+            self.waiters.setdefault(key, deque()).append(waiter)
+        if deadline is not None:
+            heapq.heappush(self.deadlines, (deadline, next(self._sequence), waiter))
+
+    def is_blocked(self, client_id):
+        """Check if a client is waiting on a blocking command."""
+        return client_id in self.blocked
+
+    def signal_key_ready(self, key):
+        """Mark key as ready if clients are waiting on it. Cheap when nobody waits."""
+        if key in self.waiters and key not in self._ready_set:
+            self._ready_set.add(key)
+            self.ready_keys.append(key)
+
+    def serve_ready_keys(self):
+        """
+        Serve the waiters of every ready key in FIFO order.
+        Returns a list of (client_id, reply) tuples to send.
+        """
+        replies = []
+        while self.ready_keys:
+            key = self.ready_keys.popleft()
+            self._ready_set.discard(key)
+            queue = self.waiters.get(key)
+            while queue:
+                waiter = queue[0]
+                if not waiter.active:
+                    queue.popleft()
+                    continue
+                reply = waiter.command.retry(key)
+                if reply is None:
+                    break
+                queue.popleft()
+                self._finish(waiter)
+                replies.append((waiter.client_id, reply))
+            if not queue:
+                self.waiters.pop(key, None)
+        return replies
+
+    def expire_timeouts(self, now=None):
+        """
+        Unblock waiters whose deadline has passed.
+        Returns a list of (client_id, reply) tuples to send.
+        """
+        now = time.monotonic() if now is None else now
+        replies = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, _, waiter = heapq.heappop(self.deadlines)
+            if waiter.active:
+                self._finish(waiter)
+                replies.append((waiter.client_id, waiter.command.timeout_reply))
+        return replies
+
+    def next_timeout(self):
+        """Return the seconds until the next deadline, or None if nothing can time out."""
+        while self.deadlines and not self.deadlines[0][2].active:
+            heapq.heappop(self.deadlines)
+        if not self.deadlines:
+            return None
+        return max(0.0, self.deadlines[0][0] - time.monotonic())
+
+    def unblock_client(self, client_id):
+        """Drop a client's waiter, e.g. when it disconnects."""
+        waiter = self.blocked.get(client_id)
+        if waiter is not None:
+            self._finish(waiter)
+
+    def _finish(self, waiter):
+        """Deactivate a waiter; stale queue and heap entries are skipped lazily."""
+        waiter.active = False
+        self.blocked.pop(waiter.client_id, None)
+        for key in waiter.command.keys:
+            queue = self.waiters.get(key)
+            if queue is None:
+                continue
+            while queue and not queue[0].active:
+                queue.popleft()
+            if not queue:
+                del self.waiters[key]
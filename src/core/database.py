@@ -3,21 +3,28 @@
 from core.expiry import ExpiryManager
 from core.transaction import TransactionManager
 from core.persistence import PersistenceManager
+from core.blocking import BlockingManager
 from datatypes.string import StringDataType
 from datatypes.list import ListDataType
-from datatypes.set import SetDataType
+from datatypes.set import SetDataType, IndexedSet
 from datatypes.hash import HashDataType
 from datatypes.zset import ZSetDataType
 from datatypes.advanced.stream import StreamDataType
 from datatypes.advanced.geo import GeoDataType
 from datatypes.advanced.bitmap import BitMapDataType
 from datatypes.advanced.bitfield import BitFieldDataType
+from datatypes.advanced.roaring import RoaringBitmap
 from datatypes.advanced.probabilistic import ProbabilisticDataType
 from datatypes.advanced.timeseries import TimeSeriesDataType
 from datatypes.advanced.json import JSONDataType
+from collections import deque
+import shlex
 import threading
 import time
 
+# Values of these types are not strings: GET answers WRONGTYPE and MGET answers nil
+CONTAINER_TYPES = (list, deque, dict, set, IndexedSet)
+
 class KeyValueStore:
     """
     KeyValueStore is an in-memory key-value database that supports various data types and operations, similar to Redis. 
@@ -27,6 +34,9 @@ class KeyValueStore:
         set_command_map(command_map): Sets the command map for transaction handling.
         set(key, value): Sets a key-value pair and logs the operation.
         get(key): Retrieves a key's value, considering expiry.
+        mset(mapping): Sets several key-value pairs and logs them as one MSET record.
+        mget(keys): Retrieves several string values in one pass.
+        get_buffer(key, create): Returns the mutable byte buffer of a string value.
         delete(key): Deletes a key and logs the operation.
         exists(key): Checks if a key exists, considering expiry.
         flush(): Clears all keys from the database.
@@ -37,9 +47,11 @@ class KeyValueStore:
     def __init__(self):
         self.store = {}
         self.expiry = {}
+        self.field_expiry = {}  # hash key -> {field: deadline}
         self.expiry_manager = ExpiryManager(self)
         self.transaction_manager = TransactionManager(self)
         self.persistence_manager = PersistenceManager(self)
+        self.blocking_manager = BlockingManager(self)
         #initialize operations
         self.string = StringDataType(self) 
         self.list = ListDataType(self)  
@@ -59,6 +71,7 @@ class KeyValueStore:
         self.replaying = True
         self.persistence_manager.restore()
         self.replaying = False
+        self.expiry_manager.rebuild_index()
 
         # Start background cleaner
         self.expiry_cleaner_thread = threading.Thread(target=self.expiry_manager.clean_expired_keys, daemon=True)
@@ -73,10 +86,11 @@ class KeyValueStore:
         self.store[key] = value
         if key in self.expiry:
             del self.expiry[key]
+        self.field_expiry.pop(key, None)
         if not self.replaying:
             if isinstance(value, list):
                 log_value = ' '.join(str(x) for x in value)
-            elif isinstance(value, set):
+            elif isinstance(value, (set, IndexedSet)):
                 log_value = ' '.join(sorted(str(x) for x in value))  # Sort for consistent logging
             elif isinstance(value, dict):
                 if ('entries' in value or 'points' in value or  # For Stream/Geo
@@ -97,15 +111,83 @@ class KeyValueStore:
         if value is None:
             return None
         # Return type error if trying to GET a non-string value
-        if isinstance(value, (list, dict, set)):
+        if isinstance(value, RoaringBitmap):
+            value = value.to_bytearray()
+        if isinstance(value, bytearray):
+            return value.decode('utf-8', 'surrogateescape')
+        if isinstance(value, CONTAINER_TYPES):
             return "WRONGTYPE Operation against a key holding the wrong kind of value"
         return value
 
+    def get_buffer(self, key, create=False):
+        """
+        Return the bytearray holding the string at key, for commands that work on its bytes
+        in place (APPEND, SETRANGE, GETRANGE, STRLEN and the bitmap commands). A value stored
+        as str (or as a sparse RoaringBitmap) is converted to a bytearray once, on first use.
+        Returns None if the key does not exist and create is False. Raises ValueError if the key
+        holds another type.
+        """
+        value = self.store.get(key)
+        if value is not None and key in self.expiry and self.expiry[key] <= time.time():
+            self.delete(key)
+            value = None
+        if value is None:
+            if not create:
+                return None
+            value = self.store[key] = bytearray()
+            return value
+        if isinstance(value, bytearray):
+            return value
+        if isinstance(value, bytes):
+            value = self.store[key] = bytearray(value)
+            return value
+        if isinstance(value, RoaringBitmap):
+            value = self.store[key] = value.to_bytearray()
+            return value
+        if not isinstance(value, (str, int, float)):
+            # Containers and the advanced types (Bloom filters, HLLs, time series...) are not strings
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        value = self.store[key] = bytearray(str(value).encode('utf-8', 'surrogateescape'))
+        return value
+
+    def mset(self, mapping):
+        """Set several string values at once and log a single MSET record instead of one SET per key."""
+        store = self.store
+        expiry = self.expiry
+        field_expiry = self.field_expiry
+        for key, value in mapping.items():
+            store[key] = value
+            expiry.pop(key, None)
+            field_expiry.pop(key, None)
+        if not self.replaying:
+            # Keys and values are quoted: unlike SET, one record holds several values that may contain spaces
+            self.persistence_manager.log_command(
+                "MSET " + ' '.join(f"{shlex.quote(str(k))} {shlex.quote(str(v))}" for k, v in mapping.items()))
+
+    def mget(self, keys):
+        """Retrieve several keys; missing keys and non-string values are returned as None."""
+        store = self.store
+        expiry = self.expiry
+        now = time.time()
+        result = []
+        for key in keys:
+            value = store.get(key)
+            if value is not None and key in expiry and expiry[key] <= now:
+                self.delete(key)
+                value = None
+            if isinstance(value, RoaringBitmap):
+                value = value.to_bytearray()
+            if isinstance(value, bytearray):
+                value = value.decode('utf-8', 'surrogateescape')
+            result.append(None if isinstance(value, CONTAINER_TYPES) else value)
+        return result
+
     def delete(self, key):
         """Delete a key and log the operation."""
         if key in self.store:
             del self.store[key]
             self.expiry.pop(key, None)
+            self.field_expiry.pop(key, None)
             if not self.replaying:
                 self.persistence_manager.log_command(f"DEL {key}")
             return True
@@ -119,6 +201,7 @@ class KeyValueStore:
         """Clear all keys from the database."""
         self.store.clear()
         self.expiry.clear()
+        self.field_expiry.clear()
         if not self.replaying:
             self.persistence_manager.log_command("FLUSHDB")
 
@@ -131,7 +214,8 @@ class KeyValueStore:
         """Get current database state for replication."""
         return {
             'store': dict(self.store),
-            'expiry': dict(self.expiry)
+            'expiry': dict(self.expiry),
+            'field_expiry': dict(self.field_expiry)
         }
 
     def restore_from_master(self, data):
@@ -140,5 +224,7 @@ class KeyValueStore:
         try:
             self.store = data['store']
             self.expiry = data['expiry']
+            self.field_expiry = data.get('field_expiry', {})
+            self.expiry_manager.rebuild_index()
         finally:
             self.replaying = False
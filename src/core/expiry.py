@@ -1,25 +1,53 @@
 # core/expiry.py
 
+import heapq
+import itertools
 import time
 
 class ExpiryManager:
     """
     ExpiryManager is a class responsible for managing the expiration of keys in an in-memory database.
-    It provides methods to set expiration times, check the time-to-live (TTL) of keys, remove expiration times, 
+    It provides methods to set expiration times, check the time-to-live (TTL) of keys, remove expiration times,
     and clean up expired keys in the background.
 
+    Deadlines of keys and of hash fields share one min-heap of (deadline, sequence, key, field) entries, so the
+    cleaner only touches entries that are due instead of scanning every key with a TTL. Entries are
+    validated lazily: an entry whose deadline no longer matches the current one (the TTL was changed,
+    removed, or the key deleted) is simply dropped when it reaches the top of the heap.
+
     Attributes:
         database (Database): The in-memory database instance.
         running (bool): A flag to control the background cleaner task.
+        index (list): Heap of (deadline, sequence, key, field) entries; field is None for key deadlines.
+            The sequence number breaks deadline ties, so keys and fields are never compared.
     """
     def __init__(self, database):
         self.database = database
         self.running = True
+        self.index = []
+        self._sequence = itertools.count()
+
+    def _schedule(self, deadline, key, field=None):
+        """Add a deadline to the expiry index."""
+        heapq.heappush(self.index, (deadline, next(self._sequence), key, field))
+
+    def rebuild_index(self):
+        """Rebuild the expiry index from the stored deadlines, e.g. after restoring a snapshot."""
+        sequence = self._sequence
+        self.index = [(deadline, next(sequence), key, None) for key, deadline in self.database.expiry.items()]
+        for key, fields in self.database.field_expiry.items():
+            self.index.extend((deadline, next(sequence), key, field) for field, deadline in fields.items())
+        heapq.heapify(self.index)
 
     def set_expiry(self, key, ttl):
         """Set expiration time for a key."""
+        return self.expire_at(key, time.time() + ttl)
+
+    def expire_at(self, key, deadline):
+        """Set the absolute expiration time (a UNIX timestamp) of a key."""
         if self.database.exists(key):
-            self.database.expiry[key] = time.time() + ttl
+            self.database.expiry[key] = deadline
+            self._schedule(deadline, key)
             return True
         return False
 
@@ -34,13 +62,49 @@ class ExpiryManager:
         """Remove the expiration time from a key."""
         return self.database.expiry.pop(key, None) is not None
 
+    def set_field_expiry(self, key, field, deadline):
+        """Set the absolute expiration time of a hash field."""
+        self.database.field_expiry.setdefault(key, {})[field] = deadline
+        self._schedule(deadline, key, field)
+
+    def field_deadline(self, key, field):
+        """Return the expiration time of a hash field, or None if it has none."""
+        fields = self.database.field_expiry.get(key)
+        return fields.get(field) if fields else None
+
+    def persist_field(self, key, field):
+        """Remove the expiration time from a hash field. Returns True if it had one."""
+        fields = self.database.field_expiry.get(key)
+        if not fields or fields.pop(field, None) is None:
+            return False
+        if not fields:
+            del self.database.field_expiry[key]
+        return True
+
+    def clear_fields(self, key):
+        """Forget the field expiration times of a key that was deleted or overwritten."""
+        self.database.field_expiry.pop(key, None)
+
+    def expire_due(self, now=None):
+        """Remove the keys and hash fields whose deadline has passed. Returns how many were removed."""
+        now = time.time() if now is None else now
+        index = self.index
+        removed = 0
+        while index and index[0][0] <= now:
+            deadline, _, key, field = heapq.heappop(index)
+            if field is None:
+                if self.database.expiry.get(key) == deadline:
+                    self.database.delete(key)
+                    removed += 1
+            elif self.field_deadline(key, field) == deadline:
+                self.database.hash.hdel(key, field)
+                removed += 1
+        return removed
+
     def clean_expired_keys(self):
         """Background task to remove expired keys."""
         while self.running:
-            now = time.time()
-            expired_keys = [key for key, exp_time in self.database.expiry.items() if exp_time <= now]
-            for key in expired_keys:
-                self.database.delete(key)
+            self.expire_due()
             time.sleep(1)
 
     def stop(self):
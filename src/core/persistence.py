@@ -1,6 +1,8 @@
+import gc
 import os
 import time
 import pickle
+import shlex
 import threading
 
 class AOFHandler:
@@ -10,6 +12,7 @@ class AOFHandler:
         self.sync_interval = sync_interval
         self.buffer = []
         self.aof_file = open(aof_path, "a")
+        self.lock = threading.Lock()  # The snapshot thread truncates the file under the event loop
 
     def log_command(self, command):
         """Log a command to the AOF buffer."""
@@ -19,33 +22,129 @@ class AOFHandler:
 
     def sync(self):
         """Write buffered commands to the AOF file."""
-        if self.buffer:
-            self.aof_file.writelines(self.buffer)
-            self.aof_file.flush()
-            os.fsync(self.aof_file.fileno())
-            self.buffer = []
+        with self.lock:
+            if self.buffer:
+                self.aof_file.writelines(self.buffer)
+                self.aof_file.flush()
+                os.fsync(self.aof_file.fileno())
+                self.buffer = []
+
+    def position(self):
+        """Write buffered commands and return the end offset of the AOF file."""
+        self.sync()
+        with self.lock:
+            return self.aof_file.tell()
 
     def replay(self):
-        """Replay AOF commands to restore data."""
-        try:
-            if os.path.exists(self.aof_path):
-                with open(self.aof_path, "r") as f:
-                    for line in f:
-                        command_parts = line.strip().split(maxsplit=2)
-                        if command_parts:
-                            command = command_parts[0].upper()
-                            if command == "SET" and len(command_parts) >= 3:
-                                self.database.set(command_parts[1], command_parts[2])
-                            elif command == "DEL" and len(command_parts) >= 2:
-                                self.database.delete(command_parts[1])
-        except Exception as e:
-            print(f"Error replaying AOF: {e}")
+        """
+        Replay AOF commands to restore data. A command that fails is reported and skipped,
+        so that one bad record does not stop the replay of every command after it.
+        """
+        if not os.path.exists(self.aof_path):
+            return
+        with open(self.aof_path, "r") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    self._replay_command(line)
+                except Exception as e:
+                    print(f"Error replaying AOF line {line_number}: {e}")
+
+    def _replay_command(self, line):
+        """Apply one AOF command to the database."""
+        command_parts = line.strip().split(maxsplit=2)
+        if command_parts:
+            command = command_parts[0].upper()
+            if command == "SET" and len(command_parts) >= 3:
+                self.database.set(command_parts[1], command_parts[2])
+            elif command == "DEL" and len(command_parts) >= 2:
+                self.database.delete(command_parts[1])
+            elif command == "APPEND" and len(command_parts) >= 3:
+                self.database.string.append(command_parts[1], command_parts[2])
+            elif command == "SETRANGE" and len(command_parts) >= 3:
+                offset_value = command_parts[2].split(maxsplit=1)
+                self.database.string.setrange(command_parts[1], offset_value[0],
+                                              offset_value[1] if len(offset_value) > 1 else "")
+            elif command == "SETBIT" and len(command_parts) >= 3:
+                offset, value = command_parts[2].split()
+                self.database.bitmap.setbit(command_parts[1], int(offset), int(value))
+            elif command == "BITFIELD" and len(command_parts) >= 3:
+                bitfield = self.database.bitfield
+                bitfield.execute(command_parts[1], bitfield.parse_operations(command_parts[2].split()))
+            elif command == "BF.RESERVE" and len(command_parts) >= 3:
+                options = command_parts[2].split()
+                error_rate, capacity = float(options[0]), int(options[1])
+                if "NONSCALING" in options:
+                    self.database.probabilistic.bf_reserve(
+                        command_parts[1], error_rate, capacity, scaling=False)
+                else:
+                    self.database.probabilistic.bf_reserve(
+                        command_parts[1], error_rate, capacity, int(options[3]))
+            elif command == "BF.MADD" and len(command_parts) >= 3:
+                self.database.probabilistic.bf_madd(command_parts[1], command_parts[2].split())
+            elif command == "CF.RESERVE" and len(command_parts) >= 3:
+                options = command_parts[2].split()
+                settings = dict(zip(options[1::2], map(int, options[2::2])))
+                self.database.probabilistic.cf_reserve(
+                    command_parts[1], int(options[0]), settings["BUCKETSIZE"],
+                    settings["MAXITERATIONS"], settings["EXPANSION"])
+            elif command == "CF.ADD" and len(command_parts) >= 3:
+                self.database.probabilistic.cf_add(command_parts[1], command_parts[2])
+            elif command == "CF.DEL" and len(command_parts) >= 3:
+                self.database.probabilistic.cf_del(command_parts[1], command_parts[2])
+            elif command == "CMS.INITBYDIM" and len(command_parts) >= 3:
+                width, depth = command_parts[2].split()
+                self.database.probabilistic.cms_initbydim(command_parts[1], int(width), int(depth))
+            elif command == "CMS.INCRBY" and len(command_parts) >= 3:
+                tokens = command_parts[2].split()
+                self.database.probabilistic.cms_incrby(
+                    command_parts[1], list(zip(tokens[::2], map(int, tokens[1::2]))))
+            elif command == "CMS.MERGE" and len(command_parts) >= 3:
+                tokens = command_parts[2].split()
+                numkeys = int(tokens[0])
+                self.database.probabilistic.cms_merge(
+                    command_parts[1], tokens[1:numkeys + 1], [int(w) for w in tokens[numkeys + 2:]])
+            elif command == "TOPK.RESERVE" and len(command_parts) >= 3:
+                k, width, depth, decay = command_parts[2].split()
+                self.database.probabilistic.topk_reserve(
+                    command_parts[1], int(k), int(width), int(depth), float(decay))
+            elif command == "TOPK.ADD" and len(command_parts) >= 3:
+                self.database.probabilistic.topk_add(command_parts[1], command_parts[2].split())
+            elif command == "TOPK.INCRBY" and len(command_parts) >= 3:
+                tokens = command_parts[2].split()
+                self.database.probabilistic.topk_incrby(
+                    command_parts[1], list(zip(tokens[::2], map(int, tokens[1::2]))))
+            elif command == "TDIGEST.CREATE" and len(command_parts) >= 3:
+                self.database.probabilistic.tdigest_create(
+                    command_parts[1], int(command_parts[2].split()[1]))
+            elif command == "TDIGEST.ADD" and len(command_parts) >= 3:
+                self.database.probabilistic.tdigest_add(
+                    command_parts[1], [float(v) for v in command_parts[2].split()])
+            elif command == "TDIGEST.MERGE" and len(command_parts) >= 3:
+                tokens = command_parts[2].split()
+                numkeys = int(tokens[0])
+                options = [token.upper() for token in tokens[numkeys + 1:]]
+                compression = int(tokens[numkeys + 2]) if "COMPRESSION" in options else None
+                self.database.probabilistic.tdigest_merge(
+                    command_parts[1], tokens[1:numkeys + 1], compression, "OVERRIDE" in options)
+            elif command == "MSET":
+                tokens = shlex.split(line)[1:]
+                self.database.mset(dict(zip(tokens[::2], tokens[1::2])))
 
-    def truncate(self):
-        """Truncate the AOF file."""
-        self.aof_file.close()
-        self.aof_file = open(self.aof_path, "w")
-        self.aof_file = open(self.aof_path, "a")
+    def truncate(self, offset=None):
+        """Truncate the AOF file, keeping the commands written after offset if given."""
+        self.sync()
+        with self.lock:
+            self.aof_file.close()
+            tail = ""
+            if offset is not None:
+                with open(self.aof_path, "r") as f:
+                    f.seek(offset)
+                    tail = f.read()
+            temp_path = f"{self.aof_path}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(tail)
+            os.replace(temp_path, self.aof_path)
+            self.aof_file = open(self.aof_path, "a")
 
     def close(self):
         """Clean shutdown of AOF handler."""
@@ -62,11 +161,14 @@ class SnapshotManager:
         snapshot_path (str): The file path where snapshots are saved.
         snapshot_interval (int): The interval (in seconds) at which snapshots are created.
         last_snapshot (float): The timestamp of the last snapshot.
+        snapshot_func (callable): Takes the periodic and final snapshots; PersistenceManager passes
+            its create_snapshot so that the AOF is truncated along with them.
     """
-    def __init__(self, database, snapshot_path="snapshot.rdb", snapshot_interval=300):
+    def __init__(self, database, snapshot_path="snapshot.rdb", snapshot_interval=300, snapshot_func=None):
         self.database = database
         self.snapshot_path = snapshot_path
         self.snapshot_interval = snapshot_interval
+        self.snapshot_func = snapshot_func or self.create_snapshot
         self.last_snapshot = time.time()
         self.running = True
         self.snapshot_thread = threading.Thread(target=self._snapshot_loop, daemon=True)
@@ -95,6 +197,7 @@ class SnapshotManager:
             snapshot_data = {
                 'store': dict(self.database.store),  # Create a copy
                 'expiry': dict(self.database.expiry),
+                'field_expiry': dict(self.database.field_expiry),
                 'timestamp': time.time()
             }
             with open(temp_path, 'wb') as f:
@@ -120,7 +223,14 @@ class SnapshotManager:
 
             with open(self.snapshot_path, 'rb') as f:
                 try:
-                    snapshot_data = pickle.load(f)
+                    # Loading rebuilds large structures (e.g. skip lists in bulk); skip GC passes meanwhile
+                    gc_enabled = gc.isenabled()
+                    gc.disable()
+                    try:
+                        snapshot_data = pickle.load(f)
+                    finally:
+                        if gc_enabled:
+                            gc.enable()
                     if not isinstance(snapshot_data, dict):
                         raise ValueError("Invalid snapshot format")
                     
@@ -130,6 +240,8 @@ class SnapshotManager:
 
                     self.database.store = snapshot_data['store']
                     self.database.expiry = snapshot_data['expiry']
+                    # Snapshots written before hash field TTLs have no field_expiry
+                    self.database.field_expiry = snapshot_data.get('field_expiry', {})
                     return snapshot_data['timestamp']
                 except (pickle.UnpicklingError, ValueError) as e:
                     print(f"Corrupt snapshot file: {e}")
@@ -146,19 +258,19 @@ class SnapshotManager:
         while self.running:
             time.sleep(1)
             if time.time() - self.last_snapshot >= self.snapshot_interval:
-                if self.create_snapshot():
+                if self.snapshot_func():
                     self.last_snapshot = time.time()
 
     def stop(self):
         """Stop the snapshot manager."""
         self.running = False
-        self.create_snapshot()  # Final snapshot
+        self.snapshot_func()  # Final snapshot
 
 class PersistenceManager:
     def __init__(self, database):
         self.database = database
         self.aof_handler = AOFHandler(database)
-        self.snapshot_manager = SnapshotManager(database)
+        self.snapshot_manager = SnapshotManager(database, snapshot_func=self.create_snapshot)
 
     def log_command(self, command):
         """Log a command to AOF."""
@@ -171,9 +283,14 @@ class PersistenceManager:
             self.aof_handler.replay()  # Replay commands after snapshot
 
     def create_snapshot(self):
-        """Create a new snapshot and truncate AOF."""
+        """
+        Create a new snapshot and truncate the AOF. Replay is not idempotent (APPEND, INCRBY,
+        CMS.INCRBY...), so the commands the snapshot already contains must not stay in the AOF;
+        commands logged while the snapshot is written are kept.
+        """
+        offset = self.aof_handler.position()
         if self.snapshot_manager.create_snapshot():
-            self.aof_handler.truncate()
+            self.aof_handler.truncate(offset)
             return True
         return False
 
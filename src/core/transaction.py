@@ -54,6 +54,9 @@ class TransactionManager:
                 if command_func:
                     try:
                         result = command_func(client_id, *args)
+                        if isinstance(result, memoryview):
+                            # Later commands in the transaction may modify the viewed buffer
+                            result = result.tobytes()
                         results.append(result)
                     except Exception as e:
                         results.append(f"ERR {str(e)}")
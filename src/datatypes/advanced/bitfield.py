@@ -1,4 +1,9 @@
-from typing import Tuple, Optional
+from typing import List, Optional, Tuple
+
+from datatypes.advanced.bitmap import MAX_BIT_OFFSET
+from datatypes.advanced.roaring import RoaringBitmap
+
+OVERFLOW_MODES = ('WRAP', 'SAT', 'FAIL')
 
 class BitFieldDataType:
     """
@@ -9,10 +14,10 @@ class BitFieldDataType:
     Methods:
         __init__(database):
             Initializes the BitFieldDataType with the given database.
-        _get_bytes(key: str) -> bytearray:
-            Retrieves the byte array associated with the given key from the database.
+        _get_bytes(key: str, create: bool = False) -> bytearray:
+            Retrieves the live byte array of the given key, the same buffer the string and bitmap commands use.
         _set_bytes(key: str, bytes_array: bytearray):
-            Stores the given byte array in the database under the specified key.
+            Stores the given byte array under the specified key if it is not already the stored buffer.
         _get_bits(data: bytearray, offset: int, bits: int, unsigned: bool = True) -> int:
             Extracts a specified number of bits from the byte array starting at a given bit offset.
         _set_bits(data: bytearray, offset: int, bits: int, value: int, unsigned: bool = True) -> int:
@@ -27,50 +32,52 @@ class BitFieldDataType:
             Sets an integer value in the bitfield at the specified offset and type, returning the old value.
         incrby(key: str, type_spec: str, offset: str, increment: int) -> Optional[int]:
             Increments an integer value in the bitfield at the specified offset and type by a given increment, returning the new value.
+        parse_operations(args: list, read_only: bool = False) -> List[tuple]:
+            Parses the arguments of a BITFIELD (or BITFIELD_RO) command into operations.
+        execute(key: str, operations: List[tuple]) -> List[Optional[int]]:
+            Runs a batch of GET/SET/INCRBY operations with OVERFLOW WRAP/SAT/FAIL against one bytearray,
+            or bit by bit against a sparse RoaringBitmap.
     """
     def __init__(self, database):
         self.db = database
+        self._types = {}
 
-    def _get_bytes(self, key: str) -> bytearray:
-        """Get bytes array from string value."""
-        try:
-            value = self.db.get(key)
-            if value is None:
-                return bytearray()
-            if isinstance(value, bytes):
-                return bytearray(value)
-            return bytearray(value.encode('latin1', errors='ignore'))
-        except Exception:
-            return bytearray()
+    def _get_bytes(self, key: str, create: bool = False) -> bytearray:
+        """
+        Get the live bytearray of the string value at key, shared with the bitmap and string
+        commands. A missing key gives an empty, unstored bytearray unless create is set.
+        """
+        data = self.db.get_buffer(key, create)
+        return data if data is not None else bytearray()
 
     def _set_bytes(self, key: str, bytes_array: bytearray):
-        """Store bytes array as string value."""
-        try:
-            self.db.store[key] = bytes(bytes_array)
-            if not self.db.replaying:
-                # Convert to hex for logging to avoid encoding issues
-                hex_value = ' '.join(f'{b:02x}' for b in bytes_array)
-                self.db.persistence_manager.log_command(f"SET {key} {hex_value}")
-        except Exception as e:
-            raise ValueError(f"Failed to store bytes: {str(e)}")
+        """Store bytes array at key unless it already is the stored buffer (it was changed in place)."""
+        if self.db.store.get(key) is not bytes_array:
+            self.db.store[key] = bytes_array
+
+    def _get_sparse(self, bitmap: RoaringBitmap, offset: int, bits: int, unsigned: bool = True) -> int:
+        """Read a field from a RoaringBitmap bit by bit, without expanding it to a dense string."""
+        value = 0
+        for position in range(offset, offset + bits):
+            value = (value << 1) | bitmap.get(position)
+        if not unsigned and value >> (bits - 1):
+            value -= 1 << bits
+        return value
+
+    def _set_sparse(self, bitmap: RoaringBitmap, offset: int, bits: int, value: int):
+        """Write a field into a RoaringBitmap bit by bit."""
+        for index in range(bits):
+            bitmap.set(offset + index, (value >> (bits - 1 - index)) & 1)
 
     def _get_bits(self, data: bytearray, offset: int, bits: int, unsigned: bool = True) -> int:
-        """Extract bits from bytes array starting at bit offset."""
+        """Extract bits from bytes array starting at bit offset. Bytes past the end read as zero."""
         start_byte = offset >> 3
         end_byte = (offset + bits - 1) >> 3
-        bit_offset = offset & 7
+        size = end_byte - start_byte + 1
 
-        # Ensure we have enough bytes
-        if len(data) < end_byte + 1:
-            data.extend([0] * (end_byte + 1 - len(data)))
-
-        # Extract relevant bytes
-        value = 0
-        for i in range(start_byte, end_byte + 1):
-            value = (value << 8) | data[i]
-
-        # Shift and mask
-        shift = (8 - bits - bit_offset) if end_byte == start_byte else (8 * (end_byte - start_byte + 1) - bits - bit_offset)
+        # One big-endian integer holding every byte the field touches
+        value = int.from_bytes(bytes(data[start_byte:end_byte + 1]).ljust(size, b'\x00'), 'big')
+        shift = 8 * size - bits - (offset & 7)
         value = (value >> shift) & ((1 << bits) - 1)
 
         # Handle signed numbers
@@ -80,31 +87,24 @@ class BitFieldDataType:
         return value
 
     def _set_bits(self, data: bytearray, offset: int, bits: int, value: int, unsigned: bool = True) -> int:
-        """Set bits in bytes array starting at bit offset."""
+        """Set bits in bytes array starting at bit offset, growing it with zero bytes if needed."""
         start_byte = offset >> 3
         end_byte = (offset + bits - 1) >> 3
-        bit_offset = offset & 7
+        size = end_byte - start_byte + 1
 
         # Ensure we have enough bytes
         if len(data) < end_byte + 1:
-            data.extend([0] * (end_byte + 1 - len(data)))
+            data.extend(bytes(end_byte + 1 - len(data)))
 
-        # Create mask and handle value
-        mask = ((1 << bits) - 1)
+        mask = (1 << bits) - 1
         value &= mask  # Truncate value to fit bits
+        shift = 8 * size - bits - (offset & 7)
 
-        # Position value and mask
-        shift = (8 - bits - bit_offset) if end_byte == start_byte else (8 * (end_byte - start_byte + 1) - bits - bit_offset)
-        value <<= shift
-        mask <<= shift
+        word = int.from_bytes(data[start_byte:end_byte + 1], 'big')
+        word = (word & ~(mask << shift)) | (value << shift)
+        data[start_byte:end_byte + 1] = word.to_bytes(size, 'big')
 
-        # Apply value
-        for i in range(start_byte, end_byte + 1):
-            byte_mask = mask >> ((end_byte - i) * 8) & 0xFF
-            byte_value = value >> ((end_byte - i) * 8) & 0xFF
-            data[i] = (data[i] & ~byte_mask) | byte_value
-
-        return value >> shift
+        return value
 
     def _parse_offset(self, offset_str: str) -> int:
         """Parse offset that may be hash-based (#N) or numeric."""
@@ -144,61 +144,198 @@ class BitFieldDataType:
         except ValueError:
             raise ValueError(f"Invalid bit width: {type_spec[1:]}")
 
+    def _overflow(self, value: int, bits: int, unsigned: bool, mode: str) -> Optional[int]:
+        """Bring value into the range of the field type: WRAP around, SAT(urate) or FAIL (None)."""
+        if unsigned:
+            min_val, max_val = 0, (1 << bits) - 1
+        else:
+            min_val, max_val = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+        if min_val <= value <= max_val:
+            return value
+        if mode == 'SAT':
+            return max_val if value > max_val else min_val
+        if mode == 'FAIL':
+            return None
+        return ((value - min_val) & ((1 << bits) - 1)) + min_val
+
+    def parse_operations(self, args, read_only: bool = False) -> List[tuple]:
+        """
+        Parse BITFIELD arguments into a list of operations for execute():
+        ('GET', unsigned, bits, offset), ('SET', unsigned, bits, offset, value),
+        ('INCRBY', unsigned, bits, offset, increment) and ('OVERFLOW', mode).
+        With read_only (BITFIELD_RO) only GET is accepted.
+        """
+        operations = []
+        pos = 0
+        while pos < len(args):
+            subcommand = str(args[pos]).upper()
+            pos += 1
+            if read_only and subcommand != 'GET':
+                raise ValueError("BITFIELD_RO only supports the GET subcommand")
+            if subcommand == 'OVERFLOW':
+                if pos >= len(args):
+                    raise ValueError("Wrong number of arguments for OVERFLOW")
+                mode = str(args[pos]).upper()
+                if mode not in OVERFLOW_MODES:
+                    raise ValueError(f"Invalid OVERFLOW type {args[pos]}")
+                operations.append(('OVERFLOW', mode))
+                pos += 1
+                continue
+            if subcommand not in ('GET', 'SET', 'INCRBY'):
+                raise ValueError(f"Unknown BITFIELD subcommand {subcommand}")
+            arity = 2 if subcommand == 'GET' else 3
+            if pos + arity > len(args):
+                raise ValueError(f"Wrong number of arguments for {subcommand}")
+            # Batches repeat a handful of types, so parsed types are memoized
+            type_spec = args[pos]
+            field_type = self._types.get(type_spec)
+            if field_type is None:
+                field_type = self._types[type_spec] = self._parse_type(type_spec)
+            unsigned, bits = field_type
+            offset = args[pos + 1]
+            if isinstance(offset, str) and offset.startswith('#'):
+                try:
+                    offset = int(offset[1:]) * bits
+                except ValueError:
+                    raise ValueError(f"Invalid hash offset: {offset}")
+            else:
+                offset = self._parse_offset(offset)
+            if offset < 0 or offset + bits > MAX_BIT_OFFSET:
+                raise ValueError("bit offset is not an integer or out of range")
+            if subcommand == 'GET':
+                operations.append(('GET', unsigned, bits, offset))
+            else:
+                try:
+                    argument = int(args[pos + 2])
+                except ValueError:
+                    label = "value" if subcommand == 'SET' else "increment"
+                    raise ValueError(f"Invalid {label}: {args[pos + 2]}")
+                operations.append((subcommand, unsigned, bits, offset, argument))
+            pos += arity
+        return operations
+
+    def execute(self, key: str, operations: List[tuple]) -> List[Optional[int]]:
+        """
+        Run parsed BITFIELD operations in order against one fetched bytearray. The value is
+        grown once, up front, to fit every write, and is then changed in place. SET returns
+        the old value, INCRBY the new one and GET the current one; None when OVERFLOW FAIL
+        skipped the write. The writes are logged as a single BITFIELD record, with hash
+        offsets (#N) resolved, which the AOF replay runs through execute() again.
+        """
+        writes = [op for op in operations if op[0] in ('SET', 'INCRBY')]
+        stored = self.db.store.get(key)
+        if isinstance(stored, RoaringBitmap) and self.db.exists(key):
+            return self._execute_sparse(key, stored, operations, writes)
+        if writes:
+            data = self._get_bytes(key, create=True)
+            end = max((op[3] + op[2] + 7) >> 3 for op in writes)
+            if len(data) < end:
+                data.extend(bytes(end - len(data)))
+        else:
+            data = self._get_bytes(key)
+
+        results = []
+        mode = 'WRAP'
+        size = len(data)
+        for op in operations:
+            name = op[0]
+            if name == 'OVERFLOW':
+                mode = op[1]
+                continue
+            unsigned, bits, offset = op[1], op[2], op[3]
+            # The field as one big-endian integer of the bytes it touches
+            start = offset >> 3
+            stop = (offset + bits + 7) >> 3
+            if stop > size:
+                # Only reads go past the end; missing bytes read as zero
+                results.append(self._get_bits(data, offset, bits, unsigned))
+                continue
+            shift = (stop << 3) - offset - bits
+            mask = (1 << bits) - 1
+            word = int.from_bytes(data[start:stop], 'big')
+            current = (word >> shift) & mask
+            if not unsigned and current >> (bits - 1):
+                current -= 1 << bits
+            if name == 'GET':
+                results.append(current)
+                continue
+            new_val = op[4] if name == 'SET' else current + op[4]
+            if not (0 <= new_val <= mask if unsigned else -(1 << (bits - 1)) <= new_val <= mask >> 1):
+                new_val = self._overflow(new_val, bits, unsigned, mode)
+            if new_val is None:
+                results.append(None)
+                continue
+            word = (word & ~(mask << shift)) | ((new_val & mask) << shift)
+            data[start:stop] = word.to_bytes(stop - start, 'big')
+            results.append(current if name == 'SET' else new_val)
+
+        if writes:
+            self._set_bytes(key, data)
+            self._log(key, operations)
+        return results
+
+    def _execute_sparse(self, key: str, bitmap: RoaringBitmap, operations: List[tuple],
+                        writes: List[tuple]) -> List[Optional[int]]:
+        """
+        execute() for a bitmap stored as a RoaringBitmap: fields are read and written bit by
+        bit in place, so that BITFIELD (and BITFIELD_RO above all) at a high offset does not
+        expand it to the dense string. It switches to dense once that is smaller, like SETBIT.
+        """
+        results = []
+        mode = 'WRAP'
+        for op in operations:
+            name = op[0]
+            if name == 'OVERFLOW':
+                mode = op[1]
+                continue
+            unsigned, bits, offset = op[1], op[2], op[3]
+            current = self._get_sparse(bitmap, offset, bits, unsigned)
+            if name == 'GET':
+                results.append(current)
+                continue
+            new_val = self._overflow(op[4] if name == 'SET' else current + op[4], bits, unsigned, mode)
+            if new_val is None:
+                results.append(None)
+                continue
+            self._set_sparse(bitmap, offset, bits, new_val)
+            results.append(current if name == 'SET' else new_val)
+
+        if writes:
+            if bitmap.nbytes > len(bitmap):
+                self.db.store[key] = bitmap.to_bytearray()
+            self._log(key, operations)
+        return results
+
+    def _log(self, key: str, operations: List[tuple]):
+        """Log the writes of a batch as a single BITFIELD record."""
+        if not self.db.replaying:
+            command = ' '.join(self._format_operation(op) for op in operations if op[0] != 'GET')
+            self.db.persistence_manager.log_command(f"BITFIELD {key} {command}")
+
+    def _format_operation(self, op: tuple) -> str:
+        """Format a parsed operation back into BITFIELD arguments, for the AOF."""
+        if op[0] == 'OVERFLOW':
+            return f"OVERFLOW {op[1]}"
+        type_spec = f"{'u' if op[1] else 'i'}{op[2]}"
+        return ' '.join(str(part) for part in (op[0], type_spec, op[3]) + op[4:])
+
     def get(self, key: str, type_spec: str, offset: str) -> Optional[int]:
         """Get integer from bitfield."""
         try:
-            unsigned, bits = self._parse_type(type_spec)
-            bit_offset = self._parse_offset(offset)
-            data = self._get_bytes(key)
-            return self._get_bits(data, bit_offset, bits, unsigned)
+            return self.execute(key, self.parse_operations(['GET', type_spec, offset]))[0]
         except ValueError as e:
             raise ValueError(f"GET error: {str(e)}")
 
     def set(self, key: str, type_spec: str, offset: str, value: int) -> Optional[int]:
         """Set integer in bitfield."""
         try:
-            unsigned, bits = self._parse_type(type_spec)
-            bit_offset = self._parse_offset(offset)
-            data = self._get_bytes(key)
-            old_value = self._get_bits(data, bit_offset, bits, unsigned)
-            self._set_bits(data, bit_offset, bits, value, unsigned)
-            self._set_bytes(key, data)
-            
-            if not self.db.replaying:
-                self.db.persistence_manager.log_command(f"BITFIELD {key} SET {type_spec} {offset} {value}")
-            
-            return old_value
+            return self.execute(key, self.parse_operations(['SET', type_spec, offset, value]))[0]
         except ValueError as e:
             raise ValueError(f"SET error: {str(e)}")
 
     def incrby(self, key: str, type_spec: str, offset: str, increment: int) -> Optional[int]:
         """Increment integer in bitfield."""
         try:
-            unsigned, bits = self._parse_type(type_spec)
-            bit_offset = self._parse_offset(offset)
-            data = self._get_bytes(key)
-            
-            current = self._get_bits(data, bit_offset, bits, unsigned)
-            max_val = (1 << bits) if unsigned else (1 << (bits - 1))
-            min_val = 0 if unsigned else -(1 << (bits - 1))
-            
-            # Calculate new value with overflow/underflow handling
-            new_val = current + increment
-            if unsigned:
-                new_val &= (1 << bits) - 1  # Wrap around for unsigned
-            else:
-                # Handle signed wrap-around
-                if new_val >= max_val:
-                    new_val = min_val + (new_val - max_val)
-                elif new_val < min_val:
-                    new_val = max_val - 1 + (new_val - min_val + 1)
-                
-            self._set_bits(data, bit_offset, bits, new_val, unsigned)
-            self._set_bytes(key, data)
-            
-            if not self.db.replaying:
-                self.db.persistence_manager.log_command(f"BITFIELD {key} INCRBY {type_spec} {offset} {increment}")
-            
-            return new_val
+            return self.execute(key, self.parse_operations(['INCRBY', type_spec, offset, increment]))[0]
         except ValueError as e:
             raise ValueError(f"INCRBY error: {str(e)}")
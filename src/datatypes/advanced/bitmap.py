@@ -1,6 +1,126 @@
+from functools import reduce
+import operator
+
+from datatypes.advanced.roaring import RoaringBitmap
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python paths below are used without it
+    np = None
+
+# Redis limits bitmaps to 512 MB, i.e. bit offsets below 2^32
+MAX_BIT_OFFSET = 1 << 32
+
+# Bytes handled per int.from_bytes() call, to bound the size of temporary integers
+CHUNK_BYTES = 1 << 20
+
+# Inputs below this size are not worth the NumPy call overhead
+NUMPY_MIN_BYTES = 1 << 16
+
+# Bitmaps shorter than this are always dense; larger ones become a RoaringBitmap when sparse
+SPARSE_MIN_BYTES = 1 << 16
+
+# Number of set bits of every byte value, for the partial bytes at the edges of a bit range
+POPCOUNT8 = bytes(bin(value).count('1') for value in range(256))
+
+_OPERATORS = {'AND': operator.and_, 'OR': operator.or_, 'XOR': operator.xor}
+
+
+def popcount(data) -> int:
+    """Count the set bits of a bytes-like object, a machine word (or a 1 MB integer) at a time."""
+    size = len(data)
+    if np is not None and size >= NUMPY_MIN_BYTES and hasattr(np, 'bitwise_count'):
+        words = size >> 3
+        count = int(np.bitwise_count(np.frombuffer(data, dtype=np.uint64, count=words)).sum())
+        return count + int.from_bytes(data[words << 3:], 'big').bit_count()
+    count = 0
+    for offset in range(0, size, CHUNK_BYTES):
+        count += int.from_bytes(data[offset:offset + CHUNK_BYTES], 'big').bit_count()
+    return count
+
+
+def bitwise(operation: str, sources, length: int) -> bytearray:
+    """
+    Combine the sources with AND, OR or XOR (or NOT for a single source) into a new
+    bytearray of length bytes; shorter sources are padded with zero bytes.
+    """
+    if np is not None and length >= NUMPY_MIN_BYTES:
+        return _bitwise_numpy(operation, sources, length)
+    result = bytearray(length)
+    combine = _OPERATORS.get(operation)
+    for offset in range(0, length, CHUNK_BYTES):
+        size = min(CHUNK_BYTES, length - offset)
+        values = []
+        for source in sources:
+            chunk = source[offset:offset + size]
+            # Shift left to pad a short chunk with zero bytes on the right
+            values.append(int.from_bytes(chunk, 'big') << (8 * (size - len(chunk))))
+        if operation == 'NOT':
+            value = values[0] ^ ((1 << (8 * size)) - 1)
+        else:
+            value = reduce(combine, values)
+        result[offset:offset + size] = value.to_bytes(size, 'big')
+    return result
+
+
+def _bitwise_numpy(operation: str, sources, length: int) -> bytearray:
+    """NumPy version of bitwise()."""
+    arrays = [np.frombuffer(source, dtype=np.uint8) for source in sources]
+    result = np.zeros(length, dtype=np.uint8)
+    if operation == 'NOT':
+        np.invert(arrays[0], out=result)
+    elif operation == 'AND':
+        # Past the shortest source every byte is ANDed with padding, so it stays zero
+        shortest = min(len(array) for array in arrays)
+        head = result[:shortest]
+        np.copyto(head, arrays[0][:shortest])
+        for array in arrays[1:]:
+            np.bitwise_and(head, array[:shortest], out=head)
+    else:
+        combine = np.bitwise_or if operation == 'OR' else np.bitwise_xor
+        for array in arrays:
+            head = result[:len(array)]
+            combine(head, array, out=head)
+    return bytearray(result)
+
+
+def find_byte_not(data, skip: int, start: int, end: int) -> int:
+    """Return the index of the first byte in data[start:end] that differs from skip, or -1."""
+    strip = bytes((skip,))
+    for offset in range(start, end, CHUNK_BYTES):
+        chunk = data[offset:min(offset + CHUNK_BYTES, end)]
+        rest = chunk.lstrip(strip)
+        if rest:
+            return offset + len(chunk) - len(rest)
+    return -1
+
+
+def prefers_sparse(cardinality: int, length: int) -> bool:
+    """
+    Whether a bitmap of length bytes with cardinality set bits should be a RoaringBitmap:
+    sparse containers cost about 2 bytes per set bit, so require a 4x saving over dense.
+    """
+    return length >= SPARSE_MIN_BYTES and 8 * (cardinality + 1) < length
+
+
+def normalize_range(start: int, end: int, length: int):
+    """Resolve a Redis style inclusive range with negative indices; None if it is empty."""
+    if start < 0:
+        start = max(0, length + start)
+    if end < 0:
+        end = max(0, length + end)
+    end = min(end, length - 1)
+    if start > end:
+        return None
+    return start, end
+
 class BitMapDataType:
     """
     A class to represent a bitmap data type for an in-memory data store.
+    Bitmaps are plain strings: the commands work on the same mutable bytearray as APPEND and
+    SETRANGE (see KeyValueStore.get_buffer) and on BITFIELD values. Large, sparse bitmaps are
+    stored as a RoaringBitmap instead (see prefers_sparse); the bitmap commands work on it
+    directly and the string commands turn it back into a bytearray.
     Attributes:
     -----------
     db : object
@@ -15,46 +135,87 @@ class BitMapDataType:
         Counts the number of set bits (1s) in the string value stored at the given key, optionally within a specified range.
     bitop(operation: str, dest_key: str, *source_keys: str) -> int:
         Performs a bitwise operation (AND, OR, XOR, NOT) on the string values stored at the source keys and stores the result at the destination key.
+    bitpos(key: str, bit: int, start: int = None, end: int = None, unit: str = 'BYTE') -> int:
+        Finds the first bit set to 0 or 1 in the string value stored at the given key, optionally within a range.
     """
     def __init__(self, database):
         self.db = database
 
+    def _get_bitmap(self, key: str):
+        """Return the stored bitmap of key (the live bytearray or RoaringBitmap), or None if it does not exist."""
+        value = self.db.store.get(key)
+        if isinstance(value, RoaringBitmap) and self.db.exists(key):
+            return value
+        return self.db.get_buffer(key)
+
+    def _get_bytes(self, key: str):
+        """Return the stored bitmap of key, or an empty bytearray if it does not exist."""
+        bitmap = self._get_bitmap(key)
+        return bitmap if bitmap is not None else bytearray()
+
+    def _store(self, key: str, data):
+        """Replace the value at key with data, like SET does, without an AOF record."""
+        self.db.store[key] = data
+        self.db.expiry.pop(key, None)
+        self.db.field_expiry.pop(key, None)
+
+    def _fit(self, bitmap):
+        """Return bitmap in its better encoding: dense unless it is large and sparse."""
+        if isinstance(bitmap, RoaringBitmap):
+            return bitmap.to_bytearray() if bitmap.nbytes > len(bitmap) else bitmap
+        if len(bitmap) >= SPARSE_MIN_BYTES and prefers_sparse(popcount(bitmap), len(bitmap)):
+            return RoaringBitmap.from_bytes(bitmap)
+        return bitmap
+
     def setbit(self, key: str, offset: int, value: int) -> int:
-        """Set or clear a bit at offset in the string."""
-        if offset < 0:
-            raise ValueError("Offset cannot be negative")
+        """
+        Set or clear a bit at offset in the string. The stored bytearray is changed in place in O(1).
+        A bitmap that would grow to a large, mostly empty string (SETBIT key 4000000000 1)
+        is kept as a RoaringBitmap instead, and switches back once dense is smaller.
+        """
+        if offset < 0 or offset >= MAX_BIT_OFFSET:
+            raise ValueError("bit offset is not an integer or out of range")
         if value not in (0, 1):
             raise ValueError("Value must be 0 or 1")
 
-        current = self.db.get(key) or ""
+        bitmap = self._get_bitmap(key)
         byte_index = offset >> 3  # Divide by 8
-        bit_offset = offset & 7   # Modulo 8
-
-        # Extend string if needed
-        if byte_index >= len(current):
-            current = current.ljust(byte_index + 1, '\x00')
-
-        # Convert to bytes for manipulation
-        byte_array = bytearray(current.encode('latin1'))
-        byte = byte_array[byte_index]
-        
-        # Get old bit value
-        old_value = (byte >> (7 - bit_offset)) & 1
-        
-        # Set or clear bit
-        if value == 1:
-            byte |= 1 << (7 - bit_offset)
+        if bitmap is None:
+            if prefers_sparse(0, byte_index + 1):
+                bitmap = self.db.store[key] = RoaringBitmap()
+            else:
+                bitmap = self.db.get_buffer(key, create=True)
+        elif (isinstance(bitmap, bytearray) and byte_index >= 2 * len(bitmap) and
+              prefers_sparse(popcount(bitmap), byte_index + 1)):
+            # Only a growth to at least twice the size is checked, so the popcount is amortized
+            bitmap = self.db.store[key] = RoaringBitmap.from_bytes(bitmap)
+
+        if isinstance(bitmap, RoaringBitmap):
+            old_value = bitmap.set(offset, value)
+            if bitmap.nbytes > len(bitmap):
+                self.db.store[key] = bitmap.to_bytearray()
         else:
-            byte &= ~(1 << (7 - bit_offset))
-            
-        byte_array[byte_index] = byte
-        
-        # Store back as string
-        self.db.set(key, byte_array.decode('latin1'))
-        
+            old_value = self._setbit_dense(bitmap, byte_index, offset, value)
+
         if not self.db.replaying:
             self.db.persistence_manager.log_command(f"SETBIT {key} {offset} {value}")
-        
+
+        return old_value
+
+    def _setbit_dense(self, buffer: bytearray, byte_index: int, offset: int, value: int) -> int:
+        """Set or clear a bit of a dense bitmap in place; returns the previous bit."""
+        mask = 0x80 >> (offset & 7)  # Bit 0 is the most significant bit of the first byte
+
+        # Extend with zero bytes if needed
+        if byte_index >= len(buffer):
+            buffer.extend(bytes(byte_index + 1 - len(buffer)))
+
+        byte = buffer[byte_index]
+        old_value = 1 if byte & mask else 0
+        if value == 1:
+            buffer[byte_index] = byte | mask
+        else:
+            buffer[byte_index] = byte & ~mask
         return old_value
 
     def getbit(self, key: str, offset: int) -> int:
@@ -62,108 +223,128 @@ class BitMapDataType:
         if offset < 0:
             raise ValueError("Offset cannot be negative")
 
-        current = self.db.get(key) or ""
+        bitmap = self._get_bitmap(key)
+        if isinstance(bitmap, RoaringBitmap):
+            return bitmap.get(offset)
         byte_index = offset >> 3
-        bit_offset = offset & 7
-
-        if byte_index >= len(current):
+        if bitmap is None or byte_index >= len(bitmap):
             return 0
-
-        byte = ord(current[byte_index])
-        return (byte >> (7 - bit_offset)) & 1
+        return 1 if bitmap[byte_index] & (0x80 >> (offset & 7)) else 0
 
     def bitcount(self, key: str, start: int = None, end: int = None, unit: str = 'BYTE') -> int:
         """
         Count set bits in string.
         unit: 'BYTE' or 'BIT' - specifies whether start/end are byte or bit positions
+        Whole bytes are counted with popcount(); the partial bytes at the edges of a BIT
+        range are masked and counted with the POPCOUNT8 table.
         """
-        current = self.db.get(key) or ""
-        if not current:
+        data = self._get_bytes(key)
+        if not data:
             return 0
+        sparse = isinstance(data, RoaringBitmap)
+        if start is None or end is None:
+            return data.cardinality if sparse else popcount(data)
 
-        bytes_array = bytearray(current.encode('latin1'))
-        total_bits = len(bytes_array) * 8
-
-        if start is not None and end is not None:
-            if unit == 'BIT':
-                # Convert bit positions to byte positions
-                if start < 0:
-                    start = total_bits + start
-                if end < 0:
-                    end = total_bits + end
-                
-                start_byte = start >> 3  # Divide by 8
-                end_byte = (end + 7) >> 3  # Round up to include partial byte
-                
-                # Get the relevant bytes
-                bytes_array = bytes_array[max(0, start_byte):min(len(bytes_array), end_byte)]
-                
-                # Count only the bits in range
-                count = 0
-                for i, byte in enumerate(bytes_array):
-                    byte_start_bit = max(0, start - (start_byte + i) * 8) if i == 0 else 0
-                    byte_end_bit = min(8, end - (start_byte + i) * 8 + 1) if i == len(bytes_array) - 1 else 8
-                    
-                    # Create mask for partial byte
-                    mask = ((1 << (byte_end_bit - byte_start_bit)) - 1) << (8 - byte_end_bit)
-                    masked_byte = byte & mask
-                    count += bin(masked_byte).count('1')
-                return count
-            else:  # BYTE
-                if start < 0:
-                    start = len(bytes_array) + start
-                if end < 0:
-                    end = len(bytes_array) + end
-                bytes_array = bytes_array[max(0, start):min(len(bytes_array), end + 1)]
-
-        return sum(bin(byte).count('1') for byte in bytes_array)
+        bounds = normalize_range(start, end, len(data) * 8 if unit == 'BIT' else len(data))
+        if bounds is None:
+            return 0
+        start, end = bounds
+        if sparse:
+            return data.count(start, end) if unit == 'BIT' else data.count(start * 8, end * 8 + 7)
+        with memoryview(data) as view:
+            if unit != 'BIT':
+                return popcount(view[start:end + 1])
+
+            first, last = start >> 3, end >> 3
+            head_mask = 0xFF >> (start & 7)
+            tail_mask = (0xFF << (7 - (end & 7))) & 0xFF
+            if first == last:
+                return POPCOUNT8[view[first] & head_mask & tail_mask]
+            return (POPCOUNT8[view[first] & head_mask] + popcount(view[first + 1:last]) +
+                    POPCOUNT8[view[last] & tail_mask])
 
     def bitop(self, operation: str, dest_key: str, *source_keys: str) -> int:
-        """Perform bitwise operation on strings."""
+        """
+        Perform bitwise operation on strings. Works on 1 MB big-integer chunks (or NumPy
+        arrays when available) instead of byte by byte. Returns the length of the result.
+        AND, OR and XOR of sparse sources only visit their non-empty containers; otherwise
+        sparse sources are expanded. The result is stored in its better encoding.
+        """
         if not source_keys:
             raise ValueError("No source keys provided")
+        operation = operation.upper()
+        if operation not in ('AND', 'OR', 'XOR', 'NOT'):
+            raise ValueError("Invalid operation")
+        if operation == 'NOT' and len(source_keys) != 1:
+            raise ValueError("NOT operation requires exactly one source key")
 
-        # Get all source strings
-        sources = []
-        max_len = 0
-        for key in source_keys:
-            value = self.db.get(key) or ""
-            sources.append(bytearray(value.encode('latin1')))
-            max_len = max(max_len, len(sources[-1]))
-
-        # Pad all strings to max length
-        for i in range(len(sources)):
-            sources[i] = sources[i].ljust(max_len, b'\x00')
-
-        # Perform operation
-        result = bytearray(max_len)
-        if operation.upper() == "AND":
-            result = sources[0]
-            for s in sources[1:]:
-                for i in range(max_len):
-                    result[i] &= s[i]
-        elif operation.upper() == "OR":
-            for s in sources:
-                for i in range(max_len):
-                    result[i] |= s[i]
-        elif operation.upper() == "XOR":
-            result = sources[0]
-            for s in sources[1:]:
-                for i in range(max_len):
-                    result[i] ^= s[i]
-        elif operation.upper() == "NOT":
-            if len(source_keys) != 1:
-                raise ValueError("NOT operation requires exactly one source key")
-            for i in range(max_len):
-                result[i] = ~sources[0][i] & 0xFF
+        sources = [self._get_bytes(key) for key in source_keys]
+        length = max(len(source) for source in sources)
+        if length == 0:
+            # Like Redis, an empty result removes the destination
+            self.db.delete(dest_key)
+        elif operation != 'NOT' and all(isinstance(source, RoaringBitmap) or not source for source in sources):
+            bitmaps = [source if source else RoaringBitmap() for source in sources]
+            self._store(dest_key, self._fit(RoaringBitmap.combine(operation, bitmaps, length)))
         else:
-            raise ValueError("Invalid operation")
+            # Compute into a new buffer: dest_key may also be one of the sources
+            sources = [source.to_bytearray() if isinstance(source, RoaringBitmap) else source
+                       for source in sources]
+            self._store(dest_key, self._fit(bitwise(operation, sources, length)))
 
-        # Store result
-        self.db.set(dest_key, result.decode('latin1'))
-        
         if not self.db.replaying:
             cmd_args = ' '.join([operation, dest_key] + list(source_keys))
             self.db.persistence_manager.log_command(f"BITOP {cmd_args}")
-        
-        return max_len
+
+        return length
+
+    def bitpos(self, key: str, bit: int, start: int = None, end: int = None, unit: str = 'BYTE') -> int:
+        """
+        Return the position of the first bit set to bit (0 or 1) in the string, or -1.
+        Whole bytes are skipped with a C-level scan for the first byte that is not 0x00
+        (or 0xFF when looking for a 0). As in Redis, looking for a 0 without an explicit
+        end in a string of all ones returns the position right after the string.
+        """
+        if bit not in (0, 1):
+            raise ValueError("The bit argument must be 1 or 0.")
+        data = self._get_bytes(key)
+        if not data:
+            return -1 if bit else 0
+
+        end_given = end is not None
+        length = len(data) * 8 if unit == 'BIT' else len(data)
+        bounds = normalize_range(start or 0, end if end_given else length - 1, length)
+        if bounds is None:
+            return -1
+        start, end = bounds
+        if unit != 'BIT':
+            start, end = start * 8, end * 8 + 7
+
+        position = self._find_bit(data, bit, start, end)
+        if position == -1 and bit == 0 and not end_given:
+            return end + 1
+        return position
+
+    def _find_bit(self, data, bit: int, start: int, end: int) -> int:
+        """Return the first position in the bit range [start, end] holding bit, or -1."""
+        if isinstance(data, RoaringBitmap):
+            return data.next_set(start, end) if bit else data.next_clear(start, end)
+        first, last = start >> 3, end >> 3
+
+        def scan_byte(index, low, high):
+            byte = data[index]
+            for position in range(low, high + 1):
+                if (byte >> (7 - position)) & 1 == bit:
+                    return (index << 3) + position
+            return -1
+
+        if first == last:
+            return scan_byte(first, start & 7, end & 7)
+        position = scan_byte(first, start & 7, 7)
+        if position != -1:
+            return position
+        index = find_byte_not(data, 0x00 if bit else 0xFF, first + 1, last)
+        if index != -1:
+            byte = data[index] if bit else data[index] ^ 0xFF
+            return (index << 3) + 8 - byte.bit_length()
+        return scan_byte(last, 0, end & 7)
@@ -0,0 +1,218 @@
+"""
+Gorilla compression for time series chunks (Pelkonen et al., "Gorilla: A Fast, Scalable,
+In-Memory Time Series Database", VLDB 2015). Timestamps are written as delta-of-deltas and
+values as the XOR with the previous value, sample by sample, into one bit stream:
+
+    timestamp   '0'                       delta-of-delta is 0
+                '10'   + 7 bits           delta-of-delta in [-64, 63]
+                '110'  + 9 bits           delta-of-delta in [-256, 255]
+                '1110' + 12 bits          delta-of-delta in [-2048, 2047]
+                '1111' + 64 bits          anything else
+    value       '0'                       same value as the previous sample
+                '10'   + meaningful bits  XOR fits in the previous leading/trailing zero window
+                '11'   + 5 bits leading zeros + 6 bits length + meaningful bits
+
+The first value is stored as its 64 raw bits and the first timestamp in the chunk header.
+Regular per-second samples cost a bit for the timestamp; repeated or slowly changing values
+a few bits more.
+"""
+from array import array
+import struct
+from typing import List, Optional, Tuple
+
+_DOUBLE = struct.Struct('<d')
+MASK64 = (1 << 64) - 1
+
+
+class GorillaChunk:
+    """
+    A chunk of samples in increasing timestamp order, compressed while they are appended. Bits
+    are gathered in an int accumulator and flushed to data a byte at a time; seal() flushes the
+    rest and freezes the chunk.
+    """
+    __slots__ = ('data', 'count', 'first_ts', 'last_ts', 'last_value',
+                 '_pending', '_pending_bits', '_delta', '_value_bits', '_leading', '_trailing')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.count = 0
+        self.first_ts = 0
+        self.last_ts = 0
+        self.last_value = 0.0
+        self._pending = 0  # Bits not flushed to data yet
+        self._pending_bits = 0
+        self._delta = 0
+        self._value_bits = 0
+        self._leading = 65  # No XOR window yet
+        self._trailing = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the compressed samples."""
+        return len(self.data) + (self._pending_bits + 7) // 8
+
+    def append(self, timestamp: int, value: float):
+        """Append a sample; its timestamp must be greater than the last one."""
+        bits = int.from_bytes(_DOUBLE.pack(value), 'little')
+        pending, length = self._pending, self._pending_bits
+        if not self.count:
+            self.first_ts = timestamp
+            pending = (pending << 64) | bits
+            length += 64
+        else:
+            delta = timestamp - self.last_ts
+            dod = delta - self._delta
+            self._delta = delta
+            if not dod:
+                pending <<= 1
+                length += 1
+            elif -64 <= dod < 64:
+                pending = (pending << 9) | 0x100 | (dod & 0x7F)
+                length += 9
+            elif -256 <= dod < 256:
+                pending = (pending << 12) | 0xC00 | (dod & 0x1FF)
+                length += 12
+            elif -2048 <= dod < 2048:
+                pending = (pending << 16) | 0xE000 | (dod & 0xFFF)
+                length += 16
+            else:
+                pending = (pending << 68) | (0xF << 64) | (dod & MASK64)
+                length += 68
+
+            xor = bits ^ self._value_bits
+            if not xor:
+                pending <<= 1
+                length += 1
+            else:
+                leading = 64 - xor.bit_length()
+                if leading > 31:
+                    leading = 31
+                trailing = (xor & -xor).bit_length() - 1
+                if leading >= self._leading and trailing >= self._trailing:
+                    meaningful = 64 - self._leading - self._trailing
+                    pending = (pending << (2 + meaningful)) | (0b10 << meaningful) | (xor >> self._trailing)
+                    length += 2 + meaningful
+                else:
+                    meaningful = 64 - leading - trailing
+                    header = (0b11 << 11) | (leading << 6) | (meaningful & 63)
+                    pending = (pending << (13 + meaningful)) | (header << meaningful) | (xor >> trailing)
+                    length += 13 + meaningful
+                    self._leading, self._trailing = leading, trailing
+        if length >= 64:
+            keep = length & 7
+            self.data += (pending >> keep).to_bytes((length - keep) >> 3, 'big')
+            pending &= (1 << keep) - 1
+            length = keep
+        self._pending, self._pending_bits = pending, length
+        self._value_bits = bits
+        self.last_ts = timestamp
+        self.last_value = value
+        self.count += 1
+
+    def seal(self):
+        """Flush the pending bits, zero-padded to a byte, and store the data as immutable bytes."""
+        if self._pending_bits:
+            padding = -self._pending_bits & 7
+            self.data += (self._pending << padding).to_bytes((self._pending_bits + padding) >> 3, 'big')
+            self._pending = self._pending_bits = 0
+        self.data = bytes(self.data)
+
+    def decode(self, until: Optional[int] = None) -> Tuple[array, array]:
+        """Timestamps and values of the chunk, stopping after the samples up to until if given."""
+        timestamps = array('q')
+        bits = array('Q')
+        count = self.count
+        if not count:
+            return timestamps, array('d')
+        if until is None:
+            until = self.last_ts
+        stream = bytes(self.data)
+        if self._pending_bits:
+            padding = -self._pending_bits & 7
+            stream += (self._pending << padding).to_bytes((self._pending_bits + padding) >> 3, 'big')
+        stream += bytes(24)  # Refills may read past the last sample
+
+        value_bits = int.from_bytes(stream[:8], 'big')
+        # Bit reader: `window` holds `available` bits not consumed yet, refilled 64 bits at a time
+        position = 8
+        window = 0
+        available = 0
+        timestamp = self.first_ts
+        delta = 0
+        leading = trailing = 0
+        timestamps.append(timestamp)
+        bits.append(value_bits)
+        for _ in range(count - 1):
+            while available < 16:
+                window = (window << 64) | int.from_bytes(stream[position:position + 8], 'big')
+                position += 8
+                available += 64
+            # Delta-of-delta
+            if not (window >> (available - 1)) & 1:
+                available -= 1
+            else:
+                prefix = (window >> (available - 4)) & 0xF
+                # Sign extension is inlined: this is the hot loop for jittery timestamps
+                if prefix < 0b1100:
+                    dod = (window >> (available - 9)) & 0x7F
+                    delta += dod - 0x80 if dod & 0x40 else dod
+                    available -= 9
+                elif prefix < 0b1110:
+                    dod = (window >> (available - 12)) & 0x1FF
+                    delta += dod - 0x200 if dod & 0x100 else dod
+                    available -= 12
+                elif prefix == 0b1110:
+                    dod = (window >> (available - 16)) & 0xFFF
+                    delta += dod - 0x1000 if dod & 0x800 else dod
+                    available -= 16
+                else:
+                    available -= 4
+                    if available < 64:
+                        window = (window << 64) | int.from_bytes(stream[position:position + 8], 'big')
+                        position += 8
+                        available += 64
+                    dod = (window >> (available - 64)) & MASK64
+                    delta += dod - (1 << 64) if dod >> 63 else dod
+                    available -= 64
+                window &= (1 << available) - 1
+            timestamp += delta
+            if timestamp > until:
+                break
+            timestamps.append(timestamp)
+
+            # Value
+            while available < 77:
+                window = (window << 64) | int.from_bytes(stream[position:position + 8], 'big')
+                position += 8
+                available += 64
+            if not (window >> (available - 1)) & 1:
+                available -= 1
+            else:
+                if (window >> (available - 2)) & 1:
+                    header = (window >> (available - 13)) & 0x7FF
+                    leading = header >> 6
+                    meaningful = (header & 63) or 64
+                    trailing = 64 - leading - meaningful
+                    available -= 13
+                else:
+                    meaningful = 64 - leading - trailing
+                    available -= 2
+                value_bits ^= ((window >> (available - meaningful)) & ((1 << meaningful) - 1)) << trailing
+                available -= meaningful
+            window &= (1 << available) - 1
+            bits.append(value_bits)
+
+        values = array('d')
+        values.frombytes(bits.tobytes())
+        return timestamps, values
+
+
+def encode_chunks(timestamps: array, values: array, chunk_size: int) -> List[GorillaChunk]:
+    """Compress sorted samples into chunks of about chunk_size bytes; all but the last one are sealed."""
+    chunks = [GorillaChunk()]
+    for timestamp, value in zip(timestamps, values):
+        if chunks[-1].nbytes >= chunk_size:
+            chunks[-1].seal()
+            chunks.append(GorillaChunk())
+        chunks[-1].append(timestamp, value)
+    return chunks
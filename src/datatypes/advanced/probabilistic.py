@@ -1,14 +1,51 @@
+from array import array
+from bisect import bisect_left
 import math
+from operator import add as add_counters
+import random
 import mmh3  # MurmurHash3 for better hash distribution
-from typing import List
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; HyperLogLog falls back to bytes operations without it
+    np = None
+
+# A HyperLogLog stays sparse up to this many non-zero registers (about 3 KB, Redis' hll-sparse-max-bytes)
+HLL_SPARSE_MAX_ENTRIES = 750
+
+# 2^-value for every possible register value (at most 64 - p + 1)
+HLL_INV_POW2 = [2.0 ** -value for value in range(66)]
+
 
 class HyperLogLog:
+    """
+    HyperLogLog with 2^p registers and a 64-bit hash. Small HLLs are sparse: a sorted
+    array of (index << 8 | value) entries for the non-zero registers only, promoted to a
+    dense bytearray once it has more than HLL_SPARSE_MAX_ENTRIES entries. The estimate
+    is cached until a register changes.
+    """
+    __slots__ = ('p', 'm', 'alpha', 'registers', 'sparse', '_cardinality')
+
     def __init__(self, precision: int = 14):
         """Initialize HLL with given precision (p)."""
         self.p = precision
         self.m = 1 << precision  # Number of registers
-        self.registers = bytearray(self.m)
+        self.registers = None  # Dense registers, once promoted
+        self.sparse = array('I')
         self.alpha = self._get_alpha(self.m)
+        self._cardinality = None
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = state[1]  # (None, slot values) as pickled for __slots__
+        if 'sparse' not in state:
+            # Snapshots taken before the sparse encoding pickle a __dict__ with dense registers,
+            # filled by the old 32-bit hash; they are kept so the restored count stays right
+            state = dict(state, registers=bytearray(state['registers']), sparse=None)
+        state.setdefault('_cardinality', None)
+        for name in self.__slots__:
+            setattr(self, name, state[name])
 
     def _get_alpha(self, m: int) -> float:
         """Get alpha constant based on number of registers."""
@@ -20,68 +57,791 @@ class HyperLogLog:
             return 0.709
         return 0.7213 / (1 + 1.079 / m)
 
+    def _promote(self):
+        """Switch to dense registers."""
+        registers = bytearray(self.m)
+        for entry in self.sparse:
+            registers[entry >> 8] = entry & 0xFF
+        self.registers = registers
+        self.sparse = None
+
     def add(self, item: str) -> bool:
         """Add an item to the HLL."""
-        x = mmh3.hash(item, 42)  # Use seed 42
+        x = mmh3.hash128(item, 42, False) & 0xFFFFFFFFFFFFFFFF  # Use seed 42, 64 bits
         j = x & (self.m - 1)  # Register index
-        w = x >> self.p  # Remaining bits
-        rho = min(self.p, (w | 1).bit_length())  # Count leading zeros + 1
-        if self.registers[j] < rho:
+        # Leading zeros of the remaining 64 - p bits, plus one
+        rho = 65 - self.p - (x >> self.p).bit_length()
+        if self.sparse is None:
+            if self.registers[j] >= rho:
+                return False
             self.registers[j] = rho
-            return True
-        return False
+        else:
+            entries = self.sparse
+            key = j << 8
+            i = bisect_left(entries, key)
+            if i < len(entries) and entries[i] >> 8 == j:
+                if entries[i] & 0xFF >= rho:
+                    return False
+                entries[i] = key | rho
+            else:
+                entries.insert(i, key | rho)
+                if len(entries) > HLL_SPARSE_MAX_ENTRIES:
+                    self._promote()
+        self._cardinality = None
+        return True
+
+    def _histogram(self) -> List[int]:
+        """Number of registers holding each value."""
+        if self.sparse is not None:
+            histogram = [0] * len(HLL_INV_POW2)
+            for entry in self.sparse:
+                histogram[entry & 0xFF] += 1
+            histogram[0] = self.m - len(self.sparse)
+            return histogram
+        if np is not None:
+            return np.bincount(np.frombuffer(self.registers, dtype=np.uint8), minlength=len(HLL_INV_POW2)).tolist()
+        # One C-level count() per possible value instead of a Python loop over the registers
+        return [self.registers.count(value) for value in range(len(HLL_INV_POW2))]
 
     def count(self) -> int:
-        """Estimate cardinality."""
-        sum_inv = 0
-        zeros = 0
-        for val in self.registers:
-            sum_inv += 2.0 ** -val
-            if val == 0:
-                zeros += 1
+        """Estimate cardinality; cached until a register changes."""
+        if self._cardinality is not None:
+            return self._cardinality
+        histogram = self._histogram()
+        sum_inv = sum(count * HLL_INV_POW2[value] for value, count in enumerate(histogram) if count)
+        zeros = histogram[0]
 
         estimate = (self.alpha * self.m ** 2) / sum_inv
 
-        # Apply corrections
-        if estimate <= 2.5 * self.m:  # Small range correction
-            if zeros > 0:
-                estimate = self.m * math.log(self.m / zeros)
-        elif estimate > 2**32 / 30:  # Large range correction
-            estimate = -2**32 * math.log(1 - estimate / 2**32)
+        # Small range correction (linear counting); a 64-bit hash needs no large range correction
+        if estimate <= 2.5 * self.m and zeros > 0:
+            estimate = self.m * math.log(self.m / zeros)
 
-        return int(estimate)
+        self._cardinality = int(estimate)
+        return self._cardinality
 
     def merge(self, other: 'HyperLogLog') -> bool:
-        """Merge another HLL into this one."""
+        """Merge another HLL into this one (register-wise maximum)."""
         if self.p != other.p:
             return False
-        for i in range(self.m):
-            self.registers[i] = max(self.registers[i], other.registers[i])
+        if other.sparse is not None:
+            if self.sparse is not None:
+                merged = {}
+                for entry in self.sparse:
+                    merged[entry >> 8] = entry & 0xFF
+                for entry in other.sparse:
+                    index, value = entry >> 8, entry & 0xFF
+                    if merged.get(index, 0) < value:
+                        merged[index] = value
+                self.sparse = array('I', sorted((index << 8) | value for index, value in merged.items()))
+                if len(self.sparse) > HLL_SPARSE_MAX_ENTRIES:
+                    self._promote()
+            else:
+                registers = self.registers
+                for entry in other.sparse:
+                    index, value = entry >> 8, entry & 0xFF
+                    if registers[index] < value:
+                        registers[index] = value
+        else:
+            if self.sparse is not None:
+                self._promote()
+            if np is not None:
+                merged = np.maximum(np.frombuffer(self.registers, dtype=np.uint8),
+                                    np.frombuffer(other.registers, dtype=np.uint8))
+                self.registers = bytearray(merged.tobytes())
+            else:
+                self.registers = bytearray(map(max, self.registers, other.registers))
+        self._cardinality = None
         return True
 
+# Bloom filter blocks are one 64-byte cache line: all bits of an item live in one block
+BLOOM_BLOCK_BITS = 512
+BLOOM_BLOCK_BYTES = BLOOM_BLOCK_BITS // 8
+
+# BF.ADD on a missing key creates a filter with the Redis defaults
+BLOOM_DEFAULT_ERROR_RATE = 0.01
+BLOOM_DEFAULT_CAPACITY = 100
+BLOOM_DEFAULT_EXPANSION = 2
+
+# Every sub-filter added on growth gets a tighter error rate, so the sum stays bounded
+BLOOM_TIGHTENING_RATIO = 0.5
+
+BLOCK_MASK = BLOOM_BLOCK_BITS - 1
+# (byte offset, bit mask) of every bit position inside a block
+_BIT_SLOTS = [(pos >> 3, 1 << (pos & 7)) for pos in range(BLOOM_BLOCK_BITS)]
+_MIX_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# CF.ADD on a missing key creates a filter with the RedisBloom defaults
+CUCKOO_DEFAULT_CAPACITY = 1024
+CUCKOO_DEFAULT_BUCKET_SIZE = 2
+CUCKOO_DEFAULT_MAX_ITERATIONS = 20
+CUCKOO_DEFAULT_EXPANSION = 1
+CUCKOO_MAX_FILTERS = 32
+# Scrambles a fingerprint into the offset between the two buckets of an item
+_FINGERPRINT_MULTIPLIER = 0x5BD1E995
+
+# Count-Min Sketch counters are unsigned 64-bit
+CMS_MAX_COUNT = (1 << 64) - 1
+
+# TOPK.RESERVE defaults; the width defaults to k * ln(k) buckets per row, at least TOPK_MIN_WIDTH
+TOPK_MIN_WIDTH = 8
+TOPK_DEFAULT_DEPTH = 7
+TOPK_DEFAULT_DECAY = 0.9
+
+# TDIGEST.CREATE default compression; unmerged values are buffered up to TDIGEST_BUFFER_FACTOR * compression
+TDIGEST_DEFAULT_COMPRESSION = 100
+TDIGEST_BUFFER_FACTOR = 5
+
+
+def bloom_hash(item: str) -> int:
+    """The single 128-bit MurmurHash3 an item is hashed with, shared by all sub-filters."""
+    return mmh3.hash128(item, 0, False)
+
+
 class BloomFilter:
-    def __init__(self, size: int = 1000, num_hashes: int = 4):
-        """Initialize Bloom filter with given size and hash functions."""
-        self.size = size
-        self.num_hashes = num_hashes
-        self.bits = bytearray(size)
+    """
+    Fixed-capacity, bit-packed blocked Bloom filter sized from capacity and error_rate.
+    The low 32 bits of the item hash pick a 512-bit block and the remaining bits, taken 9 at
+    a time, give the num_hashes bit positions inside that block. A lookup therefore touches
+    one cache line and needs one hash call however many bits it tests.
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        bits_per_item, self.num_hashes = self._bits_per_item(error_rate)
+        self.num_blocks = max(1, math.ceil(capacity * bits_per_item / BLOOM_BLOCK_BITS))
+        self.size = self.num_blocks * BLOOM_BLOCK_BITS
+        self.bits = bytearray(self.num_blocks * BLOOM_BLOCK_BYTES)
+        self._shifts = [9 * i for i in range(self.num_hashes)]
+        self._extensions = math.ceil(max(0, 9 * self.num_hashes - 96) / 96)
 
-    def _get_hash_values(self, item: str) -> List[int]:
-        """Get hash values for item using different seeds."""
-        return [mmh3.hash(item, seed) % self.size for seed in range(self.num_hashes)]
+    @staticmethod
+    def _blocked_error_rate(bits_per_item: float, num_hashes: int) -> float:
+        """False positive rate of a blocked filter: the items per block follow a Poisson law."""
+        per_block = BLOOM_BLOCK_BITS / bits_per_item
+        miss = 1 - 1 / BLOOM_BLOCK_BITS
+        term = math.exp(-per_block)
+        rate = 0.0
+        for items in range(int(per_block + 12 * math.sqrt(per_block) + 12)):
+            if items:
+                term *= per_block / items
+            rate += term * (1 - miss ** (num_hashes * items)) ** num_hashes
+        return rate
 
-    def add(self, item: str) -> bool:
-        """Add an item to the Bloom filter."""
+    @classmethod
+    def _bits_per_item(cls, error_rate: float):
+        """
+        Start from the classic -ln(p) / ln(2)^2 bits per item and ln(2) * bits hash functions,
+        then add bits until the blocked filter, which fills its blocks unevenly, reaches error_rate.
+        """
+        bits_per_item = -math.log(error_rate) / math.log(2) ** 2
+        num_hashes = max(1, math.ceil(math.log(2) * bits_per_item))
+        while cls._blocked_error_rate(bits_per_item, num_hashes) > error_rate:
+            bits_per_item *= 1.02
+        return bits_per_item, num_hashes
+
+    def _block(self, hash_value: int):
+        """Byte offset of the block of an item hash, and the bits that pick positions in it."""
+        base = ((hash_value & 0xFFFFFFFF) * self.num_blocks >> 32) * BLOOM_BLOCK_BYTES
+        # The other 96 bits give 9-bit offsets inside the block; stretch them if that is too few
+        stream = hash_value >> 32
+        for _ in range(self._extensions):
+            stream |= ((stream * _MIX_MULTIPLIER) >> 64) << stream.bit_length()
+        return base, stream
+
+    def add_hash(self, hash_value: int) -> bool:
+        """Set the bits of an item hash. Returns True if any bit changed."""
+        base, stream = self._block(hash_value)
+        bits = self.bits
         changed = False
-        for pos in self._get_hash_values(item):
-            if not self.bits[pos]:
-                self.bits[pos] = 1
+        for shift in self._shifts:
+            offset, mask = _BIT_SLOTS[(stream >> shift) & BLOCK_MASK]
+            byte = bits[base + offset]
+            if not byte & mask:
+                bits[base + offset] = byte | mask
                 changed = True
         return changed
 
+    def contains_hash(self, hash_value: int) -> bool:
+        """Check the bits of an item hash."""
+        base, stream = self._block(hash_value)
+        bits = self.bits
+        for shift in self._shifts:
+            offset, mask = _BIT_SLOTS[(stream >> shift) & BLOCK_MASK]
+            if not bits[base + offset] & mask:
+                return False
+        return True
+
+    def add(self, item: str) -> bool:
+        """Add an item to the Bloom filter."""
+        changed = self.add_hash(bloom_hash(item))
+        if changed:
+            self.count += 1
+        return changed
+
     def contains(self, item: str) -> bool:
         """Check if item might be in the set."""
-        return all(self.bits[pos] for pos in self._get_hash_values(item))
+        return self.contains_hash(bloom_hash(item))
+
+class ScalableBloomFilter:
+    """
+    Bloom filter made of BloomFilter sub-filters. When the newest one is full, a sub-filter
+    expansion times larger, with a tighter error rate, is added (unless it is non-scaling).
+    Items are hashed once and the hash is tested against every sub-filter.
+    A filter restored from a snapshot taken before the blocked layout keeps the old one-byte-per-bit
+    filter as legacy: it is still checked with its own hash functions, and new items go to the
+    sub-filters.
+    """
+    legacy = None
+
+    def __init__(self, error_rate: float = BLOOM_DEFAULT_ERROR_RATE, capacity: int = BLOOM_DEFAULT_CAPACITY,
+                 expansion: int = BLOOM_DEFAULT_EXPANSION, scaling: bool = True):
+        self.expansion = expansion
+        self.scaling = scaling
+        self.filters = [BloomFilter(capacity, error_rate)]
+
+    @property
+    def capacity(self) -> int:
+        return sum(bloom.capacity for bloom in self.filters)
+
+    @property
+    def count(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def size(self) -> int:
+        """Memory used by the bit arrays, in bytes."""
+        size = sum(len(bloom.bits) for bloom in self.filters)
+        return size + len(self.legacy.bits) if self.legacy is not None else size
+
+    @classmethod
+    def from_legacy(cls, legacy: BloomFilter) -> 'ScalableBloomFilter':
+        """Wrap a BloomFilter pickled before the blocked layout (size, num_hashes and one byte per bit)."""
+        bf = cls()
+        bf.legacy = legacy
+        return bf
+
+    def _in_legacy(self, item: str) -> bool:
+        """Check item against the legacy filter, with the hash functions it was built with."""
+        legacy = self.legacy
+        return legacy is not None and all(
+            legacy.bits[mmh3.hash(item, seed) % legacy.size] for seed in range(legacy.num_hashes))
+
+    def add(self, item: str) -> bool:
+        """Add an item. Returns False if it (probably) was already present."""
+        if self._in_legacy(item):
+            return False
+        hash_value = bloom_hash(item)
+        *older, current = self.filters
+        for bloom in older:
+            if bloom.contains_hash(hash_value):
+                return False
+        if current.count < current.capacity:
+            # Setting no new bit means the item was (probably) present already
+            if not current.add_hash(hash_value):
+                return False
+        else:
+            if current.contains_hash(hash_value):
+                return False
+            if not self.scaling:
+                raise ValueError("non scaling filter is full")
+            current = BloomFilter(current.capacity * self.expansion, current.error_rate * BLOOM_TIGHTENING_RATIO)
+            self.filters.append(current)
+            current.add_hash(hash_value)
+        current.count += 1
+        return True
+
+    def contains(self, item: str) -> bool:
+        """Check if item might be in the set."""
+        if self._in_legacy(item):
+            return True
+        hash_value = bloom_hash(item)
+        return any(bloom.contains_hash(hash_value) for bloom in reversed(self.filters))
+
+class CuckooFilter:
+    """
+    Cuckoo filter of 8-bit fingerprints kept in a bytearray, bucket_size slots per bucket (0 marks
+    an empty slot). An item lives in bucket i1 = hash & mask or in i2 = i1 ^ scramble(fingerprint).
+    Since either bucket can be computed from the other and the fingerprint, fingerprints can be
+    relocated and deleted without the original item.
+    """
+    def __init__(self, num_buckets: int, bucket_size: int):
+        self.num_buckets = num_buckets  # A power of two
+        self.bucket_size = bucket_size
+        self.mask = num_buckets - 1
+        self.slots = bytearray(num_buckets * bucket_size)
+        self.count = 0
+
+    def _alternate(self, index: int, fingerprint: int) -> int:
+        return (index ^ (fingerprint * _FINGERPRINT_MULTIPLIER)) & self.mask
+
+    def locate(self, hash_value: int) -> Tuple[int, int, int]:
+        """Fingerprint (1-255) and the two candidate buckets of an item hash."""
+        fingerprint = (hash_value >> 64) % 255 + 1
+        index = hash_value & self.mask
+        return fingerprint, index, self._alternate(index, fingerprint)
+
+    def insert(self, fingerprint: int, i1: int, i2: int, max_iterations: int) -> bool:
+        """
+        Store a fingerprint in a free slot of i1 or i2, relocating up to max_iterations other
+        fingerprints to their alternate bucket if both are full. Returns False, with every
+        relocation undone, if no room was found.
+        """
+        slots = self.slots
+        size = self.bucket_size
+        for index in (i1, i2):
+            free = slots.find(0, index * size, index * size + size)
+            if free >= 0:
+                slots[free] = fingerprint
+                self.count += 1
+                return True
+
+        path = []
+        index = random.choice((i1, i2))
+        for _ in range(max_iterations):
+            slot = index * size + random.randrange(size)
+            path.append(slot)
+            fingerprint, slots[slot] = slots[slot], fingerprint
+            index = self._alternate(index, fingerprint)
+            free = slots.find(0, index * size, index * size + size)
+            if free >= 0:
+                slots[free] = fingerprint
+                self.count += 1
+                return True
+        for slot in reversed(path):
+            fingerprint, slots[slot] = slots[slot], fingerprint
+        return False
+
+    def find(self, fingerprint: int, i1: int, i2: int) -> int:
+        """Slot holding the fingerprint, or -1."""
+        size = self.bucket_size
+        slot = self.slots.find(fingerprint, i1 * size, i1 * size + size)
+        if slot < 0:
+            slot = self.slots.find(fingerprint, i2 * size, i2 * size + size)
+        return slot
+
+    def occurrences(self, fingerprint: int, i1: int, i2: int) -> int:
+        """Number of copies of the fingerprint in both buckets."""
+        size = self.bucket_size
+        found = self.slots.count(fingerprint, i1 * size, i1 * size + size)
+        if i2 != i1:
+            found += self.slots.count(fingerprint, i2 * size, i2 * size + size)
+        return found
+
+class ScalableCuckooFilter:
+    """
+    Cuckoo filter made of CuckooFilter sub-filters. Items go to a free slot of any sub-filter, then
+    to the newest one with relocations, and when that fails a sub-filter expansion times larger is
+    added. Items are hashed once and may be added several times; CF.DEL removes one copy.
+    """
+    def __init__(self, capacity: int = CUCKOO_DEFAULT_CAPACITY, bucket_size: int = CUCKOO_DEFAULT_BUCKET_SIZE,
+                 max_iterations: int = CUCKOO_DEFAULT_MAX_ITERATIONS, expansion: int = CUCKOO_DEFAULT_EXPANSION):
+        self.bucket_size = bucket_size
+        self.max_iterations = max_iterations
+        # Sub-filters keep a power-of-two bucket count, so the expansion is rounded up to one
+        self.expansion = 1 << max(0, expansion - 1).bit_length()
+        num_buckets = 1 << max(0, math.ceil(capacity / bucket_size) - 1).bit_length()
+        self.filters = [CuckooFilter(num_buckets, bucket_size)]
+
+    @property
+    def count(self) -> int:
+        return sum(cuckoo.count for cuckoo in self.filters)
+
+    @property
+    def size(self) -> int:
+        """Memory used by the fingerprint slots, in bytes."""
+        return sum(len(cuckoo.slots) for cuckoo in self.filters)
+
+    def add(self, item: str):
+        """Add an item (again, if already present). Raises ValueError if the filter cannot grow."""
+        hash_value = bloom_hash(item)
+        for cuckoo in self.filters:
+            if cuckoo.insert(*cuckoo.locate(hash_value), 0):
+                return
+        current = self.filters[-1]
+        if current.insert(*current.locate(hash_value), self.max_iterations):
+            return
+        if len(self.filters) >= CUCKOO_MAX_FILTERS:
+            raise ValueError("filter is full")
+        current = CuckooFilter(current.num_buckets * self.expansion, self.bucket_size)
+        self.filters.append(current)
+        current.insert(*current.locate(hash_value), self.max_iterations)
+
+    def contains(self, item: str) -> bool:
+        """Check if item might be in the filter."""
+        hash_value = bloom_hash(item)
+        return any(cuckoo.find(*cuckoo.locate(hash_value)) >= 0 for cuckoo in reversed(self.filters))
+
+    def delete(self, item: str) -> bool:
+        """Remove one copy of an item, starting from the newest sub-filter. Returns False if it was not found."""
+        hash_value = bloom_hash(item)
+        for cuckoo in reversed(self.filters):
+            slot = cuckoo.find(*cuckoo.locate(hash_value))
+            if slot >= 0:
+                cuckoo.slots[slot] = 0
+                cuckoo.count -= 1
+                return True
+        return False
+
+    def occurrences(self, item: str) -> int:
+        """Approximate number of times the item was added (fingerprints can collide)."""
+        hash_value = bloom_hash(item)
+        return sum(cuckoo.occurrences(*cuckoo.locate(hash_value)) for cuckoo in self.filters)
+
+class CountMinSketch:
+    """
+    Count-Min Sketch: depth rows of width unsigned 64-bit counters in a single array('Q'). An item
+    owns one counter per row, at (h1 + row * h2) % width for the two halves of one 128-bit hash, and
+    its estimate is the minimum of those counters: never below the true count, and with probability
+    1 - delta at most 2 / width of the total count above it.
+    """
+    def __init__(self, width: int, depth: int):
+        self.width = width
+        self.depth = depth
+        self.count = 0  # Total of all increments
+        self.counters = array('Q', bytes(8 * width * depth))
+
+    @staticmethod
+    def dimensions(error: float, probability: float) -> Tuple[int, int]:
+        """Width and depth for an overestimate of at most error * count with the given probability of failure."""
+        return math.ceil(2 / error), max(1, math.ceil(math.log(probability) / math.log(0.5)))
+
+    def _positions(self, item: str) -> List[int]:
+        hash_value = mmh3.hash128(item, 0, False)
+        h1 = hash_value & 0xFFFFFFFFFFFFFFFF
+        h2 = (hash_value >> 64) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def incrby(self, item: str, increment: int) -> int:
+        """Add increment to the counters of item. Returns the new estimate."""
+        counters = self.counters
+        positions = self._positions(item)
+        values = [counters[pos] for pos in positions]
+        if max(values) + increment > CMS_MAX_COUNT:
+            raise ValueError("CMS counter overflow")
+        for pos, value in zip(positions, values):
+            counters[pos] = value + increment
+        self.count += increment
+        return min(values) + increment
+
+    def query(self, item: str) -> int:
+        """Estimated count of item."""
+        counters = self.counters
+        return min(counters[pos] for pos in self._positions(item))
+
+    def merge(self, sketches: List['CountMinSketch'], weights: List[int]):
+        """Replace the counters with the weighted sum of the counters of sketches."""
+        if any(sketch.width != self.width or sketch.depth != self.depth for sketch in sketches):
+            raise ValueError("width/depth is not equal")
+        totals = [0] * len(self.counters)
+        for sketch, weight in zip(sketches, weights):
+            if weight == 1:
+                totals = list(map(add_counters, totals, sketch.counters))
+            else:
+                totals = [total + weight * value for total, value in zip(totals, sketch.counters)]
+        try:
+            self.counters = array('Q', totals)
+        except OverflowError:
+            raise ValueError("CMS counter overflow")
+        self.count = sum(weight * sketch.count for sketch, weight in zip(sketches, weights))
+
+class TopK:
+    """
+    Top-k heavy hitters: a HeavyKeeper sketch of depth rows of width (fingerprint, count) buckets,
+    kept in an array('I') and an array('Q'), plus a min-heap of the k items with the largest
+    estimated counts. An item increments its matching (or empty) bucket in every row and decays
+    a bucket of another item with probability decay^count, taking it over when it reaches 0, so
+    only large counts survive. The heap is indexed by item, so an update costs O(log k).
+    """
+    def __init__(self, k: int, width: int = None, depth: int = TOPK_DEFAULT_DEPTH, decay: float = TOPK_DEFAULT_DECAY):
+        self.k = k
+        self.width = width or max(TOPK_MIN_WIDTH, k * math.ceil(math.log(k)))
+        self.depth = depth
+        self.decay = decay
+        self.fingerprints = array('I', bytes(4 * self.width * depth))
+        self.counts = array('Q', bytes(8 * self.width * depth))
+        self.heap = []  # [count, item] entries
+        self.index = {}  # item -> position in heap
+        # Seeded per sketch so replaying the AOF rebuilds the same buckets
+        self._random = random.Random(0)
+
+    @staticmethod
+    def hash(item: str) -> int:
+        return mmh3.hash128(item, 0, False)
+
+    def _positions(self, hash_value: int):
+        h1 = hash_value & 0xFFFFFFFFFFFFFFFF
+        h2 = (hash_value >> 64) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def estimate(self, hash_value: int) -> int:
+        """Largest count among the buckets holding the fingerprint of an item hash."""
+        fingerprint = hash_value >> 96
+        fingerprints, counts = self.fingerprints, self.counts
+        return max([counts[pos] for pos in self._positions(hash_value) if fingerprints[pos] == fingerprint], default=0)
+
+    def incrby_hash(self, item: str, hash_value: int, increment: int):
+        """Add increment to an item with a precomputed hash. Returns the item expelled from the top-k, or None."""
+        fingerprint = hash_value >> 96
+        fingerprints, counts = self.fingerprints, self.counts
+        decay = self.decay
+        random_value = self._random.random
+        max_count = 0
+        for pos in self._positions(hash_value):
+            count = counts[pos]
+            if not count:
+                fingerprints[pos] = fingerprint
+                count = increment
+            elif fingerprints[pos] == fingerprint:
+                count += increment
+            else:
+                # Each unit of increment decays the count with probability decay^count; draw the
+                # number of units up to the next decay instead of flipping a coin per unit
+                remaining = increment
+                while True:
+                    probability = decay ** count
+                    if not probability:
+                        break
+                    draws = math.log(1.0 - random_value()) / math.log1p(-probability)
+                    if draws >= remaining:
+                        break
+                    units = int(draws) + 1
+                    count -= 1
+                    if not count:
+                        fingerprints[pos] = fingerprint
+                        count = remaining - units + 1
+                        break
+                    remaining -= units
+                if fingerprints[pos] != fingerprint:
+                    counts[pos] = count
+                    continue
+            counts[pos] = count
+            if count > max_count:
+                max_count = count
+        return self._update_heap(item, max_count)
+
+    def _update_heap(self, item: str, count: int):
+        heap = self.heap
+        position = self.index.get(item)
+        if position is not None:
+            heap[position][0] = count
+            self._sift_down(self._sift_up(position))
+            return None
+        if len(heap) < self.k:
+            if count:
+                heap.append([count, item])
+                self.index[item] = len(heap) - 1
+                self._sift_up(len(heap) - 1)
+            return None
+        # A newcomer has to beat the smallest count, so items with equal counts do not churn
+        if count <= heap[0][0]:
+            return None
+        expelled = heap[0][1]
+        del self.index[expelled]
+        heap[0] = [count, item]
+        self.index[item] = 0
+        self._sift_down(0)
+        return expelled
+
+    def _sift_up(self, position: int) -> int:
+        heap, index = self.heap, self.index
+        entry = heap[position]
+        while position:
+            parent = (position - 1) >> 1
+            if heap[parent][0] <= entry[0]:
+                break
+            heap[position] = heap[parent]
+            index[heap[position][1]] = position
+            position = parent
+        heap[position] = entry
+        index[entry[1]] = position
+        return position
+
+    def _sift_down(self, position: int) -> int:
+        heap, index = self.heap, self.index
+        size = len(heap)
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if heap[child][0] >= entry[0]:
+                break
+            heap[position] = heap[child]
+            index[heap[position][1]] = position
+            position = child
+        heap[position] = entry
+        index[entry[1]] = position
+        return position
+
+    def incrby(self, increments: List[Tuple[str, int]]) -> list:
+        """Add increments to items, hashing each distinct item once. Returns the expelled item (or None) per item."""
+        hashes = {}
+        results = []
+        for item, increment in increments:
+            hash_value = hashes.get(item)
+            if hash_value is None:
+                hash_value = hashes[item] = self.hash(item)
+            results.append(self.incrby_hash(item, hash_value, increment))
+        return results
+
+    def query(self, item: str) -> bool:
+        """Check if an item is in the top-k."""
+        return item in self.index
+
+    def count(self, item: str) -> int:
+        """Estimated count of an item."""
+        return self.estimate(self.hash(item))
+
+    def list(self) -> List[Tuple[str, int]]:
+        """The top-k items and their counts, largest first."""
+        return [(item, count) for count, item in sorted(self.heap, key=lambda entry: -entry[0])]
+
+class TDigest:
+    """
+    Merging t-digest: sorted centroids (mean and weight in two array('d')) plus a buffer of
+    unmerged values. When the buffer is full, or before a query, everything is sorted and merged
+    in one pass, letting a centroid grow only while it spans at most one unit of the k1 scale
+    function k(q) = compression / (2 pi) * asin(2q - 1). Centroids therefore stay small near the
+    tails, which keeps extreme quantiles accurate, and their number stays around compression.
+    Digests merge by feeding their centroids into the same pass.
+    """
+    def __init__(self, compression: float = TDIGEST_DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = array('d')
+        self.weights = array('d')
+        self.total = 0.0  # Weight of the centroids
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = array('d')
+        self._buffer_weights = array('d')
+        self._buffer_size = int(TDIGEST_BUFFER_FACTOR * compression)
+
+    def add(self, value: float, weight: float = 1.0):
+        """Add a value."""
+        self._buffer.append(value)
+        self._buffer_weights.append(weight)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= self._buffer_size:
+            self._compress()
+
+    def add_all(self, values: List[float]):
+        """Add several values."""
+        for value in values:
+            self.add(value)
+
+    def merge(self, others: List['TDigest']):
+        """Add the centroids of other digests."""
+        for other in others:
+            other._compress()
+            self._buffer.extend(other.means)
+            self._buffer_weights.extend(other.weights)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k_inverse_step(self, q: float) -> float:
+        """The quantile one unit of the k1 scale above q."""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(zip(self.means + self._buffer, self.weights + self._buffer_weights))
+        self._buffer = array('d')
+        self._buffer_weights = array('d')
+        total = sum(weight for _, weight in points)
+        means, weights = array('d'), array('d')
+        mean, weight = points[0]
+        before = 0.0  # Weight of the finished centroids
+        limit = self._k_inverse_step(0.0) * total
+        for point_mean, point_weight in points[1:]:
+            if before + weight + point_weight <= limit:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                before += weight
+                limit = self._k_inverse_step(before / total) * total
+                mean, weight = point_mean, point_weight
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights, self.total = means, weights, total
+
+    def quantile(self, q: float) -> float:
+        """Estimated value at quantile q (0 to 1), interpolating between centroid centers; nan if empty."""
+        self._compress()
+        if not self.total:
+            return math.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        means, weights = self.means, self.weights
+        index = q * self.total
+        # Between the minimum and the center of the first centroid
+        if index < weights[0] / 2:
+            return self.min + (means[0] - self.min) * index / (weights[0] / 2)
+        center = weights[0] / 2  # Weight below the center of centroid i
+        for i in range(len(means) - 1):
+            step = (weights[i] + weights[i + 1]) / 2
+            if center + step > index:
+                return means[i] + (means[i + 1] - means[i]) * (index - center) / step
+            center += step
+        # Between the center of the last centroid and the maximum
+        half = weights[-1] / 2
+        return means[-1] + (self.max - means[-1]) * min(1.0, (index - center) / half)
+
+    def cdf(self, value: float) -> float:
+        """Estimated fraction of values at or below value; nan if empty."""
+        self._compress()
+        if not self.total:
+            return math.nan
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        means, weights = self.means, self.weights
+        if value < means[0]:
+            return (value - self.min) / (means[0] - self.min) * weights[0] / 2 / self.total
+        center = weights[0] / 2
+        for i in range(len(means) - 1):
+            step = (weights[i] + weights[i + 1]) / 2
+            if value < means[i + 1]:
+                return (center + step * (value - means[i]) / (means[i + 1] - means[i])) / self.total
+            center += step
+        return (center + weights[-1] / 2 * (value - means[-1]) / (self.max - means[-1])) / self.total
+
+    def trimmed_mean(self, low: float, high: float) -> float:
+        """Mean of the values between quantiles low and high; nan if empty."""
+        self._compress()
+        if not self.total:
+            return math.nan
+        lower, upper = low * self.total, high * self.total
+        start = 0.0
+        weighted_sum = 0.0
+        included = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            overlap = min(start + weight, upper) - max(start, lower)
+            if overlap > 0:
+                weighted_sum += mean * overlap
+                included += overlap
+            start += weight
+            if start >= upper:
+                break
+        return weighted_sum / included if included else math.nan
 
 class ProbabilisticDataType:
     """
@@ -98,14 +858,60 @@ class ProbabilisticDataType:
             Returns the cardinality estimate for one or more HyperLogLogs. If multiple keys are provided, it merges them before counting.
         pfmerge(destkey: str, *sourcekeys: str) -> bool:
             Merges multiple HyperLogLogs into a new one at the destination key. Returns True if successful, otherwise False.
-        _ensure_bloom(key: str, size: int = None, num_hashes: int = None) -> BloomFilter:
-            Ensures that the value at the given key is a BloomFilter. If not, it initializes a new BloomFilter with the specified size and number of hash functions.
-        bf_reserve(key: str, size: int, num_hashes: int) -> bool:
-            Creates a new Bloom filter with the specified parameters at the given key. Returns True if successful, otherwise False.
+        _get_bloom(key: str) -> ScalableBloomFilter:
+            Returns the Bloom filter at the given key, or None if the key does not exist.
+        _ensure_bloom(key: str) -> ScalableBloomFilter:
+            Ensures that the value at the given key is a Bloom filter. If not, it initializes one with the default error rate and capacity.
+        bf_reserve(key: str, error_rate: float, capacity: int, expansion: int = 2, scaling: bool = True) -> bool:
+            Creates a new Bloom filter sized for capacity items at error_rate at the given key. Returns True if successful, otherwise False.
         bf_add(key: str, item: str) -> int:
             Adds an item to the Bloom filter at the specified key. Returns 1 if the Bloom filter was modified, otherwise 0.
+        bf_madd(key: str, items: List[str]) -> list:
+            Adds several items to the Bloom filter at the specified key. Returns 1 or 0 for each item.
         bf_exists(key: str, item: str) -> bool:
             Checks if an item might exist in the Bloom filter at the specified key. Returns True if the item might exist, otherwise False.
+        bf_mexists(key: str, items: List[str]) -> List[int]:
+            Checks if several items might exist in the Bloom filter at the specified key. Returns 1 or 0 for each item.
+        cf_reserve(key: str, capacity: int, bucket_size: int = 2, max_iterations: int = 20, expansion: int = 1) -> bool:
+            Creates a new Cuckoo filter for capacity items at the given key. Returns True if successful, otherwise False.
+        cf_add(key: str, item: str) -> int:
+            Adds an item to the Cuckoo filter at the specified key, creating the filter if needed. Returns 1.
+        cf_addnx(key: str, item: str) -> int:
+            Adds an item only if it does not already exist. Returns 1 if it was added, otherwise 0.
+        cf_exists(key: str, item: str) -> bool / cf_mexists(key: str, items: List[str]) -> List[int]:
+            Check if one or several items might exist in the Cuckoo filter at the specified key.
+        cf_del(key: str, item: str) -> int:
+            Deletes one copy of an item from the Cuckoo filter. Returns 1 if it was found, otherwise 0.
+        cf_count(key: str, item: str) -> int:
+            Returns the approximate number of times an item was added to the Cuckoo filter.
+        cms_initbydim(key: str, width: int, depth: int) -> bool / cms_initbyprob(key: str, error: float, probability: float) -> bool:
+            Create a new Count-Min Sketch from its dimensions or from the accepted error and probability of failure.
+        cms_incrby(key: str, increments: List[Tuple[str, int]]) -> List[int]:
+            Increases the counts of items in the Count-Min Sketch at the specified key. Returns the new estimates.
+        cms_query(key: str, items: List[str]) -> List[int]:
+            Returns the estimated counts of items in the Count-Min Sketch at the specified key.
+        cms_merge(destkey: str, sourcekeys: List[str], weights: List[int] = None) -> bool:
+            Stores the weighted sum of several Count-Min Sketches in the existing sketch at destkey.
+        topk_reserve(key: str, k: int, width: int = None, depth: int = 7, decay: float = 0.9) -> bool:
+            Creates a new Top-K sketch tracking the k most frequent items at the given key. Returns True if successful, otherwise False.
+        topk_incrby(key: str, increments: List[Tuple[str, int]]) -> list:
+            Increases the counts of items in the Top-K sketch. Returns, per item, the item it expelled from the top-k or None.
+        topk_add(key: str, items: List[str]) -> list:
+            Adds items to the Top-K sketch once each. Returns, per item, the item it expelled from the top-k or None.
+        topk_query(key: str, items: List[str]) -> List[int] / topk_count(key: str, items: List[str]) -> List[int]:
+            Check if items are in the top-k, or return their estimated counts.
+        topk_list(key: str) -> List[Tuple[str, int]]:
+            Returns the top-k items and their counts, largest first.
+        tdigest_create(key: str, compression: float = 100) -> bool:
+            Creates a new t-digest at the given key. Returns True if successful, otherwise False.
+        tdigest_add(key: str, values: List[float]) -> bool:
+            Adds values to the t-digest at the specified key.
+        tdigest_merge(destkey: str, sourcekeys: List[str], compression: float = None, override: bool = False) -> bool:
+            Merges several t-digests into destkey, creating it if needed; OVERRIDE replaces its previous content.
+        tdigest_quantile(key: str, quantiles: List[float]) -> List[float] / tdigest_cdf(key: str, values: List[float]) -> List[float]:
+            Return the estimated values at quantiles, or the estimated fractions of values at or below the given ones.
+        tdigest_trimmed_mean(key: str, low: float, high: float) -> float:
+            Returns the mean of the values between the low and high quantiles.
     """
     def __init__(self, database):
         self.db = database
@@ -169,49 +975,299 @@ class ProbabilisticDataType:
         except ValueError:
             return False
 
-    def _ensure_bloom(self, key: str, size: int = None, num_hashes: int = None) -> BloomFilter:
-        """Ensure value at key is a BloomFilter."""
+    def _get_bloom(self, key: str):
+        """Return the Bloom filter at key, or None if the key does not exist."""
         if not self.db.exists(key):
-            if size is None:
-                size = 1000  # Default size
-            if num_hashes is None:
-                num_hashes = 4  # Default number of hash functions
-            bf = BloomFilter(size, num_hashes)
-            self.db.store[key] = bf
-            return bf
+            return None
         value = self.db.get(key)
-        if not isinstance(value, BloomFilter):
+        if isinstance(value, BloomFilter):
+            # A filter restored from a snapshot taken before the scalable filters
+            value = ScalableBloomFilter.from_legacy(value)
+            self.db.store[key] = value
+        elif not isinstance(value, ScalableBloomFilter):
             raise ValueError("Value is not a BloomFilter")
         return value
 
-    def bf_reserve(self, key: str, size: int, num_hashes: int) -> bool:
-        """Create a new Bloom filter with specified parameters."""
-        try:
-            if self.db.exists(key):
-                return False
-            bf = BloomFilter(size, num_hashes)
+    def _ensure_bloom(self, key: str) -> ScalableBloomFilter:
+        """Ensure value at key is a Bloom filter, creating one with the default sizing."""
+        bf = self._get_bloom(key)
+        if bf is None:
+            bf = ScalableBloomFilter()
             self.db.store[key] = bf
-            if not self.db.replaying:
-                self.db.persistence_manager.log_command(f"BF.RESERVE {key} {size} {num_hashes}")
-            return True
-        except ValueError:
+        return bf
+
+    def bf_reserve(self, key: str, error_rate: float, capacity: int,
+                   expansion: int = BLOOM_DEFAULT_EXPANSION, scaling: bool = True) -> bool:
+        """Create a new Bloom filter for capacity items at error_rate. Returns False if the key exists."""
+        if self.db.exists(key):
             return False
+        self.db.store[key] = ScalableBloomFilter(error_rate, capacity, expansion, scaling)
+        if not self.db.replaying:
+            options = f" EXPANSION {expansion}" if scaling else " NONSCALING"
+            self.db.persistence_manager.log_command(f"BF.RESERVE {key} {error_rate} {capacity}{options}")
+        return True
+
+    def bf_madd(self, key: str, items: List[str]) -> list:
+        """
+        Add items to the Bloom filter, creating it if needed. Returns 1 or 0 per item (0 if it
+        may already have been present); items that do not fit a full non-scaling filter get an
+        error string instead.
+        """
+        bf = self._ensure_bloom(key)
+        results = []
+        added = []
+        for item in items:
+            try:
+                changed = bf.add(item)
+            except ValueError as e:
+                results.append(f"ERROR: {e}")
+                continue
+            results.append(1 if changed else 0)
+            if changed:
+                added.append(item)
+        if added and not self.db.replaying:
+            self.db.persistence_manager.log_command(f"BF.MADD {key} {' '.join(added)}")
+        return results
 
-    def bf_add(self, key: str, item: str) -> int:
-        """Add item to Bloom filter."""
+    def bf_add(self, key: str, item: str):
+        """Add item to Bloom filter. Returns 1, 0 or an error string if a non-scaling filter is full."""
         try:
-            bf = self._ensure_bloom(key)
-            result = bf.add(item)
-            if result and not self.db.replaying:
-                self.db.persistence_manager.log_command(f"BF.ADD {key} {item}")
-            return 1 if result else 0
-        except ValueError:
-            return 0
+            return self.bf_madd(key, [item])[0]
+        except ValueError as e:
+            return f"ERROR: {e}"
+
+    def bf_mexists(self, key: str, items: List[str]) -> List[int]:
+        """Check several items at once; 1 if an item might exist, 0 if it does not."""
+        bf = self._get_bloom(key)
+        if bf is None:
+            return [0] * len(items)
+        return [1 if bf.contains(item) else 0 for item in items]
 
     def bf_exists(self, key: str, item: str) -> bool:
         """Check if item might exist in Bloom filter."""
         try:
-            bf = self._ensure_bloom(key)
-            return bf.contains(item)
+            return self.bf_mexists(key, [item])[0] == 1
         except ValueError:
             return False
+
+    def _get_cuckoo(self, key: str):
+        """Return the Cuckoo filter at key, or None if the key does not exist."""
+        if not self.db.exists(key):
+            return None
+        value = self.db.get(key)
+        if not isinstance(value, ScalableCuckooFilter):
+            raise ValueError("Value is not a CuckooFilter")
+        return value
+
+    def _ensure_cuckoo(self, key: str) -> ScalableCuckooFilter:
+        """Ensure value at key is a Cuckoo filter, creating one with the default sizing."""
+        cf = self._get_cuckoo(key)
+        if cf is None:
+            cf = ScalableCuckooFilter()
+            self.db.store[key] = cf
+        return cf
+
+    def cf_reserve(self, key: str, capacity: int, bucket_size: int = CUCKOO_DEFAULT_BUCKET_SIZE,
+                   max_iterations: int = CUCKOO_DEFAULT_MAX_ITERATIONS,
+                   expansion: int = CUCKOO_DEFAULT_EXPANSION) -> bool:
+        """Create a new Cuckoo filter for capacity items. Returns False if the key exists."""
+        if self.db.exists(key):
+            return False
+        self.db.store[key] = ScalableCuckooFilter(capacity, bucket_size, max_iterations, expansion)
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(
+                f"CF.RESERVE {key} {capacity} BUCKETSIZE {bucket_size} MAXITERATIONS {max_iterations} EXPANSION {expansion}")
+        return True
+
+    def cf_add(self, key: str, item: str) -> int:
+        """Add item to the Cuckoo filter, creating it if needed. Raises ValueError if the filter is full."""
+        self._ensure_cuckoo(key).add(item)
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"CF.ADD {key} {item}")
+        return 1
+
+    def cf_addnx(self, key: str, item: str) -> int:
+        """Add item only if it is not (probably) in the filter yet."""
+        if self.cf_exists(key, item):
+            return 0
+        return self.cf_add(key, item)
+
+    def cf_mexists(self, key: str, items: List[str]) -> List[int]:
+        """Check several items at once; 1 if an item might exist, 0 if it does not."""
+        cf = self._get_cuckoo(key)
+        if cf is None:
+            return [0] * len(items)
+        return [1 if cf.contains(item) else 0 for item in items]
+
+    def cf_exists(self, key: str, item: str) -> bool:
+        """Check if item might exist in the Cuckoo filter."""
+        return self.cf_mexists(key, [item])[0] == 1
+
+    def cf_del(self, key: str, item: str) -> int:
+        """Delete one copy of item. Returns 1 if it was found, otherwise 0."""
+        cf = self._get_cuckoo(key)
+        if cf is None or not cf.delete(item):
+            return 0
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"CF.DEL {key} {item}")
+        return 1
+
+    def cf_count(self, key: str, item: str) -> int:
+        """Approximate number of copies of item in the Cuckoo filter."""
+        cf = self._get_cuckoo(key)
+        return cf.occurrences(item) if cf is not None else 0
+
+    def _get_cms(self, key: str) -> CountMinSketch:
+        """Return the Count-Min Sketch at key. Unlike the filters, sketches are never created implicitly."""
+        if not self.db.exists(key):
+            raise ValueError("CMS: key does not exist")
+        value = self.db.get(key)
+        if not isinstance(value, CountMinSketch):
+            raise ValueError("Value is not a CountMinSketch")
+        return value
+
+    def cms_initbydim(self, key: str, width: int, depth: int) -> bool:
+        """Create a Count-Min Sketch of depth rows of width counters. Returns False if the key exists."""
+        if self.db.exists(key):
+            return False
+        self.db.store[key] = CountMinSketch(width, depth)
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"CMS.INITBYDIM {key} {width} {depth}")
+        return True
+
+    def cms_initbyprob(self, key: str, error: float, probability: float) -> bool:
+        """Create a Count-Min Sketch sized for an error rate and a probability of exceeding it."""
+        return self.cms_initbydim(key, *CountMinSketch.dimensions(error, probability))
+
+    def cms_incrby(self, key: str, increments: List[Tuple[str, int]]) -> List[int]:
+        """Increase the counts of items. Returns the new estimate of each item."""
+        cms = self._get_cms(key)
+        results = [cms.incrby(item, increment) for item, increment in increments]
+        if not self.db.replaying:
+            pairs = ' '.join(f"{item} {increment}" for item, increment in increments)
+            self.db.persistence_manager.log_command(f"CMS.INCRBY {key} {pairs}")
+        return results
+
+    def cms_query(self, key: str, items: List[str]) -> List[int]:
+        """Estimated counts of items."""
+        cms = self._get_cms(key)
+        return [cms.query(item) for item in items]
+
+    def cms_merge(self, destkey: str, sourcekeys: List[str], weights: List[int] = None) -> bool:
+        """Store the weighted sum of the source sketches in the existing sketch at destkey."""
+        weights = weights or [1] * len(sourcekeys)
+        dest = self._get_cms(destkey)
+        dest.merge([self._get_cms(key) for key in sourcekeys], weights)
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(
+                f"CMS.MERGE {destkey} {len(sourcekeys)} {' '.join(sourcekeys)} WEIGHTS {' '.join(map(str, weights))}")
+        return True
+
+    def _get_topk(self, key: str) -> TopK:
+        """Return the Top-K sketch at key, which must exist."""
+        if not self.db.exists(key):
+            raise ValueError("TopK: key does not exist")
+        value = self.db.get(key)
+        if not isinstance(value, TopK):
+            raise ValueError("Value is not a TopK")
+        return value
+
+    def topk_reserve(self, key: str, k: int, width: int = None, depth: int = TOPK_DEFAULT_DEPTH,
+                     decay: float = TOPK_DEFAULT_DECAY) -> bool:
+        """Create a Top-K sketch for the k most frequent items. Returns False if the key exists."""
+        if self.db.exists(key):
+            return False
+        topk = TopK(k, width, depth, decay)
+        self.db.store[key] = topk
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"TOPK.RESERVE {key} {k} {topk.width} {depth} {decay}")
+        return True
+
+    def topk_incrby(self, key: str, increments: List[Tuple[str, int]]) -> list:
+        """Increase the counts of items. Returns the item expelled from the top-k (or None) per item."""
+        results = self._get_topk(key).incrby(increments)
+        if not self.db.replaying:
+            pairs = ' '.join(f"{item} {increment}" for item, increment in increments)
+            self.db.persistence_manager.log_command(f"TOPK.INCRBY {key} {pairs}")
+        return results
+
+    def topk_add(self, key: str, items: List[str]) -> list:
+        """Add items once each. Returns the item expelled from the top-k (or None) per item."""
+        results = self._get_topk(key).incrby([(item, 1) for item in items])
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"TOPK.ADD {key} {' '.join(items)}")
+        return results
+
+    def topk_query(self, key: str, items: List[str]) -> List[int]:
+        """1 for each item in the top-k, otherwise 0."""
+        topk = self._get_topk(key)
+        return [1 if topk.query(item) else 0 for item in items]
+
+    def topk_count(self, key: str, items: List[str]) -> List[int]:
+        """Estimated counts of items."""
+        topk = self._get_topk(key)
+        return [topk.count(item) for item in items]
+
+    def topk_list(self, key: str) -> List[Tuple[str, int]]:
+        """The top-k items and their counts, largest first."""
+        return self._get_topk(key).list()
+
+    def _get_tdigest(self, key: str) -> TDigest:
+        """Return the t-digest at key, which must exist."""
+        if not self.db.exists(key):
+            raise ValueError("T-Digest: key does not exist")
+        value = self.db.get(key)
+        if not isinstance(value, TDigest):
+            raise ValueError("Value is not a TDigest")
+        return value
+
+    def tdigest_create(self, key: str, compression: float = TDIGEST_DEFAULT_COMPRESSION) -> bool:
+        """Create an empty t-digest. Returns False if the key exists."""
+        if self.db.exists(key):
+            return False
+        self.db.store[key] = TDigest(compression)
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"TDIGEST.CREATE {key} COMPRESSION {compression}")
+        return True
+
+    def tdigest_add(self, key: str, values: List[float]) -> bool:
+        """Add values to the t-digest."""
+        self._get_tdigest(key).add_all(values)
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"TDIGEST.ADD {key} {' '.join(map(repr, values))}")
+        return True
+
+    def tdigest_merge(self, destkey: str, sourcekeys: List[str], compression: float = None,
+                      override: bool = False) -> bool:
+        """
+        Merge the source t-digests into destkey. A missing destination is created with the given
+        compression, or the largest one of the sources; an existing one keeps its values unless override is set.
+        """
+        sources = [self._get_tdigest(key) for key in sourcekeys]
+        dest = None if override or not self.db.exists(destkey) else self._get_tdigest(destkey)
+        if dest is None or compression is not None and compression != dest.compression:
+            merged = TDigest(compression or max(source.compression for source in sources))
+            if dest is not None:
+                sources.append(dest)
+            dest = merged
+        dest.merge(sources)
+        self.db.store[destkey] = dest
+        if not self.db.replaying:
+            options = (f" COMPRESSION {compression}" if compression is not None else "") + (" OVERRIDE" if override else "")
+            self.db.persistence_manager.log_command(
+                f"TDIGEST.MERGE {destkey} {len(sourcekeys)} {' '.join(sourcekeys)}{options}")
+        return True
+
+    def tdigest_quantile(self, key: str, quantiles: List[float]) -> List[float]:
+        """Estimated values at quantiles."""
+        digest = self._get_tdigest(key)
+        return [digest.quantile(q) for q in quantiles]
+
+    def tdigest_cdf(self, key: str, values: List[float]) -> List[float]:
+        """Estimated fractions of values at or below each value."""
+        digest = self._get_tdigest(key)
+        return [digest.cdf(value) for value in values]
+
+    def tdigest_trimmed_mean(self, key: str, low: float, high: float) -> float:
+        """Mean of the values between quantiles low and high."""
+        return self._get_tdigest(key).trimmed_mean(low, high)
@@ -0,0 +1,480 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import reduce
+import re
+
+# Every container covers 2^16 bit offsets: the high 16 bits of an offset select the container
+CHUNK_BITS = 1 << 16
+CHUNK_BYTES = CHUNK_BITS >> 3
+
+# An array container holds at most this many values; beyond it a bitset is smaller
+ARRAY_MAX = 4096
+
+_FULL = b'\xff' * CHUNK_BYTES
+_NONZERO = re.compile(b'[^\x00]')
+
+# Offsets (MSB first, as in Redis bitmaps) of the set bits of every byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value & (0x80 >> bit)) for value in range(256)]
+
+
+def _positions(bits):
+    """Return the sorted offsets of the set bits of an MSB-first bitset."""
+    result = []
+    for match in _NONZERO.finditer(bits):
+        index = match.start()
+        base = index << 3
+        result.extend(base + bit for bit in _BYTE_BITS[bits[index]])
+    return result
+
+
+def _fill(bits, start, end):
+    """Set the bits start..end (inclusive) of an MSB-first bitset."""
+    first, last = start >> 3, end >> 3
+    head = 0xFF >> (start & 7)
+    tail = (0xFF << (7 - (end & 7))) & 0xFF
+    if first == last:
+        bits[first] |= head & tail
+        return
+    bits[first] |= head
+    bits[first + 1:last] = _FULL[:last - first - 1]
+    bits[last] |= tail
+
+
+def _count(bits, start, end):
+    """Count the set bits start..end (inclusive) of an MSB-first bitset."""
+    first, last = start >> 3, end >> 3
+    head = 0xFF >> (start & 7)
+    tail = (0xFF << (7 - (end & 7))) & 0xFF
+    if first == last:
+        return (bits[first] & head & tail).bit_count()
+    return ((bits[first] & head).bit_count() + int.from_bytes(bits[first + 1:last], 'big').bit_count() +
+            (bits[last] & tail).bit_count())
+
+
+def _next_in_bitset(bits, low, skip):
+    """First offset >= low whose byte differs from skip (0x00: next set bit, 0xFF: next clear bit)."""
+    index = low >> 3
+    byte = (bits[index] ^ skip) & (0xFF >> (low & 7))
+    if byte:
+        return (index << 3) + 8 - byte.bit_length()
+    rest = bits[index + 1:].lstrip(bytes((skip,)))
+    if not rest:
+        return None
+    index = CHUNK_BYTES - len(rest)
+    return (index << 3) + 8 - (rest[0] ^ skip).bit_length()
+
+
+class ArrayContainer:
+    """Sorted array of the set 16-bit offsets; used for up to ARRAY_MAX values."""
+    __slots__ = ('values',)
+
+    def __init__(self, values=()):
+        self.values = array('H', values)
+
+    @property
+    def cardinality(self):
+        return len(self.values)
+
+    def nbytes(self):
+        return 2 * len(self.values)
+
+    def copy(self):
+        return ArrayContainer(self.values)
+
+    def contains(self, low):
+        values = self.values
+        index = bisect_left(values, low)
+        return index < len(values) and values[index] == low
+
+    def add(self, low):
+        values = self.values
+        index = bisect_left(values, low)
+        if index < len(values) and values[index] == low:
+            return False
+        values.insert(index, low)
+        return True
+
+    def discard(self, low):
+        values = self.values
+        index = bisect_left(values, low)
+        if index < len(values) and values[index] == low:
+            del values[index]
+            return True
+        return False
+
+    def count(self, start, end):
+        return bisect_right(self.values, end) - bisect_left(self.values, start)
+
+    def next_set(self, low):
+        values = self.values
+        index = bisect_left(values, low)
+        return values[index] if index < len(values) else None
+
+    def next_clear(self, low):
+        values = self.values
+        index = bisect_left(values, low)
+        while index < len(values) and values[index] == low:
+            index += 1
+            low += 1
+        return low if low < CHUNK_BITS else None
+
+    def to_bitset(self):
+        bits = bytearray(CHUNK_BYTES)
+        for low in self.values:
+            bits[low >> 3] |= 0x80 >> (low & 7)
+        return bits
+
+
+class BitsetContainer:
+    """8 KB MSB-first bitset, laid out exactly like the matching slice of the dense bitmap."""
+    __slots__ = ('bits', 'cardinality')
+
+    def __init__(self, bits, cardinality):
+        self.bits = bits
+        self.cardinality = cardinality
+
+    def nbytes(self):
+        return CHUNK_BYTES
+
+    def copy(self):
+        return BitsetContainer(bytearray(self.bits), self.cardinality)
+
+    def contains(self, low):
+        return bool(self.bits[low >> 3] & (0x80 >> (low & 7)))
+
+    def add(self, low):
+        mask = 0x80 >> (low & 7)
+        byte = self.bits[low >> 3]
+        if byte & mask:
+            return False
+        self.bits[low >> 3] = byte | mask
+        self.cardinality += 1
+        return True
+
+    def discard(self, low):
+        mask = 0x80 >> (low & 7)
+        byte = self.bits[low >> 3]
+        if not byte & mask:
+            return False
+        self.bits[low >> 3] = byte & ~mask
+        self.cardinality -= 1
+        return True
+
+    def count(self, start, end):
+        return _count(self.bits, start, end)
+
+    def next_set(self, low):
+        return _next_in_bitset(self.bits, low, 0x00)
+
+    def next_clear(self, low):
+        return _next_in_bitset(self.bits, low, 0xFF)
+
+    def to_bitset(self):
+        return bytearray(self.bits)
+
+
+class RunContainer:
+    """Sorted, maximal runs of set offsets as parallel lists of starts and (inclusive) ends."""
+    __slots__ = ('starts', 'ends', 'cardinality')
+
+    def __init__(self, starts, ends, cardinality):
+        self.starts = starts
+        self.ends = ends
+        self.cardinality = cardinality
+
+    def nbytes(self):
+        return 4 * len(self.starts)
+
+    def copy(self):
+        return RunContainer(list(self.starts), list(self.ends), self.cardinality)
+
+    def contains(self, low):
+        index = bisect_right(self.starts, low) - 1
+        return index >= 0 and self.ends[index] >= low
+
+    def add(self, low):
+        starts, ends = self.starts, self.ends
+        index = bisect_right(starts, low) - 1
+        if index >= 0 and ends[index] >= low:
+            return False
+        joins_previous = index >= 0 and ends[index] + 1 == low
+        joins_next = index + 1 < len(starts) and starts[index + 1] - 1 == low
+        if joins_previous and joins_next:
+            ends[index] = ends[index + 1]
+            del starts[index + 1]
+            del ends[index + 1]
+        elif joins_previous:
+            ends[index] = low
+        elif joins_next:
+            starts[index + 1] = low
+        else:
+            starts.insert(index + 1, low)
+            ends.insert(index + 1, low)
+        self.cardinality += 1
+        return True
+
+    def discard(self, low):
+        starts, ends = self.starts, self.ends
+        index = bisect_right(starts, low) - 1
+        if index < 0 or ends[index] < low:
+            return False
+        start, end = starts[index], ends[index]
+        if start == end:
+            del starts[index]
+            del ends[index]
+        elif low == start:
+            starts[index] = low + 1
+        elif low == end:
+            ends[index] = low - 1
+        else:
+            # Split the run around low
+            ends[index] = low - 1
+            starts.insert(index + 1, low + 1)
+            ends.insert(index + 1, end)
+        self.cardinality -= 1
+        return True
+
+    def _rank(self, low):
+        """Number of set offsets <= low."""
+        starts, ends = self.starts, self.ends
+        index = bisect_right(starts, low) - 1
+        if index < 0:
+            return 0
+        total = sum(ends[i] - starts[i] + 1 for i in range(index))
+        return total + min(ends[index], low) - starts[index] + 1
+
+    def count(self, start, end):
+        return self._rank(end) - (self._rank(start - 1) if start else 0)
+
+    def next_set(self, low):
+        index = bisect_right(self.starts, low) - 1
+        if index >= 0 and self.ends[index] >= low:
+            return low
+        return self.starts[index + 1] if index + 1 < len(self.starts) else None
+
+    def next_clear(self, low):
+        index = bisect_right(self.starts, low) - 1
+        if index >= 0 and self.ends[index] >= low:
+            # Runs are maximal, so the bit after a run is clear
+            low = self.ends[index] + 1
+        return low if low < CHUNK_BITS else None
+
+    def to_bitset(self):
+        bits = bytearray(CHUNK_BYTES)
+        for start, end in zip(self.starts, self.ends):
+            _fill(bits, start, end)
+        return bits
+
+
+def best_container(bits):
+    """
+    Build the smallest container for an 8 KB MSB-first bitset, the way Roaring chooses:
+    an array (2 bytes per value), a bitset (8 KB) or runs (4 bytes per run).
+    Returns None if no bit is set.
+    """
+    value = int.from_bytes(bits, 'big')
+    cardinality = value.bit_count()
+    if not cardinality:
+        return None
+    # Bit p of value is offset CHUNK_BITS - 1 - p; a run starts where the previous offset is clear
+    run_starts = value & ~(value >> 1)
+    runs = run_starts.bit_count()
+    array_size = 2 * cardinality if cardinality <= ARRAY_MAX else CHUNK_BYTES + 1
+    if 4 * runs < min(array_size, CHUNK_BYTES):
+        run_ends = value & ~(value << 1)
+        starts = _positions(run_starts.to_bytes(CHUNK_BYTES, 'big'))
+        ends = _positions((run_ends & ((1 << CHUNK_BITS) - 1)).to_bytes(CHUNK_BYTES, 'big'))
+        return RunContainer(starts, ends, cardinality)
+    if array_size < CHUNK_BYTES:
+        return ArrayContainer(_positions(bits))
+    return BitsetContainer(bytearray(bits), cardinality)
+
+
+def _from_values(values):
+    """Build the container for sorted offsets, or None if there are none."""
+    if not values:
+        return None
+    if len(values) <= ARRAY_MAX:
+        return ArrayContainer(values)
+    return best_container(ArrayContainer(values).to_bitset())
+
+
+class RoaringBitmap:
+    """
+    RoaringBitmap is the compressed encoding of sparse bitmaps. Bit offsets are split into
+    a 16-bit container key and a 16-bit offset within the container, and each non-empty
+    container is stored as whichever of an array, a bitset or a list of runs is smallest.
+    It behaves like the dense string it replaces: length is the string length in bytes
+    (it only grows, as with SETBIT) and to_bytearray() returns the same MSB-first bytes.
+
+    Attributes:
+        containers (dict): Container key to container.
+        keys (list): Sorted container keys.
+        length (int): Length in bytes of the equivalent dense string.
+        cardinality (int): Number of set bits.
+        nbytes (int): Payload size of all containers, to compare against the dense size.
+    """
+    __slots__ = ('containers', 'keys', 'length', 'cardinality', 'nbytes')
+
+    def __init__(self, length=0):
+        self.containers = {}
+        self.keys = []
+        self.length = length
+        self.cardinality = 0
+        self.nbytes = 0
+
+    def __len__(self):
+        return self.length
+
+    def _add_container(self, high, container):
+        self.containers[high] = container
+        insort(self.keys, high)
+        self.cardinality += container.cardinality
+        self.nbytes += container.nbytes()
+
+    def _refit(self, high, container):
+        """Switch a container to a smaller encoding once its density changed enough."""
+        if isinstance(container, ArrayContainer):
+            if container.cardinality <= ARRAY_MAX:
+                return
+        elif isinstance(container, BitsetContainer):
+            # Hysteresis: only leave the bitset well below the array limit, or when it is full
+            if ARRAY_MAX // 2 <= container.cardinality < CHUNK_BITS:
+                return
+        elif 4 * len(container.starts) <= min(2 * container.cardinality, CHUNK_BYTES):
+            return
+        self.containers[high] = best_container(container.to_bitset())
+
+    def get(self, offset):
+        container = self.containers.get(offset >> 16)
+        return 1 if container is not None and container.contains(offset & 0xFFFF) else 0
+
+    def set(self, offset, value):
+        """Set or clear the bit at offset. Returns the previous bit."""
+        high, low = offset >> 16, offset & 0xFFFF
+        self.length = max(self.length, (offset >> 3) + 1)
+        container = self.containers.get(high)
+        if value:
+            if container is None:
+                self._add_container(high, ArrayContainer((low,)))
+                return 0
+            before = container.nbytes()
+            if not container.add(low):
+                return 1
+            self.cardinality += 1
+        else:
+            if container is None:
+                return 0
+            before = container.nbytes()
+            if not container.discard(low):
+                return 0
+            self.cardinality -= 1
+            if not container.cardinality:
+                del self.containers[high]
+                del self.keys[bisect_left(self.keys, high)]
+                self.nbytes -= before
+                return 1
+        self._refit(high, container)
+        self.nbytes += self.containers[high].nbytes() - before
+        return 0 if value else 1
+
+    def count(self, start, end):
+        """Number of set bits with offsets start..end (inclusive)."""
+        first, last = start >> 16, end >> 16
+        keys = self.keys
+        total = 0
+        for index in range(bisect_left(keys, first), bisect_right(keys, last)):
+            high = keys[index]
+            container = self.containers[high]
+            low_start = start & 0xFFFF if high == first else 0
+            low_end = end & 0xFFFF if high == last else CHUNK_BITS - 1
+            if low_start == 0 and low_end == CHUNK_BITS - 1:
+                total += container.cardinality
+            else:
+                total += container.count(low_start, low_end)
+        return total
+
+    def next_set(self, start, end):
+        """First set bit with an offset in start..end, or -1."""
+        first = start >> 16
+        keys = self.keys
+        for index in range(bisect_left(keys, first), len(keys)):
+            high = keys[index]
+            if high > end >> 16:
+                break
+            low = self.containers[high].next_set(start & 0xFFFF if high == first else 0)
+            if low is not None:
+                position = (high << 16) | low
+                return position if position <= end else -1
+        return -1
+
+    def next_clear(self, start, end):
+        """First clear bit with an offset in start..end, or -1."""
+        position = start
+        while position <= end:
+            high = position >> 16
+            container = self.containers.get(high)
+            if container is None:
+                return position
+            low = container.next_clear(position & 0xFFFF)
+            if low is not None:
+                position = (high << 16) | low
+                return position if position <= end else -1
+            position = (high + 1) << 16
+        return -1
+
+    def to_bytearray(self):
+        """Return the equivalent dense bitmap."""
+        result = bytearray(self.length)
+        for high in self.keys:
+            start = high * CHUNK_BYTES
+            size = min(CHUNK_BYTES, self.length - start)
+            result[start:start + size] = self.containers[high].to_bitset()[:size]
+        return result
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Build a RoaringBitmap from a dense bitmap."""
+        bitmap = cls(len(data))
+        for high, start in enumerate(range(0, len(data), CHUNK_BYTES)):
+            chunk = data[start:start + CHUNK_BYTES]
+            if not chunk.lstrip(b'\x00'):
+                continue
+            container = best_container(bytes(chunk).ljust(CHUNK_BYTES, b'\x00'))
+            bitmap.containers[high] = container
+            bitmap.keys.append(high)
+            bitmap.cardinality += container.cardinality
+            bitmap.nbytes += container.nbytes()
+        return bitmap
+
+    @classmethod
+    def combine(cls, operation, bitmaps, length):
+        """
+        AND, OR or XOR bitmaps container by container. Only container keys present in
+        every bitmap (AND) or in any bitmap (OR, XOR) are visited.
+        """
+        result = cls(length)
+        key_sets = [set(bitmap.containers) for bitmap in bitmaps]
+        if operation == 'AND':
+            highs = set.intersection(*key_sets)
+        else:
+            highs = set().union(*key_sets)
+        for high in sorted(highs):
+            containers = [bitmap.containers[high] for bitmap in bitmaps if high in bitmap.containers]
+            if len(containers) == 1:
+                container = containers[0].copy()
+            elif all(isinstance(c, ArrayContainer) for c in containers):
+                # Sparse containers: combine the values as sets instead of as 8 KB bitsets
+                combine = {'AND': set.intersection, 'OR': set.union, 'XOR': set.symmetric_difference}[operation]
+                values = reduce(combine, (c.values for c in containers[1:]), set(containers[0].values))
+                container = _from_values(sorted(values))
+            else:
+                combine = {'AND': int.__and__, 'OR': int.__or__, 'XOR': int.__xor__}[operation]
+                value = reduce(combine, (int.from_bytes(c.to_bitset(), 'big') for c in containers))
+                container = best_container(value.to_bytes(CHUNK_BYTES, 'big')) if value else None
+            if container is not None:
+                result.containers[high] = container
+                result.keys.append(high)
+                result.cardinality += container.cardinality
+                result.nbytes += container.nbytes()
+        return result
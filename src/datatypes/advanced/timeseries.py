@@ -1,7 +1,17 @@
-import time
-from typing import List, Tuple, Dict, Optional
+from array import array
+from bisect import bisect_left, bisect_right
+import math
+from typing import List, Tuple, Dict, Optional, Union
 from enum import Enum
-import statistics
+import re
+
+from datatypes.advanced.gorilla import GorillaChunk, encode_chunks
+from datatypes.advanced.probabilistic import TDigest
+
+TS_DEFAULT_CHUNK_SIZE = 4096  # Bytes of compressed samples per chunk
+TS_ENCODINGS = ('COMPRESSED', 'UNCOMPRESSED')
+_MIN_TIMESTAMP = -(1 << 63)
+_MAX_TIMESTAMP = (1 << 63) - 1
 
 class TSAggregationType(Enum):
     AVG = 'avg'
@@ -12,120 +22,390 @@ class TSAggregationType(Enum):
     FIRST = 'first'
     LAST = 'last'
 
+class TSPercentile:
+    """A pNN aggregation, e.g. p99: the NN-th percentile of a bucket, estimated with a t-digest."""
+    def __init__(self, percentile: float):
+        self.percentile = percentile
+        self.quantile = percentile / 100
+
+    def __eq__(self, other):
+        return isinstance(other, TSPercentile) and other.percentile == self.percentile
+
+    def __repr__(self):
+        return f"TSPercentile({self.percentile!r})"
+
+_PERCENTILE_PATTERN = re.compile(r'p(\d+(?:\.\d+)?)')
+
+def parse_aggregation(name: str) -> Union[TSAggregationType, TSPercentile]:
+    """Parse an aggregation name: avg, sum, min, max, count, first, last or pNN with 0 <= NN <= 100."""
+    name = name.lower()
+    match = _PERCENTILE_PATTERN.fullmatch(name)
+    if match:
+        percentile = float(match.group(1))
+        if percentile > 100:
+            raise ValueError("percentile must be between 0 and 100")
+        return TSPercentile(percentile)
+    return TSAggregationType(name)
+
+def aggregate(aggregation: Union[TSAggregationType, TSPercentile], values: array) -> float:
+    """Aggregate the values of one bucket."""
+    if isinstance(aggregation, TSPercentile):
+        digest = TDigest()
+        digest.add_all(values)
+        return digest.quantile(aggregation.quantile)
+    if aggregation == TSAggregationType.SUM:
+        return math.fsum(values)
+    if aggregation == TSAggregationType.MIN:
+        return min(values)
+    if aggregation == TSAggregationType.MAX:
+        return max(values)
+    if aggregation == TSAggregationType.COUNT:
+        return len(values)
+    if aggregation == TSAggregationType.FIRST:
+        return values[0]
+    if aggregation == TSAggregationType.LAST:
+        return values[-1]
+    return math.fsum(values) / len(values)  # AVG, the default
+
+def _closest(timestamps: array, values: array, lo: int, timestamp_ms: int) -> Tuple[int, float]:
+    """The sample of timestamps[lo:] closest to timestamp_ms; the earlier one on a tie."""
+    i = bisect_left(timestamps, timestamp_ms, lo)
+    if i == len(timestamps) or (i > lo and timestamp_ms - timestamps[i - 1] <= timestamps[i] - timestamp_ms):
+        i -= 1
+    return timestamps[i], values[i]
+
+class CompactionRule:
+    """
+    A TS.CREATERULE compaction: samples added to the source series are aggregated into buckets of
+    bucket_size_ms (starting at align_ms modulo the bucket size) and written to dest_key. The open
+    bucket keeps a running aggregate, updated in O(1) per sample (a t-digest for pNN), and is
+    written to the destination when a sample opens a later bucket.
+    """
+    def __init__(self, dest_key: str, aggregation: Union[TSAggregationType, TSPercentile],
+                 bucket_size_ms: int, align_ms: int = 0):
+        self.dest_key = dest_key
+        self.aggregation = aggregation
+        self.bucket_size_ms = bucket_size_ms
+        self.align_ms = align_ms
+        self.bucket_ts = None  # Start of the open bucket
+        self.open(None, [])
+
+    def bucket_start(self, timestamp_ms: int) -> int:
+        """Start of the bucket holding timestamp_ms."""
+        return timestamp_ms - (timestamp_ms - self.align_ms) % self.bucket_size_ms
+
+    def open(self, bucket_ts: Optional[int], values: List[float]):
+        """Make bucket_ts the open bucket, holding values in timestamp order."""
+        self.bucket_ts = bucket_ts
+        self.count = 0
+        self.total = 0.0
+        self.min = self.max = self.first = self.last = None
+        self.digest = TDigest() if isinstance(self.aggregation, TSPercentile) else None
+        for value in values:
+            self.add(value)
+
+    def add(self, value: float):
+        """Add a value to the open bucket after the ones already in it."""
+        if self.digest is not None:
+            self.digest.add(value)
+        if self.count:
+            if value < self.min:
+                self.min = value
+            elif value > self.max:
+                self.max = value
+        else:
+            self.first = self.min = self.max = value
+        self.count += 1
+        self.total += value
+        self.last = value
+
+    def value(self) -> float:
+        """The aggregate of the open bucket."""
+        aggregation = self.aggregation
+        if self.digest is not None:
+            return self.digest.quantile(aggregation.quantile)
+        if aggregation == TSAggregationType.SUM:
+            return self.total
+        if aggregation == TSAggregationType.MIN:
+            return self.min
+        if aggregation == TSAggregationType.MAX:
+            return self.max
+        if aggregation == TSAggregationType.COUNT:
+            return self.count
+        if aggregation == TSAggregationType.FIRST:
+            return self.first
+        if aggregation == TSAggregationType.LAST:
+            return self.last
+        return self.total / self.count  # AVG
+
 class TimeSeries:
     """
     A class to represent a time series data structure with support for retention policies,
     duplicate handling, and downsampling.
     Attributes:
     -----------
-    samples : list
-        A list of (timestamp, value) tuples representing the time series data points.
+    timestamps : array('q')
+        Sample timestamps in milliseconds, sorted; the samples before head are expired.
+    values : array('d')
+        Sample values, parallel to timestamps.
+    head : int
+        Index of the first sample within the retention period.
     retention_ms : int
-        The retention period in milliseconds. Samples older than this period will be removed.
+        The retention period in milliseconds. Samples older than this period (relative to the
+        newest sample) are dropped.
     duplicate_policy : str
         The policy for handling duplicate timestamps. Options are 'LAST', 'FIRST', and 'BLOCK'.
     labels : dict
         Metadata labels associated with the time series.
     rules : list
-        Downsampling rules defined as (dest_key, aggregation, bucket_size_ms) tuples.
+        CompactionRule objects downsampling this series into other series.
+    source_key : str
+        The series compacted into this one, if any.
     Methods:
     --------
     _cleanup_samples(current_time_ms: int):
-        Remove samples older than the retention period.
-    add_sample(timestamp_ms: int, value: float) -> bool:
+        Advance head past the samples older than the retention period.
+    add_sample(timestamp_ms: int, value: float, policy: Optional[str] = None) -> bool:
         Add a new sample to the time series, handling duplicates according to the policy.
+        Appending in timestamp order is O(1); older timestamps are placed with bisect.
     get_sample(timestamp_ms: Optional[int] = None) -> Optional[Tuple[int, float]]:
         Get the sample at or closest to the given timestamp.
-    range(from_ts: int, to_ts: int, aggregation: Optional[TSAggregationType] = None,
-        Get a range of samples with optional downsampling.
+    range(from_ts: int, to_ts: int, aggregation: Optional[TSAggregationType | TSPercentile] = None,
+        Get a range of samples with optional downsampling, including pNN percentiles, in O(log n + k).
     """
+    ENCODING = 'UNCOMPRESSED'
+    # Expired samples are only dropped from the columns once they are at least this many, and half of them
+    COMPACT_MIN_EXPIRED = 1024
+
     def __init__(self, retention_ms: int = 0, duplicate_policy: str = 'LAST'):
-        self.samples = []  # List of (timestamp, value) tuples
         self.retention_ms = retention_ms
         self.duplicate_policy = duplicate_policy
         self.labels = {}  # Metadata labels
-        self.rules = []  # Downsampling rules: (dest_key, aggregation, bucket_size_ms)
+        self.rules = []  # CompactionRule objects
+        self.source_key = None  # Set when this series is the destination of a rule
+        self._init_storage()
+
+    def _init_storage(self):
+        self.timestamps = array('q')
+        self.values = array('d')
+        self.head = 0
+
+    def __setstate__(self, state):
+        # Snapshots taken before the columnar storage hold a sorted list of (timestamp, value) tuples
+        samples = state.pop('samples', None)
+        state.setdefault('source_key', None)  # Added with compaction rules
+        self.__dict__.update(state)
+        if samples is not None:
+            self.timestamps = array('q', [ts for ts, _ in samples])
+            self.values = array('d', [val for _, val in samples])
+            self.head = 0
+
+    @property
+    def samples(self) -> List[Tuple[int, float]]:
+        """The live samples as (timestamp, value) tuples."""
+        timestamps, values, lo, hi = self._columns(_MIN_TIMESTAMP, _MAX_TIMESTAMP)
+        return list(zip(timestamps[lo:hi], values[lo:hi]))
+
+    def __len__(self) -> int:
+        return len(self.timestamps) - self.head
 
     def _cleanup_samples(self, current_time_ms: int):
-        """Remove samples older than retention period."""
+        """Advance head past the samples older than the retention period."""
         if self.retention_ms > 0:
+            timestamps = self.timestamps
             min_timestamp = current_time_ms - self.retention_ms
-            self.samples = [(ts, val) for ts, val in self.samples if ts >= min_timestamp]
-
-    def add_sample(self, timestamp_ms: int, value: float) -> bool:
-        """Add a new sample to the time series."""
-        # Handle duplicate timestamps
-        for i, (ts, _) in enumerate(self.samples):
-            if ts == timestamp_ms:
-                if self.duplicate_policy == 'BLOCK':
-                    return False
-                elif self.duplicate_policy == 'FIRST':
-                    return True
-                else:  # LAST
-                    self.samples[i] = (timestamp_ms, value)
-                    return True
-
-        self.samples.append((timestamp_ms, value))
-        self.samples.sort()  # Keep samples sorted by timestamp
-        
-        # Apply retention policy
-        self._cleanup_samples(timestamp_ms)
+            if timestamps[self.head] < min_timestamp:
+                self.head = bisect_left(timestamps, min_timestamp, self.head)
+                if self.head >= self.COMPACT_MIN_EXPIRED and 2 * self.head >= len(timestamps):
+                    del timestamps[:self.head]
+                    del self.values[:self.head]
+                    self.head = 0
+
+    def add_sample(self, timestamp_ms: int, value: float, policy: Optional[str] = None) -> bool:
+        """Add a new sample to the time series; policy overrides the duplicate policy."""
+        timestamps = self.timestamps
+        if len(timestamps) == self.head or timestamp_ms > timestamps[-1]:
+            # In-order append: the common case
+            timestamps.append(timestamp_ms)
+            self.values.append(value)
+            self._cleanup_samples(timestamp_ms)
+            return True
+
+        if self.retention_ms > 0 and timestamp_ms < timestamps[-1] - self.retention_ms:
+            return False  # Already outside the retention period
+        i = bisect_left(timestamps, timestamp_ms, self.head)
+        if timestamps[i] == timestamp_ms:
+            # Handle duplicate timestamps
+            policy = policy or self.duplicate_policy
+            if policy == 'BLOCK':
+                return False
+            elif policy == 'LAST':
+                self.values[i] = value
+            return True
+        timestamps.insert(i, timestamp_ms)
+        self.values.insert(i, value)
         return True
 
     def get_sample(self, timestamp_ms: Optional[int] = None) -> Optional[Tuple[int, float]]:
         """Get the sample at or closest to the given timestamp."""
-        if not self.samples:
+        timestamps = self.timestamps
+        if len(timestamps) == self.head:
             return None
-            
+
         if timestamp_ms is None:
-            return self.samples[-1]  # Return latest sample
+            return timestamps[-1], self.values[-1]  # Return latest sample
 
-        # Find closest sample
-        closest = min(self.samples, key=lambda x: abs(x[0] - timestamp_ms))
-        return closest
+        return _closest(timestamps, self.values, self.head, timestamp_ms)
+
+    def _columns(self, from_ts: int, to_ts: int) -> Tuple[array, array, int, int]:
+        """Sorted timestamp and value columns, and the slice [lo, hi) of the live samples from from_ts to to_ts."""
+        lo = bisect_left(self.timestamps, from_ts, self.head)
+        hi = bisect_right(self.timestamps, to_ts, lo)
+        return self.timestamps, self.values, lo, hi
 
     def range(self, from_ts: int, to_ts: int, 
-              aggregation: Optional[TSAggregationType] = None,
+              aggregation: Optional[Union[TSAggregationType, TSPercentile]] = None,
               bucket_size_ms: Optional[int] = None) -> List[Tuple[int, float]]:
         """Get range of samples with optional downsampling."""
-        # Filter samples within range
-        filtered = [(ts, val) for ts, val in self.samples if from_ts <= ts <= to_ts]
+        timestamps, values, lo, hi = self._columns(from_ts, to_ts)
         
         if not aggregation or not bucket_size_ms:
-            return filtered
-
-        # Group samples into buckets for downsampling
-        buckets: Dict[int, List[float]] = {}
-        for ts, val in filtered:
-            bucket_ts = (ts // bucket_size_ms) * bucket_size_ms
-            if bucket_ts not in buckets:
-                buckets[bucket_ts] = []
-            buckets[bucket_ts].append(val)
+            return list(zip(timestamps[lo:hi], values[lo:hi]))
 
-        # Apply aggregation function to each bucket
+        # Samples are sorted, so every bucket is a contiguous slice found with bisect
         result = []
-        for ts, values in sorted(buckets.items()):
-            if aggregation == TSAggregationType.AVG:
-                agg_value = statistics.mean(values)
-            elif aggregation == TSAggregationType.SUM:
-                agg_value = sum(values)
-            elif aggregation == TSAggregationType.MIN:
-                agg_value = min(values)
-            elif aggregation == TSAggregationType.MAX:
-                agg_value = max(values)
-            elif aggregation == TSAggregationType.COUNT:
-                agg_value = len(values)
-            elif aggregation == TSAggregationType.FIRST:
-                agg_value = values[0]
-            elif aggregation == TSAggregationType.LAST:
-                agg_value = values[-1]
-            else:
-                agg_value = statistics.mean(values)  # Default to average
-                
-            result.append((ts, agg_value))
-            
+        while lo < hi:
+            bucket_ts = (timestamps[lo] // bucket_size_ms) * bucket_size_ms
+            end = bisect_left(timestamps, bucket_ts + bucket_size_ms, lo, hi)
+            result.append((bucket_ts, aggregate(aggregation, values[lo:end])))
+            lo = end
         return result
 
+class CompressedTimeSeries(TimeSeries):
+    """
+    A TimeSeries whose samples are stored in Gorilla-compressed chunks instead of flat columns,
+    about 1-2 bytes per sample for regular metrics instead of 16.
+    Attributes:
+    -----------
+    chunk_size : int
+        A chunk is sealed and a new one opened once its compressed samples reach this many bytes.
+    chunks : list
+        GorillaChunk objects in timestamp order; the last one is open for appends.
+    chunk_ends : array('q')
+        The last timestamp of every chunk, to bisect for the chunk holding a timestamp.
+    Appending in timestamp order encodes the sample into the open chunk in O(1). Lookups and
+    ranges decode only the chunks they overlap; an out-of-order sample re-encodes its chunk.
+    Retention drops whole chunks, and the expired samples left in the oldest one are skipped.
+    """
+    ENCODING = 'COMPRESSED'
+
+    def __init__(self, retention_ms: int = 0, duplicate_policy: str = 'LAST',
+                 chunk_size: int = TS_DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        super().__init__(retention_ms, duplicate_policy)
+
+    def _init_storage(self):
+        self.chunks = [GorillaChunk()]
+        self.chunk_ends = array('q')
+
+    def __len__(self) -> int:
+        count = sum(chunk.count for chunk in self.chunks)
+        min_timestamp = self._min_timestamp()
+        if self.chunks[0].first_ts < min_timestamp:
+            count -= bisect_left(self.chunks[0].decode()[0], min_timestamp)
+        return count
+
+    def _min_timestamp(self) -> int:
+        """The oldest timestamp within the retention period."""
+        if self.retention_ms > 0 and self.chunk_ends:
+            return self.chunk_ends[-1] - self.retention_ms
+        return _MIN_TIMESTAMP
+
+    def _decode(self, first: int, last: int, until: Optional[int] = None) -> Tuple[array, array]:
+        """Timestamps and values of chunks[first:last], up to until if given."""
+        timestamps, values = array('q'), array('d')
+        for chunk in self.chunks[first:last]:
+            chunk_timestamps, chunk_values = chunk.decode(until)
+            timestamps += chunk_timestamps
+            values += chunk_values
+        return timestamps, values
+
+    def _cleanup_samples(self, current_time_ms: int):
+        """Drop the chunks whose samples are all older than the retention period."""
+        if self.retention_ms > 0:
+            # The open chunk ends at current_time_ms, so it is never dropped
+            expired = bisect_left(self.chunk_ends, current_time_ms - self.retention_ms)
+            if expired:
+                del self.chunks[:expired]
+                del self.chunk_ends[:expired]
+
+    def add_sample(self, timestamp_ms: int, value: float, policy: Optional[str] = None) -> bool:
+        """Add a new sample to the time series; policy overrides the duplicate policy."""
+        chunk_ends = self.chunk_ends
+        if not chunk_ends or timestamp_ms > chunk_ends[-1]:
+            # In-order append: the common case
+            chunk = self.chunks[-1]
+            if chunk.nbytes >= self.chunk_size:
+                chunk.seal()
+                chunk = GorillaChunk()
+                self.chunks.append(chunk)
+            if chunk.count:
+                chunk_ends[-1] = timestamp_ms
+            else:
+                chunk_ends.append(timestamp_ms)
+            chunk.append(timestamp_ms, value)
+            self._cleanup_samples(timestamp_ms)
+            return True
+
+        if self.retention_ms > 0 and timestamp_ms < chunk_ends[-1] - self.retention_ms:
+            return False  # Already outside the retention period
+        i = bisect_left(chunk_ends, timestamp_ms)
+        timestamps, values = self.chunks[i].decode()
+        j = bisect_left(timestamps, timestamp_ms)
+        if timestamps[j] == timestamp_ms:
+            # Handle duplicate timestamps
+            policy = policy or self.duplicate_policy
+            if policy == 'BLOCK':
+                return False
+            elif policy != 'LAST':
+                return True
+            values[j] = value
+        else:
+            timestamps.insert(j, timestamp_ms)
+            values.insert(j, value)
+        chunks = encode_chunks(timestamps, values, self.chunk_size)
+        if i < len(self.chunks) - 1:
+            chunks[-1].seal()
+        self.chunks[i:i + 1] = chunks
+        chunk_ends[i:i + 1] = array('q', [chunk.last_ts for chunk in chunks])
+        return True
+
+    def get_sample(self, timestamp_ms: Optional[int] = None) -> Optional[Tuple[int, float]]:
+        """Get the sample at or closest to the given timestamp."""
+        if not self.chunk_ends:
+            return None
+
+        if timestamp_ms is None:
+            chunk = self.chunks[-1]
+            return chunk.last_ts, chunk.last_value  # Return latest sample
+
+        # The closest sample is in the first chunk ending at or after timestamp_ms, or is the last
+        # sample of the chunk before it
+        min_timestamp = self._min_timestamp()
+        i = min(bisect_left(self.chunk_ends, max(timestamp_ms, min_timestamp)), len(self.chunks) - 1)
+        timestamps, values = self._decode(max(i - 1, 0), i + 1)
+        return _closest(timestamps, values, bisect_left(timestamps, min_timestamp), timestamp_ms)
+
+    def _columns(self, from_ts: int, to_ts: int) -> Tuple[array, array, int, int]:
+        """Decode the chunks overlapping from_ts to to_ts; the slice [lo, hi) holds the live samples in range."""
+        from_ts = max(from_ts, self._min_timestamp())
+        first = last = bisect_left(self.chunk_ends, from_ts)
+        while last < len(self.chunk_ends) and self.chunks[last].first_ts <= to_ts:
+            last += 1
+        timestamps, values = self._decode(first, last, to_ts)
+        lo = bisect_left(timestamps, from_ts)
+        return timestamps, values, lo, bisect_right(timestamps, to_ts, lo)
+
 class TimeSeriesDataType:
     def __init__(self, database):
         self.db = database
@@ -142,13 +422,17 @@ class TimeSeriesDataType:
         return value
 
     def create(self, key: str, retention_ms: int = 0, 
-               duplicate_policy: str = 'LAST', labels: Dict = None) -> bool:
-        """Create a new time series."""
+               duplicate_policy: str = 'LAST', labels: Dict = None,
+               encoding: str = 'UNCOMPRESSED', chunk_size: int = TS_DEFAULT_CHUNK_SIZE) -> bool:
+        """Create a new time series; chunk_size only applies to the COMPRESSED encoding."""
         try:
             if self.db.exists(key):
                 return False
                 
-            ts = TimeSeries(retention_ms, duplicate_policy)
+            if encoding == 'COMPRESSED':
+                ts = CompressedTimeSeries(retention_ms, duplicate_policy, chunk_size)
+            else:
+                ts = TimeSeries(retention_ms, duplicate_policy)
             if labels:
                 ts.labels = labels
                 
@@ -158,7 +442,9 @@ class TimeSeriesDataType:
                 cmd_parts = [
                     "TS.CREATE", key,
                     "RETENTION", str(retention_ms),
-                    "DUPLICATE_POLICY", duplicate_policy
+                    "DUPLICATE_POLICY", duplicate_policy,
+                    "ENCODING", encoding,
+                    "CHUNK_SIZE", str(chunk_size)
                 ]
                 if labels:
                     for k, v in labels.items():
@@ -169,11 +455,91 @@ class TimeSeriesDataType:
         except ValueError:
             return False
 
+    def create_rule(self, source_key: str, dest_key: str, agg_type: str,
+                    bucket_size_ms: int, align_ms: int = 0) -> bool:
+        """Compact source_key into dest_key; raises ValueError when the rule is not allowed."""
+        if source_key == dest_key:
+            raise ValueError("Source and destination keys must differ")
+        if not self.db.exists(source_key) or not self.db.exists(dest_key):
+            raise ValueError("Key does not exist")
+        source, dest = self._ensure_ts(source_key), self._ensure_ts(dest_key)
+        if dest.source_key is not None:
+            raise ValueError("Destination key already has a source rule")
+        if bucket_size_ms <= 0:
+            raise ValueError("Bucket duration must be positive")
+        try:
+            aggregation = parse_aggregation(agg_type)
+        except ValueError:
+            raise ValueError(f"Invalid aggregation type {agg_type}")
+
+        # Rules may chain, but not loop back to the destination
+        ancestor = source
+        while ancestor.source_key is not None:
+            if ancestor.source_key == dest_key:
+                raise ValueError("Rule would create a cycle")
+            ancestor = self.db.get(ancestor.source_key)
+            if not isinstance(ancestor, TimeSeries):
+                break
+
+        source.rules.append(CompactionRule(dest_key, aggregation, bucket_size_ms, align_ms))
+        dest.source_key = source_key
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(
+                f"TS.CREATERULE {source_key} {dest_key} AGGREGATION {agg_type.lower()} {bucket_size_ms} {align_ms}")
+        return True
+
+    def delete_rule(self, source_key: str, dest_key: str) -> bool:
+        """Delete the compaction rule from source_key to dest_key."""
+        source = self.db.get(source_key)
+        if not isinstance(source, TimeSeries):
+            return False
+        for i, rule in enumerate(source.rules):
+            if rule.dest_key == dest_key:
+                del source.rules[i]
+                dest = self.db.get(dest_key)
+                if isinstance(dest, TimeSeries) and dest.source_key == source_key:
+                    dest.source_key = None
+                if not self.db.replaying:
+                    self.db.persistence_manager.log_command(f"TS.DELETERULE {source_key} {dest_key}")
+                return True
+        return False
+
+    def _add_sample(self, ts: TimeSeries, timestamp_ms: int, value: float, policy: Optional[str] = None) -> bool:
+        """Add a sample to ts and run its compaction rules."""
+        latest = ts.get_sample() if ts.rules else None
+        if not ts.add_sample(timestamp_ms, value, policy):
+            return False
+        for rule in ts.rules:
+            bucket_ts = rule.bucket_start(timestamp_ms)
+            if latest is None or timestamp_ms > latest[0]:
+                # In-order sample: O(1) update of the open bucket, or close it and open the next one
+                if bucket_ts == rule.bucket_ts:
+                    rule.add(value)
+                    continue
+                if rule.bucket_ts is not None:
+                    self._write_compaction(rule.dest_key, rule.bucket_ts, rule.value())
+                    rule.open(bucket_ts, [value])
+                    continue
+            # A late sample, or the first one since the rule was created: redo its bucket from the
+            # raw samples, which for a closed bucket also rewrites the destination sample
+            bucket = [val for _, val in ts.range(bucket_ts, bucket_ts + rule.bucket_size_ms - 1)]
+            if bucket_ts == rule.bucket_start(ts.get_sample()[0]):
+                rule.open(bucket_ts, bucket)
+            else:
+                self._write_compaction(rule.dest_key, bucket_ts, aggregate(rule.aggregation, bucket))
+        return True
+
+    def _write_compaction(self, dest_key: str, bucket_ts: int, value: float):
+        """Write a bucket aggregate to the destination of a rule, replacing an earlier one."""
+        dest = self.db.get(dest_key)
+        if isinstance(dest, TimeSeries):
+            self._add_sample(dest, bucket_ts, value, 'LAST')
+
     def add(self, key: str, timestamp_ms: int, value: float) -> bool:
         """Add a sample to the time series."""
         try:
             ts = self._ensure_ts(key)
-            result = ts.add_sample(timestamp_ms, value)
+            result = self._add_sample(ts, timestamp_ms, value)
             
             if result and not self.db.replaying:
                 self.db.persistence_manager.log_command(
@@ -197,7 +563,7 @@ class TimeSeriesDataType:
         """Get range of samples with optional aggregation."""
         try:
             ts = self._ensure_ts(key)
-            aggregation = TSAggregationType(agg_type.lower()) if agg_type else None
+            aggregation = parse_aggregation(agg_type) if agg_type else None
             return ts.range(from_ts, to_ts, aggregation, bucket_size_ms)
         except (ValueError, AttributeError):
             return []
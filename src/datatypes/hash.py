@@ -1,4 +1,9 @@
 from collections import OrderedDict
+import math
+import random
+import time
+
+from datatypes.string import format_float
 
 class HashDataType:
     """
@@ -23,6 +28,17 @@ class HashDataType:
             Delete the specified fields from the hash stored at the key. Returns the number of fields that were removed.
         hexists(key, field):
             Check if the field exists in the hash stored at the key. Returns True if the field exists, False otherwise.
+        hincrby(key, field, increment) / hincrbyfloat(key, field, increment):
+            Increment the numeric value of a field in place and return the new value.
+        hmget(key, *fields), hlen(key), hkeys(key), hvals(key), hstrlen(key, field):
+            Read several fields, the number of fields, all fields, all values, or the length of a value.
+        hsetnx(key, field, value):
+            Set a field only if it does not exist yet.
+        hrandfield(key, count=None, withvalues=False):
+            Return random fields, following the SRANDMEMBER count semantics.
+        hexpire(key, seconds, fields, condition=None) / httl(key, fields) / hpersist(key, fields):
+            Per-field expiration. Field deadlines are kept in database.field_expiry and indexed by
+            the ExpiryManager together with key deadlines; reads also drop expired fields lazily.
     """
     def __init__(self, database):
         self.db = database
@@ -31,43 +47,94 @@ class HashDataType:
         """Create a new hash at key."""
         hash_dict = {}
         self.db.store[key] = hash_dict
+        # A previous value at key may have left field deadlines behind
+        self.db.expiry_manager.clear_fields(key)
         return hash_dict
 
-    def _validate_hash(self, key):
-        """Validate if key exists and holds a hash."""
+    def _validate_hash(self, key, fields=None):
+        """
+        Validate if key exists and holds a hash. Expired fields are dropped first: only the
+        given fields, or every field with a deadline when fields is None.
+        """
         if not self.db.exists(key):
             return None
         value = self.db.store.get(key)
         if not isinstance(value, dict):
             raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        if key in self.db.field_expiry:
+            return self._expire_fields(key, value, fields)
         return value
 
+    def _expire_fields(self, key, hash_dict, fields=None):
+        """Remove expired fields of the hash at key. Returns the hash, or None if it became empty."""
+        deadlines = self.db.field_expiry[key]
+        now = time.time()
+        candidates = deadlines if fields is None else [field for field in fields if field in deadlines]
+        expired = [field for field in candidates if deadlines[field] <= now]
+        if not expired:
+            return hash_dict
+        for field in expired:
+            hash_dict.pop(field, None)
+            deadlines.pop(field, None)
+        if not deadlines:
+            del self.db.field_expiry[key]
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"HDEL {key} {' '.join(expired)}")
+        if not hash_dict:
+            self.db.delete(key)
+            return None
+        return hash_dict
+
     def hset(self, key, field, value):
-        """Set field in hash stored at key to value."""
+        """Set field in hash stored at key to value. Overwriting a field clears its expiration."""
         try:
-            hash_dict = self._validate_hash(key) or self._create_hash(key)
+            hash_dict = self._validate_hash(key, (field,)) or self._create_hash(key)
             is_new = field not in hash_dict
             hash_dict[field] = str(value)
+            self.db.expiry_manager.persist_field(key, field)
             if not self.db.replaying:
                 self.db.persistence_manager.log_command(f"HSET {key} {field} {value}")
             return 1 if is_new else 0
         except ValueError as e:
             return str(e)
 
+    def hsetnx(self, key, field, value):
+        """Set field in hash stored at key only if it does not exist. Returns 1 if it was set."""
+        try:
+            hash_dict = self._validate_hash(key, (field,))
+            if hash_dict and field in hash_dict:
+                return 0
+            return self.hset(key, field, value)
+        except ValueError as e:
+            return str(e)
+
     def hget(self, key, field):
         """Get value of field in hash stored at key."""
         try:
-            hash_dict = self._validate_hash(key)
+            hash_dict = self._validate_hash(key, (field,))
             return hash_dict.get(field) if hash_dict else None
         except ValueError as e:
             return str(e)
 
+    def hmget(self, key, *fields):
+        """Get the values of fields in hash stored at key; missing fields are returned as None."""
+        try:
+            hash_dict = self._validate_hash(key, fields)
+            if not hash_dict:
+                return [None] * len(fields)
+            return [hash_dict.get(field) for field in fields]
+        except ValueError as e:
+            return str(e)
+
     def hmset(self, key, mapping):
         """Set multiple field-value pairs in hash stored at key."""
         try:
-            hash_dict = self._validate_hash(key) or self._create_hash(key)
+            hash_dict = self._validate_hash(key, mapping) or self._create_hash(key)
             for field, value in mapping.items():
                 hash_dict[field] = str(value)
+            if key in self.db.field_expiry:
+                for field in mapping:
+                    self.db.expiry_manager.persist_field(key, field)
             if not self.db.replaying:
                 fields_values = ' '.join(f"{k} {v}" for k, v in mapping.items())
                 self.db.persistence_manager.log_command(f"HMSET {key} {fields_values}")
@@ -75,6 +142,48 @@ class HashDataType:
         except ValueError as e:
             return str(e)
 
+    def hincrby(self, key, field, increment):
+        """Increment the integer value of field in hash stored at key. Returns the new value."""
+        try:
+            hash_dict = self._validate_hash(key, (field,))
+            try:
+                value = int(hash_dict.get(field, 0)) if hash_dict else 0
+            except ValueError:
+                return "ERR hash value is not an integer"
+            value += increment
+            if not -2**63 <= value < 2**63:
+                return "ERR increment or decrement would overflow"
+            if hash_dict is None:
+                hash_dict = self._create_hash(key)
+            hash_dict[field] = str(value)
+            if not self.db.replaying:
+                self.db.persistence_manager.log_command(f"HINCRBY {key} {field} {increment}")
+            return value
+        except ValueError as e:
+            return str(e)
+
+    def hincrbyfloat(self, key, field, increment):
+        """Increment the float value of field in hash stored at key. Returns the new value as a string."""
+        try:
+            hash_dict = self._validate_hash(key, (field,))
+            try:
+                value = float(hash_dict.get(field, 0)) if hash_dict else 0.0
+            except ValueError:
+                return "ERR hash value is not a float"
+            value += increment
+            if math.isnan(value) or math.isinf(value):
+                return "ERR increment would produce NaN or Infinity"
+            if hash_dict is None:
+                hash_dict = self._create_hash(key)
+            formatted = format_float(value)
+            hash_dict[field] = formatted
+            if not self.db.replaying:
+                # Log the resulting value so that replay does not accumulate rounding differences
+                self.db.persistence_manager.log_command(f"HSET {key} {field} {formatted}")
+            return formatted
+        except ValueError as e:
+            return str(e)
+
     def hgetall(self, key):
         """Get all field-value pairs in hash stored at key."""
         try:
@@ -89,16 +198,77 @@ class HashDataType:
         except ValueError as e:
             return str(e)
 
+    def hlen(self, key):
+        """Return the number of fields in hash stored at key."""
+        try:
+            hash_dict = self._validate_hash(key)
+            return len(hash_dict) if hash_dict else 0
+        except ValueError as e:
+            return str(e)
+
+    def hkeys(self, key):
+        """Return all fields in hash stored at key."""
+        try:
+            hash_dict = self._validate_hash(key)
+            return list(hash_dict) if hash_dict else []
+        except ValueError as e:
+            return str(e)
+
+    def hvals(self, key):
+        """Return all values in hash stored at key."""
+        try:
+            hash_dict = self._validate_hash(key)
+            return list(hash_dict.values()) if hash_dict else []
+        except ValueError as e:
+            return str(e)
+
+    def hstrlen(self, key, field):
+        """Return the length of the value of field in hash stored at key (0 if missing)."""
+        try:
+            hash_dict = self._validate_hash(key, (field,))
+            return len(hash_dict.get(field, "")) if hash_dict else 0
+        except ValueError as e:
+            return str(e)
+
+    def hrandfield(self, key, count=None, withvalues=False):
+        """
+        Return a random field, or a list of count fields when count is given: distinct fields
+        for a positive count, fields drawn with replacement for a negative count. With
+        withvalues the list alternates fields and values.
+        """
+        try:
+            hash_dict = self._validate_hash(key)
+            if count is None:
+                return random.choice(list(hash_dict)) if hash_dict else None
+            if not hash_dict or count == 0:
+                return []
+            fields = list(hash_dict)
+            if count >= len(fields):
+                picked = fields
+            elif count > 0:
+                picked = random.sample(fields, count)
+            else:
+                picked = random.choices(fields, k=-count)
+            if not withvalues:
+                return picked
+            result = []
+            for field in picked:
+                result.extend([field, hash_dict[field]])
+            return result
+        except ValueError as e:
+            return str(e)
+
     def hdel(self, key, *fields):
         """Delete fields from hash stored at key."""
         try:
-            hash_dict = self._validate_hash(key)
+            hash_dict = self._validate_hash(key, fields)
             if not hash_dict:
                 return 0
             count = 0
             for field in fields:
                 if field in hash_dict:
                     del hash_dict[field]
+                    self.db.expiry_manager.persist_field(key, field)
                     count += 1
             if count > 0:
                 if len(hash_dict) == 0:
@@ -112,7 +282,84 @@ class HashDataType:
     def hexists(self, key, field):
         """Check if field exists in hash stored at key."""
         try:
-            hash_dict = self._validate_hash(key)
+            hash_dict = self._validate_hash(key, (field,))
             return bool(hash_dict and field in hash_dict)
         except ValueError:
             return False
+
+    def hexpire(self, key, seconds, fields, condition=None):
+        """
+        Set a time to live of seconds on fields of the hash stored at key. condition is one of
+        NX (only fields without a TTL), XX (only fields with a TTL), GT or LT (only if the new
+        TTL is greater / less than the current one; no TTL counts as infinite).
+        Returns, per field: -2 if the field does not exist, 0 if the condition was not met,
+        1 if the TTL was set, 2 if the field was deleted because seconds is 0.
+        """
+        try:
+            hash_dict = self._validate_hash(key, fields)
+            if not hash_dict:
+                return [-2] * len(fields)
+            deadline = time.time() + seconds
+            result = []
+            deleted = []
+            for field in fields:
+                if field not in hash_dict:
+                    result.append(-2)
+                    continue
+                current = self.db.expiry_manager.field_deadline(key, field)
+                if ((condition == 'NX' and current is not None) or
+                        (condition == 'XX' and current is None) or
+                        (condition == 'GT' and (current is None or deadline <= current)) or
+                        (condition == 'LT' and current is not None and deadline >= current)):
+                    result.append(0)
+                elif seconds <= 0:
+                    deleted.append(field)
+                    result.append(2)
+                else:
+                    self.db.expiry_manager.set_field_expiry(key, field, deadline)
+                    result.append(1)
+            if deleted:
+                self.hdel(key, *deleted)
+            return result
+        except ValueError as e:
+            return str(e)
+
+    def httl(self, key, fields):
+        """
+        Return, per field, the remaining time to live in seconds: -2 if the field does not
+        exist, -1 if it has no expiration.
+        """
+        try:
+            hash_dict = self._validate_hash(key, fields)
+            if not hash_dict:
+                return [-2] * len(fields)
+            now = time.time()
+            result = []
+            for field in fields:
+                if field not in hash_dict:
+                    result.append(-2)
+                    continue
+                deadline = self.db.expiry_manager.field_deadline(key, field)
+                result.append(-1 if deadline is None else math.ceil(deadline - now))
+            return result
+        except ValueError as e:
+            return str(e)
+
+    def hpersist(self, key, fields):
+        """
+        Remove the expiration of fields. Returns, per field: -2 if the field does not exist,
+        -1 if it had no expiration, 1 if the expiration was removed.
+        """
+        try:
+            hash_dict = self._validate_hash(key, fields)
+            if not hash_dict:
+                return [-2] * len(fields)
+            result = []
+            for field in fields:
+                if field not in hash_dict:
+                    result.append(-2)
+                else:
+                    result.append(1 if self.db.expiry_manager.persist_field(key, field) else -1)
+            return result
+        except ValueError as e:
+            return str(e)
@@ -1,21 +1,41 @@
+from collections import deque
+from itertools import islice
+
 class ListDataType:
     """
     ListDataType is a class that provides list-like operations for an in-memory data store.
     It ensures that the values associated with keys are lists and provides methods to manipulate these lists.
+    Lists are stored as collections.deque, a doubly linked chain of fixed-size blocks (like the
+    Redis quicklist): pushes and pops at both ends are O(1), and indexing walks blocks from the
+    nearer end.
     Methods:
         __init__(database):
             Initializes the ListDataType with a reference to the database.
         _ensure_list(key):
             Ensures that the value at the given key is a list. If the key does not exist, it initializes it with an empty list.
             Raises a ValueError if the value at the key is not a list.
+        _get_list(key):
+            Returns the list at the given key, or None if the key does not exist.
         lpush(key, *values):
             Pushes values to the head of the list at the given key. Returns the length of the list after the operation.
         rpush(key, *values):
             Pushes values to the tail of the list at the given key. Returns the length of the list after the operation.
-        lpop(key):
-            Removes and returns the first element of the list at the given key. If the list becomes empty, the key is deleted.
-        rpop(key):
-            Removes and returns the last element of the list at the given key. If the list becomes empty, the key is deleted.
+        lpop(key, count=None):
+            Removes and returns the first element (or up to count elements) of the list at the given key. If the list becomes empty, the key is deleted.
+        rpop(key, count=None):
+            Removes and returns the last element (or up to count elements) of the list at the given key. If the list becomes empty, the key is deleted.
+        llen(key):
+            Returns the length of the list at the given key.
+        ltrim(key, start, stop):
+            Trims the list to the given inclusive range, dropping elements in bulk from both ends.
+        lrem(key, count, value):
+            Removes up to count occurrences of value (from the tail if count is negative, all if 0).
+        linsert(key, where, pivot, value):
+            Inserts value before or after the first occurrence of pivot.
+        lpos(key, element, rank=1, count=None, maxlen=0):
+            Returns the index (or indexes) of matching elements, scanning at most maxlen elements.
+        lmpop(keys, where, count=1):
+            Pops up to count elements from the first non-empty list among keys.
         lrange(key, start, stop):
             Returns a range of elements from the list at the given key, from the start index to the stop index (inclusive).
             Handles negative indices and ensures bounds. If the value at the key is not a list or indices are invalid, returns an error message.
@@ -23,29 +43,40 @@ class ListDataType:
             Returns the element at the given index from the list at the given key. Handles negative indices.
         lset(key, index, value):
             Sets the element at the given index to the specified value in the list at the given key. Handles negative indices.
+        lmove(source, destination, wherefrom, whereto):
+            Atomically pops an element from one end of source and pushes it to one end of destination.
     """
     def __init__(self, database):
         self.db = database
 
     def _ensure_list(self, key):
-        """Ensure the value at key is a list."""
+        """Ensure the value at key is a list, upgrading plain lists from older snapshots."""
         value = self.db.store.get(key) 
         if value is None:
-            value = []
+            value = deque()
             self.db.store[key] = value
             return value
-        if not isinstance(value, list):
+        if isinstance(value, list):
+            value = deque(value)
+            self.db.store[key] = value
+        elif not isinstance(value, deque):
             raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
         return value
 
+    def _get_list(self, key):
+        """Return the list at key without creating it, or None if the key does not exist."""
+        if key not in self.db.store:
+            return None
+        return self._ensure_list(key)
+
     def lpush(self, key, *values):
         """Push values to the head of the list."""
         if not values:
             return 0
         try:
             current = self._ensure_list(key)
-            for value in reversed(values):
-                current.insert(0, value)  # Store as-is without str() conversion
+            current.extendleft(values)  # Each value becomes the new head, as in Redis
+            self.db.blocking_manager.signal_key_ready(key)
             return len(current)
         except ValueError as e:
             return str(e)
@@ -56,42 +87,43 @@ class ListDataType:
             return 0
         try:
             current = self._ensure_list(key)
-            for value in values:
-                current.append(value)  # Store as-is without str() conversion
+            current.extend(values)  # Store as-is without str() conversion
+            self.db.blocking_manager.signal_key_ready(key)
             return len(current)
         except ValueError as e:
             return str(e)
 
-    def lpop(self, key):
-        """Remove and return the first element of the list."""
+    def _pop(self, key, count, left):
+        """Pop one element, or a list of up to count elements, from one end of the list."""
         try:
-            current = self._ensure_list(key)
+            current = self._get_list(key)
             if not current:
                 return None
-            value = current.pop(0)
+            pop = current.popleft if left else current.pop
+            if count is None:
+                value = pop()
+            else:
+                value = [pop() for _ in range(min(count, len(current)))]
             if len(current) == 0:
                 self.db.delete(key)  # Delete key if list becomes empty
             return value
         except ValueError as e:
             return str(e)
 
-    def rpop(self, key):
-        """Remove and return the last element of the list."""
-        try:
-            current = self._ensure_list(key)
-            if not current:
-                return None
-            value = current.pop()
-            if len(current) == 0:
-                self.db.delete(key)  # Delete key if list becomes empty
-            return value
-        except ValueError as e:
-            return str(e)
+    def lpop(self, key, count=None):
+        """Remove and return the first element of the list, or up to count elements."""
+        return self._pop(key, count, left=True)
+
+    def rpop(self, key, count=None):
+        """Remove and return the last element of the list, or up to count elements."""
+        return self._pop(key, count, left=False)
 
     def lrange(self, key, start, stop):
         """Get a range of elements from the list."""
         try:
-            current = self._ensure_list(key)
+            current = self._get_list(key)
+            if current is None:
+                return []
             start = int(start)
             stop = int(stop)
             
@@ -113,14 +145,21 @@ class ListDataType:
             if start > stop or start >= length:
                 return []
                 
-            return current[start:stop]
+            # Walk from the nearer end so ranges at the tail stay cheap
+            if start > length - stop:
+                result = list(islice(reversed(current), length - stop, length - start))
+                result.reverse()
+                return result
+            return list(islice(current, start, stop))
         except (ValueError, TypeError):
             return "ERR value is not an integer or out of range"
 
     def lindex(self, key, index):
         """Get an element from the list by its index."""
         try:
-            current = self._ensure_list(key)
+            current = self._get_list(key)
+            if current is None:
+                return None
             index = int(index)
             # Handle negative indices
             if index < 0:
@@ -134,7 +173,9 @@ class ListDataType:
     def lset(self, key, index, value):
         """Set the list element at index to value."""
         try:
-            current = self._ensure_list(key)
+            current = self._get_list(key)
+            if current is None:
+                return "ERR no such key"
             index = int(index)
             # Handle negative indices
             if index < 0:
@@ -145,3 +186,173 @@ class ListDataType:
             return "ERR index out of range"
         except ValueError as e:
             return str(e)
+
+    def lmove(self, source, destination, wherefrom='LEFT', whereto='RIGHT'):
+        """Pop an element from one end of source and push it to one end of destination."""
+        try:
+            current = self._get_list(source)
+            if destination in self.db.store:
+                self._ensure_list(destination)  # Check the type before popping
+            if not current:
+                return None
+            value = current.popleft() if wherefrom.upper() == 'LEFT' else current.pop()
+            if not current:
+                self.db.delete(source)
+            target = self._ensure_list(destination)
+            if whereto.upper() == 'LEFT':
+                target.appendleft(value)
+            else:
+                target.append(value)
+            self.db.blocking_manager.signal_key_ready(destination)
+            return value
+        except ValueError as e:
+            return str(e)
+
+    def llen(self, key):
+        """Get the length of the list."""
+        try:
+            current = self._get_list(key)
+            return len(current) if current is not None else 0
+        except ValueError as e:
+            return str(e)
+
+    def ltrim(self, key, start, stop):
+        """Trim the list to the elements between start and stop (inclusive)."""
+        try:
+            current = self._get_list(key)
+            if current is None:
+                return "OK"
+            length = len(current)
+            start, stop = int(start), int(stop)
+            if start < 0:
+                start = max(0, length + start)
+            if stop < 0:
+                stop = length + stop
+            stop = min(stop, length - 1)
+            if start > stop:
+                self.db.delete(key)
+                return "OK"
+
+            drop_head, drop_tail = start, length - 1 - stop
+            if drop_head + drop_tail <= stop - start + 1:
+                # Fewer elements go than stay (e.g. LPUSH + LTRIM capped logs): pop them
+                for _ in range(drop_head):
+                    current.popleft()
+                for _ in range(drop_tail):
+                    current.pop()
+            else:
+                # Most elements go: copy the survivors and release the old blocks at once
+                self.db.store[key] = deque(islice(current, start, stop + 1))
+            return "OK"
+        except ValueError as e:
+            return str(e)
+
+    def lrem(self, key, count, value):
+        """Remove up to count occurrences of value; count < 0 removes from the tail and 0 removes all."""
+        try:
+            current = self._get_list(key)
+            if current is None:
+                return 0
+            count = int(count)
+            if count in (1, -1):
+                # Single removal: deque.remove stops at the first match
+                if count < 0:
+                    current.reverse()
+                try:
+                    current.remove(value)
+                    removed = 1
+                except ValueError:
+                    removed = 0
+                if count < 0:
+                    current.reverse()
+            else:
+                limit = abs(count) or len(current)
+                kept = []
+                removed = 0
+                for item in (reversed(current) if count < 0 else current):
+                    if removed < limit and item == value:
+                        removed += 1
+                    else:
+                        kept.append(item)
+                if removed:
+                    if count < 0:
+                        kept.reverse()
+                    current.clear()
+                    current.extend(kept)
+            if not current:
+                self.db.delete(key)
+            return removed
+        except ValueError as e:
+            return str(e)
+
+    def linsert(self, key, where, pivot, value):
+        """Insert value before or after pivot. Returns the new length, -1 if pivot is missing."""
+        try:
+            current = self._get_list(key)
+            if current is None:
+                return 0
+            try:
+                index = current.index(pivot)
+            except ValueError:
+                return -1
+            current.insert(index if where.upper() == 'BEFORE' else index + 1, value)
+            return len(current)
+        except ValueError as e:
+            return str(e)
+
+    def lpos(self, key, element, rank=1, count=None, maxlen=0):
+        """
+        Return the index of the rank-th match of element (negative rank scans from the tail),
+        or a list of up to count indexes when count is given (0 means all matches).
+        At most maxlen elements are compared when maxlen is not 0.
+        """
+        try:
+            current = self._get_list(key)
+            if current is None:
+                return None if count is None else []
+            length = len(current)
+            scan = min(maxlen, length) if maxlen else length
+            wanted = 1 if count is None else (count or length)
+            skip = abs(rank) - 1
+            matches = []
+
+            if rank > 0:
+                # deque.index scans in C between matches
+                position = 0
+                while len(matches) < wanted:
+                    try:
+                        position = current.index(element, position, scan)
+                    except ValueError:
+                        break
+                    if skip:
+                        skip -= 1
+                    else:
+                        matches.append(position)
+                    position += 1
+            else:
+                for offset, item in enumerate(islice(reversed(current), scan)):
+                    if item == element:
+                        if skip:
+                            skip -= 1
+                            continue
+                        matches.append(length - 1 - offset)
+                        if len(matches) == wanted:
+                            break
+
+            if count is None:
+                return matches[0] if matches else None
+            return matches
+        except ValueError as e:
+            return str(e)
+
+    def lmpop(self, keys, where='LEFT', count=1):
+        """Pop up to count elements from the first non-empty list. Returns [key, elements] or None."""
+        left = where.upper() == 'LEFT'
+        for key in keys:
+            try:
+                value = self._get_list(key)
+            except ValueError as e:
+                return str(e)
+            if value:
+                return [key, self._pop(key, count, left)]
+        return None
@@ -1,22 +1,171 @@
+from itertools import filterfalse
+import random
+
+class IndexedSet:
+    """
+    IndexedSet is the storage for Redis sets: a dict maps every member to its position in a
+    dense list of members. Membership tests go through the dict in O(1), and the list allows
+    picking a random member in O(1). Removing a member moves the last member into the freed
+    slot (swap-remove), so the list never has holes.
+    """
+    __slots__ = ('_index', '_members')
+
+    def __init__(self, members=()):
+        self._members = list(dict.fromkeys(members))
+        self._index = {member: position for position, member in enumerate(self._members)}
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, member):
+        return member in self._index
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __repr__(self):
+        return f"IndexedSet({self._members!r})"
+
+    def __getstate__(self):
+        """Pickle only the member list; the index is rebuilt on load."""
+        return self._members
+
+    def __setstate__(self, members):
+        self.__init__(members)
+
+    def add(self, member):
+        """Add member. Returns True if it was not present."""
+        if member in self._index:
+            return False
+        self._index[member] = len(self._members)
+        self._members.append(member)
+        return True
+
+    def discard(self, member):
+        """Remove member in O(1) by moving the last member into its slot. Returns True if it was present."""
+        position = self._index.pop(member, None)
+        if position is None:
+            return False
+        last = self._members.pop()
+        if position < len(self._members):
+            self._members[position] = last
+            self._index[last] = position
+        return True
+
+    def contains(self):
+        """Return the bound membership test, for probing with filter() at C speed."""
+        return self._index.__contains__
+
+    def members(self):
+        """Return a copy of the members as a list."""
+        return list(self._members)
+
+    def random_member(self):
+        """Return a random member in O(1)."""
+        return self._members[random.randrange(len(self._members))]
+
+    def sample(self, count):
+        """Return count distinct random members (all members if count exceeds the size)."""
+        if count >= len(self._members):
+            return list(self._members)
+        return random.sample(self._members, count)
+
+    def choices(self, count):
+        """Return count random members drawn with replacement."""
+        return random.choices(self._members, k=count)
+
+    def pop_random(self):
+        """Remove and return a random member in O(1)."""
+        member = self.random_member()
+        self.discard(member)
+        return member
+
 class SetDataType:
     """
     SetDataType provides a Redis-like in-memory data store for set operations.
-    This class implements various set operations using hash tables (Python's built-in set) 
-    for O(1) average time complexity for lookups, insertions, and deletions.
+    Sets are stored as IndexedSet: a hash table for O(1) average time complexity for lookups,
+    insertions, and deletions, plus a dense member array for O(1) random sampling.
+    Intersections always iterate the smallest set and probe the others, so their cost
+    depends on the smallest input rather than on the argument order.
     """
     def __init__(self, database):
         self.db = database
 
+    def _check_set(self, key, value):
+        """Validate the type of a stored value, upgrading plain sets from older snapshots."""
+        if isinstance(value, IndexedSet):
+            return value
+        if isinstance(value, set):
+            value = IndexedSet(value)
+            self.db.store[key] = value
+            return value
+        raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+
     def _ensure_set(self, key):
         """Ensure the value at key is a set."""
         value = self.db.store.get(key)
         if value is None:
-            value = set()
+            value = IndexedSet()
             self.db.store[key] = value
             return value
-        if not isinstance(value, set):
-            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
-        return value
+        return self._check_set(key, value)
+
+    def _get_set(self, key):
+        """Return the set at key with a single lookup, or None if the key does not exist."""
+        value = self.db.store.get(key)
+        if value is None:
+            return None
+        if key in self.db.expiry and not self.db.exists(key):
+            return None
+        return self._check_set(key, value)
+
+    def _get_sets(self, keys):
+        """Return the sets at keys; missing keys are returned as None."""
+        return [self._get_set(key) for key in keys]
+
+    def _intersect(self, keys):
+        """Intersect the sets at keys, smallest first, stopping as soon as the result is empty."""
+        sets = self._get_sets(keys)
+        if not sets or any(current is None for current in sets):
+            return []
+        sets.sort(key=len)
+        result = sets[0].members()
+        for other in sets[1:]:
+            if not result:
+                break
+            result = list(filter(other.contains(), result))
+        return result
+
+    def _union(self, keys):
+        """Union of the sets at keys."""
+        sets = [current for current in self._get_sets(keys) if current is not None]
+        if len(sets) == 1:
+            return sets[0].members()
+        return list(set().union(*sets))
+
+    def _difference(self, keys):
+        """Members of the first set that are in none of the others."""
+        first, *others = self._get_sets(keys)
+        if not first:
+            return []
+        result = first.members()
+        for other in others:
+            if not result:
+                break
+            if other:
+                result = list(filterfalse(other.contains(), result))
+        return result
+
+    def _store(self, command, destination, keys, members):
+        """Replace destination with members and log the STORE command itself."""
+        self.db.expiry.pop(destination, None)
+        if members:
+            self.db.store[destination] = IndexedSet(members)
+        else:
+            self.db.store.pop(destination, None)
+        if not self.db.replaying:
+            self.db.persistence_manager.log_command(f"{command} {destination} {' '.join(keys)}")
+        return len(members)
 
     def sadd(self, key, *members):
         """Add one or more members to a set."""
@@ -24,8 +173,7 @@ class SetDataType:
             current = self._ensure_set(key)
             count = 0
             for member in members:
-                if member not in current:  # Use direct comparison
-                    current.add(member)
+                if current.add(member):
                     count += 1
             if count > 0:
                 if not self.db.replaying:
@@ -42,8 +190,7 @@ class SetDataType:
             current = self._ensure_set(key)
             count = 0
             for member in members:
-                if member in current:
-                    current.remove(member)
+                if current.discard(member):
                     count += 1
             if count > 0:
                 if len(current) == 0:
@@ -67,36 +214,63 @@ class SetDataType:
     def smembers(self, key):
         """Return all members of the set."""
         try:
-            if not self.db.exists(key):
-                return set()
-            return self._ensure_set(key)
+            current = self._get_set(key)
+            return current.members() if current is not None else []
+        except ValueError as e:
+            return str(e)
+
+    def srandmember(self, key, count=None):
+        """
+        Return a random member, or a list of count members when count is given: distinct
+        members for a positive count, members drawn with replacement for a negative count.
+        """
+        try:
+            current = self._get_set(key)
+            if count is None:
+                return current.random_member() if current else None
+            if not current or count == 0:
+                return []
+            if count > 0:
+                return current.sample(count)
+            return current.choices(-count)
+        except ValueError as e:
+            return str(e)
+
+    def spop(self, key, count=None):
+        """Remove and return a random member, or a list of up to count distinct random members."""
+        try:
+            current = self._get_set(key)
+            if not current:
+                return None if count is None else []
+            if count is None:
+                popped = [current.pop_random()]
+            elif count >= len(current):
+                popped = current.members()
+                current = IndexedSet()
+            else:
+                popped = [current.pop_random() for _ in range(count)]
+
+            if popped:
+                if len(current) == 0:
+                    self.db.delete(key)
+                # Log the members that were actually removed so replay is deterministic
+                if not self.db.replaying:
+                    self.db.persistence_manager.log_command(f"SREM {key} {' '.join(str(m) for m in popped)}")
+            return popped[0] if count is None else popped
         except ValueError as e:
             return str(e)
 
     def sinter(self, *keys):
         """Return the intersection of multiple sets."""
         try:
-            if not keys:
-                return set()
-            sets = []
-            for key in keys:
-                if not self.db.exists(key):
-                    return set()
-                sets.append(self._ensure_set(key))
-            return sets[0].intersection(*sets[1:]) if sets else set()
+            return self._intersect(keys)
         except ValueError as e:
             return str(e)
 
     def sunion(self, *keys):
         """Return the union of multiple sets."""
         try:
-            if not keys:
-                return set()
-            sets = []
-            for key in keys:
-                if self.db.exists(key):
-                    sets.append(self._ensure_set(key))
-            return sets[0].union(*sets[1:]) if sets else set()
+            return self._union(keys)
         except ValueError as e:
             return str(e)
 
@@ -104,14 +278,56 @@ class SetDataType:
         """Return the difference of multiple sets."""
         try:
             if not keys:
-                return set()
-            if not self.db.exists(keys[0]):
-                return set()
-            first_set = self._ensure_set(keys[0])
-            other_sets = []
-            for key in keys[1:]:
-                if self.db.exists(key):
-                    other_sets.append(self._ensure_set(key))
-            return first_set.difference(*other_sets) if other_sets else first_set
+                return []
+            return self._difference(keys)
+        except ValueError as e:
+            return str(e)
+
+    def sintercard(self, keys, limit=0):
+        """
+        Return the size of the intersection without building it. The smallest set is
+        iterated and every member probed in the others; with a limit the scan stops
+        as soon as limit common members were found.
+        """
+        try:
+            sets = self._get_sets(keys)
+            if not sets or any(current is None for current in sets):
+                return 0
+            sets.sort(key=len)
+            smallest = sets[0]
+            probes = [other.contains() for other in sets[1:]]
+            if not limit and len(probes) == 1:
+                return sum(1 for _ in filter(probes[0], smallest))
+            count = 0
+            for member in smallest:
+                for contains in probes:
+                    if not contains(member):
+                        break
+                else:
+                    count += 1
+                    if count == limit:
+                        break
+            return count
+        except ValueError as e:
+            return str(e)
+
+    def sinterstore(self, destination, *keys):
+        """Store the intersection of the sets at keys in destination. Returns its size."""
+        try:
+            return self._store("SINTERSTORE", destination, keys, self._intersect(keys))
+        except ValueError as e:
+            return str(e)
+
+    def sunionstore(self, destination, *keys):
+        """Store the union of the sets at keys in destination. Returns its size."""
+        try:
+            return self._store("SUNIONSTORE", destination, keys, self._union(keys))
+        except ValueError as e:
+            return str(e)
+
+    def sdiffstore(self, destination, *keys):
+        """Store the difference of the sets at keys in destination. Returns its size."""
+        try:
+            return self._store("SDIFFSTORE", destination, keys, self._difference(keys))
         except ValueError as e:
             return str(e)
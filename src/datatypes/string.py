@@ -1,6 +1,22 @@
+import math
+
+from datatypes.advanced.roaring import RoaringBitmap
+
+# Largest string Redis accepts (proto-max-bulk-len)
+MAX_STRING_LENGTH = 512 * 1024 * 1024
+
+def format_float(value):
+    """Format a float result the way Redis prints it: shortest repr, whole numbers without '.0'."""
+    formatted = repr(value)
+    if formatted.endswith('.0'):
+        formatted = formatted[:-2]
+    return formatted
+
 class StringDataType:
     """
     A class to represent string data type operations in an in-memory data store.
+    Strings written by SET are stored as str; APPEND, SETRANGE, GETRANGE and STRLEN switch a
+    value to a mutable bytearray (see KeyValueStore.get_buffer) and then work on it in place.
     Attributes:
     ----------
     database : object
@@ -21,29 +37,48 @@ class StringDataType:
         Decrements the integer value of the specified key by a given amount.
     getrange(key, start, end):
         Returns a substring of the string stored at the specified key, based on the provided start and end indices.
+    getrange_view(key, start, end):
+        Returns the same range as a zero-copy memoryview of the stored bytes.
     setrange(key, offset, value):
         Overwrites part of the string stored at the specified key, starting at the given offset.
+    mget(*keys) / mset(mapping) / msetnx(mapping):
+        Read or write several keys in one call; MSET is logged as a single AOF record.
+    getset(key, value) / getdel(key) / getex(key, deadline=None, persist=False):
+        Return the current value and replace it, delete the key, or change its expiration.
+    setnx(key, value):
+        Sets the key only if it does not exist.
+    incrbyfloat(key, increment):
+        Increments the float value of the specified key by a given amount.
     """
     def __init__(self, database):
         self.database = database
 
     def append(self, key, value):
-        """Append a value to the string stored at key."""
-        existing_value = self.database.get(key) or ""
-        if not isinstance(existing_value, str):
+        """
+        Append a value to the string stored at key. The bytes are appended to the key's
+        bytearray in place; bytearray over-allocates geometrically, so appends are
+        amortized O(1) instead of copying the whole string every time.
+        """
+        try:
+            buffer = self.database.get_buffer(key, create=True)
+        except ValueError:
             return "ERROR: Value at key is not a string"
-        new_value = existing_value + value
-        self.database.set(key, new_value)
-        return len(new_value)
+        buffer += str(value).encode('utf-8', 'surrogateescape')
+        if not self.database.replaying:
+            self.database.persistence_manager.log_command(f"APPEND {key} {value}")
+        return len(buffer)
 
     def strlen(self, key):
         """Get the length of the string stored at key."""
-        value = self.database.get(key)
-        if value is None:
-            return 0
-        if not isinstance(value, str):
+        value = self.database.store.get(key)
+        if isinstance(value, RoaringBitmap) and self.database.exists(key):
+            # A sparse bitmap knows its length; do not materialize it
+            return len(value)
+        try:
+            buffer = self.database.get_buffer(key)
+        except ValueError:
             return "ERROR: Value at key is not a string"
-        return len(value)
+        return len(buffer) if buffer is not None else 0
 
     def incr(self, key):
         """Increment the integer value of a key by 1."""
@@ -69,54 +104,136 @@ class StringDataType:
 
     def getrange(self, key, start, end):
         """Get a substring of the string stored at key."""
+        view = self.getrange_view(key, start, end)
+        if isinstance(view, str):
+            return view
+        with view:
+            return view.tobytes().decode('utf-8', 'surrogateescape')
+
+    def getrange_view(self, key, start, end):
+        """
+        Return a memoryview of the bytes from start to end (inclusive) of the string stored
+        at key, without copying them. The server writes the view straight to the socket.
+        """
         try:
-            value = self.database.get(key)
-            if value is None:
-                return ""
-            if not isinstance(value, str):
-                return "ERROR: Value at key is not a string"
-            
             start = int(start)
             end = int(end)
-            
-            # Handle negative indices
-            if start < 0:
-                start = len(value) + start
-            if end < 0:
-                end = len(value) + end
-            
-            end += 1
-            
-            # Ensure we don't go out of bounds
-            start = max(0, start)
-            end = min(len(value), end)
-            
-            return value[start:end]
         except ValueError:
-            return ""
+            return memoryview(b"")
+        try:
+            buffer = self.database.get_buffer(key)
+        except ValueError:
+            return "ERROR: Value at key is not a string"
+        if buffer is None:
+            return memoryview(b"")
+        length = len(buffer)
+
+        # Handle negative indices
+        if start < 0:
+            start = length + start
+        if end < 0:
+            end = length + end
+
+        end += 1
+
+        # Ensure we don't go out of bounds
+        start = max(0, start)
+        end = min(length, end)
+
+        if start >= end:
+            return memoryview(b"")
+        return memoryview(buffer)[start:end]
 
     def setrange(self, key, offset, value):
-        """Overwrite part of the string stored at key."""
+        """Overwrite part of the string stored at key, in place."""
         try:
             offset = int(offset)
-            if offset < 0:
-                return "ERROR: Offset cannot be negative"
-            
-            current = self.database.get(key)
-            if current is None:
-                current = "\0" * offset  # Initialize with null bytes if key doesn't exist
-            elif not isinstance(current, str):
-                return "ERROR: Value at key is not a string"
-            
-            # Extend string with null bytes if needed
-            if offset > len(current):
-                current = current + "\0" * (offset - len(current))
-            
-            new_value = current[:offset] + str(value)
-            if offset + len(str(value)) < len(current):
-                new_value += current[offset + len(str(value)):]
-                
-            self.database.set(key, new_value)
-            return len(new_value)
         except ValueError:
             return "ERROR: Invalid offset value"
+        if offset < 0:
+            return "ERROR: Offset cannot be negative"
+        data = str(value).encode('utf-8', 'surrogateescape')
+        if offset + len(data) > MAX_STRING_LENGTH:
+            return "ERR string exceeds maximum allowed size (proto-max-bulk-len)"
+        try:
+            # An empty value does not create the key
+            buffer = self.database.get_buffer(key, create=bool(data))
+        except ValueError:
+            return "ERROR: Value at key is not a string"
+        if buffer is None:
+            return 0
+        if not data:
+            return len(buffer)
+
+        end = offset + len(data)
+        if end > len(buffer):
+            # Pad with null bytes up to the end of the new data
+            buffer.extend(bytes(end - len(buffer)))
+        buffer[offset:end] = data
+        if not self.database.replaying:
+            self.database.persistence_manager.log_command(f"SETRANGE {key} {offset} {value}")
+        return len(buffer)
+
+    def mget(self, *keys):
+        """Get the values of several keys; missing keys and non-string values are returned as None."""
+        return self.database.mget(keys)
+
+    def mset(self, mapping):
+        """Set several keys at once."""
+        self.database.mset(mapping)
+        return True
+
+    def msetnx(self, mapping):
+        """Set several keys at once, only if none of them exists. Returns 1 if they were set."""
+        if any(self.database.exists(key) for key in mapping):
+            return 0
+        self.database.mset(mapping)
+        return 1
+
+    def setnx(self, key, value):
+        """Set key to value only if it does not exist. Returns 1 if it was set."""
+        if self.database.exists(key):
+            return 0
+        self.database.set(key, value)
+        return 1
+
+    def getset(self, key, value):
+        """Set key to value and return its previous value."""
+        old_value = self.database.get(key)
+        if isinstance(old_value, str) and old_value.startswith("WRONGTYPE"):
+            return old_value
+        self.database.set(key, value)
+        return old_value
+
+    def getdel(self, key):
+        """Return the value of key and delete it."""
+        value = self.database.get(key)
+        if value is not None and not (isinstance(value, str) and value.startswith("WRONGTYPE")):
+            self.database.delete(key)
+        return value
+
+    def getex(self, key, deadline=None, persist=False):
+        """Return the value of key and set its absolute expiration time, or remove it with persist."""
+        value = self.database.get(key)
+        if value is None or (isinstance(value, str) and value.startswith("WRONGTYPE")):
+            return value
+        if persist:
+            self.database.expiry_manager.persist(key)
+        elif deadline is not None:
+            self.database.expiry_manager.expire_at(key, deadline)
+        return value
+
+    def incrbyfloat(self, key, increment):
+        """Increment the float value of a key by a given amount. Returns the new value as a string."""
+        value = self.database.get(key)
+        if isinstance(value, str) and value.startswith("WRONGTYPE"):
+            return value
+        try:
+            new_value = float(value or 0) + increment
+        except ValueError:
+            return "ERR value is not a valid float"
+        if math.isnan(new_value) or math.isinf(new_value):
+            return "ERR increment would produce NaN or Infinity"
+        formatted = format_float(new_value)
+        self.database.set(key, formatted)
+        return formatted
@@ -1,12 +1,46 @@
+from contextlib import contextmanager
 from typing import List, Optional, Tuple
+import gc
 import random
 
+from datatypes.set import IndexedSet
+
+@contextmanager
+def paused_gc():
+    """Pause the cyclic garbage collector while millions of objects are allocated."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 class SkipListNode:
+    """
+    A node of the skip list. The per-level links are packed into a single list:
+    levels[2 * i] is the forward pointer at level i and levels[2 * i + 1] is its
+    span, the number of bottom-level steps that pointer jumps over. The backward
+    pointer links the bottom level in reverse for descending iteration.
+    """
+    __slots__ = ('score', 'member', 'backward', 'levels')
+
     def __init__(self, score: float, member: str, level: int):
         self.score = score
         self.member = member
-        self.forward = [None] * (level + 1)
-        self.span = [0] * (level + 1)  # Add span for rank calculations
+        self.backward = None
+        self.levels = [None, 0] * (level + 1)
+
+    def __setstate__(self, state):
+        # Snapshots taken before the slotted nodes pickle a __dict__ with forward and span lists
+        slots = state[1] if isinstance(state, tuple) else state
+        self.score = slots['score']
+        self.member = slots['member']
+        self.backward = slots.get('backward')
+        if 'levels' in slots:
+            self.levels = slots['levels']
+        else:
+            self.levels = [link for pair in zip(slots['forward'], slots['span']) for link in pair]
 
 class SkipList:
     """
@@ -16,10 +50,12 @@ class SkipList:
     below it.
     The bottom level contains all the elements, and higher levels provide shortcuts 
     to improve efficiency.
+    Every forward pointer carries a span so that ranks can be computed while descending.
     Attributes:
         MAX_LEVEL (int): The maximum level of the skip list.
         P (float): The probability of promoting an element to the next level.
         head (SkipListNode): The head node of the skip list.
+        tail (SkipListNode): The last node of the skip list, or None when empty.
         level (int): The current maximum level of the skip list.
         length (int): The number of elements in the skip list.
     """
@@ -28,9 +64,97 @@ class SkipList:
 
     def __init__(self):
         self.head = SkipListNode(float('-inf'), '', self.MAX_LEVEL)
+        self.tail = None
         self.level = 0
         self.length = 0
 
+    def __len__(self) -> int:
+        return self.length
+
+    def __getstate__(self):
+        """Pickle as a flat list of pairs; a chain of nodes would exceed the recursion limit."""
+        pairs = []
+        node = self.head.levels[0]
+        with paused_gc():
+            while node is not None:
+                pairs.append((node.score, node.member))
+                node = node.levels[0]
+        return pairs
+
+    def __setstate__(self, pairs):
+        if isinstance(pairs, dict):
+            # Snapshots taken before pickling as pairs hold the node chain from head
+            node = pairs['head'].levels[0]
+            pairs = []
+            while node is not None:
+                pairs.append((node.score, node.member))
+                node = node.levels[0]
+        self.__init__()
+        self.extend_sorted(pairs)
+
+    @classmethod
+    def from_sorted(cls, pairs) -> 'SkipList':
+        """Build a balanced skip list in O(n) from (score, member) pairs sorted by (score, member)."""
+        skiplist = cls()
+        skiplist.extend_sorted(pairs)
+        return skiplist
+
+    def extend_sorted(self, pairs) -> int:
+        """
+        Append (score, member) pairs that are sorted and all order after the current tail.
+        Levels are assigned from the rank instead of randomly: every fourth node reaches
+        level 1, every sixteenth level 2 and so on, giving a perfectly balanced list.
+        Returns the number of appended nodes.
+        """
+        # Find the rightmost node on every level together with its rank
+        last = [self.head] * (self.MAX_LEVEL + 1)
+        last_rank = [0] * (self.MAX_LEVEL + 1)
+        current, traversed = self.head, 0
+        for i in range(self.MAX_LEVEL, -1, -1):
+            f = i << 1
+            while current.levels[f] is not None:
+                traversed += current.levels[f + 1]
+                current = current.levels[f]
+            last[i] = current
+            last_rank[i] = traversed
+
+        previous = self.tail
+        rank = start = self.length
+        # Millions of new nodes would otherwise trigger repeated full GC passes
+        with paused_gc():
+            for score, member in pairs:
+                rank += 1
+                if rank & 3:
+                    # Three out of four nodes only live on the bottom level
+                    node = SkipListNode(score, member, 0)
+                    links = last[0].levels
+                    links[0] = node
+                    links[1] = 1
+                    last[0] = node
+                    last_rank[0] = rank
+                else:
+                    # Trailing zero bits of the rank, two per level for P = 1/4
+                    level = min(((rank & -rank).bit_length() - 1) >> 1, self.MAX_LEVEL)
+                    node = SkipListNode(score, member, level)
+                    for i in range(level + 1):
+                        f = i << 1
+                        links = last[i].levels
+                        links[f] = node
+                        links[f + 1] = rank - last_rank[i]
+                        last[i] = node
+                        last_rank[i] = rank
+                    if level > self.level:
+                        self.level = level
+                node.backward = previous
+                previous = node
+
+        # Pointers past the tail span the remaining elements
+        for i in range(self.MAX_LEVEL + 1):
+            last[i].levels[(i << 1) + 1] = rank - last_rank[i]
+        self.tail = previous
+        self.length = rank
+        return rank - start
+
     def random_level(self) -> int:
         "Generates a random level for a new node based on the probability P."
         level = 0
@@ -38,97 +162,164 @@ class SkipList:
             level += 1
         return level
 
-    def insert(self, score: float, member: str) -> None:
-        "Inserts a new element with the given score and member into the skip list."
-        update = [None] * (self.MAX_LEVEL + 1)
-        rank = [0] * (self.MAX_LEVEL + 1)
+    def _find_update(self, score: float, member: str, rank: Optional[List[int]] = None) -> List[SkipListNode]:
+        """Collect the rightmost node before (score, member) on every level."""
+        update = [self.head] * (self.MAX_LEVEL + 1)
         current = self.head
-
-        # Find position and calculate rank
+        traversed = 0
         for i in range(self.level, -1, -1):
-            rank[i] = rank[i + 1] if i < self.level else 0
-            while (current.forward[i] and 
-                  (current.forward[i].score < score or 
-                   (current.forward[i].score == score and 
-                    current.forward[i].member < member))):
-                rank[i] += current.span[i]
-                current = current.forward[i]
+            f = i << 1
+            nxt = current.levels[f]
+            while nxt is not None and (nxt.score < score or
+                                       (nxt.score == score and nxt.member < member)):
+                traversed += current.levels[f + 1]
+                current = nxt
+                nxt = current.levels[f]
             update[i] = current
+            if rank is not None:
+                rank[i] = traversed
+        return update
+
+    def insert(self, score: float, member: str) -> SkipListNode:
+        "Inserts a new element with the given score and member into the skip list."
+        rank = [0] * (self.MAX_LEVEL + 1)
+        update = self._find_update(score, member, rank)
 
         level = self.random_level()
         if level > self.level:
             for i in range(self.level + 1, level + 1):
                 rank[i] = 0
                 update[i] = self.head
-                update[i].span[i] = self.length
+                self.head.levels[(i << 1) + 1] = self.length
             self.level = level
 
-        # Create new node
-        new_node = SkipListNode(score, member, level)
-        
-        # Insert node and update spans
+        node = SkipListNode(score, member, level)
+        links = node.levels
         for i in range(level + 1):
-            new_node.forward[i] = update[i].forward[i]
-            update[i].forward[i] = new_node
-            
-            # Update spans
-            new_node.span[i] = update[i].span[i] - (rank[0] - rank[i])
-            update[i].span[i] = (rank[0] - rank[i]) + 1
+            f = i << 1
+            prev = update[i].levels
+            links[f] = prev[f]
+            prev[f] = node
+            links[f + 1] = prev[f + 1] - (rank[0] - rank[i])
+            prev[f + 1] = (rank[0] - rank[i]) + 1
 
-        # Update spans for untouched levels
+        # Levels above the new node now jump over one more element
         for i in range(level + 1, self.level + 1):
-            update[i].span[i] += 1
+            update[i].levels[(i << 1) + 1] += 1
 
+        node.backward = update[0] if update[0] is not self.head else None
+        if links[0] is not None:
+            links[0].backward = node
+        else:
+            self.tail = node
         self.length += 1
+        return node
+
+    def _unlink(self, node: SkipListNode, update: List[SkipListNode]) -> None:
+        """Unlink node from every level, folding its spans into its predecessors."""
+        links = node.levels
+        for i in range(self.level + 1):
+            f = i << 1
+            prev = update[i].levels
+            if prev[f] is node:
+                prev[f + 1] += links[f + 1] - 1
+                prev[f] = links[f]
+            else:
+                prev[f + 1] -= 1
+
+        if links[0] is not None:
+            links[0].backward = node.backward
+        else:
+            self.tail = node.backward
+        while self.level > 0 and self.head.levels[self.level << 1] is None:
+            self.level -= 1
+        self.length -= 1
 
     def delete(self, score: float, member: str) -> bool:
-        update = [None] * (self.MAX_LEVEL + 1)
-        current = self.head
+        "Removes the element with the given score and member, keeping spans consistent."
+        update = self._find_update(score, member)
+        node = update[0].levels[0]
+        if node is not None and node.score == score and node.member == member:
+            self._unlink(node, update)
+            return True
+        return False
 
-        # Find node to delete
-        for i in range(self.level, -1, -1):
-            while (current.forward[i] and 
-                  (current.forward[i].score < score or 
-                   (current.forward[i].score == score and 
-                    current.forward[i].member < member))):
-                current = current.forward[i]
-            update[i] = current
+    def pop_first(self) -> Optional[SkipListNode]:
+        """
+        Removes and returns the lowest-ranked node. Every predecessor of the first
+        node is the head, so no search is needed.
+        """
+        node = self.head.levels[0]
+        if node is not None:
+            self._unlink(node, [self.head] * (self.level + 1))
+        return node
 
-        current = current.forward[0]
-        if current and current.score == score and current.member == member:
-            # Remove node at all levels
-            for i in range(self.level + 1):
-                if update[i].forward[i] != current:
-                    break
-                update[i].forward[i] = current.forward[i]
+    def pop_last(self) -> Optional[SkipListNode]:
+        "Removes and returns the highest-ranked node."
+        node = self.tail
+        if node is not None:
+            self._unlink(node, self._find_update(node.score, node.member))
+        return node
 
-            # Update level if needed
-            while self.level > 0 and not self.head.forward[self.level]:
-                self.level -= 1
+    def update_score(self, score: float, member: str, new_score: float) -> SkipListNode:
+        """
+        Change the score of an existing element. When the new score keeps the node
+        between its neighbours the score is updated in place, otherwise the node is
+        moved with a delete plus insert.
+        """
+        update = self._find_update(score, member)
+        node = update[0].levels[0]
+        if node is None or node.score != score or node.member != member:
+            raise KeyError(member)
 
-            self.length -= 1
-            return True
-        return False
+        prev = node.backward
+        nxt = node.levels[0]
+        if ((prev is None or prev.score < new_score or
+             (prev.score == new_score and prev.member < member)) and
+                (nxt is None or nxt.score > new_score or
+                 (nxt.score == new_score and nxt.member > member))):
+            node.score = new_score
+            return node
+
+        self._unlink(node, update)
+        return self.insert(new_score, member)
 
     def get_rank(self, member: str, score: float) -> Optional[int]:
+        "Returns the 0-based rank of the element, or None if it is not in the list."
         rank = 0
         current = self.head
 
-        # Traverse all levels from top to bottom
         for i in range(self.level, -1, -1):
-            while (current.forward[i] and 
-                  (current.forward[i].score < score or 
-                   (current.forward[i].score == score and 
-                    current.forward[i].member <= member))):
-                rank += current.span[i]
-                current = current.forward[i]
-                if (current.score == score and 
-                    current.member == member):
-                    return rank - 1  # Adjust for 0-based ranking
+            f = i << 1
+            nxt = current.levels[f]
+            while nxt is not None and (nxt.score < score or
+                                       (nxt.score == score and nxt.member <= member)):
+                rank += current.levels[f + 1]
+                current = nxt
+                nxt = current.levels[f]
+            if current is not self.head and current.member == member and current.score == score:
+                return rank - 1  # Adjust for 0-based ranking
+
+        return None
 
+    def get_by_rank(self, rank: int) -> Optional[SkipListNode]:
+        "Returns the node at the given 1-based rank using the spans."
+        traversed = 0
+        current = self.head
+        for i in range(self.level, -1, -1):
+            f = i << 1
+            while current.levels[f] is not None and traversed + current.levels[f + 1] <= rank:
+                traversed += current.levels[f + 1]
+                current = current.levels[f]
+            if traversed == rank:
+                return current if current is not self.head else None
         return None
 
-    def get_range(self, start: int, stop: int) -> List[Tuple[str, float]]:
+    def get_range(self, start: int, stop: int, reverse: bool = False) -> List[Tuple[str, float]]:
+        """
+        Returns (member, score) pairs between the 0-based ranks start and stop, inclusive.
+        With reverse=True the ranks count from the highest score downwards.
+        """
         if start < 0:
             start = max(self.length + start, 0)
         if stop < 0:
@@ -140,23 +331,58 @@ class SkipList:
             return []
 
         result = []
-        rank = 0
-        current = self.head
+        if reverse:
+            current = self.get_by_rank(self.length - start)
+            for _ in range(stop - start + 1):
+                result.append((current.member, current.score))
+                current = current.backward
+        else:
+            current = self.get_by_rank(start + 1)
+            for _ in range(stop - start + 1):
+                result.append((current.member, current.score))
+                current = current.levels[0]
 
-        # Skip to start position using spans
-        for i in range(self.level, -1, -1):
-            while current.forward[i] and (rank + current.span[i]) <= start:
-                rank += current.span[i]
-                current = current.forward[i]
+        return result
 
-        current = current.forward[0]
-        while current and len(result) <= (stop - start):
-            result.append((current.member, current.score))
-            current = current.forward[0]
+    def _seek(self, before) -> Tuple[SkipListNode, int]:
+        """
+        Descend to the last node for which before(node) holds, returning it (or the
+        head) with its 1-based rank. before must hold for a prefix of the list.
+        """
+        traversed = 0
+        current = self.head
+        for i in range(self.level, -1, -1):
+            f = i << 1
+            nxt = current.levels[f]
+            while nxt is not None and before(nxt):
+                traversed += current.levels[f + 1]
+                current = nxt
+                nxt = current.levels[f]
+        return current, traversed
 
-        return result
+    def find_range(self, below_min, within_max) -> Optional[Tuple[SkipListNode, int, SkipListNode, int]]:
+        """
+        Locate the nodes bounding a range in O(log n).
+        below_min(node) is true for nodes before the range and within_max(node) for nodes
+        up to its end. Returns (first, first_rank, last, last_rank) or None if the range is empty.
+        """
+        node, rank = self._seek(below_min)
+        first = node.levels[0]
+        if first is None or not within_max(first):
+            return None
+        last, last_rank = self._seek(within_max)
+        return first, rank + 1, last, last_rank
 
 class ZSetDataType:
+    """
+    ZSetDataType implements Redis-like sorted sets. Each sorted set is stored as a dict
+    holding a member -> score mapping for O(1) lookups and a SkipList ordered by
+    (score, member) for rank and range queries.
+    Range queries seek to the first element of the range in O(log n) through the skip
+    list levels and count elements from the spans instead of iterating them.
+    """
+    BULK_LOAD_MIN = 32  # ZADD pairs needed before trying the bulk-load path
+
     def __init__(self, database):
         self.db = database
 
@@ -171,6 +397,261 @@ class ZSetDataType:
             raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
         return value
 
+    def _get_zset(self, key):
+        """Return the sorted set at key, or None if the key does not exist."""
+        if not self.db.exists(key):
+            return None
+        return self._ensure_zset(key)
+
+    @staticmethod
+    def _format_score(score: float) -> str:
+        """Format a score the way Redis replies with it (no trailing .0)."""
+        text = repr(float(score))
+        return text[:-2] if text.endswith('.0') else text
+
+    @staticmethod
+    def parse_score_bound(bound: str) -> Tuple[float, bool]:
+        """Parse a score bound such as 5, (5, -inf or +inf into (value, exclusive)."""
+        bound = str(bound)
+        exclusive = bound.startswith('(')
+        if exclusive:
+            bound = bound[1:]
+        try:
+            value = float(bound)
+        except ValueError:
+            raise ValueError("min or max is not a float")
+        if value != value:
+            raise ValueError("min or max is not a float")
+        return value, exclusive
+
+    @staticmethod
+    def parse_lex_bound(bound: str) -> Tuple[Optional[str], bool]:
+        """
+        Parse a lex bound ([a, (a, - or +) into (value, exclusive).
+        The value is None for the infinite bounds.
+        """
+        bound = str(bound)
+        if bound in ('-', '+'):
+            return None, bound == '+'
+        if bound[:1] == '[':
+            return bound[1:], False
+        if bound[:1] == '(':
+            return bound[1:], True
+        raise ValueError("min or max not valid string range item")
+
+    def _score_range(self, skiplist, min_score, max_score):
+        """Locate a score range in the skip list."""
+        min_val, minex = self.parse_score_bound(min_score)
+        max_val, maxex = self.parse_score_bound(max_score)
+        if min_val > max_val or (min_val == max_val and (minex or maxex)):
+            return None
+        below_min = (lambda n: n.score <= min_val) if minex else (lambda n: n.score < min_val)
+        within_max = (lambda n: n.score < max_val) if maxex else (lambda n: n.score <= max_val)
+        return skiplist.find_range(below_min, within_max)
+
+    def _lex_range(self, skiplist, min_member, max_member):
+        """Locate a lexicographical range; meaningful when all scores are equal."""
+        min_val, minex = self.parse_lex_bound(min_member)
+        max_val, maxex = self.parse_lex_bound(max_member)
+        if min_val is None:
+            if minex:  # min is '+'
+                return None
+            below_min = lambda n: False
+        elif minex:
+            below_min = lambda n: n.member <= min_val
+        else:
+            below_min = lambda n: n.member < min_val
+        if max_val is None:
+            if not maxex:  # max is '-'
+                return None
+            within_max = lambda n: True
+        elif maxex:
+            within_max = lambda n: n.member < max_val
+        else:
+            within_max = lambda n: n.member <= max_val
+        return skiplist.find_range(below_min, within_max)
+
+    def _collect(self, skiplist, bounds, withscores, offset, count, reverse):
+        """Walk a located range, applying LIMIT offset/count and direction."""
+        if bounds is None or offset < 0 or count == 0:
+            return []
+        first, first_rank, last, last_rank = bounds
+        available = last_rank - first_rank + 1 - offset
+        if available <= 0:
+            return []
+        if count is not None and count > 0:
+            available = min(available, count)
+
+        # Jump over the offset with the spans instead of walking it
+        if reverse:
+            node = last if offset == 0 else skiplist.get_by_rank(last_rank - offset)
+        else:
+            node = first if offset == 0 else skiplist.get_by_rank(first_rank + offset)
+
+        result = []
+        for _ in range(available):
+            if withscores:
+                result.append((node.member, self._format_score(node.score)))
+            else:
+                result.append(node.member)
+            node = node.backward if reverse else node.levels[0]
+        return result
+
+    def _read_sources(self, keys):
+        """Return the member -> score mapping of every source key. Plain sets score 1."""
+        sources = []
+        for key in keys:
+            if not self.db.exists(key):
+                sources.append({})
+                continue
+            value = self.db.store.get(key)
+            if isinstance(value, (set, IndexedSet)):
+                sources.append(dict.fromkeys(value, 1.0))
+            elif isinstance(value, dict) and 'dict' in value and 'skiplist' in value:
+                sources.append(value['dict'])
+            else:
+                raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return sources
+
+    @staticmethod
+    def _aggregator(aggregate: str):
+        """Return the function combining two scores for AGGREGATE SUM|MIN|MAX."""
+        aggregate = aggregate.upper()
+        if aggregate == 'SUM':
+            return lambda a, b: a + b
+        if aggregate == 'MIN':
+            return min
+        if aggregate == 'MAX':
+            return max
+        raise ValueError("ERR syntax error")
+
+    def _union(self, keys, weights=None, aggregate='SUM'):
+        """Compute the weighted union of the sorted sets at keys."""
+        combine = self._aggregator(aggregate)
+        weights = weights or [1.0] * len(keys)
+        result = {}
+        for source, weight in zip(self._read_sources(keys), weights):
+            for member, score in source.items():
+                score *= weight
+                if member in result:
+                    score = combine(result[member], score)
+                result[member] = score
+        return result
+
+    def _inter(self, keys, weights=None, aggregate='SUM'):
+        """Compute the weighted intersection, iterating the smallest input and probing the others."""
+        combine = self._aggregator(aggregate)
+        weights = weights or [1.0] * len(keys)
+        sources = sorted(zip(self._read_sources(keys), weights), key=lambda item: len(item[0]))
+        smallest, smallest_weight = sources[0]
+        others = sources[1:]
+        result = {}
+        if any(not source for source, _ in others):
+            return result
+        for member, score in smallest.items():
+            score *= smallest_weight
+            for source, weight in others:
+                other = source.get(member)
+                if other is None:
+                    break
+                score = combine(score, other * weight)
+            else:
+                result[member] = score
+        return result
+
+    def _diff(self, keys):
+        """Compute the members of the first sorted set that are in none of the others."""
+        sources = self._read_sources(keys)
+        first, others = sources[0], [source for source in sources[1:] if source]
+        return {member: score for member, score in first.items()
+                if not any(member in source for source in others)}
+
+    def _store_result(self, destination, result) -> int:
+        """Replace destination with a sorted set built in bulk from result."""
+        # inf - inf yields nan, which Redis stores as 0
+        for member, score in result.items():
+            if score != score:
+                result[member] = 0.0
+        self.db.expiry.pop(destination, None)
+        if not result:
+            self.db.store.pop(destination, None)
+            return 0
+        pairs = sorted((score, member) for member, score in result.items())
+        self.db.store[destination] = {'dict': result, 'skiplist': SkipList.from_sorted(pairs)}
+        self.db.blocking_manager.signal_key_ready(destination)
+        return len(result)
+
+    def _reply(self, result, withscores):
+        """Format an aggregation result ordered by score."""
+        pairs = sorted((score, member) for member, score in result.items())
+        if withscores:
+            return [(member, self._format_score(score)) for score, member in pairs]
+        return [member for _, member in pairs]
+
+    def _log_aggregate(self, command, destination, keys, weights=None, aggregate=None):
+        """Log an aggregation STORE command to the AOF."""
+        if self.db.replaying:
+            return
+        parts = [command, destination, str(len(keys))] + list(keys)
+        if weights:
+            parts += ["WEIGHTS"] + [str(weight) for weight in weights]
+        if aggregate:
+            parts += ["AGGREGATE", aggregate.upper()]
+        self.db.persistence_manager.log_command(' '.join(parts))
+
+    def zunionstore(self, destination, keys, weights=None, aggregate='SUM') -> int:
+        """Store the union of the sorted sets at keys in destination."""
+        count = self._store_result(destination, self._union(keys, weights, aggregate))
+        self._log_aggregate("ZUNIONSTORE", destination, keys, weights, aggregate)
+        return count
+
+    def zinterstore(self, destination, keys, weights=None, aggregate='SUM') -> int:
+        """Store the intersection of the sorted sets at keys in destination."""
+        count = self._store_result(destination, self._inter(keys, weights, aggregate))
+        self._log_aggregate("ZINTERSTORE", destination, keys, weights, aggregate)
+        return count
+
+    def zdiffstore(self, destination, keys) -> int:
+        """Store the difference between the first and the other sorted sets in destination."""
+        count = self._store_result(destination, self._diff(keys))
+        self._log_aggregate("ZDIFFSTORE", destination, keys)
+        return count
+
+    def zunion(self, keys, weights=None, aggregate='SUM', withscores=False) -> List:
+        """Return the union of the sorted sets at keys."""
+        return self._reply(self._union(keys, weights, aggregate), withscores)
+
+    def zinter(self, keys, weights=None, aggregate='SUM', withscores=False) -> List:
+        """Return the intersection of the sorted sets at keys."""
+        return self._reply(self._inter(keys, weights, aggregate), withscores)
+
+    def zdiff(self, keys, withscores=False) -> List:
+        """Return the difference between the first and the other sorted sets."""
+        return self._reply(self._diff(keys), withscores)
+
+    def _bulk_add(self, zset, args) -> Optional[int]:
+        """
+        Add many new members at once. When every member is new and all of them order
+        after the current tail (always true for an empty set) the pairs are sorted and
+        appended with SkipList.extend_sorted. Returns None if the fast path does not apply.
+        """
+        with paused_gc():
+            incoming = {}
+            for i in range(0, len(args), 2):
+                incoming[str(args[i + 1])] = float(args[i])
+            existing = zset['dict']
+            if existing and not incoming.keys().isdisjoint(existing):
+                return None
+            pairs = sorted((score, member) for member, score in incoming.items())
+
+        tail = zset['skiplist'].tail
+        if tail is not None and pairs[0] <= (tail.score, tail.member):
+            return None
+
+        zset['skiplist'].extend_sorted(pairs)
+        existing.update(incoming)
+        return len(incoming)
+
     def zadd(self, key, *args):
         """Add members to sorted set."""
         if len(args) % 2 != 0:
@@ -178,6 +659,15 @@ class ZSetDataType:
         
         try:
             zset = self._ensure_zset(key)
+            added = None
+            if len(args) >= 2 * self.BULK_LOAD_MIN:
+                added = self._bulk_add(zset, args)
+            if added is not None:
+                if added > 0:
+                    self.db.blocking_manager.signal_key_ready(key)
+                    if not self.db.replaying:
+                        self.db.persistence_manager.log_command(f"ZADD {key} {' '.join(map(str, args))}")
+                return added
             added = 0
             
             # Process score-member pairs
@@ -194,42 +684,56 @@ class ZSetDataType:
                     
                 # Update or add member
                 if member in zset['dict']:
-                    zset['skiplist'].delete(zset['dict'][member], member)
+                    zset['skiplist'].update_score(zset['dict'][member], member, score)
+                else:
+                    zset['skiplist'].insert(score, member)
                 zset['dict'][member] = score
-                zset['skiplist'].insert(score, member)
                 
                 i += 2
             
-            if added > 0 and not self.db.replaying:
-                self.db.persistence_manager.log_command(f"ZADD {key} {' '.join(map(str, args))}")
+            if added > 0:
+                self.db.blocking_manager.signal_key_ready(key)
+                if not self.db.replaying:
+                    self.db.persistence_manager.log_command(f"ZADD {key} {' '.join(map(str, args))}")
             
             return added
         except ValueError as e:
             raise ValueError(f"ERR {str(e)}")
 
-    def zrange(self, key, start, stop, withscores=False):
+    def zrange(self, key, start, stop, withscores=False, reverse=False):
         """Return range of members by index."""
         try:
-            zset = self._ensure_zset(key)
-            result = zset['skiplist'].get_range(start, stop)
-            if not result:
+            zset = self._get_zset(key)
+            if zset is None:
                 return []
+            result = zset['skiplist'].get_range(int(start), int(stop), reverse)
             if withscores:
-                return [(item[0], str(item[1])) for item in result]
-            return [item[0] for item in result]
-        except ValueError as e:
-            return str(e)
+                return [(member, self._format_score(score)) for member, score in result]
+            return [member for member, _ in result]
+        except ValueError:
+            return []
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        """Return range of members by index, ordered from the highest to the lowest score."""
+        return self.zrange(key, start, stop, withscores, reverse=True)
 
     def zrank(self, key: str, member: str) -> Optional[int]:
         """Return rank of member in sorted set."""
         try:
-            zset = self._ensure_zset(key)
-            if member not in zset['dict']:
+            zset = self._get_zset(key)
+            if zset is None or member not in zset['dict']:
                 return None
             return zset['skiplist'].get_rank(member, zset['dict'][member])
         except ValueError:
             return None
 
+    def zrevrank(self, key: str, member: str) -> Optional[int]:
+        """Return rank of member with the scores ordered from high to low."""
+        rank = self.zrank(key, member)
+        if rank is None:
+            return None
+        return len(self.db.store[key]['skiplist']) - 1 - rank
+
     def zrem(self, key: str, *members: str) -> int:
         """Remove members from sorted set."""
         try:
@@ -250,25 +754,89 @@ class ZSetDataType:
         except ValueError:
             return 0
 
-    def zrangebyscore(self, key: str, min_score: str, max_score: str, withscores: bool = False) -> List:
-        """Return members with scores within the given range."""
+    def _pop(self, key: str, count: int, highest: bool) -> List[Tuple[str, str]]:
+        """Pop up to count members from one end of a sorted set, deleting the key once empty."""
+        zset = self._get_zset(key)
+        if zset is None or count <= 0:
+            return []
+        skiplist = zset['skiplist']
+        pop = skiplist.pop_last if highest else skiplist.pop_first
+        popped = []
+        for _ in range(min(count, len(skiplist))):
+            node = pop()
+            del zset['dict'][node.member]
+            popped.append((node.member, self._format_score(node.score)))
+
+        if not zset['dict']:
+            self.db.store.pop(key, None)
+            self.db.expiry.pop(key, None)
+        if popped and not self.db.replaying:
+            members_str = ' '.join(member for member, _ in popped)
+            self.db.persistence_manager.log_command(f"ZREM {key} {members_str}")
+        return popped
+
+    def zpopmin(self, key: str, count: int = 1) -> List[Tuple[str, str]]:
+        """Remove and return up to count members with the lowest scores."""
+        return self._pop(key, count, highest=False)
+
+    def zpopmax(self, key: str, count: int = 1) -> List[Tuple[str, str]]:
+        """Remove and return up to count members with the highest scores."""
+        return self._pop(key, count, highest=True)
+
+    def zrangebyscore(self, key: str, min_score: str, max_score: str, withscores: bool = False,
+                      offset: int = 0, count: Optional[int] = None, reverse: bool = False) -> List:
+        """Return members with scores within the given range, optionally limited by offset and count."""
         try:
-            zset = self._ensure_zset(key)
-            try:
-                min_val = float('-inf') if min_score == '-inf' else float(min_score)
-                max_val = float('inf') if max_score == '+inf' else float(max_score)
-            except ValueError:
+            zset = self._get_zset(key)
+            if zset is None:
                 return []
+            skiplist = zset['skiplist']
+            bounds = self._score_range(skiplist, min_score, max_score)
+            return self._collect(skiplist, bounds, withscores, offset, count, reverse)
+        except ValueError:
+            return []
 
-            result = []
-            current = zset['skiplist'].head.forward[0]
-            while current and current.score <= max_val:
-                if current.score >= min_val:
-                    if withscores:
-                        result.append((current.member, self._format_score(current.score)))
-                    else:
-                        result.append(current.member)
-                current = current.forward[0]
-            return result
+    def zrevrangebyscore(self, key: str, max_score: str, min_score: str, withscores: bool = False,
+                         offset: int = 0, count: Optional[int] = None) -> List:
+        """Return members with scores within the given range, from the highest score down."""
+        return self.zrangebyscore(key, min_score, max_score, withscores, offset, count, reverse=True)
+
+    def zcount(self, key: str, min_score: str, max_score: str) -> int:
+        """Count members with scores within the given range without iterating them."""
+        try:
+            zset = self._get_zset(key)
+            if zset is None:
+                return 0
+            bounds = self._score_range(zset['skiplist'], min_score, max_score)
+            return 0 if bounds is None else bounds[3] - bounds[1] + 1
+        except ValueError:
+            return 0
+
+    def zrangebylex(self, key: str, min_member: str, max_member: str,
+                    offset: int = 0, count: Optional[int] = None, reverse: bool = False) -> List:
+        """Return members between min and max in lexicographical order."""
+        try:
+            zset = self._get_zset(key)
+            if zset is None:
+                return []
+            skiplist = zset['skiplist']
+            bounds = self._lex_range(skiplist, min_member, max_member)
+            return self._collect(skiplist, bounds, False, offset, count, reverse)
         except ValueError:
             return []
+
+    def zrevrangebylex(self, key: str, max_member: str, min_member: str,
+                       offset: int = 0, count: Optional[int] = None) -> List:
+        """Return members between max and min in reverse lexicographical order."""
+        return self.zrangebylex(key, min_member, max_member, offset, count, reverse=True)
+
+    def zlexcount(self, key: str, min_member: str, max_member: str) -> int:
+        """Count members between min and max in lexicographical order."""
+        try:
+            zset = self._get_zset(key)
+            if zset is None:
+                return 0
+            bounds = self._lex_range(zset['skiplist'], min_member, max_member)
+            return 0 if bounds is None else bounds[3] - bounds[1] + 1
+        except ValueError:
+            return 0
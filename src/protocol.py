@@ -55,6 +55,9 @@ def format_resp(data):
         return f"${len(data)}\r\n{data}\r\n"
     elif isinstance(data, int):
         return f":{data}\r\n"
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        # Raw string bytes; surrogateescape lets arbitrary bytes survive the str round trip
+        return f"${len(data)}\r\n{bytes(data).decode('utf-8', 'surrogateescape')}\r\n"
     elif isinstance(data, (list, tuple)):
         if not data:
             return "*0\r\n"  # Empty array
@@ -1,8 +1,10 @@
 import socket
 import select
+import selectors
 import pickle
 from collections import defaultdict
 from core.database import KeyValueStore
+from core.blocking import BlockedCommand
 from protocol import parse_resp, format_resp, format_pubsub_message
 from pubsub import PubSubManager
 from commands.core_handler import CoreCommandHandler
@@ -32,10 +34,14 @@ class TCPServer:
         shutting_down (bool): Flag indicating if the server is shutting down.
         socket_timeout (float): The timeout value for socket operations.
         active_clients (set): A set of active client sockets.
+        selector (selectors.BaseSelector): Readiness selector (epoll/kqueue where available) with the sockets to read from.
         pubsub_manager (PubSubManager): The Pub/Sub manager instance.
         subscribed_clients (set): A set of subscribed client IDs.
         client_sockets (dict): A dictionary mapping client IDs to their sockets.
         client_channels (defaultdict): A dictionary mapping client IDs to their subscribed channels.
+        blocked_sockets (set): Sockets of clients parked on a blocking command; they stay registered so that a disconnect drops the waiter.
+        held_input (dict): Input read from blocked sockets, by socket; it is handled once the client is unblocked.
+        unblocked_input (list): (socket, input) pairs of unblocked clients, handled by the event loop.
         replication_manager (ReplicationManager): The replication manager instance.
         slaves (set): A set of slave client IDs.
         command_map (dict): A dictionary mapping commands to their handlers.
@@ -48,10 +54,14 @@ class TCPServer:
         self.shutting_down = False
         self.socket_timeout = 0.1
         self.active_clients = set()
+        self.selector = selectors.DefaultSelector()
         self.pubsub_manager = PubSubManager()
         self.subscribed_clients = set()
         self.client_sockets = {}
         self.client_channels = defaultdict(set)
+        self.blocked_sockets = set()
+        self.held_input = {}
+        self.unblocked_input = []
         
         self.command_map = {}
         self._init_command_handlers()
@@ -90,26 +100,33 @@ class TCPServer:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
+            self.server_socket.listen(socket.SOMAXCONN)
             self.server_socket.settimeout(self.socket_timeout)
+            self.selector.register(self.server_socket, selectors.EVENT_READ)
             
             while not self.shutting_down:
                 try:
-                    sockets_to_monitor = [self.server_socket] + list(self.active_clients)
-                    readable, _, _ = select.select(sockets_to_monitor, [], [], self.socket_timeout)
+                    events = self.selector.select(self._select_timeout())
                     
-                    for sock in readable:
+                    for selector_key, _ in events:
+                        sock = selector_key.fileobj
                         if sock is self.server_socket:
                             client_socket, address = self.server_socket.accept()
                             client_socket.setblocking(False)
                             print(f"Connection from {address}")
                             self.active_clients.add(client_socket)
+                            self.selector.register(client_socket, selectors.EVENT_READ)
                             self.client_sockets[address[1]] = client_socket
+                        elif sock in self.blocked_sockets:
+                            self.check_blocked_client(sock)
                         else:
                             try:
                                 self.handle_client_data(sock)
                             except Exception:
                                 self.cleanup_client_by_socket(sock)
+
+                    self.send_blocked_replies(self.db.blocking_manager.expire_timeouts())
+                    self.handle_unblocked_input()
                                 
                 except select.error:
                     if self.shutting_down:
@@ -149,14 +166,17 @@ class TCPServer:
                     self.server_socket.close()
                 except OSError:
                     pass
+            self.selector.close()
 
             self.db.stop()
             print("Server stopped.")
 
-    def handle_client_data(self, client_socket):
-        """Handle data from a connected client."""
+    def handle_client_data(self, client_socket, data=None):
+        """Handle data from a connected client, read from its socket unless it was held while it was blocked."""
         try:
-            data = client_socket.recv(1024).decode().strip()
+            if data is None:
+                data = client_socket.recv(1024)
+            data = data.decode().strip()
             if not data:
                 raise ConnectionError("Client disconnected")
                 
@@ -167,6 +187,12 @@ class TCPServer:
                 return
                 
             response = self.process_request(request, client_id)
+
+            if isinstance(response, BlockedCommand):
+                # Park the client; it gets its reply once a key is ready or it times out
+                self.db.blocking_manager.block(client_id, response)
+                self.blocked_sockets.add(client_socket)
+                return
             
             if isinstance(response, tuple) and len(response) >= 2:
                 msg_type = response[0]
@@ -178,9 +204,16 @@ class TCPServer:
                     return
             
             # Format and send response
-            formatted_response = format_resp(response)
-            if formatted_response:
-                client_socket.sendall(formatted_response.encode())
+            if isinstance(response, memoryview):
+                with response:
+                    self.send_bulk(client_socket, response)
+            else:
+                formatted_response = format_resp(response)
+                if formatted_response:
+                    client_socket.sendall(formatted_response.encode('utf-8', 'surrogateescape'))
+
+            # Hand keys written by this command to the clients blocked on them
+            self.send_blocked_replies(self.db.blocking_manager.serve_ready_keys())
                 
         except ConnectionError:
             # Handle normal disconnection
@@ -194,6 +227,69 @@ class TCPServer:
             print(f"Error handling client data: {str(e)}")
             raise
 
+    def send_bulk(self, client_socket, view):
+        """Send a bulk string reply straight from a memoryview, without copying it into a str."""
+        parts = [f"${len(view)}\r\n".encode(), view, b"\r\n"]
+        total = sum(len(part) for part in parts)
+        sent = client_socket.sendmsg(parts)
+        if sent < total:
+            # Partial write: send the remainder with sendall
+            client_socket.sendall(b"".join(parts)[sent:])
+
+    def _select_timeout(self):
+        """Wait no longer than the next blocking-command deadline."""
+        next_timeout = self.db.blocking_manager.next_timeout()
+        if next_timeout is None:
+            return self.socket_timeout
+        return min(self.socket_timeout, next_timeout)
+
+    def check_blocked_client(self, client_socket):
+        """
+        Read from a blocked client. Its input is held until it is unblocked; reading it keeps
+        the socket from staying readable, so the socket remains registered and a disconnect
+        drops the waiter right away instead of when an element is served to a closed socket.
+        """
+        try:
+            data = client_socket.recv(1024)
+        except OSError:
+            data = b''
+        if data:
+            self.held_input[client_socket] = self.held_input.get(client_socket, b'') + data
+            return
+        # getpeername() can fail on a reset socket, so find the client ID by socket
+        for client_id, sock in self.client_sockets.items():
+            if sock is client_socket:
+                self.db.blocking_manager.unblock_client(client_id)
+                break
+        self.cleanup_client_by_socket(client_socket)
+
+    def send_blocked_replies(self, replies):
+        """Send replies to clients that were parked on a blocking command."""
+        for client_id, reply in replies:
+            client_socket = self.client_sockets.get(client_id)
+            if client_socket is None:
+                continue
+            self.blocked_sockets.discard(client_socket)
+            try:
+                client_socket.sendall(format_resp(reply).encode())
+            except OSError:
+                self.cleanup_client_by_socket(client_socket)
+                continue
+            held = self.held_input.pop(client_socket, None)
+            if held is not None:
+                self.unblocked_input.append((client_socket, held))
+
+    def handle_unblocked_input(self):
+        """Handle the input that clients sent while they were blocked."""
+        while self.unblocked_input:
+            client_socket, data = self.unblocked_input.pop(0)
+            if client_socket not in self.active_clients:
+                continue
+            try:
+                self.handle_client_data(client_socket, data)
+            except Exception:
+                self.cleanup_client_by_socket(client_socket)
+
     def cleanup_client_by_socket(self, client_socket):
         """Clean up client resources using socket reference."""
         try:
@@ -203,11 +299,18 @@ class TCPServer:
             self.pubsub_manager.remove_client(client_id)
             self.subscribed_clients.discard(client_id)
             self.client_sockets.pop(client_id, None)
+            self.db.blocking_manager.unblock_client(client_id)
         except:
             pass
         finally:
+            self.blocked_sockets.discard(client_socket)
+            self.held_input.pop(client_socket, None)
             if client_socket in self.active_clients:
                 self.active_clients.remove(client_socket)
+            try:
+                self.selector.unregister(client_socket)
+            except (KeyError, ValueError):
+                pass
             try:
                 client_socket.close()
             except:
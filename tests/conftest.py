@@ -20,3 +20,24 @@ def clean_db(db):
     db.flush()
     yield
     db.flush()  # Clean up after test
+
+@pytest.fixture
+def restart(tmp_path, monkeypatch):
+    """
+    Factory reopening a database on snapshot and AOF files in tmp_path. Each call shuts the
+    previous instance down, or with crash=True leaves it running as after a kill, and returns
+    a new one restored from the files.
+    """
+    monkeypatch.chdir(tmp_path)
+    stores = []
+
+    def reopen(crash=False):
+        if stores and not crash:
+            stores[-1].stop()
+        stores.append(KeyValueStore())
+        return stores[-1]
+
+    yield reopen
+    for store in stores:
+        store.expiry_manager.stop()
+        store.persistence_manager.snapshot_manager.running = False
@@ -0,0 +1,288 @@
+import pytest
+
+from commands.bitfield_handler import BitFieldCommandHandler
+from core.persistence import AOFHandler
+import datatypes.advanced.bitmap as bitmap_module
+from datatypes.advanced.roaring import ArrayContainer, BitsetContainer, RoaringBitmap, RunContainer
+
+class TestBitmapBasicOperations:
+    def test_setbit_getbit(self, db):
+        """Test SETBIT and GETBIT"""
+        assert db.bitmap.setbit("bits", 7, 1) == 0
+        assert db.bitmap.setbit("bits", 7, 1) == 1
+        assert db.bitmap.getbit("bits", 7) == 1
+        assert db.bitmap.getbit("bits", 6) == 0
+        assert db.bitmap.getbit("bits", 1000) == 0
+        assert db.bitmap.getbit("nonexistent", 0) == 0
+
+        # Bit 0 is the most significant bit of the first byte
+        db.bitmap.setbit("bits", 0, 1)
+        assert db.store["bits"] == bytearray(b"\x81")
+        assert db.bitmap.setbit("bits", 0, 0) == 1
+        assert db.store["bits"] == bytearray(b"\x01")
+
+    def test_setbit_in_place(self, db):
+        """Test that SETBIT changes the stored buffer in place"""
+        db.bitmap.setbit("bits", 8 * 1000, 1)
+        buffer = db.store["bits"]
+        assert len(buffer) == 1001
+        db.bitmap.setbit("bits", 3, 1)
+        assert db.store["bits"] is buffer
+        assert db.bitmap.bitcount("bits") == 2
+
+    def test_shared_string_storage(self, db):
+        """Test that bitmaps, strings and bitfields share the same bytes"""
+        db.set("key", "a")  # 0b01100001
+        assert [db.bitmap.getbit("key", i) for i in range(8)] == [0, 1, 1, 0, 0, 0, 0, 1]
+        db.bitmap.setbit("key", 6, 1)
+        assert db.get("key") == "c"
+        db.string.append("key", "b")
+        assert db.bitfield.get("key", "u8", 8) == ord("b")
+        db.bitfield.set("key", "u8", 8, ord("z"))
+        assert db.get("key") == "cz"
+
+    def test_errors(self, db):
+        """Test invalid offsets and wrong types"""
+        with pytest.raises(ValueError):
+            db.bitmap.setbit("bits", -1, 1)
+        with pytest.raises(ValueError):
+            db.bitmap.setbit("bits", 1 << 32, 1)
+        db.list.lpush("list", "a")
+        with pytest.raises(ValueError, match="WRONGTYPE"):
+            db.bitmap.setbit("list", 0, 1)
+
+@pytest.fixture(params=["python", "numpy"])
+def bitops_path(request, monkeypatch):
+    """Run a test with the pure Python chunks and, if installed, with NumPy."""
+    if request.param == "numpy":
+        if bitmap_module.np is None:
+            pytest.skip("NumPy is not installed")
+        monkeypatch.setattr(bitmap_module, "NUMPY_MIN_BYTES", 8)
+    else:
+        monkeypatch.setattr(bitmap_module, "np", None)
+    # Small chunks so that multi-chunk paths are exercised as well
+    monkeypatch.setattr(bitmap_module, "CHUNK_BYTES", 3)
+    return request.param
+
+class TestBitmapRangeOperations:
+    def test_bitcount(self, db, bitops_path):
+        """Test BITCOUNT with byte and bit ranges"""
+        db.set("key", "foobar")
+        assert db.bitmap.bitcount("key") == 26
+        assert db.bitmap.bitcount("key", 0, 0) == 4
+        assert db.bitmap.bitcount("key", 1, 1) == 6
+        assert db.bitmap.bitcount("key", 1, -2) == 18
+        assert db.bitmap.bitcount("key", 5, 30, 'BIT') == 17
+        assert db.bitmap.bitcount("key", 3, 2) == 0
+        assert db.bitmap.bitcount("nonexistent") == 0
+
+    def test_bitop(self, db, bitops_path):
+        """Test BITOP AND/OR/XOR/NOT with sources of different lengths"""
+        db.store["a"] = bytearray(b"\xff\x0f\xf0" * 10)
+        db.store["b"] = bytearray(b"\x0f" * 20)
+        assert db.bitmap.bitop("AND", "dest", "a", "b") == 30
+        assert db.store["dest"] == bytearray(b"\x0f\x0f\x00" * 6 + b"\x0f\x0f" + bytes(10))
+        db.bitmap.bitop("OR", "dest", "a", "b")
+        assert db.store["dest"] == bytearray(b"\xff\x0f\xff" * 6 + b"\xff\x0f" + (b"\xff\x0f\xf0" * 10)[20:])
+        db.bitmap.bitop("XOR", "dest", "a", "a")
+        assert db.store["dest"] == bytearray(30)
+        db.bitmap.bitop("NOT", "dest", "b")
+        assert db.store["dest"] == bytearray(b"\xf0" * 20)
+
+        # Sources may include the destination; missing sources remove it
+        db.bitmap.bitop("AND", "b", "b", "a")
+        assert db.store["b"][:3] == bytearray(b"\x0f\x0f\x00")
+        assert db.bitmap.bitop("OR", "dest", "missing") == 0
+        assert not db.exists("dest")
+
+    def test_bitpos(self, db, bitops_path):
+        """Test BITPOS for set and clear bits"""
+        db.store["key"] = bytearray(b"\xff\xf0\x00")
+        assert db.bitmap.bitpos("key", 0) == 12
+        assert db.bitmap.bitpos("key", 1) == 0
+        assert db.bitmap.bitpos("key", 1, 2) == -1
+        assert db.bitmap.bitpos("key", 0, 7, 15, 'BIT') == 12
+
+        db.store["zeros"] = bytearray(100) + bytearray(b"\x01")
+        assert db.bitmap.bitpos("zeros", 1) == 807
+        assert db.bitmap.bitpos("zeros", 1, 0, 99) == -1
+
+        # Looking for a 0 in all ones: past the end unless an end is given
+        db.store["ones"] = bytearray(b"\xff" * 50)
+        assert db.bitmap.bitpos("ones", 0) == 400
+        assert db.bitmap.bitpos("ones", 0, 0, -1) == -1
+        assert db.bitmap.bitpos("nonexistent", 0) == 0
+        assert db.bitmap.bitpos("nonexistent", 1) == -1
+
+class TestSparseBitmaps:
+    def test_large_offset_stays_sparse(self, db):
+        """Test that a huge offset does not allocate the dense string"""
+        assert db.bitmap.setbit("sparse", 4_000_000_000, 1) == 0
+        bitmap = db.store["sparse"]
+        assert isinstance(bitmap, RoaringBitmap)
+        assert bitmap.nbytes < 100
+        assert db.string.strlen("sparse") == 500_000_001
+        assert db.bitmap.getbit("sparse", 4_000_000_000) == 1
+        assert db.bitmap.getbit("sparse", 3_999_999_999) == 0
+        assert db.bitmap.bitcount("sparse") == 1
+        assert db.bitmap.bitcount("sparse", -1, -1) == 1
+        assert db.bitmap.bitcount("sparse", 0, 3_999_999_999, 'BIT') == 0
+        assert db.bitmap.bitpos("sparse", 1) == 4_000_000_000
+        assert db.bitmap.bitpos("sparse", 0, 1) == 8
+
+    def test_matches_dense(self, db):
+        """Test that sparse and dense bitmaps answer every command the same"""
+        offsets = [0, 7, 65535, 65536, 1 << 20, (1 << 20) + 1, 5_000_000]
+        for offset in offsets:
+            db.bitmap.setbit("sparse", offset, 1)
+        assert isinstance(db.store["sparse"], RoaringBitmap)
+        dense = db.store["sparse"].to_bytearray()
+        db.store["dense"] = dense
+        # Same MSB-first layout as SETBIT on a dense string
+        assert dense[0] == 0x81
+
+        for args in [(), (0, -1), (1, 8192), (8191, 8192), (65535, 65536 + 7, 'BIT'), (-100, -1)]:
+            assert db.bitmap.bitcount("sparse", *args) == db.bitmap.bitcount("dense", *args)
+        for args in [(1,), (0,), (1, 1), (0, 0, 7, 'BIT'), (1, 8, 70000, 'BIT'), (1, -1)]:
+            assert db.bitmap.bitpos("sparse", *args) == db.bitmap.bitpos("dense", *args)
+
+        db.bitmap.setbit("other", 65536, 1)
+        db.bitmap.setbit("other", 4_000_000, 1)
+        for operation in ("AND", "OR", "XOR"):
+            db.bitmap.bitop(operation, "dest", "sparse", "other")
+            expected = bitmap_module.bitwise(operation, [dense, db.store["other"].to_bytearray()], len(dense))
+            assert db.store["dest"].to_bytearray() == expected
+
+    def test_string_commands_expand(self, db):
+        """Test that string commands see the sparse bitmap as its dense bytes"""
+        db.bitmap.setbit("sparse", 1_000_000, 1)
+        assert db.get("sparse") == "\x00" * 125000 + "\udc80"
+        db.string.append("sparse", "x")
+        assert isinstance(db.store["sparse"], bytearray)
+        assert db.string.strlen("sparse") == 125002
+
+    def test_bitfield_in_place(self, db):
+        """Test that BITFIELD works on a sparse bitmap without expanding it"""
+        handler = BitFieldCommandHandler(db)
+        db.bitmap.setbit("sparse", 4_000_000_000, 1)
+        db.bitmap.setbit("sparse", 7, 1)
+        assert handler.bitfield_ro_command(None, "sparse", "GET", "u8", "0", "GET", "i4", "3999999997",
+                                           "GET", "u16", "4000000000") == [1, 1, 0x8000]
+        ops = db.bitfield.parse_operations(["SET", "i8", "8", "-2", "INCRBY", "u4", "3999999998", "15",
+                                            "OVERFLOW", "FAIL", "INCRBY", "u2", "0", "4"])
+        assert db.bitfield.execute("sparse", ops) == [0, 1, None]
+        assert isinstance(db.store["sparse"], RoaringBitmap)
+        assert db.bitfield.get("sparse", "i8", "8") == -2
+        assert db.bitfield.get("sparse", "u8", "3999999996") == 0x04
+
+    def test_switch_encodings(self, db, monkeypatch):
+        """Test that a bitmap moves between dense and sparse as its density changes"""
+        monkeypatch.setattr(bitmap_module, "SPARSE_MIN_BYTES", 1024)
+        db.bitmap.setbit("bits", 8, 1)
+        assert isinstance(db.store["bits"], bytearray)
+        # Growing a small dense bitmap far away makes it sparse
+        db.bitmap.setbit("bits", 8 * 20_000, 1)
+        assert isinstance(db.store["bits"], RoaringBitmap)
+        # Filling it up makes dense smaller again
+        for offset in range(0, 8 * 20_000, 8):
+            db.bitmap.setbit("bits", offset, 1)
+        assert isinstance(db.store["bits"], bytearray)
+        assert db.bitmap.bitcount("bits") == 20_001
+
+        # A large, mostly empty BITOP result is stored sparse
+        db.bitmap.bitop("AND", "dest", "bits", "missing")
+        assert isinstance(db.store["dest"], RoaringBitmap)
+        assert db.string.strlen("dest") == 20_001
+
+    def test_containers(self):
+        """Test that each container picks the smallest encoding and keeps it up to date"""
+        bitmap = RoaringBitmap()
+        for offset in range(0, 65536, 2):
+            bitmap.set(offset, 1)
+        assert isinstance(bitmap.containers[0], BitsetContainer)
+        for offset in range(1, 65536, 2):
+            bitmap.set(offset, 1)
+        assert isinstance(bitmap.containers[0], RunContainer)
+        for offset in range(0, 65536, 16):
+            bitmap.set(offset, 0)
+        assert isinstance(bitmap.containers[0], BitsetContainer)
+        for offset in range(65536):
+            if offset % 1000:
+                bitmap.set(offset, 0)
+        assert isinstance(bitmap.containers[0], ArrayContainer)
+        assert bitmap.cardinality == 33
+        assert bitmap.nbytes == 2 * 33
+
+class TestBitfieldOperations:
+    def test_get_set_incrby(self, db):
+        """Test BITFIELD GET, SET and INCRBY across byte boundaries"""
+        assert db.bitfield.set("bf", "u12", 4, 0xABC) == 0
+        assert db.bitfield.get("bf", "u12", 4) == 0xABC
+        assert db.bitfield.get("bf", "i12", 4) == 0xABC - 4096
+        assert db.bitfield.incrby("bf", "u12", 4, 1) == 0xABD
+        # Reading past the end does not grow the value
+        assert db.bitfield.get("bf", "u8", 100) == 0
+        assert len(db.store["bf"]) == 2
+
+    def test_batch(self, db):
+        """Test several operations in one BITFIELD call, with hash offsets"""
+        handler = BitFieldCommandHandler(db)
+        assert handler.bitfield_command(None, "bf", "SET", "u8", "#1", "200", "GET", "u8", "8",
+                                        "INCRBY", "u4", "#3", "7", "SET", "i16", "#9", "-5",
+                                        "GET", "i16", "144") == [0, 200, 15, 0, -5]
+        assert len(db.store["bf"]) == 20
+        assert db.bitfield.get("bf", "u8", 8) == 207
+
+    def test_overflow(self, db):
+        """Test OVERFLOW WRAP, SAT and FAIL for unsigned and signed fields"""
+        ops = db.bitfield.parse_operations
+        assert db.bitfield.execute("bf", ops(["INCRBY", "u2", "0", "5"])) == [1]
+        assert db.bitfield.execute("bf", ops(["INCRBY", "i8", "8", "130"])) == [-126]
+        assert db.bitfield.execute("bf", ops(["OVERFLOW", "SAT", "INCRBY", "u2", "0", "5",
+                                              "INCRBY", "i8", "8", "-10"])) == [3, -128]
+        assert db.bitfield.execute("bf", ops(["OVERFLOW", "FAIL", "INCRBY", "u2", "0", "1",
+                                              "SET", "u2", "0", "4", "INCRBY", "u2", "0", "-1"])) == [None, None, 2]
+        # OVERFLOW applies to the operations after it only
+        assert db.bitfield.execute("bf", ops(["INCRBY", "u2", "0", "2", "OVERFLOW", "FAIL",
+                                              "INCRBY", "u2", "0", "4"])) == [0, None]
+        with pytest.raises(ValueError):
+            ops(["OVERFLOW", "MAYBE"])
+
+    def test_read_only(self, db):
+        """Test BITFIELD_RO"""
+        handler = BitFieldCommandHandler(db)
+        db.set("key", "a")
+        assert handler.bitfield_ro_command(None, "key", "GET", "u8", "0", "GET", "u4", "#1") == [97, 1]
+        assert handler.bitfield_ro_command(None, "key", "SET", "u8", "0", "1").startswith("ERROR")
+        assert handler.bitfield_ro_command(None, "missing", "GET", "u8", "0") == [0]
+        assert not db.exists("missing")
+
+    def test_single_aof_record(self, db, tmp_path):
+        """Test that a batch is logged once, without its reads, and replayed"""
+        logged = []
+        db.persistence_manager.log_command = logged.append
+        ops = db.bitfield.parse_operations(["GET", "u8", "0", "SET", "u8", "#1", "255",
+                                            "OVERFLOW", "SAT", "INCRBY", "u8", "#1", "10"])
+        assert db.bitfield.execute("bf", ops) == [0, 0, 255]
+        assert logged == ["BITFIELD bf SET u8 8 255 OVERFLOW SAT INCRBY u8 8 10"]
+
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("".join(line + "\n" for line in logged))
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert db.store["bf"] == bytearray(b"\x00\xff")
+
+    def test_restarts(self, restart):
+        """Test that BITFIELD INCRBY is applied once across restarts"""
+        db = restart()
+        db.bitfield.incrby("bf", "u8", "0", 5)
+        for crash in (False, True, False):
+            if crash:
+                db.persistence_manager.create_snapshot()
+            db = restart(crash)
+            assert db.bitfield.get("bf", "u8", "0") == 5
+
+if __name__ == '__main__':
+    pytest.main([__file__])
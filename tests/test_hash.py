@@ -1,4 +1,5 @@
 import pytest
+import time
 
 class TestHashBasicOperations:
     def test_hset_hget(self, db):
@@ -129,5 +130,126 @@ class TestHashEdgeCases:
         assert db.hash.hget("string", "field") is None  # Should fail
         assert db.hash.hexists("string", "field") == False  # Should fail
 
+class TestHashCounterOperations:
+    def test_hincrby(self, db):
+        """Test HINCRBY and HINCRBYFLOAT"""
+        assert db.hash.hincrby("myhash", "counter", 5) == 5
+        assert db.hash.hincrby("myhash", "counter", -2) == 3
+        assert db.hash.hget("myhash", "counter") == "3"
+
+        assert db.hash.hincrbyfloat("myhash", "price", 10.5) == "10.5"
+        assert db.hash.hincrbyfloat("myhash", "price", 0.5) == "11"
+
+        # Non-numeric values are rejected
+        db.hash.hset("myhash", "name", "abc")
+        assert db.hash.hincrby("myhash", "name", 1) == "ERR hash value is not an integer"
+        assert db.hash.hincrbyfloat("myhash", "name", 1.0) == "ERR hash value is not a float"
+        assert db.hash.hincrby("myhash", "counter", 2**63) == "ERR increment or decrement would overflow"
+
+    def test_read_operations(self, db):
+        """Test HMGET, HLEN, HKEYS, HVALS, HSTRLEN and HSETNX"""
+        db.hash.hmset("myhash", {"a": "1", "b": "22"})
+        assert db.hash.hmget("myhash", "a", "missing", "b") == ["1", None, "22"]
+        assert db.hash.hmget("nonexistent", "a") == [None]
+        assert db.hash.hlen("myhash") == 2
+        assert db.hash.hkeys("myhash") == ["a", "b"]
+        assert db.hash.hvals("myhash") == ["1", "22"]
+        assert db.hash.hstrlen("myhash", "b") == 2
+        assert db.hash.hstrlen("myhash", "missing") == 0
+
+        assert db.hash.hsetnx("myhash", "a", "other") == 0
+        assert db.hash.hsetnx("myhash", "c", "3") == 1
+        assert db.hash.hget("myhash", "a") == "1"
+
+    def test_hrandfield(self, db):
+        """Test HRANDFIELD with and without count"""
+        mapping = {f"f{i}": str(i) for i in range(10)}
+        db.hash.hmset("myhash", mapping)
+        assert db.hash.hrandfield("myhash") in mapping
+        assert db.hash.hrandfield("nonexistent") is None
+
+        fields = db.hash.hrandfield("myhash", 5)
+        assert len(set(fields)) == 5
+        # A negative count may repeat fields
+        assert len(db.hash.hrandfield("myhash", -30)) == 30
+        assert sorted(db.hash.hrandfield("myhash", 20)) == sorted(mapping)
+
+        pairs = db.hash.hrandfield("myhash", 3, withvalues=True)
+        assert all(mapping[pairs[i]] == pairs[i + 1] for i in range(0, 6, 2))
+
+class TestHashFieldExpiry:
+    def test_hexpire_httl_hpersist(self, db):
+        """Test setting, reading and removing field TTLs"""
+        db.hash.hmset("session", {"token": "abc", "user": "42"})
+        assert db.hash.hexpire("session", 100, ["token", "missing"]) == [1, -2]
+        assert db.hash.httl("session", ["token", "user", "missing"]) == [100, -1, -2]
+
+        # NX/XX/GT/LT conditions
+        assert db.hash.hexpire("session", 50, ["token"], "NX") == [0]
+        assert db.hash.hexpire("session", 50, ["token"], "GT") == [0]
+        assert db.hash.hexpire("session", 50, ["token"], "LT") == [1]
+        assert db.hash.hexpire("session", 50, ["user"], "XX") == [0]
+
+        assert db.hash.hpersist("session", ["token", "user"]) == [1, -1]
+        assert db.hash.httl("session", ["token"]) == [-1]
+        assert db.hash.httl("nonexistent", ["a"]) == [-2]
+
+        # Zero seconds deletes the field right away
+        assert db.hash.hexpire("session", 0, ["user"]) == [2]
+        assert db.hash.hkeys("session") == ["token"]
+
+    def test_expired_fields(self, db):
+        """Test that expired fields disappear on read and in the background cleaner"""
+        db.hash.hmset("session", {"token": "abc", "user": "42", "other": "x"})
+        db.hash.hexpire("session", 100, ["token", "user"])
+        # Move the deadlines into the past
+        for field in ("token", "user"):
+            db.expiry_manager.set_field_expiry("session", field, time.time() - 1)
+
+        assert db.hash.hget("session", "token") is None
+        assert db.hash.hlen("session") == 1
+
+        db.hash.hset("session2", "a", "1")
+        db.hash.hexpire("session2", 100, ["a"])
+        db.expiry_manager.set_field_expiry("session2", "a", time.time() - 1)
+        assert db.expiry_manager.expire_due() == 1
+        assert not db.exists("session2")
+
+    def test_overwrite_clears_ttl(self, db):
+        """Test that HSET clears a field TTL and HINCRBY keeps it"""
+        db.hash.hmset("myhash", {"a": "1", "b": "2"})
+        db.hash.hexpire("myhash", 100, ["a", "b"])
+        db.hash.hset("myhash", "a", "10")
+        db.hash.hincrby("myhash", "b", 1)
+        assert db.hash.httl("myhash", ["a", "b"]) == [-1, 100]
+
+        # Deleting the key drops its field deadlines
+        db.delete("myhash")
+        db.hash.hset("myhash", "b", "1")
+        assert db.hash.httl("myhash", ["b"]) == [-1]
+
+    def test_key_expiry_index(self, db):
+        """Test that key deadlines go through the same index"""
+        db.set("k1", "v1")
+        db.set("k2", "v2")
+        db.expiry_manager.set_expiry("k1", 100)
+        db.expiry_manager.set_expiry("k2", 100)
+        db.expiry_manager.persist("k2")
+        assert db.expiry_manager.expire_due(time.time() + 200) == 1
+        assert not db.exists("k1")
+        assert db.exists("k2")
+
+    def test_equal_key_and_field_deadlines(self, db):
+        """Test that a key and a field of it may share a deadline in the index"""
+        deadline = time.time() - 1
+        db.hash.hset("tied", "f", "1")
+        db.hash.hset("tied", "g", "2")
+        db.expiry_manager.set_field_expiry("tied", "f", deadline)
+        db.expiry_manager.expire_at("tied", deadline)
+        db.expiry_manager.set_field_expiry("tied", "g", deadline)
+        db.expiry_manager.rebuild_index()
+        assert db.expiry_manager.expire_due() >= 1
+        assert not db.exists("tied")
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -86,6 +86,114 @@ class TestListRangeOperations:
         assert db.list.lset("mylist", -4, "zero") is False
         assert db.list.lset("nonexistent", 0, "value") is False
 
+    def test_queue_operations(self, db):
+        """Test using a list as a FIFO queue and reading ranges near the tail"""
+        db.list.rpush("queue", *[str(i) for i in range(1000)])
+        for i in range(500):
+            assert db.list.lpop("queue") == str(i)
+            db.list.rpush("queue", str(1000 + i))
+
+        assert db.list.lindex("queue", 0) == "500"
+        assert db.list.lrange("queue", -3, -1) == ["1497", "1498", "1499"]
+        assert db.list.lrange("queue", 998, 2000) == ["1498", "1499"]
+
+        # Reading a missing key does not create it
+        assert db.list.lpop("missing") is None
+        assert not db.exists("missing")
+
+class TestListModifyOperations:
+    def test_pop_with_count(self, db):
+        """Test LPOP/RPOP with a COUNT argument"""
+        db.list.rpush("mylist", "one", "two", "three", "four")
+        assert db.list.lpop("mylist", 2) == ["one", "two"]
+        assert db.list.rpop("mylist", 5) == ["four", "three"]
+        assert not db.exists("mylist")
+        assert db.list.lpop("mylist", 2) is None
+
+    def test_llen_and_ltrim(self, db):
+        """Test LLEN and LTRIM for the capped-log pattern"""
+        for i in range(10):
+            db.list.lpush("log", str(i))
+            db.list.ltrim("log", 0, 2)
+        assert db.list.llen("log") == 3
+        assert db.list.lrange("log", 0, -1) == ["9", "8", "7"]
+
+        # Trimming most of a list and trimming everything
+        db.list.rpush("big", *[str(i) for i in range(100)])
+        assert db.list.ltrim("big", -2, -1) == "OK"
+        assert db.list.lrange("big", 0, -1) == ["98", "99"]
+        assert db.list.ltrim("big", 5, 10) == "OK"
+        assert not db.exists("big")
+        assert db.list.llen("big") == 0
+
+    def test_lrem_and_linsert(self, db):
+        """Test LREM from both ends and LINSERT around a pivot"""
+        db.list.rpush("mylist", "a", "b", "a", "c", "a")
+        assert db.list.lrem("mylist", -1, "a") == 1
+        assert db.list.lrange("mylist", 0, -1) == ["a", "b", "a", "c"]
+        assert db.list.lrem("mylist", 0, "a") == 2
+        assert db.list.lrange("mylist", 0, -1) == ["b", "c"]
+
+        assert db.list.linsert("mylist", "BEFORE", "c", "x") == 3
+        assert db.list.linsert("mylist", "AFTER", "c", "y") == 4
+        assert db.list.linsert("mylist", "AFTER", "missing", "z") == -1
+        assert db.list.lrange("mylist", 0, -1) == ["b", "x", "c", "y"]
+
+    def test_lpos(self, db):
+        """Test LPOS with RANK, COUNT and MAXLEN"""
+        db.list.rpush("mylist", "a", "b", "c", "1", "2", "3", "c", "c")
+        assert db.list.lpos("mylist", "c") == 2
+        assert db.list.lpos("mylist", "c", rank=2) == 6
+        assert db.list.lpos("mylist", "c", rank=-1) == 7
+        assert db.list.lpos("mylist", "c", count=0) == [2, 6, 7]
+        assert db.list.lpos("mylist", "c", rank=-1, count=2) == [7, 6]
+        assert db.list.lpos("mylist", "c", count=0, maxlen=4) == [2]
+        assert db.list.lpos("mylist", "x") is None
+
+    def test_lmove_and_lmpop(self, db):
+        """Test LMOVE rotation and LMPOP across keys"""
+        db.list.rpush("mylist", "a", "b", "c")
+        assert db.list.lmove("mylist", "mylist", "LEFT", "RIGHT") == "a"
+        assert db.list.lrange("mylist", 0, -1) == ["b", "c", "a"]
+        assert db.list.lmove("missing", "mylist") is None
+
+        assert db.list.lmpop(["empty", "mylist"], "RIGHT", 2) == ["mylist", ["a", "c"]]
+        assert db.list.lmpop(["empty"], "LEFT") is None
+
+class TestListBlockingOperations:
+    def test_blocking_pop(self, db):
+        """Test BLPOP/BRPOP serving parked clients in FIFO order"""
+        from commands.list_handler import ListCommandHandler
+        handler = ListCommandHandler(db)
+        manager = db.blocking_manager
+
+        # Data available: reply right away from the first non-empty key
+        db.list.rpush("low", "a")
+        assert handler.blpop_command(1, "high", "low", "0") == ["low", "a"]
+
+        # No data: clients are parked and served in arrival order
+        manager.block(1, handler.brpop_command(1, "high", "low", "0"))
+        manager.block(2, handler.blpop_command(2, "low", "1.5"))
+        db.list.rpush("low", "x", "y")
+        assert manager.serve_ready_keys() == [(1, ["low", "y"]), (2, ["low", "x"])]
+        assert not db.exists("low")
+
+        # Timed-out clients get nil
+        manager.block(3, handler.blpop_command(3, "high", "0.1"))
+        assert manager.expire_timeouts(now=float('inf')) == [(3, None)]
+
+    def test_blmove(self, db):
+        """Test BLMOVE moving an element once the source gets one"""
+        from commands.list_handler import ListCommandHandler
+        handler = ListCommandHandler(db)
+        manager = db.blocking_manager
+
+        manager.block(1, handler.blmove_command(1, "jobs", "processing", "RIGHT", "LEFT", "0"))
+        db.list.lpush("jobs", "job1")
+        assert manager.serve_ready_keys() == [(1, "job1")]
+        assert db.list.lrange("processing", 0, -1) == ["job1"]
+        assert handler.blmove_command(1, "jobs", "processing", "UP", "LEFT", "0") == "ERR syntax error"
+
 class TestListEdgeCases:
     def test_type_handling(self, db):
         """Test handling of different value types"""
@@ -116,6 +224,14 @@ class TestListEdgeCases:
         assert db.list.lindex("largelist", 500) == "500"
         assert db.list.lindex("largelist", -1) == str(large_size - 1)
 
+    def test_legacy_list_values(self, db):
+        """Test that plain lists restored from older snapshots are upgraded on access"""
+        db.store["old"] = ["a", "b", "c"]
+        assert db.list.lpush("old", "z") == 4
+        assert db.list.lrange("old", 0, -1) == ["z", "a", "b", "c"]
+        db.store["old2"] = ["x"]
+        assert db.list.lmpop(["missing", "old2"]) == ["old2", ["x"]]
+
     def test_error_conditions(self, db):
         """Test error conditions and edge cases"""
         # Test operations on non-list types
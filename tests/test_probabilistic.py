@@ -0,0 +1,551 @@
+import bisect
+import math
+import random
+
+import pytest
+
+from commands.probabilistic_handler import ProbabilisticCommandHandler
+from core.persistence import AOFHandler
+import datatypes.advanced.probabilistic as probabilistic_module
+from datatypes.advanced.probabilistic import (
+    BloomFilter, HyperLogLog, ScalableBloomFilter, ScalableCuckooFilter, TDigest, TopK,
+    HLL_SPARSE_MAX_ENTRIES,
+)
+
+class TestBloomFilter:
+    def test_add_exists(self, db):
+        """Test BF.ADD, BF.EXISTS and the default filter"""
+        assert db.probabilistic.bf_add("bf", "apple") == 1
+        assert db.probabilistic.bf_add("bf", "apple") == 0
+        assert db.probabilistic.bf_exists("bf", "apple")
+        assert not db.probabilistic.bf_exists("bf", "banana")
+        # Checking a missing key does not create it
+        assert not db.probabilistic.bf_exists("missing", "apple")
+        assert not db.exists("missing")
+
+    def test_madd_mexists(self, db):
+        """Test BF.MADD and BF.MEXISTS"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.bf_madd_command(None, "bf", "a", "b", "a") == [1, 1, 0]
+        assert handler.bf_mexists_command(None, "bf", "a", "c", "b") == [1, 0, 1]
+        assert handler.bf_mexists_command(None, "missing", "a") == [0]
+        db.set("str", "value")
+        assert handler.bf_madd_command(None, "str", "a").startswith("ERROR")
+
+    def test_reserve(self, db):
+        """Test BF.RESERVE sizing and argument checks"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.bf_reserve_command(None, "bf", "0.001", "10000") == "OK"
+        assert handler.bf_reserve_command(None, "bf", "0.001", "10000") == "ERROR: Key exists"
+        assert handler.bf_reserve_command(None, "bad", "1.5", "100").startswith("ERROR")
+        assert handler.bf_reserve_command(None, "bad", "0.01", "0").startswith("ERROR")
+        assert handler.bf_reserve_command(None, "bad", "0.01", "100", "EXPANSION").startswith("ERROR")
+
+        bf = db.store["bf"]
+        # Bit-packed: about 15-20 bits per item at 0.1%, in whole 64-byte blocks
+        assert 10000 * 14 // 8 < bf.size < 10000 * 20 // 8
+        assert bf.size % 64 == 0
+
+    def test_error_rate(self):
+        """Test that the false positive rate stays close to the requested one"""
+        bf = BloomFilter(5000, 0.01)
+        for i in range(5000):
+            bf.add(f"member:{i}")
+        assert all(bf.contains(f"member:{i}") for i in range(5000))
+        false_positives = sum(bf.contains(f"other:{i}") for i in range(20000))
+        assert false_positives / 20000 < 0.02
+
+    def test_scaling(self, db):
+        """Test that a full filter grows, and that NONSCALING filters refuse new items"""
+        handler = ProbabilisticCommandHandler(db)
+        handler.bf_reserve_command(None, "bf", "0.01", "100", "EXPANSION", "4")
+        db.probabilistic.bf_madd("bf", [f"item:{i}" for i in range(600)])
+        bf = db.store["bf"]
+        assert [bloom.capacity for bloom in bf.filters] == [100, 400, 1600]
+        assert bf.filters[1].error_rate == 0.005
+        assert all(db.probabilistic.bf_mexists("bf", [f"item:{i}" for i in range(600)]))
+
+        handler.bf_reserve_command(None, "fixed", "0.01", "2", "NONSCALING")
+        assert handler.bf_madd_command(None, "fixed", "a", "b", "c") == [1, 1, "ERROR: non scaling filter is full"]
+        assert handler.bf_add_command(None, "fixed", "d") == "ERROR: non scaling filter is full"
+        assert isinstance(db.store["fixed"], ScalableBloomFilter)
+        assert len(db.store["fixed"].filters) == 1
+
+    def test_legacy_filter(self, db):
+        """Test that a Bloom filter pickled before the blocked layout still answers and grows"""
+        import pickle
+        import mmh3
+        legacy = BloomFilter.__new__(BloomFilter)
+        legacy.__dict__.update(size=1000, num_hashes=4, bits=bytearray(1000))
+        for item in ("apple", "pear"):
+            for seed in range(4):
+                legacy.bits[mmh3.hash(item, seed) % 1000] = 1
+        db.store["old"] = pickle.loads(pickle.dumps(legacy))
+        assert db.probabilistic.bf_mexists("old", ["apple", "pear", "plum"]) == [1, 1, 0]
+        assert db.probabilistic.bf_add("old", "apple") == 0
+        assert db.probabilistic.bf_add("old", "plum") == 1
+        assert db.probabilistic.bf_mexists("old", ["apple", "plum"]) == [1, 1]
+        assert isinstance(db.store["old"], ScalableBloomFilter)
+
+        db.set("str", "value")
+        assert db.probabilistic.bf_add("str", "a") == "ERROR: Value is not a BloomFilter"
+
+    def test_aof_replay(self, db, tmp_path):
+        """Test that BF.RESERVE and BF.MADD are logged and replayed"""
+        logged = []
+        db.persistence_manager.log_command = logged.append
+        db.probabilistic.bf_reserve("bf", 0.001, 50, expansion=4)
+        db.probabilistic.bf_reserve("fixed", 0.01, 2, scaling=False)
+        db.probabilistic.bf_madd("bf", [f"item:{i}" for i in range(100)])
+        db.probabilistic.bf_madd("fixed", ["a", "b", "c"])
+        db.probabilistic.bf_add("default", "x")
+
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("".join(line + "\n" for line in logged))
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert all(db.probabilistic.bf_mexists("bf", [f"item:{i}" for i in range(100)]))
+        assert [bloom.capacity for bloom in db.store["bf"].filters] == [50, 200]
+        assert db.store["bf"].filters[0].error_rate == 0.001
+        assert not db.store["fixed"].scaling
+        assert db.probabilistic.bf_mexists("fixed", ["a", "b", "c"]) == [1, 1, 0]
+        assert db.probabilistic.bf_exists("default", "x")
+
+    def test_aof_replay_bad_record(self, db, tmp_path, capsys):
+        """Test that a failing AOF record is reported and the records after it are still replayed"""
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("SET str value\nBF.MADD str a\nBF.RESERVE bad 0.01\nBF.MADD bf a b\nAPPEND str !\n")
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert db.probabilistic.bf_mexists("bf", ["a", "b"]) == [1, 1]
+        assert db.get("str") == "value!"
+        assert not db.exists("bad")
+        errors = capsys.readouterr().out.splitlines()
+        assert [error.split(":")[0] for error in errors] == ["Error replaying AOF line 2", "Error replaying AOF line 3"]
+
+@pytest.fixture(params=["python", "numpy"])
+def hll_path(request, monkeypatch):
+    """Run a test with the pure Python register operations and, if installed, with NumPy."""
+    if request.param == "numpy":
+        if probabilistic_module.np is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(probabilistic_module, "np", None)
+    return request.param
+
+class TestHyperLogLog:
+    def test_pfadd_pfcount(self, db):
+        """Test PFADD and PFCOUNT"""
+        assert db.probabilistic.pfadd("hll", "a", "b", "c") == 1
+        assert db.probabilistic.pfadd("hll", "a") == 0
+        assert db.probabilistic.pfcount("hll") == 3
+        db.probabilistic.pfadd("other", "c", "d")
+        assert db.probabilistic.pfcount("hll", "other") == 4
+
+    def test_sparse_promotion(self, hll_path):
+        """Test that small HLLs stay sparse and are promoted to dense registers"""
+        hll = HyperLogLog()
+        for i in range(200):
+            hll.add(f"item:{i}")
+        assert hll.registers is None
+        assert len(hll.sparse) <= 200
+        assert abs(hll.count() - 200) <= 2
+        for i in range(200, 5000):
+            hll.add(f"item:{i}")
+        assert hll.sparse is None
+        assert len(hll.registers) == 16384
+        assert abs(hll.count() - 5000) < 5000 * 0.03
+
+    def test_accuracy(self, hll_path):
+        """Test the estimate of a large cardinality"""
+        hll = HyperLogLog()
+        for i in range(100000):
+            hll.add(f"user:{i}")
+        assert abs(hll.count() - 100000) < 100000 * 0.03
+
+    def test_cached_count(self):
+        """Test that the estimate is cached until a register changes"""
+        hll = HyperLogLog()
+        hll.add("a")
+        assert hll.count() == 1
+        hll.sparse = None  # Any recount would now fail
+        assert hll.count() == 1
+
+    def test_legacy_snapshot(self, db, monkeypatch):
+        """Test that HLLs pickled before the sparse encoding load as dense registers"""
+        import pickle
+        import mmh3
+
+        class HyperLogLog:
+            def __init__(self):
+                self.p = 14
+                self.m = 1 << 14
+                self.registers = bytearray(self.m)
+                self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+            def add(self, item):
+                x = mmh3.hash(item, 42)
+                j = x & (self.m - 1)
+                self.registers[j] = max(self.registers[j], min(self.p, ((x >> self.p) | 1).bit_length()))
+
+        # Pickle it under the name of the current class, as the old code would have
+        HyperLogLog.__module__ = probabilistic_module.__name__
+        HyperLogLog.__qualname__ = HyperLogLog.__name__
+        legacy = HyperLogLog()
+        for i in range(1000):
+            legacy.add(f"user:{i}")
+        with monkeypatch.context() as patch:
+            patch.setattr(probabilistic_module, "HyperLogLog", HyperLogLog)
+            data = pickle.dumps(legacy)
+        db.store["old"] = pickle.loads(data)
+
+        assert db.store["old"].sparse is None
+        assert abs(db.probabilistic.pfcount("old") - 1000) < 1000 * 0.03
+        assert db.probabilistic.pfadd("old", "new:1", "new:2") == 1
+        assert abs(db.probabilistic.pfcount("old") - 1002) < 1002 * 0.03
+        restored = pickle.loads(pickle.dumps(db.store["old"]))
+        assert restored.count() == db.store["old"].count()
+
+    def test_merge(self, db, hll_path):
+        """Test merging sparse and dense HLLs"""
+        small = HyperLogLog()
+        large = HyperLogLog()
+        for i in range(100):
+            small.add(f"small:{i}")
+        for i in range(20000):
+            large.add(f"large:{i}")
+
+        merged = HyperLogLog()
+        assert merged.merge(small)
+        assert merged.sparse is not None
+        assert abs(merged.count() - 100) <= 2
+        assert merged.merge(large)
+        assert merged.sparse is None
+        assert abs(merged.count() - 20100) < 20100 * 0.03
+        # Merging is idempotent
+        registers = bytes(merged.registers)
+        merged.merge(large)
+        assert bytes(merged.registers) == registers
+        assert not merged.merge(HyperLogLog(precision=10))
+
+        # Sparse + sparse beyond the limit is promoted
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(HLL_SPARSE_MAX_ENTRIES):
+            first.add(f"first:{i}")
+            second.add(f"second:{i}")
+        first.merge(second)
+        assert first.sparse is None
+
+        db.store["small"], db.store["large"] = small, large
+        assert db.probabilistic.pfmerge("dest", "small", "large")
+        assert db.probabilistic.pfcount("dest") == merged.count()
+
+class TestCuckooFilter:
+    def test_add_exists_del(self, db):
+        """Test CF.ADD, CF.EXISTS, CF.DEL and CF.COUNT"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.cf_add_command(None, "cf", "apple") == "1"
+        assert handler.cf_add_command(None, "cf", "apple") == "1"
+        assert handler.cf_addnx_command(None, "cf", "apple") == "0"
+        assert handler.cf_count_command(None, "cf", "apple") == "2"
+        assert handler.cf_mexists_command(None, "cf", "apple", "banana") == [1, 0]
+        assert handler.cf_del_command(None, "cf", "apple") == "1"
+        assert handler.cf_exists_command(None, "cf", "apple") == "1"
+        assert handler.cf_del_command(None, "cf", "apple") == "1"
+        assert handler.cf_exists_command(None, "cf", "apple") == "0"
+        assert handler.cf_del_command(None, "cf", "apple") == "0"
+        assert handler.cf_del_command(None, "missing", "apple") == "0"
+        assert not db.exists("missing")
+        db.set("str", "value")
+        assert handler.cf_add_command(None, "str", "a").startswith("ERROR")
+
+    def test_reserve(self, db):
+        """Test CF.RESERVE sizing and argument checks"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.cf_reserve_command(None, "cf", "1000", "BUCKETSIZE", "4") == "OK"
+        assert handler.cf_reserve_command(None, "cf", "1000") == "ERROR: Key exists"
+        assert handler.cf_reserve_command(None, "bad", "0").startswith("ERROR")
+        assert handler.cf_reserve_command(None, "bad", "100", "BUCKETSIZE").startswith("ERROR")
+        assert handler.cf_reserve_command(None, "bad", "100", "EXPANSION", "0").startswith("ERROR")
+        # One byte per fingerprint, bucket count rounded up to a power of two
+        assert db.store["cf"].size == 256 * 4
+
+    def test_delete_and_error_rate(self):
+        """Test that deleted items are gone and that other items are rarely reported"""
+        cf = ScalableCuckooFilter(4000)
+        for i in range(4000):
+            cf.add(f"member:{i}")
+        assert all(cf.contains(f"member:{i}") for i in range(4000))
+        for i in range(2000):
+            assert cf.delete(f"member:{i}")
+        assert all(cf.contains(f"member:{i}") for i in range(2000, 4000))
+        assert cf.count == 2000
+        assert sum(cf.contains(f"member:{i}") for i in range(2000)) < 2000 * 0.03
+        assert sum(cf.contains(f"other:{i}") for i in range(10000)) < 10000 * 0.03
+
+    def test_scaling(self):
+        """Test that a full filter grows by the expansion, rounded up to a power of two"""
+        cf = ScalableCuckooFilter(8, bucket_size=2, max_iterations=5, expansion=3)
+        for i in range(200):
+            cf.add(f"item:{i}")
+        buckets = [cuckoo.num_buckets for cuckoo in cf.filters]
+        assert len(buckets) > 1
+        assert all(after == before * 4 for before, after in zip(buckets, buckets[1:]))
+        assert all(cf.contains(f"item:{i}") for i in range(200))
+        assert cf.count == 200
+
+class TestCountMinSketch:
+    def test_incrby_query(self, db):
+        """Test CMS.INITBYDIM, CMS.INCRBY and CMS.QUERY"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.cms_initbydim_command(None, "cms", "2000", "5") == "OK"
+        assert handler.cms_initbydim_command(None, "cms", "2000", "5") == "ERROR: Key exists"
+        assert handler.cms_incrby_command(None, "cms", "a", "3", "b", "1", "a", "2") == [3, 1, 5]
+        assert handler.cms_query_command(None, "cms", "a", "b", "c") == [5, 1, 0]
+        assert handler.cms_incrby_command(None, "cms", "a").startswith("ERROR")
+        assert handler.cms_incrby_command(None, "cms", "a", "-1").startswith("ERROR")
+        assert handler.cms_incrby_command(None, "missing", "a", "1") == "ERROR: CMS: key does not exist"
+        assert db.store["cms"].count == 6
+        assert len(db.store["cms"].counters) == 2000 * 5
+
+    def test_initbyprob_and_accuracy(self, db):
+        """Test CMS.INITBYPROB sizing and that estimates only overestimate, within the error bound"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.cms_initbyprob_command(None, "cms", "0.01", "0.01") == "OK"
+        assert handler.cms_initbyprob_command(None, "bad", "0", "0.01").startswith("ERROR")
+        cms = db.store["cms"]
+        assert (cms.width, cms.depth) == (200, 7)
+        counts = {f"item:{i}": i % 50 + 1 for i in range(1000)}
+        for item, count in counts.items():
+            cms.incrby(item, count)
+        for item, count in counts.items():
+            assert count <= cms.query(item) <= count + 0.01 * cms.count
+
+    def test_merge(self, db):
+        """Test CMS.MERGE with and without weights"""
+        handler = ProbabilisticCommandHandler(db)
+        for key in ("a", "b", "dest"):
+            handler.cms_initbydim_command(None, key, "100", "4")
+        handler.cms_initbydim_command(None, "other", "50", "4")
+        db.probabilistic.cms_incrby("a", [("x", 2), ("y", 1)])
+        db.probabilistic.cms_incrby("b", [("x", 3)])
+        assert handler.cms_merge_command(None, "dest", "2", "a", "b") == "OK"
+        assert db.probabilistic.cms_query("dest", ["x", "y"]) == [5, 1]
+        assert handler.cms_merge_command(None, "dest", "2", "a", "b", "WEIGHTS", "2", "3") == "OK"
+        assert db.probabilistic.cms_query("dest", ["x", "y"]) == [13, 2]
+        assert db.store["dest"].count == 15
+        assert handler.cms_merge_command(None, "dest", "2", "a", "other").startswith("ERROR")
+        assert handler.cms_merge_command(None, "dest", "2", "a", "b", "WEIGHTS", "1").startswith("ERROR")
+        assert handler.cms_merge_command(None, "new", "1", "a") == "ERROR: CMS: key does not exist"
+
+    def test_aof_replay(self, db, tmp_path):
+        """Test that Cuckoo filter and Count-Min Sketch commands are logged and replayed"""
+        logged = []
+        db.persistence_manager.log_command = logged.append
+        db.probabilistic.cf_reserve("cf", 100)
+        db.probabilistic.cf_add("cf", "a")
+        db.probabilistic.cf_add("cf", "b")
+        db.probabilistic.cf_del("cf", "a")
+        db.probabilistic.cms_initbyprob("src", 0.01, 0.01)
+        db.probabilistic.cms_initbydim("cms", 200, 7)
+        db.probabilistic.cms_incrby("src", [("x", 4), ("y", 1)])
+        db.probabilistic.cms_merge("cms", ["src"], [2])
+
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("".join(line + "\n" for line in logged))
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert db.probabilistic.cf_mexists("cf", ["a", "b"]) == [0, 1]
+        assert db.store["cf"].size == 128
+        assert db.probabilistic.cms_query("cms", ["x", "y"]) == [8, 2]
+
+    def test_restarts(self, restart):
+        """Test that Cuckoo filter and Count-Min Sketch counts stay the same across restarts"""
+        db = restart()
+        db.probabilistic.cf_reserve("cf", 100)
+        db.probabilistic.cf_add("cf", "a")
+        db.probabilistic.cms_initbydim("cms", 200, 7)
+        db.probabilistic.cms_incrby("cms", [("x", 3)])
+        for crash in (False, True, False):
+            if crash:
+                db.persistence_manager.create_snapshot()
+            db = restart(crash)
+            assert db.probabilistic.cf_count("cf", "a") == 1
+            assert db.probabilistic.cms_query("cms", ["x"]) == [3]
+
+class TestTopK:
+    def test_add_list(self, db):
+        """Test TOPK.RESERVE, TOPK.ADD, TOPK.LIST, TOPK.QUERY and TOPK.COUNT"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.topk_reserve_command(None, "top", "2") == "OK"
+        assert handler.topk_reserve_command(None, "top", "2") == "ERROR: Key exists"
+        assert handler.topk_add_command(None, "top", "a", "b", "a") == ["(nil)", "(nil)", "(nil)"]
+        assert handler.topk_add_command(None, "top", "c", "c", "c") == ["(nil)", "b", "(nil)"]
+        assert handler.topk_list_command(None, "top") == ["c", "a"]
+        assert handler.topk_list_command(None, "top", "WITHCOUNT") == ["c", 3, "a", 2]
+        assert handler.topk_query_command(None, "top", "a", "b") == [1, 0]
+        assert handler.topk_count_command(None, "top", "a", "b", "c", "d") == [2, 1, 3, 0]
+        assert handler.topk_add_command(None, "missing", "a") == "ERROR: TopK: key does not exist"
+        assert handler.topk_reserve_command(None, "bad", "10", "8", "7", "1.5").startswith("ERROR")
+        assert handler.topk_reserve_command(None, "bad", "10", "8").startswith("ERROR")
+
+    def test_incrby(self, db):
+        """Test TOPK.INCRBY with large increments"""
+        handler = ProbabilisticCommandHandler(db)
+        handler.topk_reserve_command(None, "top", "3", "4", "2", "0.9")
+        assert handler.topk_incrby_command(None, "top", "a", "1000000", "b", "5", "c", "7", "d", "1000000000") \
+            == ["(nil)", "(nil)", "(nil)", "(nil)"]
+        items = db.probabilistic.topk_list("top")
+        assert items[0] == ("d", 1000000000)
+        assert ("a", 1000000) in items
+        assert handler.topk_incrby_command(None, "top", "a", "0").startswith("ERROR")
+        assert handler.topk_incrby_command(None, "top", "a").startswith("ERROR")
+
+    def test_heavy_hitters(self):
+        """Test that the most frequent items of a skewed stream are found with their counts"""
+        topk = TopK(10, width=100)
+        counts = {f"url:{i}": 1000 // (i + 1) for i in range(500)}
+        stream = [item for item, count in counts.items() for _ in range(count)]
+        random.Random(3).shuffle(stream)
+        for start in range(0, len(stream), 100):
+            topk.incrby([(item, 1) for item in stream[start:start + 100]])
+        assert [item for item, _ in topk.list()] == [f"url:{i}" for i in range(10)]
+        assert all(abs(count - counts[item]) <= counts[item] * 0.05 for item, count in topk.list())
+        # The heap stays a valid min-heap with a matching index
+        heap = topk.heap
+        assert all(heap[(i - 1) // 2][0] <= heap[i][0] for i in range(1, len(heap)))
+        assert all(topk.index[item] == i for i, (_, item) in enumerate(heap))
+        assert len(topk.counts) == topk.width * topk.depth
+
+    def test_aof_replay(self, db, tmp_path):
+        """Test that Top-K commands are logged and replayed into the same sketch"""
+        logged = []
+        db.persistence_manager.log_command = logged.append
+        db.probabilistic.topk_reserve("top", 2, 50, 3)
+        db.probabilistic.topk_add("top", ["a", "b", "c", "a"])
+        db.probabilistic.topk_incrby("top", [("c", 5)])
+        expected = db.store["top"]
+
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("".join(line + "\n" for line in logged))
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        topk = db.store["top"]
+        assert topk.list() == expected.list() == [("c", 6), ("a", 2)]
+        assert topk.counts == expected.counts
+
+    def test_restarts(self, restart):
+        """Test that Top-K counts stay the same across restarts"""
+        db = restart()
+        db.probabilistic.topk_reserve("top", 2, 50, 3)
+        db.probabilistic.topk_add("top", ["a", "b", "c", "a"])
+        db.probabilistic.topk_incrby("top", [("c", 5)])
+        for crash in (False, True, False):
+            if crash:
+                db.persistence_manager.create_snapshot()
+            db = restart(crash)
+            assert db.probabilistic.topk_list("top") == [("c", 6), ("a", 2)]
+            assert db.probabilistic.topk_count("top", ["a", "b"]) == [2, 1]
+
+class TestTDigest:
+    def test_commands(self, db):
+        """Test TDIGEST.CREATE, TDIGEST.ADD, TDIGEST.QUANTILE, TDIGEST.CDF and TDIGEST.TRIMMED_MEAN"""
+        handler = ProbabilisticCommandHandler(db)
+        assert handler.tdigest_create_command(None, "td") == "OK"
+        assert handler.tdigest_create_command(None, "td") == "ERROR: Key exists"
+        assert handler.tdigest_quantile_command(None, "td", "0.5") == ["nan"]
+        assert handler.tdigest_add_command(None, "td", *map(str, range(1, 11))) == "OK"
+        assert handler.tdigest_quantile_command(None, "td", "0", "1") == ["1.0", "10.0"]
+        assert float(handler.tdigest_quantile_command(None, "td", "0.5")[0]) == pytest.approx(5.5)
+        assert handler.tdigest_cdf_command(None, "td", "0", "10") == ["0.0", "1.0"]
+        assert float(handler.tdigest_cdf_command(None, "td", "5.5")[0]) == pytest.approx(0.5)
+        assert float(handler.tdigest_trimmed_mean_command(None, "td", "0.1", "0.9")) == pytest.approx(5.5)
+        assert handler.tdigest_add_command(None, "td", "abc").startswith("ERROR")
+        assert handler.tdigest_quantile_command(None, "td", "1.5").startswith("ERROR")
+        assert handler.tdigest_trimmed_mean_command(None, "td", "0.9", "0.1").startswith("ERROR")
+        assert handler.tdigest_add_command(None, "missing", "1") == "ERROR: T-Digest: key does not exist"
+
+    def test_accuracy_and_memory(self):
+        """Test quantile and CDF accuracy on skewed data with a bounded number of centroids"""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(0, 1.5) for _ in range(50000)]
+        digest = TDigest()
+        digest.add_all(values)
+        ordered = sorted(values)
+        for q in (0.001, 0.01, 0.5, 0.9, 0.99, 0.999):
+            rank = bisect.bisect_left(ordered, digest.quantile(q)) / len(ordered)
+            assert abs(rank - q) < 0.005
+            assert digest.cdf(ordered[int(q * len(ordered))]) == pytest.approx(q, abs=0.005)
+        exact = sum(ordered[5000:45000]) / 40000
+        assert digest.trimmed_mean(0.1, 0.9) == pytest.approx(exact, rel=0.01)
+        assert len(digest.means) <= digest.compression
+        assert digest.total == 50000
+
+    def test_merge(self, db):
+        """Test TDIGEST.MERGE into new and existing digests, with OVERRIDE and COMPRESSION"""
+        handler = ProbabilisticCommandHandler(db)
+        handler.tdigest_create_command(None, "low")
+        handler.tdigest_create_command(None, "high", "COMPRESSION", "200")
+        db.probabilistic.tdigest_add("low", [float(i) for i in range(1000)])
+        db.probabilistic.tdigest_add("high", [float(i) for i in range(1000, 2000)])
+        assert handler.tdigest_merge_command(None, "all", "2", "low", "high") == "OK"
+        merged = db.store["all"]
+        assert merged.compression == 200
+        assert merged.total == 2000
+        assert (merged.min, merged.max) == (0, 1999)
+        assert merged.quantile(0.5) == pytest.approx(1000, abs=20)
+
+        # An existing destination keeps its values unless OVERRIDE is given
+        assert handler.tdigest_merge_command(None, "all", "1", "low") == "OK"
+        assert db.store["all"].total == 3000
+        assert handler.tdigest_merge_command(None, "all", "1", "low", "OVERRIDE", "COMPRESSION", "50") == "OK"
+        assert db.store["all"].total == 1000
+        assert db.store["all"].compression == 50
+        assert handler.tdigest_merge_command(None, "all", "1", "missing").startswith("ERROR")
+        assert handler.tdigest_merge_command(None, "all", "2", "low").startswith("ERROR")
+
+    def test_aof_replay(self, db, tmp_path):
+        """Test that t-digest commands are logged and replayed"""
+        logged = []
+        db.persistence_manager.log_command = logged.append
+        db.probabilistic.tdigest_create("a", 50)
+        db.probabilistic.tdigest_create("b")
+        db.probabilistic.tdigest_add("a", [0.1, 2.5, 1e-7])
+        db.probabilistic.tdigest_add("b", [3.0])
+        db.probabilistic.tdigest_merge("c", ["a", "b"], compression=20, override=True)
+
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("".join(line + "\n" for line in logged))
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert db.store["a"].compression == 50
+        assert db.probabilistic.tdigest_quantile("c", [0, 1]) == [1e-7, 3.0]
+        assert db.store["c"].total == 4
+        assert math.isnan(db.probabilistic.tdigest_trimmed_mean("b", 0.5, 0.5))
+
+    def test_restarts(self, restart):
+        """Test that t-digest weights and quantiles stay the same across restarts"""
+        db = restart()
+        db.probabilistic.tdigest_create("a")
+        db.probabilistic.tdigest_add("a", [1.0, 2.0, 3.0, 4.0])
+        db.probabilistic.tdigest_merge("b", ["a"])
+        expected = db.probabilistic.tdigest_quantile("a", [0.25, 0.5])
+        for crash in (False, True, False):
+            if crash:
+                db.persistence_manager.create_snapshot()
+            db = restart(crash)
+            assert db.store["a"].total == db.store["b"].total == 4
+            assert db.probabilistic.tdigest_quantile("a", [0.25, 0.5]) == expected
+
+if __name__ == '__main__':
+    pytest.main([__file__])
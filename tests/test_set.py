@@ -52,6 +52,39 @@ class TestSetBasicOperations:
         db.sets.srem("myset", "two")
         assert sorted(db.sets.smembers("myset")) == ["one", "three"]
 
+class TestSetRandomOperations:
+    def test_srandmember(self, db):
+        """Test SRANDMEMBER with positive and negative counts"""
+        members = {str(i) for i in range(10)}
+        db.sets.sadd("myset", *members)
+
+        assert db.sets.srandmember("myset") in members
+        sample = db.sets.srandmember("myset", 5)
+        assert len(sample) == 5 and len(set(sample)) == 5 and set(sample) <= members
+        assert sorted(db.sets.srandmember("myset", 20)) == sorted(members)
+
+        # A negative count draws with replacement and may exceed the set size
+        draws = db.sets.srandmember("myset", -50)
+        assert len(draws) == 50 and set(draws) <= members
+
+        assert db.sets.srandmember("nonexistent") is None
+        assert db.sets.srandmember("nonexistent", 3) == []
+        assert len(db.sets.smembers("myset")) == 10
+
+    def test_spop(self, db):
+        """Test SPOP removing random members until the set is gone"""
+        db.sets.sadd("myset", *[str(i) for i in range(10)])
+        popped = [db.sets.spop("myset")]
+        popped += db.sets.spop("myset", 4)
+        assert len(set(popped)) == 5
+        assert not any(db.sets.sismember("myset", member) for member in popped)
+        assert len(db.sets.smembers("myset")) == 5
+
+        popped += db.sets.spop("myset", 100)
+        assert sorted(popped, key=int) == [str(i) for i in range(10)]
+        assert not db.exists("myset")
+        assert db.sets.spop("myset") is None
+
 class TestSetOperations:
     def test_sinter(self, db):
         """Test SINTER operation"""
@@ -107,6 +140,34 @@ class TestSetOperations:
         # Test with non-existent set
         assert set(db.sets.sdiff("set1", "nonexistent")) == {"a", "b", "c", "d"}
 
+    def test_store_variants(self, db):
+        """Test SINTERSTORE, SUNIONSTORE and SDIFFSTORE"""
+        db.sets.sadd("set1", "a", "b", "c", "d")
+        db.sets.sadd("set2", "c", "d", "e")
+
+        assert db.sets.sinterstore("dest", "set1", "set2") == 2
+        assert set(db.sets.smembers("dest")) == {"c", "d"}
+        assert db.sets.sunionstore("dest", "set1", "set2") == 5
+        assert db.sets.sdiffstore("dest", "set1", "set2") == 2
+        assert set(db.sets.smembers("dest")) == {"a", "b"}
+
+        # The stored set is independent of its sources
+        db.sets.sunionstore("copy", "set1")
+        db.sets.sadd("copy", "z")
+        assert not db.sets.sismember("set1", "z")
+
+        # An empty result deletes the destination
+        assert db.sets.sinterstore("dest", "set1", "nonexistent") == 0
+        assert not db.exists("dest")
+
+    def test_sintercard(self, db):
+        """Test SINTERCARD with and without LIMIT"""
+        db.sets.sadd("big", *[str(i) for i in range(1000)])
+        db.sets.sadd("small", "1", "2", "3", "x")
+        assert db.sets.sintercard(["big", "small"]) == 3
+        assert db.sets.sintercard(["big", "small"], limit=2) == 2
+        assert db.sets.sintercard(["big", "nonexistent"]) == 0
+
     def test_edge_cases(self, db):
         """Test edge cases for set operations"""
         # Test operations on non-set types
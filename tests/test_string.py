@@ -1,4 +1,8 @@
 import pytest
+import time
+
+from core.persistence import AOFHandler
+from protocol import format_resp
 
 class TestStringBasicOperations:
     def test_set_and_get(self, db):
@@ -105,5 +109,144 @@ class TestStringRangeOperations:
         assert db.string.strlen("large") == 1000000
         assert db.string.getrange("large", 0, 5) == "xxxxxx"
 
+class TestStringMultiKeyOperations:
+    def test_mset_mget(self, db):
+        """Test MSET, MGET and MSETNX"""
+        assert db.string.mset({"k1": "v1", "k2": "v2"}) == True
+        db.sets.sadd("set", "member")
+        assert db.string.mget("k1", "missing", "k2", "set") == ["v1", None, "v2", None]
+
+        # MSETNX sets nothing if any key exists
+        assert db.string.msetnx({"k3": "v3", "k1": "other"}) == 0
+        assert db.get("k3") is None
+        assert db.string.msetnx({"k3": "v3", "k4": "v4"}) == 1
+        assert db.string.mget("k3", "k4") == ["v3", "v4"]
+
+    def test_mset_single_aof_record(self, db, tmp_path):
+        """Test that MSET is logged once and replayed"""
+        logged = []
+        db.persistence_manager.log_command = logged.append
+        db.string.mset({"k1": "v1", "k2": "v2"})
+        assert logged == ["MSET k1 v1 k2 v2"]
+
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("MSET k1 a k2 b\n")
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert db.string.mget("k1", "k2") == ["a", "b"]
+
+        logged.clear()
+        db.string.mset({"a": "x y", "b": "z", "it's": ""})
+        aof_path.write_text("".join(line + "\n" for line in logged))
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert db.string.mget("a", "b", "it's") == ["x y", "z", ""]
+
+    def test_get_and_modify(self, db):
+        """Test SETNX, GETSET, GETDEL and GETEX"""
+        assert db.string.setnx("key", "v1") == 1
+        assert db.string.setnx("key", "v2") == 0
+        assert db.string.getset("key", "v3") == "v1"
+        assert db.string.getset("new", "v") is None
+        assert db.get("key") == "v3"
+
+        assert db.string.getex("key", time.time() + 100) == "v3"
+        assert db.expiry_manager.ttl("key") in (99, 100)
+        assert db.string.getex("key", persist=True) == "v3"
+        assert db.expiry_manager.ttl("key") == -1
+
+        assert db.string.getdel("key") == "v3"
+        assert db.get("key") is None
+        assert db.string.getdel("key") is None
+
+    def test_incrbyfloat(self, db):
+        """Test INCRBYFLOAT"""
+        assert db.string.incrbyfloat("f", 10.5) == "10.5"
+        assert db.string.incrbyfloat("f", 0.1) == "10.6"
+        assert db.string.incrbyfloat("f", -0.6) == "10"
+        db.set("text", "abc")
+        assert db.string.incrbyfloat("text", 1.0) == "ERR value is not a valid float"
+
+class TestStringBufferOperations:
+    def test_in_place_buffer(self, db):
+        """Test that APPEND and SETRANGE modify one bytearray in place"""
+        db.set("log", "a")
+        assert db.string.append("log", "bc") == 3
+        buffer = db.store["log"]
+        assert isinstance(buffer, bytearray)
+        for _ in range(100):
+            db.string.append("log", "x")
+        assert db.string.setrange("log", 0, "ABC") == 103
+        assert db.store["log"] is buffer
+        assert db.get("log") == "ABC" + "x" * 100
+        assert db.string.mget("log") == ["ABC" + "x" * 100]
+
+        # SET replaces the buffer with a plain string again
+        db.set("log", "new")
+        assert db.get("log") == "new"
+
+        # An empty SETRANGE does not create the key
+        assert db.string.setrange("missing", 5, "") == 0
+        assert not db.exists("missing")
+
+    def test_getrange_view(self, db):
+        """Test that GETRANGE returns a view of the stored bytes"""
+        db.string.append("key", "Hello World")
+        view = db.string.getrange_view("key", 6, -1)
+        assert isinstance(view, memoryview)
+        assert view.obj is db.store["key"]
+        assert view.tobytes() == b"World"
+        view.release()
+        assert db.string.getrange_view("key", 20, 30).tobytes() == b""
+        assert format_resp(db.string.getrange_view("key", 0, 4)) == "$5\r\nHello\r\n"
+
+    def test_buffer_persistence(self, db, tmp_path):
+        """Test that APPEND and SETRANGE log only the change and replay it"""
+        logged = []
+        db.persistence_manager.log_command = logged.append
+        db.string.append("key", "Hello")
+        db.string.setrange("key", 1, "ELLO world")
+        assert logged == ["APPEND key Hello", "SETRANGE key 1 ELLO world"]
+
+        aof_path = tmp_path / "appendonly.aof"
+        aof_path.write_text("".join(line + "\n" for line in logged))
+        db.flush()
+        db.replaying = True
+        AOFHandler(db, aof_path=str(aof_path)).replay()
+        db.replaying = False
+        assert db.get("key") == "HELLO world"
+
+    def test_buffer_wrong_type(self, db):
+        """Test that the byte commands refuse values that are not strings instead of replacing them"""
+        db.probabilistic.bf_add("bf", "a")
+        db.probabilistic.pfadd("hll", "a")
+        db.set("number", 12)
+        assert db.string.append("bf", "x") == "ERROR: Value at key is not a string"
+        assert db.probabilistic.bf_exists("bf", "a")
+        with pytest.raises(ValueError, match="WRONGTYPE"):
+            db.bitmap.setbit("hll", 0, 1)
+        assert db.probabilistic.pfcount("hll") == 1
+        assert db.string.append("number", "3") == 3
+
+    def test_append_survives_restarts(self, restart):
+        """Test that APPEND is applied once per restart, from the snapshot or from the AOF"""
+        db = restart()
+        db.string.append("key", "abc")
+        db = restart()
+        assert db.get("key") == "abc"
+        db = restart()
+        assert db.get("key") == "abc"
+
+        db.persistence_manager.create_snapshot()
+        db.string.append("key", "def")
+        db = restart(crash=True)
+        assert db.get("key") == "abcdef"
+        db = restart()
+        assert db.get("key") == "abcdef"
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,253 @@
+import pickle
+import random
+from array import array
+
+import pytest
+
+from commands.timeseries_handler import TimeSeriesCommandHandler
+from datatypes.advanced.gorilla import GorillaChunk
+from datatypes.advanced.timeseries import (
+    CompressedTimeSeries, TimeSeries, TSAggregationType, TSPercentile, parse_aggregation,
+)
+
+class TestTimeSeriesStorage:
+    def test_add_in_and_out_of_order(self):
+        """Test that samples stay sorted whatever the insertion order"""
+        ts = TimeSeries()
+        for timestamp in (10, 20, 30, 5, 25, 15):
+            assert ts.add_sample(timestamp, float(timestamp))
+        assert list(ts.timestamps) == [5, 10, 15, 20, 25, 30]
+        assert ts.samples == [(t, float(t)) for t in (5, 10, 15, 20, 25, 30)]
+        assert len(ts) == 6
+
+    def test_duplicate_policies(self):
+        """Test the LAST, FIRST and BLOCK duplicate policies, at the end and in the middle"""
+        for policy, accepted, expected in (("LAST", True, 2.0), ("FIRST", True, 1.0), ("BLOCK", False, 1.0)):
+            ts = TimeSeries(duplicate_policy=policy)
+            ts.add_sample(10, 1.0)
+            ts.add_sample(20, 1.0)
+            assert ts.add_sample(10, 2.0) == accepted
+            assert ts.add_sample(20, 2.0) == accepted
+            assert ts.samples == [(10, expected), (20, expected)]
+
+    def test_retention(self, monkeypatch):
+        """Test that retention advances the head and compacts the columns"""
+        monkeypatch.setattr(TimeSeries, "COMPACT_MIN_EXPIRED", 4)
+        ts = TimeSeries(retention_ms=100)
+        for timestamp in range(0, 150, 10):
+            ts.add_sample(timestamp, 1.0)
+        assert ts.samples[0][0] == 40
+        assert len(ts) == 11
+        # Samples older than the retention of the newest one are refused
+        assert not ts.add_sample(30, 1.0)
+        assert ts.add_sample(45, 1.0)
+        for timestamp in range(150, 300, 10):
+            ts.add_sample(timestamp, 1.0)
+        assert ts.head < len(ts.timestamps) / 2
+        assert ts.samples[0][0] == 190
+        assert ts.range(0, 1000) == ts.samples
+
+    def test_get_sample(self):
+        """Test getting the latest and the closest sample"""
+        ts = TimeSeries()
+        assert ts.get_sample() is None
+        for timestamp in (10, 20, 40):
+            ts.add_sample(timestamp, float(timestamp))
+        assert ts.get_sample() == (40, 40.0)
+        assert ts.get_sample(0) == (10, 10.0)
+        assert ts.get_sample(14) == (10, 10.0)
+        assert ts.get_sample(15) == (10, 10.0)
+        assert ts.get_sample(16) == (20, 20.0)
+        assert ts.get_sample(31) == (40, 40.0)
+        assert ts.get_sample(100) == (40, 40.0)
+
+    def test_range(self):
+        """Test range bounds and aggregations"""
+        ts = TimeSeries()
+        for timestamp in range(0, 100, 5):
+            ts.add_sample(timestamp, float(timestamp))
+        assert ts.range(12, 27) == [(15, 15.0), (20, 20.0), (25, 25.0)]
+        assert ts.range(15, 25) == [(15, 15.0), (20, 20.0), (25, 25.0)]
+        assert ts.range(200, 300) == []
+        expected = {
+            TSAggregationType.AVG: [(0, 10.0), (25, 35.0)],
+            TSAggregationType.SUM: [(0, 50.0), (25, 175.0)],
+            TSAggregationType.MIN: [(0, 0.0), (25, 25.0)],
+            TSAggregationType.MAX: [(0, 20.0), (25, 45.0)],
+            TSAggregationType.COUNT: [(0, 5), (25, 5)],
+            TSAggregationType.FIRST: [(0, 0.0), (25, 25.0)],
+            TSAggregationType.LAST: [(0, 20.0), (25, 45.0)],
+        }
+        for aggregation, buckets in expected.items():
+            assert ts.range(0, 49, aggregation, 25) == buckets
+
+    def test_old_snapshot(self):
+        """Test loading a pickled TimeSeries that still stores a list of tuples"""
+        ts = TimeSeries()
+        ts.add_sample(1, 1.0)
+        state = {k: v for k, v in ts.__dict__.items() if k not in ("timestamps", "values", "head")}
+        state["samples"] = [(1, 1.0), (2, 2.0)]
+        restored = TimeSeries.__new__(TimeSeries)
+        restored.__setstate__(state)
+        assert restored.samples == [(1, 1.0), (2, 2.0)]
+        assert pickle.loads(pickle.dumps(restored)).samples == [(1, 1.0), (2, 2.0)]
+
+class TestTimeSeriesAggregation:
+    def test_parse_aggregation(self):
+        """Test parsing aggregation names, including percentiles"""
+        assert parse_aggregation("AVG") == TSAggregationType.AVG
+        assert parse_aggregation("p99") == TSPercentile(99)
+        assert parse_aggregation("P99.9").quantile == pytest.approx(0.999)
+        with pytest.raises(ValueError):
+            parse_aggregation("p101")
+        with pytest.raises(ValueError):
+            parse_aggregation("median")
+
+    def test_range_percentile(self, db):
+        """Test TS.RANGE with pNN aggregations"""
+        handler = TimeSeriesCommandHandler(db)
+        for i in range(200):
+            db.timeseries.add("latency", i * 10, float(i % 100))
+        result = db.timeseries.range("latency", 0, 1999, "p99", 1000)
+        assert [ts for ts, _ in result] == [0, 1000]
+        assert all(value == pytest.approx(98.5, abs=1) for _, value in result)
+        assert db.timeseries.range("latency", 0, 1999, "p0", 1000)[0][1] == 0
+        assert db.timeseries.range("latency", 0, 1999, "p100", 1000)[0][1] == 99
+        assert handler.ts_range_command(None, "latency", "0", "999", "AGGREGATION", "p50", "1000") == [["0", "49.5"]]
+        assert db.timeseries.range("latency", 0, 999, "max", 1000) == [(0, 99.0)]
+
+class TestTimeSeriesCompression:
+    def test_chunk_round_trip(self):
+        """Test that a Gorilla chunk restores timestamps and value bits exactly"""
+        timestamps = [-5, 0, 1, 2, 1000, 1063, 1320, 3400, 10 ** 15, 10 ** 15 + 1]
+        values = [0.0, -0.0, 1.5, float("nan"), float("inf"), -1e308, 5e-324, 42.0, 42.0, 0.1]
+        chunk = GorillaChunk()
+        for timestamp, value in zip(timestamps, values):
+            chunk.append(timestamp, value)
+        for _ in range(2):
+            decoded_timestamps, decoded_values = chunk.decode()
+            assert list(decoded_timestamps) == timestamps
+            assert decoded_values.tobytes() == array("d", values).tobytes()
+            chunk.seal()
+        assert list(chunk.decode(1320)[0]) == timestamps[:7]
+
+    def test_compression_ratio(self):
+        """Test that regular per-second samples take under 2 bytes each"""
+        rng = random.Random(1)
+        ts = CompressedTimeSeries()
+        level = 50
+        for i in range(20000):
+            level += rng.choice((-1, 0, 0, 1))
+            ts.add_sample(i * 1000 + rng.randint(-5, 5), float(level))
+        assert len(ts.chunks) > 1
+        assert sum(chunk.nbytes for chunk in ts.chunks) / len(ts) < 2
+
+    def test_matches_uncompressed(self):
+        """Test that compressed series answer like uncompressed ones, across many small chunks"""
+        rng = random.Random(7)
+        for retention, policy in ((0, "LAST"), (200, "FIRST"), (50, "BLOCK")):
+            plain = TimeSeries(retention, policy)
+            compressed = CompressedTimeSeries(retention, policy, chunk_size=48)
+            timestamp = 0
+            for _ in range(300):
+                if rng.random() < 0.7:
+                    timestamp += rng.choice((1, 5, 17))
+                    sample_ts = timestamp
+                else:
+                    sample_ts = timestamp - rng.randint(0, 300)
+                value = float(rng.randint(0, 3))
+                assert compressed.add_sample(sample_ts, value) == plain.add_sample(sample_ts, value)
+            assert len(compressed.chunks) > 1
+            assert compressed.samples == plain.samples
+            assert len(compressed) == len(plain)
+            for query in [None] + [rng.randint(0, timestamp + 50) for _ in range(20)]:
+                assert compressed.get_sample(query) == plain.get_sample(query)
+            for start in range(0, timestamp, 97):
+                assert compressed.range(start, start + 150) == plain.range(start, start + 150)
+                assert (compressed.range(start, start + 150, TSAggregationType.AVG, 20)
+                        == plain.range(start, start + 150, TSAggregationType.AVG, 20))
+
+    def test_ts_create_encoding(self, db):
+        """Test TS.CREATE ENCODING and CHUNK_SIZE"""
+        handler = TimeSeriesCommandHandler(db)
+        assert handler.ts_create_command(None, "packed", "ENCODING", "compressed", "CHUNK_SIZE", "64") == "OK"
+        assert handler.ts_create_command(None, "plain", "ENCODING", "UNCOMPRESSED") == "OK"
+        assert handler.ts_create_command(None, "bad", "ENCODING", "zip") == "ERROR: Invalid encoding"
+        assert handler.ts_create_command(None, "bad", "CHUNK_SIZE", "50") == "ERROR: Invalid chunk size"
+        assert handler.ts_create_command(None, "bad", "CHUNK_SIZE", "8") == "ERROR: Invalid chunk size"
+        assert handler.ts_create_command(None, "bad", "CHUNK_SIZE") == "ERROR: CHUNK_SIZE requires size in bytes"
+        packed = db.get("packed")
+        assert isinstance(packed, CompressedTimeSeries) and packed.chunk_size == 64
+        assert type(db.get("plain")) is TimeSeries
+        for i in range(100):
+            handler.ts_add_command(None, "packed", str(i * 1000), str(i % 7))
+        assert len(packed.chunks) > 1
+        assert handler.ts_get_command(None, "packed") == ["99000", "1.0"]
+        assert handler.ts_range_command(None, "packed", "5000", "7000") == [["5000", "5.0"], ["6000", "6.0"], ["7000", "0.0"]]
+        restored = pickle.loads(pickle.dumps(packed, protocol=4))
+        assert restored.samples == packed.samples
+
+class TestTimeSeriesCompaction:
+    def test_rule_writes_closed_buckets(self, db):
+        """Test that TS.CREATERULE writes a bucket aggregate once a later bucket opens"""
+        handler = TimeSeriesCommandHandler(db)
+        for key in ("raw", "avg", "p90", "hourly"):
+            handler.ts_create_command(None, key)
+        assert handler.ts_createrule_command(None, "raw", "avg", "AGGREGATION", "avg", "1000") == "OK"
+        assert handler.ts_createrule_command(None, "raw", "p90", "AGGREGATION", "P90", "1000") == "OK"
+        assert handler.ts_createrule_command(None, "avg", "hourly", "AGGREGATION", "max", "3600000") == "OK"
+        for i in range(25):
+            handler.ts_add_command(None, "raw", str(i * 100), str(i))
+        # Buckets 0 and 1000 are closed, 2000 is still open
+        assert db.get("avg").samples == [(0, 4.5), (1000, 14.5)]
+        assert db.get("p90").samples == [(0, pytest.approx(8.5, abs=0.5)), (1000, pytest.approx(18.5, abs=0.5))]
+        assert db.get("hourly").samples == []
+        handler.ts_add_command(None, "raw", "3600000", "1")
+        assert db.get("avg").samples[-1] == (2000, 22.0)
+        assert db.get("hourly").samples == []
+        # Chained: closing the 3600000 bucket of avg opens a new hour in hourly
+        handler.ts_add_command(None, "raw", "3601000", "1")
+        assert db.get("avg").samples[-1] == (3600000, 1.0)
+        assert db.get("hourly").samples == [(0, 22.0)]
+
+    def test_late_samples(self, db):
+        """Test that late samples update the open bucket or rewrite a closed one"""
+        for key in ("raw", "sum"):
+            db.timeseries.create(key)
+        db.timeseries.add("raw", 50, 1.0)
+        db.timeseries.create_rule("raw", "sum", "sum", 100)
+        for timestamp in (150, 250, 120, 40, 260):
+            db.timeseries.add("raw", timestamp, 1.0)
+        assert db.get("sum").samples == [(0, 2.0), (100, 2.0)]
+        db.timeseries.add("raw", 300, 1.0)
+        assert db.get("sum").samples == [(0, 2.0), (100, 2.0), (200, 2.0)]
+        # A compressed source with BLOCK duplicates on the destination: rewrites still replace
+        db.timeseries.create("packed", encoding="COMPRESSED")
+        db.timeseries.create("count", duplicate_policy="BLOCK")
+        db.timeseries.create_rule("packed", "count", "count", 10, 5)
+        for timestamp in (5, 6, 16, 7, 30):
+            db.timeseries.add("packed", timestamp, 0.0)
+        assert db.get("count").samples == [(5, 3), (15, 1)]
+
+    def test_rule_errors(self, db):
+        """Test TS.CREATERULE validation and TS.DELETERULE"""
+        handler = TimeSeriesCommandHandler(db)
+        for key in ("a", "b", "c"):
+            handler.ts_create_command(None, key)
+        create = handler.ts_createrule_command
+        assert create(None, "a", "missing", "AGGREGATION", "avg", "10") == "ERROR: Key does not exist"
+        assert create(None, "a", "a", "AGGREGATION", "avg", "10") == "ERROR: Source and destination keys must differ"
+        assert create(None, "a", "b", "AGGREGATION", "median", "10") == "ERROR: Invalid aggregation type median"
+        assert create(None, "a", "b", "AGGREGATION", "avg", "0") == "ERROR: Bucket duration must be positive"
+        assert create(None, "a", "b", "AGGREGATION", "avg") == "ERROR: Wrong number of arguments for TS.CREATERULE"
+        assert create(None, "a", "b", "AGGREGATION", "avg", "10") == "OK"
+        assert create(None, "c", "b", "AGGREGATION", "avg", "10") == "ERROR: Destination key already has a source rule"
+        assert create(None, "b", "c", "AGGREGATION", "avg", "10") == "OK"
+        assert create(None, "c", "a", "AGGREGATION", "avg", "10") == "ERROR: Rule would create a cycle"
+        assert handler.ts_deleterule_command(None, "a", "c") == "ERROR: Rule does not exist"
+        assert handler.ts_deleterule_command(None, "a", "b") == "OK"
+        assert db.get("a").rules == [] and db.get("b").source_key is None
+        assert create(None, "c", "a", "AGGREGATION", "avg", "10") == "OK"
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -70,6 +70,50 @@ class TestZSetRangeOperations:
         assert db.zset.zrangebyscore("myzset", "invalid", "5") == []
         assert db.zset.zrangebyscore("nonexistent", "1", "5") == []
 
+    def test_zrangebyscore_exclusive_and_limit(self, db):
+        """Test ZRANGEBYSCORE with exclusive bounds and LIMIT"""
+        db.zset.zadd("myzset", "1", "one", "2", "two", "3", "three", "4", "four", "5", "five")
+
+        # Exclusive bounds
+        assert db.zset.zrangebyscore("myzset", "(1", "(4") == ["two", "three"]
+        assert db.zset.zrangebyscore("myzset", "(5", "+inf") == []
+
+        # LIMIT offset count
+        assert db.zset.zrangebyscore("myzset", "-inf", "+inf", offset=1, count=2) == ["two", "three"]
+        assert db.zset.zrangebyscore("myzset", "-inf", "+inf", offset=3, count=-1) == ["four", "five"]
+        assert db.zset.zrangebyscore("myzset", "-inf", "+inf", offset=10, count=2) == []
+
+        # Reverse order
+        assert db.zset.zrevrangebyscore("myzset", "+inf", "(2") == ["five", "four", "three"]
+        assert db.zset.zrevrangebyscore("myzset", "5", "1", offset=1, count=2) == ["four", "three"]
+
+    def test_zcount(self, db):
+        """Test ZCOUNT operation"""
+        db.zset.zadd("myzset", "1", "one", "2", "two", "3", "three", "4", "four", "5", "five")
+
+        assert db.zset.zcount("myzset", "-inf", "+inf") == 5
+        assert db.zset.zcount("myzset", "(1", "3") == 2
+        assert db.zset.zcount("myzset", "6", "10") == 0
+        assert db.zset.zcount("nonexistent", "-inf", "+inf") == 0
+
+    def test_zrevrange(self, db):
+        """Test ZREVRANGE operation"""
+        db.zset.zadd("myzset", "1", "one", "2", "two", "3", "three")
+
+        assert db.zset.zrevrange("myzset", 0, -1) == ["three", "two", "one"]
+        assert db.zset.zrevrange("myzset", 1, 1, withscores=True) == [("two", "2")]
+        assert db.zset.zrevrange("myzset", 5, 10) == []
+
+    def test_zrangebylex(self, db):
+        """Test ZRANGEBYLEX and ZLEXCOUNT operations"""
+        db.zset.zadd("myzset", "0", "a", "0", "b", "0", "c", "0", "d", "0", "e")
+
+        assert db.zset.zrangebylex("myzset", "-", "[c") == ["a", "b", "c"]
+        assert db.zset.zrangebylex("myzset", "(b", "+") == ["c", "d", "e"]
+        assert db.zset.zrangebylex("myzset", "-", "+", offset=1, count=2) == ["b", "c"]
+        assert db.zset.zrevrangebylex("myzset", "(d", "-") == ["c", "b", "a"]
+        assert db.zset.zlexcount("myzset", "[b", "(e") == 3
+
 class TestZSetRankOperations:
     def test_zrank(self, db):
         """Test ZRANK operation"""
@@ -85,6 +129,41 @@ class TestZSetRankOperations:
         assert db.zset.zrank("myzset", "nonexistent") is None
         assert db.zset.zrank("nonexistent", "one") is None
 
+    def test_zrevrank(self, db):
+        """Test ZREVRANK operation"""
+        db.zset.zadd("myzset", "1", "one", "2", "two", "3", "three")
+
+        assert db.zset.zrevrank("myzset", "three") == 0
+        assert db.zset.zrevrank("myzset", "one") == 2
+        assert db.zset.zrevrank("myzset", "nonexistent") is None
+
+    def test_rank_after_removals(self, db):
+        """Test ZRANK and ZRANGE stay consistent after removals"""
+        for i in range(200):
+            db.zset.zadd("myzset", str(i), f"m{i}")
+
+        # Remove every third member
+        db.zset.zrem("myzset", *[f"m{i}" for i in range(0, 200, 3)])
+        remaining = [f"m{i}" for i in range(200) if i % 3]
+
+        assert db.zset.zrange("myzset", 0, -1) == remaining
+        assert db.zset.zrange("myzset", 50, 52) == remaining[50:53]
+        for rank, member in enumerate(remaining):
+            assert db.zset.zrank("myzset", member) == rank
+
+    def test_score_update_keeps_order(self, db):
+        """Test ZADD score updates, in place and with reordering"""
+        db.zset.zadd("myzset", "1", "a", "2", "b", "3", "c")
+
+        # New score keeps the position
+        assert db.zset.zadd("myzset", "2.5", "b") == 0
+        assert db.zset.zrange("myzset", 0, -1) == ["a", "b", "c"]
+
+        # New score moves the member
+        assert db.zset.zadd("myzset", "0", "c") == 0
+        assert db.zset.zrange("myzset", 0, -1) == ["c", "a", "b"]
+        assert db.zset.zrank("myzset", "b") == 2
+
 class TestZSetRemoveOperations:
     def test_zrem(self, db):
         """Test ZREM operation"""
@@ -102,6 +181,91 @@ class TestZSetRemoveOperations:
         # Test non-existent set
         assert db.zset.zrem("nonexistent", "member") == 0
 
+class TestZSetAggregateOperations:
+    def test_zunionstore(self, db):
+        """Test ZUNIONSTORE with WEIGHTS and AGGREGATE"""
+        db.zset.zadd("zset1", "1", "one", "2", "two")
+        db.zset.zadd("zset2", "1", "one", "2", "two", "3", "three")
+
+        assert db.zset.zunionstore("out", ["zset1", "zset2"], [2, 3]) == 3
+        assert db.zset.zrange("out", 0, -1, withscores=True) == [("one", "5"), ("three", "9"), ("two", "10")]
+
+        assert db.zset.zunionstore("out", ["zset1", "zset2"], aggregate="MAX") == 3
+        assert db.zset.zrange("out", 0, -1, withscores=True) == [("one", "1"), ("two", "2"), ("three", "3")]
+        assert db.zset.zrank("out", "three") == 2
+
+    def test_zinterstore(self, db):
+        """Test ZINTERSTORE and ZINTER"""
+        db.zset.zadd("zset1", "1", "one", "2", "two")
+        db.zset.zadd("zset2", "1", "one", "2", "two", "3", "three")
+
+        assert db.zset.zinterstore("out", ["zset1", "zset2"], [2, 3]) == 2
+        assert db.zset.zrange("out", 0, -1, withscores=True) == [("one", "5"), ("two", "10")]
+        assert db.zset.zinter(["zset2", "zset1"], aggregate="MIN") == ["one", "two"]
+
+        # Intersecting with a missing key empties the destination
+        assert db.zset.zinterstore("out", ["zset1", "nonexistent"]) == 0
+        assert db.zset.zrange("out", 0, -1) == []
+
+    def test_zdiff(self, db):
+        """Test ZDIFF and ZDIFFSTORE"""
+        db.zset.zadd("zset1", "1", "one", "2", "two", "3", "three")
+        db.zset.zadd("zset2", "1", "one", "2", "two")
+
+        assert db.zset.zdiff(["zset1", "zset2"], withscores=True) == [("three", "3")]
+        assert db.zset.zdiffstore("out", ["zset1", "nonexistent"]) == 3
+        assert db.zset.zrange("out", 0, -1) == ["one", "two", "three"]
+
+class TestZSetPopOperations:
+    def test_zpopmin_zpopmax(self, db):
+        """Test ZPOPMIN and ZPOPMAX with and without count"""
+        db.zset.zadd("myzset", "1", "one", "2", "two", "3", "three", "4", "four")
+
+        assert db.zset.zpopmin("myzset") == [("one", "1")]
+        assert db.zset.zpopmax("myzset", 2) == [("four", "4"), ("three", "3")]
+        assert db.zset.zrank("myzset", "two") == 0
+
+        # Popping the last member deletes the key
+        assert db.zset.zpopmin("myzset", 10) == [("two", "2")]
+        assert not db.exists("myzset")
+        assert db.zset.zpopmax("myzset") == []
+
+    def test_blocking_pop(self, db):
+        """Test BZPOPMIN parking clients and serving them in FIFO order"""
+        from commands.zset_handler import ZSetCommandHandler
+        from core.blocking import BlockedCommand
+        handler = ZSetCommandHandler(db)
+        manager = db.blocking_manager
+
+        # Data available: reply right away
+        db.zset.zadd("queue", "5", "job")
+        assert handler.bzpopmin_command(1, "empty", "queue", "0") == ["queue", "job", "5"]
+
+        # No data: both clients are parked on the key
+        for client_id in (1, 2):
+            blocked = handler.bzpopmin_command(client_id, "queue", "0")
+            assert isinstance(blocked, BlockedCommand)
+            manager.block(client_id, blocked)
+
+        db.zset.zadd("queue", "2", "b", "1", "a")
+        assert manager.serve_ready_keys() == [(1, ["queue", "a", "1"]), (2, ["queue", "b", "2"])]
+        assert not manager.is_blocked(1) and not manager.is_blocked(2)
+
+    def test_blocking_pop_timeout(self, db):
+        """Test that a blocked client gets nil once its timeout expires"""
+        from commands.zset_handler import ZSetCommandHandler
+        handler = ZSetCommandHandler(db)
+        manager = db.blocking_manager
+
+        manager.block(7, handler.bzpopmax_command(7, "queue", "0.5"))
+        assert manager.expire_timeouts() == []
+        assert manager.expire_timeouts(now=float('inf')) == [(7, None)]
+
+        # A timed-out client is not served later
+        db.zset.zadd("queue", "1", "a")
+        assert manager.serve_ready_keys() == []
+        assert handler.bzpopmin_command(7, "queue", "-1") == "ERR timeout is negative"
+
 class TestZSetEdgeCases:
     def test_type_handling(self, db):
         """Test handling of different types"""
@@ -134,5 +298,71 @@ class TestZSetEdgeCases:
         # Test random access
         assert db.zset.zrank("largezset", "500") == 500
 
+    def test_bulk_zadd(self, db):
+        """Test ZADD with many pairs, which takes the bulk-load path"""
+        args = []
+        for i in reversed(range(500)):
+            args.extend([str(i), f"m{i:03d}"])
+        assert db.zset.zadd("bulkzset", *args) == 500
+        assert db.zset.zrank("bulkzset", "m250") == 250
+        assert db.zset.zrange("bulkzset", 0, 2) == ["m000", "m001", "m002"]
+
+        # Members ordered after the tail are appended in bulk as well
+        args = []
+        for i in range(500, 600):
+            args.extend([str(i), f"m{i:03d}"])
+        assert db.zset.zadd("bulkzset", *args) == 100
+        assert db.zset.zrevrange("bulkzset", 0, 0) == ["m599"]
+        assert db.zset.zcount("bulkzset", "(100", "+inf") == 499
+
+    def test_snapshot_round_trip(self, db):
+        """Test that sorted sets survive pickling as used by snapshots"""
+        import pickle
+        for i in range(100):
+            db.zset.zadd("myzset", str(i % 10), f"m{i}")
+        restored = pickle.loads(pickle.dumps(db.store["myzset"]))
+        db.store["restored"] = restored
+        assert db.zset.zrange("restored", 0, -1) == db.zset.zrange("myzset", 0, -1)
+        assert db.zset.zrank("restored", "m55") == db.zset.zrank("myzset", "m55")
+
+    def test_legacy_snapshot(self, db, monkeypatch):
+        """Test that sorted sets pickled with the old dict-based nodes still load"""
+        import pickle
+        from datatypes import zset as zset_module
+
+        class SkipListNode:
+            def __init__(self, score, member, level):
+                self.score = score
+                self.member = member
+                self.forward = [None] * (level + 1)
+                self.span = [0] * (level + 1)
+
+        class SkipList:
+            def __init__(self, pairs):
+                self.head = SkipListNode(float('-inf'), '', 16)
+                self.level = 0
+                self.length = len(pairs)
+                last = self.head
+                for score, member in pairs:
+                    last.forward[0] = SkipListNode(score, member, 0)
+                    last.span[0] = 1
+                    last = last.forward[0]
+
+        # Pickle them under the names of the current classes, as the old code would have
+        for cls in (SkipListNode, SkipList):
+            cls.__module__ = zset_module.__name__
+            cls.__qualname__ = cls.__name__
+        pairs = [(float(i % 5), f"m{i:02d}") for i in range(20)]
+        pairs.sort()
+        with monkeypatch.context() as patch:
+            patch.setattr(zset_module, "SkipListNode", SkipListNode)
+            patch.setattr(zset_module, "SkipList", SkipList)
+            data = pickle.dumps({'dict': {m: s for s, m in pairs}, 'skiplist': SkipList(pairs)})
+        db.store["legacy"] = pickle.loads(data)
+        assert db.zset.zrange("legacy", 0, -1) == [m for _, m in pairs]
+        assert db.zset.zrank("legacy", "m07") == [m for _, m in pairs].index("m07")
+        db.zset.zadd("legacy", "2.5", "new")
+        assert db.zset.zcount("legacy", "2", "3") == 9
+
 if __name__ == '__main__':
     pytest.main([__file__])